@@ -0,0 +1,500 @@
+"""
+Analysis Schemas Module
+
+This module defines the structured answer expected for each analysis type
+and decodes model output into typed records, so an answer is either used
+field by field or repaired, never silently replaced by default scores.
+
+Each schema lists its fields with a kind: "score" (a number from 1 to 10),
+"string", "list" (of strings), or another schema for a nested section. The
+schema is sent as the provider's JSON schema response format where the
+provider supports one (json_object mode otherwise) and its layout is spelled
+out in the prompt. Answers are parsed tolerantly: prose and code fences
+around the object, trailing commas and scores written as "8/10" or "High"
+are accepted. When required fields are still missing or invalid, a repair
+request asks for those fields only, and the valid part of the answer is
+kept, so a bad field does not cost a whole new analysis.
+"""
+
+import os
+import re
+import sys
+import json
+import logging
+import dataclasses
+from dataclasses import dataclass, field, make_dataclass
+from typing import Dict, Any, List, Optional, Sequence, Tuple, Union
+
+from metrics import get_registry
+
+# Configure logging
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger(__name__)
+
+# Repair requests sent for one answer before it is given up
+MAX_REPAIRS = int(os.getenv("LLM_SCHEMA_REPAIRS", "1"))
+
+# Field kinds
+SCORE = "score"
+STRING = "string"
+LIST = "list"
+
+# Accepted score range; the prompts ask for 1 to 10
+SCORE_MIN = 0.0
+SCORE_MAX = 10.0
+
+# Rating words mapped to scores, longest first so "medium-low" is not read as "low"
+SCORE_WORDS = [
+    ("medium-high", 7.0),
+    ("medium-low", 3.0),
+    ("very high", 10.0),
+    ("very low", 1.0),
+    ("medium", 5.0),
+    ("high", 8.0),
+    ("low", 2.0),
+]
+
+# Positions tried when looking for the JSON object in an answer
+MAX_OBJECT_STARTS = 16
+
+_SCORE_OUT_OF_TEN = re.compile(r"(\d+(?:\.\d+)?)\s*/\s*10\b")
+_NUMBER = re.compile(r"\d+(?:\.\d+)?")
+_TRAILING_COMMA = re.compile(r",\s*([}\]])")
+
+JSON_INSTRUCTIONS = """
+Respond with JSON in exactly this structure:
+{layout}
+"""
+
+REPAIR_INSTRUCTIONS = """
+These fields of your answer were missing or invalid:
+{errors}
+Reply with a JSON object holding only these fields, in exactly this structure:
+{layout}
+"""
+
+
+class SchemaValidationError(ValueError):
+    """An answer still misses required fields after its repair requests"""
+
+    def __init__(self, schema: str, errors: Dict[str, str]):
+        super().__init__(
+            f"{schema} answer is invalid: " + "; ".join(f"{name} {error}" for name, error in errors.items())
+        )
+        self.schema = schema
+        self.errors = errors
+
+
+def parse_score(value: Any) -> Optional[float]:
+    """
+    Read a score from a number or text such as "8", "8.5", "High (8/10)" or "Medium".
+
+    Args:
+        value: The value given for the score.
+
+    Returns:
+        The score, or None if the value holds none.
+    """
+    if isinstance(value, bool):
+        return None
+    if isinstance(value, (int, float)):
+        return float(value)
+    if not isinstance(value, str):
+        return None
+    match = _SCORE_OUT_OF_TEN.search(value)
+    if match:
+        return float(match.group(1))
+    match = _NUMBER.search(value)
+    if match:
+        return float(match.group(0))
+    text = value.lower()
+    for word, score in SCORE_WORDS:
+        if word in text:
+            return score
+    return None
+
+
+def parse_json_object(content: Optional[str]) -> Optional[Dict[str, Any]]:
+    """
+    Find the JSON object in a model answer.
+
+    A bare object (as returned in JSON mode) is parsed directly; otherwise
+    the first object that decodes is taken, skipping prose and code fences
+    around it and allowing trailing commas.
+
+    Args:
+        content: The answer text.
+
+    Returns:
+        The object, or None if the answer holds none.
+    """
+    if not content:
+        return None
+    text = content.strip()
+    if text.startswith("{"):
+        try:
+            value = json.loads(text)
+            if isinstance(value, dict):
+                return value
+        except json.JSONDecodeError:
+            pass
+
+    decoder = json.JSONDecoder()
+    start = text.find("{")
+    for _ in range(MAX_OBJECT_STARTS):
+        if start == -1:
+            break
+        for candidate in (text[start:], _TRAILING_COMMA.sub(r"\1", text[start:])):
+            try:
+                value, _ = decoder.raw_decode(candidate)
+            except json.JSONDecodeError:
+                continue
+            if isinstance(value, dict):
+                return value
+        start = text.find("{", start + 1)
+    return None
+
+
+@dataclass
+class AnalysisSchema:
+    """
+    Expected answer of one analysis type.
+
+    Attributes:
+        name: Analysis type, also the name of the JSON schema.
+        fields: Kind of each field, in answer order: SCORE, STRING, LIST or
+            a nested AnalysisSchema.
+        optional: Fields that may be left out; they default to an empty
+            string or list, and are dropped rather than repaired when invalid.
+        record_type: Frozen dataclass the answer is decoded into (slotted
+            on Python 3.10 and later).
+    """
+    name: str
+    fields: Dict[str, Union[str, "AnalysisSchema"]]
+    optional: Tuple[str, ...] = ()
+    record_type: type = field(init=False, repr=False)
+
+    def __post_init__(self):
+        types = {SCORE: float, STRING: str, LIST: Tuple[str, ...]}
+        self.record_type = make_dataclass(
+            "".join(part.title() for part in self.name.split("_")) + "Record",
+            [
+                (name, kind.record_type if isinstance(kind, AnalysisSchema) else types[kind])
+                for name, kind in self.fields.items()
+            ],
+            frozen=True,
+            # make_dataclass only takes slots from Python 3.10
+            **({"slots": True} if sys.version_info >= (3, 10) else {})
+        )
+
+    def layout(self, names: Optional[Sequence[str]] = None) -> str:
+        """
+        The JSON layout of the answer, for the prompt.
+
+        Args:
+            names: Only lay out these fields. If None, all of them.
+        """
+        return json.dumps(self._layout(names), indent=2)
+
+    def _layout(self, names: Optional[Sequence[str]] = None) -> Dict[str, Any]:
+        placeholders = {SCORE: "<score 1-10>", STRING: "<string>", LIST: ["<string>"]}
+        return {
+            name: kind._layout() if isinstance(kind, AnalysisSchema) else placeholders[kind]
+            for name, kind in self.fields.items()
+            if names is None or name in names
+        }
+
+    def instructions(self) -> str:
+        """Prompt text asking for an answer in this schema's layout"""
+        return JSON_INSTRUCTIONS.format(layout=self.layout())
+
+    def json_schema(self, names: Optional[Sequence[str]] = None) -> Dict[str, Any]:
+        """
+        JSON schema of the answer.
+
+        Args:
+            names: Only include these fields. If None, all of them.
+        """
+        types = {
+            SCORE: {"type": "number", "minimum": SCORE_MIN, "maximum": SCORE_MAX},
+            STRING: {"type": "string"},
+            LIST: {"type": "array", "items": {"type": "string"}},
+        }
+        selected = [name for name in self.fields if names is None or name in names]
+        return {
+            "type": "object",
+            "properties": {
+                name: self.fields[name].json_schema() if isinstance(self.fields[name], AnalysisSchema)
+                else types[self.fields[name]]
+                for name in selected
+            },
+            "required": [name for name in selected if name not in self.optional],
+            "additionalProperties": False,
+        }
+
+    def response_format(self, json_mode: Optional[str], names: Optional[Sequence[str]] = None) -> Optional[Dict[str, Any]]:
+        """
+        The response_format chat argument for a provider.
+
+        Args:
+            json_mode: The provider's structured output support
+                (ProviderConfig.json_mode).
+            names: Only ask for these fields. If None, all of them.
+
+        Returns:
+            The response format, or None if the provider has no JSON mode.
+        """
+        if json_mode == "json_schema":
+            return {"type": "json_schema", "json_schema": {"name": self.name, "schema": self.json_schema(names)}}
+        if json_mode == "json_object":
+            return {"type": "json_object"}
+        return None
+
+    def coerce(self, data: Dict[str, Any], names: Optional[Sequence[str]] = None) -> Tuple[Dict[str, Any], Dict[str, str]]:
+        """
+        Convert the fields of a decoded answer to their kinds.
+
+        Args:
+            data: The JSON object of the answer.
+            names: Only convert these fields. If None, all of them.
+
+        Returns:
+            The converted values, and an error per required field that is
+            missing or invalid.
+        """
+        values, errors = {}, {}
+        for name, kind in self.fields.items():
+            if names is not None and name not in names:
+                continue
+            if data.get(name) is None:
+                if name not in self.optional:
+                    errors[name] = "is missing"
+                continue
+            value, error = _coerce_value(kind, data[name])
+            if error is None:
+                values[name] = value
+            elif name not in self.optional:
+                errors[name] = error
+        return values, errors
+
+    def build(self, values: Dict[str, Any]):
+        """Create a record from converted values, filling in the optional fields"""
+        defaults = {STRING: "", LIST: ()}
+        return self.record_type(**{
+            name: values[name] if name in values else defaults.get(kind)
+            for name, kind in self.fields.items()
+        })
+
+    def decode(self, data: Dict[str, Any]):
+        """
+        Decode an answer into a record.
+
+        Raises:
+            SchemaValidationError: If a required field is missing or invalid.
+        """
+        values, errors = self.coerce(data)
+        if errors:
+            raise SchemaValidationError(self.name, errors)
+        return self.build(values)
+
+    def accepts(self, content: str) -> bool:
+        """Whether an answer text decodes without errors"""
+        data = parse_json_object(content)
+        return data is not None and not self.coerce(data)[1]
+
+
+def _coerce_value(kind: Union[str, AnalysisSchema], value: Any) -> Tuple[Any, Optional[str]]:
+    """Convert one field value; returns (value, None) or (None, error)"""
+    if isinstance(kind, AnalysisSchema):
+        if not isinstance(value, dict):
+            return None, "must be an object"
+        values, errors = kind.coerce(value)
+        if errors:
+            return None, "has invalid fields: " + ", ".join(f"{name} {error}" for name, error in errors.items())
+        return kind.build(values), None
+    if kind == SCORE:
+        score = parse_score(value)
+        if score is None or not SCORE_MIN <= score <= SCORE_MAX:
+            return None, "must be a score from 1 to 10"
+        return score, None
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        value = str(value)
+    if kind == STRING:
+        if isinstance(value, list) and all(isinstance(item, str) for item in value):
+            return "; ".join(value), None
+        return (value.strip(), None) if isinstance(value, str) else (None, "must be a string")
+    if isinstance(value, str):
+        return ((value.strip(),) if value.strip() else ()), None
+    if not isinstance(value, list):
+        return None, "must be a list of strings"
+    items = []
+    for item in value:
+        if isinstance(item, dict):
+            # Findings are often given as objects, e.g. {"type": ..., "description": ...}
+            item = ", ".join(f"{key}: {text}" for key, text in item.items())
+        elif isinstance(item, (int, float)) and not isinstance(item, bool):
+            item = str(item)
+        if not isinstance(item, str):
+            return None, "must be a list of strings"
+        items.append(item.strip())
+    return tuple(items), None
+
+
+def as_dict(record) -> Dict[str, Any]:
+    """A record as plain JSON data, with lists for its tuples"""
+    result = {}
+    for record_field in dataclasses.fields(record):
+        value = getattr(record, record_field.name)
+        if dataclasses.is_dataclass(value):
+            value = as_dict(value)
+        elif isinstance(value, tuple):
+            value = list(value)
+        result[record_field.name] = value
+    return result
+
+
+class AnswerDecoder:
+    """
+    Decodes a model's answers into a record, asking again for failed fields.
+
+    Send a request with arguments(), pass its answer to feed(), and send
+    again while feed() returns True. Valid fields are kept across answers,
+    so each repair request asks only for the fields still missing or
+    invalid; record() then returns the decoded record.
+    """
+
+    def __init__(
+        self,
+        schema: AnalysisSchema,
+        messages: List[Dict[str, Any]],
+        json_mode: Optional[str] = None,
+        max_repairs: int = MAX_REPAIRS
+    ):
+        """
+        Initialize the decoder.
+
+        Args:
+            schema: The expected answer.
+            messages: The chat messages of the first request.
+            json_mode: The provider's structured output support
+                (ProviderConfig.json_mode).
+            max_repairs: Repair requests allowed before giving up.
+        """
+        self.schema = schema
+        self.messages = list(messages)
+        self.json_mode = json_mode
+        self.max_repairs = max_repairs
+        self.repairs = 0
+        self.values: Dict[str, Any] = {}
+        self.errors: Dict[str, str] = {}
+        self._pending: Optional[List[str]] = None
+
+    def arguments(self) -> Dict[str, Any]:
+        """Chat arguments of the next request: its messages and response format"""
+        arguments = {"messages": self.messages}
+        response_format = self.schema.response_format(self.json_mode, self._pending)
+        if response_format:
+            arguments["response_format"] = response_format
+        return arguments
+
+    def feed(self, content: str) -> bool:
+        """
+        Decode an answer.
+
+        Args:
+            content: The answer text.
+
+        Returns:
+            True if a repair request should be sent (see arguments()).
+        """
+        values, self.errors = self.schema.coerce(parse_json_object(content) or {}, self._pending)
+        self.values.update(values)
+        if not self.errors:
+            return False
+        registry = get_registry()
+        if self.repairs >= self.max_repairs:
+            registry.increment("llm.schema.failures")
+            logger.info(f"{self.schema.name} answer still invalid after {self.repairs} repairs: {', '.join(self.errors)}")
+            return False
+        self.repairs += 1
+        registry.increment("llm.schema.repairs")
+        self._pending = list(self.errors)
+        errors = "\n".join(f"- {name} {error}" for name, error in self.errors.items())
+        self.messages = self.messages + [
+            {"role": "assistant", "content": content},
+            {"role": "user", "content": REPAIR_INSTRUCTIONS.format(
+                errors=errors, layout=self.schema.layout(self._pending)
+            ).strip()},
+        ]
+        return True
+
+    def record(self):
+        """
+        The decoded record.
+
+        Raises:
+            SchemaValidationError: If required fields are still missing or invalid.
+        """
+        if self.errors:
+            raise SchemaValidationError(self.schema.name, self.errors)
+        return self.schema.build(self.values)
+
+
+# Per-file analyses of RealMistralAnalyzer
+FILE_SCHEMAS = {
+    "code_quality": AnalysisSchema(
+        "code_quality",
+        {"score": SCORE, "issues": LIST, "recommendations": LIST, "style_notes": STRING},
+        optional=("issues", "recommendations", "style_notes")
+    ),
+    "security": AnalysisSchema(
+        "security",
+        {"score": SCORE, "vulnerabilities": LIST, "recommendations": LIST},
+        optional=("vulnerabilities", "recommendations")
+    ),
+    "documentation": AnalysisSchema(
+        "documentation",
+        {"score": SCORE, "coverage": STRING, "suggestions": LIST},
+        optional=("coverage", "suggestions")
+    ),
+}
+
+# Repository-wide analyses of MistralRepositoryAnalyzer
+SECTION_SCHEMAS = {
+    "code_quality": AnalysisSchema("code_quality", {
+        "overall_score": SCORE,
+        "assessment": STRING,
+        "strengths": LIST,
+        "weaknesses": LIST,
+        "security_score": SCORE,
+        "security_notes": STRING,
+    }),
+    "technology_stack": AnalysisSchema("technology_stack", {
+        "languages": LIST,
+        "frameworks": LIST,
+        "tools": LIST,
+        "package_managers": LIST,
+        "ci_cd": LIST,
+        "modernization_suggestions": LIST,
+    }),
+    "architecture": AnalysisSchema("architecture", {
+        "pattern": STRING,
+        "complexity": STRING,
+        "modularity_score": SCORE,
+        "scalability_score": SCORE,
+        "recommendations": LIST,
+    }),
+    "documentation": AnalysisSchema("documentation", {
+        "completeness_score": SCORE,
+        "readme_quality": STRING,
+        "code_comments": STRING,
+        "setup_instructions": STRING,
+        "improvements_needed": LIST,
+    }),
+}
+
+# All repository-wide analyses in one answer
+COMBINED_SCHEMA = AnalysisSchema("repository_analysis", dict(SECTION_SCHEMAS))
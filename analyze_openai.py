@@ -8,20 +8,31 @@ Mirrors the structure of analyze_repo.py but uses OpenAI instead of Mistral.
 import os
 import json
 import time
+import argparse
 from pathlib import Path
 import subprocess
-from typing import Dict, Any, List, Optional
+from typing import Dict, Any, List, Optional, Callable
 
-from openai_config import get_client, OpenAIClient
+from openai_config import OpenAIClient, MAX_TOKENS, DEFAULT_MODEL, MODEL_TOKEN_LIMITS
+from batch_runner import BatchRunner, BatchRequest, ProviderBatchBackend, POLL_INTERVAL
+from usage_ledger import repo_context
+from prompt_builder import (
+    build_context, build_messages, REPOSITORY_ANALYSIS_INSTRUCTIONS, REPOSITORY_ANALYSIS_FIELDS
+)
+from token_budget import BudgetItem, fit_to_budget, file_priority, MAX_FILE_TOKENS, PRIORITY_HIGH
+
+# Budget key of the file structure among the file contents
+STRUCTURE_KEY = "<file structure>"
 
 class OpenAIRepositoryAnalyzer:
-    def __init__(self, api_key: Optional[str] = None, model: Optional[str] = None):
+    def __init__(self, api_key: Optional[str] = None, model: Optional[str] = None, repo_path: str = "."):
         """
         Initialize the OpenAI Repository Analyzer.
         
         Args:
             api_key: OpenAI API key. If None, uses the environment variable.
             model: OpenAI model to use. If None, uses the default model.
+            repo_path: Repository to analyze.
         """
         try:
             self.openai_client = OpenAIClient(api_key=api_key, model=model)
@@ -30,7 +41,7 @@ class OpenAIRepositoryAnalyzer:
             print("Analysis will be simulated without API calls.")
             self.openai_client = None
             
-        self.repo_path = Path(".")
+        self.repo_path = Path(repo_path)
         self.analysis_results = {}
         
     def collect_repository_info(self):
@@ -48,15 +59,18 @@ class OpenAIRepositoryAnalyzer:
     def get_file_structure(self):
         """Get repository file structure"""
         structure = []
-        for root, dirs, files in os.walk("."):
+        for root, dirs, files in os.walk(self.repo_path):
+            # Walk in a fixed order so the structure is byte-stable across runs
+            dirs.sort()
+            relative = os.path.relpath(root, self.repo_path)
             # Skip .git directory and other hidden directories
-            if any(part.startswith('.') for part in root.split(os.sep)):
+            if relative != "." and any(part.startswith('.') for part in relative.split(os.sep)):
                 continue
-            level = root.replace(".", "").count(os.sep)
+            level = 0 if relative == "." else relative.count(os.sep) + 1
             indent = " " * 2 * level
             structure.append(f"{indent}{os.path.basename(root)}/")
             subindent = " " * 2 * (level + 1)
-            for file in files:
+            for file in sorted(files):
                 if not file.startswith('.'):
                     structure.append(f"{subindent}{file}")
         return "\n".join(structure)
@@ -67,32 +81,34 @@ class OpenAIRepositoryAnalyzer:
         contents = {}
         
         for file in key_files:
-            if os.path.exists(file):
+            if (self.repo_path / file).exists():
                 try:
-                    with open(file, 'r', encoding='utf-8') as f:
+                    with open(self.repo_path / file, 'r', encoding='utf-8') as f:
                         contents[file] = f.read()
                 except Exception as e:
                     contents[file] = f"Error reading file: {str(e)}"
         
         # Get workflow files
-        workflow_dir = Path(".github/workflows")
+        workflow_dir = self.repo_path / ".github/workflows"
         if workflow_dir.exists():
             for workflow_file in workflow_dir.glob("*.yml"):
+                name = str(workflow_file.relative_to(self.repo_path))
                 try:
                     with open(workflow_file, 'r', encoding='utf-8') as f:
-                        contents[str(workflow_file)] = f.read()
+                        contents[name] = f.read()
                 except Exception as e:
-                    contents[str(workflow_file)] = f"Error reading file: {str(e)}"
+                    contents[name] = f"Error reading file: {str(e)}"
         
         # Get Python files (limited to avoid token limits)
-        python_files = list(Path(".").glob("**/*.py"))[:5]  # Limit to 5 Python files
+        python_files = sorted(self.repo_path.glob("**/*.py"))[:5]  # Limit to 5 Python files
         for py_file in python_files:
-            if ".git" not in str(py_file):
+            name = str(py_file.relative_to(self.repo_path))
+            if ".git" not in name:
                 try:
                     with open(py_file, 'r', encoding='utf-8') as f:
-                        contents[str(py_file)] = f.read()
+                        contents[name] = f.read()
                 except Exception as e:
-                    contents[str(py_file)] = f"Error reading file: {str(e)}"
+                    contents[name] = f"Error reading file: {str(e)}"
         
         return contents
     
@@ -104,7 +120,7 @@ class OpenAIRepositoryAnalyzer:
                 ["git", "remote", "-v"], 
                 capture_output=True, 
                 text=True, 
-                cwd="."
+                cwd=self.repo_path
             )
             
             # Get branch info
@@ -112,7 +128,7 @@ class OpenAIRepositoryAnalyzer:
                 ["git", "branch"], 
                 capture_output=True, 
                 text=True, 
-                cwd="."
+                cwd=self.repo_path
             )
             
             # Get commit info
@@ -120,7 +136,7 @@ class OpenAIRepositoryAnalyzer:
                 ["git", "log", "--oneline", "-5"], 
                 capture_output=True, 
                 text=True, 
-                cwd="."
+                cwd=self.repo_path
             )
             
             return {
@@ -136,9 +152,9 @@ class OpenAIRepositoryAnalyzer:
         deps = {}
         
         # Check package.json for npm dependencies
-        if os.path.exists("package.json"):
+        if (self.repo_path / "package.json").exists():
             try:
-                with open("package.json", 'r') as f:
+                with open(self.repo_path / "package.json", 'r') as f:
                     package_data = json.load(f)
                     deps["npm"] = package_data.get("dependencies", {})
                     deps["dev_dependencies"] = package_data.get("devDependencies", {})
@@ -146,9 +162,9 @@ class OpenAIRepositoryAnalyzer:
                 deps["npm_error"] = str(e)
         
         # Check requirements.txt for Python dependencies
-        if os.path.exists("requirements.txt"):
+        if (self.repo_path / "requirements.txt").exists():
             try:
-                with open("requirements.txt", 'r') as f:
+                with open(self.repo_path / "requirements.txt", 'r') as f:
                     requirements = f.read().splitlines()
                     deps["python"] = requirements
             except Exception as e:
@@ -159,110 +175,90 @@ class OpenAIRepositoryAnalyzer:
     def get_github_workflows(self):
         """Analyze GitHub Actions workflows"""
         workflows = {}
-        workflow_dir = Path(".github/workflows")
+        workflow_dir = self.repo_path / ".github/workflows"
         
         if workflow_dir.exists():
             for workflow_file in workflow_dir.glob("*.yml"):
                 workflows[workflow_file.name] = {
-                    "path": str(workflow_file),
+                    "path": str(workflow_file.relative_to(self.repo_path)),
                     "exists": True
                 }
         
         return workflows
     
-    def analyze_with_openai(self, repo_info):
-        """Analyze repository using OpenAI"""
+    def analyze_with_openai(self, repo_info, on_field: Optional[Callable[[str, Any], None]] = None):
+        """
+        Analyze repository using OpenAI
+        
+        The answer is streamed and parsed as it arrives; generation stops
+        once every analysis field is complete.
+        
+        Args:
+            repo_info: Output of collect_repository_info.
+            on_field: Called with (name, value) as each analysis field arrives.
+        """
         if self.openai_client is None:
             return self._simulate_analysis(repo_info)
         
         print("🧠 Analyzing repository with OpenAI...")
         
-        # Prepare the prompt with repository information
-        structure = repo_info["structure"]
+        fields = {}
         
-        # Get a sample of file contents to avoid token limits
-        content_sample = {}
-        for key, content in repo_info["content"].items():
-            if len(content) > 1000:
-                content_sample[key] = content[:1000] + "... (truncated)"
-            else:
-                content_sample[key] = content
-        
-        # Create the analysis prompt
-        prompt = f"""
-        Analyze this GitHub repository based on the following information:
-        
-        FILE STRUCTURE:
-        {structure}
-        
-        KEY FILE CONTENTS (samples):
-        {json.dumps(content_sample, indent=2)}
-        
-        DEPENDENCIES:
-        {json.dumps(repo_info["dependencies"], indent=2)}
-        
-        GITHUB WORKFLOWS:
-        {json.dumps(repo_info["workflows"], indent=2)}
-        
-        Provide a comprehensive analysis including:
-        1. Repository type and primary purpose
-        2. Technology stack identification
-        3. Code quality assessment (structure, documentation, testing, CI/CD)
-        4. Security analysis
-        5. Specific recommendations for improvement
-        6. Analysis of GitHub workflows
-        7. Scores for complexity (1-10), maintainability (1-10), and scalability potential (1-10)
-        
-        Format your response as a JSON object with the following structure:
-        {
-            "repository_type": "string",
-            "primary_purpose": "string",
-            "technology_stack": ["string"],
-            "code_quality_assessment": {
-                "structure": "string",
-                "documentation": "string",
-                "testing": "string",
-                "ci_cd": "string"
-            },
-            "security_analysis": {
-                "dependencies": "string",
-                "workflows": "string",
-                "secrets_management": "string"
-            },
-            "recommendations": ["string"],
-            "workflow_analysis": {
-                "workflow_name.yml": {
-                    "purpose": "string",
-                    "triggers": "string",
-                    "security": "string"
-                }
-            },
-            "complexity_score": "string (e.g., 'Low (1/10)')",
-            "maintainability_score": "string (e.g., 'High (8/10)')",
-            "scalability_potential": "string (e.g., 'Medium (5/10)')"
-        }
-        """
+        def collect(name, value):
+            fields[name] = value
+            if on_field is not None:
+                on_field(name, value)
         
         try:
             # Call OpenAI API
             response = self.openai_client.chat_completion(
-                messages=[
-                    {"role": "system", "content": "You are a code analysis expert that provides detailed repository analysis."},
-                    {"role": "user", "content": prompt}
-                ],
-                temperature=0.2,
-                response_format={"type": "json_object"}
+                **self._analysis_request(repo_info),
+                stream=True,
+                on_field=collect,
+                stop_when=lambda parsed: REPOSITORY_ANALYSIS_FIELDS.issubset(parsed)
             )
             
-            # Extract and parse the JSON response
-            analysis_text = response.choices[0].message.content
-            analysis = json.loads(analysis_text)
+            # The fields parsed from the stream if all of them arrived, otherwise
+            # the whole answer, which fails to parse if the stream was cut off
+            if REPOSITORY_ANALYSIS_FIELDS.issubset(fields):
+                analysis = fields
+            else:
+                analysis = json.loads(response.choices[0].message.content)
             
             return analysis
         except Exception as e:
             print(f"Error during OpenAI analysis: {str(e)}")
             return self._simulate_analysis(repo_info)
     
+    def _analysis_request(self, repo_info) -> Dict[str, Any]:
+        """Build the chat request analyzing a repository"""
+        def render(texts):
+            # Stable sections first, so repeated analyses share a cached prompt prefix
+            context = build_context([
+                ("DEPENDENCIES", repo_info["dependencies"]),
+                ("GITHUB WORKFLOWS", repo_info["workflows"]),
+                ("FILE STRUCTURE", texts.get(STRUCTURE_KEY, "")),
+                ("KEY FILE CONTENTS (samples)", {
+                    key: text for key, text in texts.items() if key != STRUCTURE_KEY
+                }),
+            ])
+            return build_messages(context, REPOSITORY_ANALYSIS_INSTRUCTIONS)
+        
+        # Fit the structure and file samples to the model's context window
+        model = self.openai_client.model if self.openai_client else DEFAULT_MODEL
+        items = [BudgetItem(STRUCTURE_KEY, repo_info["structure"], PRIORITY_HIGH)]
+        items.extend(
+            BudgetItem(key, content, file_priority(key), MAX_FILE_TOKENS)
+            for key, content in repo_info["content"].items()
+        )
+        texts, _ = fit_to_budget(render, items, model, MODEL_TOKEN_LIMITS.get(model, 4096), MAX_TOKENS)
+        
+        return {
+            "messages": render(texts),
+            "temperature": 0.2,
+            "response_format": {"type": "json_object"}
+        }
+    
     def _simulate_analysis(self, repo_info):
         """Simulate OpenAI analysis when API is not available"""
         print("⚠️ Using simulated analysis (OpenAI API not available)")
@@ -317,8 +313,13 @@ class OpenAIRepositoryAnalyzer:
         
         return analysis
     
-    def generate_report(self):
-        """Generate comprehensive analysis report"""
+    def generate_report(self, on_field: Optional[Callable[[str, Any], None]] = None):
+        """
+        Generate comprehensive analysis report
+        
+        Args:
+            on_field: Called with (name, value) as each analysis field arrives.
+        """
         print("🔍 Starting Repository Analysis with OpenAI...")
         start_time = time.time()
         
@@ -326,17 +327,34 @@ class OpenAIRepositoryAnalyzer:
         repo_info = self.collect_repository_info()
         
         # Analyze with OpenAI
-        analysis = self.analyze_with_openai(repo_info)
+        with repo_context(self.repo_path.resolve()):
+            analysis = self.analyze_with_openai(repo_info, on_field=on_field)
         
-        # Generate report
-        report = {
+        return self._build_report(repo_info, analysis, start_time)
+    
+    @staticmethod
+    def _build_report(repo_info, analysis, start_time: float) -> Dict[str, Any]:
+        """Assemble the analysis report"""
+        return {
             "timestamp": time.strftime("%Y-%m-%d %H:%M:%S"),
             "repository_info": repo_info,
             "openai_analysis": analysis,
             "analysis_duration_seconds": round(time.time() - start_time, 2)
         }
+    
+    def batch_request(self, repo_info, custom_id: str) -> BatchRequest:
+        """
+        Build the batch request analyzing this repository.
         
-        return report
+        Args:
+            repo_info: Output of collect_repository_info.
+            custom_id: Unique ID of the request within the batch.
+            
+        Returns:
+            The batch request, tagged with the repository path.
+        """
+        body = {"model": self.openai_client.model, "max_tokens": MAX_TOKENS, **self._analysis_request(repo_info)}
+        return BatchRequest(custom_id=custom_id, body=body, metadata={"repository": str(self.repo_path)})
     
     def print_analysis(self, report):
         """Print formatted analysis results"""
@@ -385,17 +403,99 @@ class OpenAIRepositoryAnalyzer:
         print("✅ Analysis Complete!")
         print("="*60)
 
+def generate_batch_reports(
+    analyzers: List[OpenAIRepositoryAnalyzer],
+    runner: Optional[BatchRunner] = None
+) -> List[Dict[str, Any]]:
+    """
+    Analyze several repositories with one batch job instead of one
+    synchronous call per repository.
+    
+    Args:
+        analyzers: One analyzer per repository.
+        runner: Batch runner to use. If None, submits through the OpenAI
+            batch API with the default state file, so an interrupted run
+            resumes the same job.
+        
+    Returns:
+        One report per analyzer, in the same format as generate_report.
+    """
+    print(f"🔍 Starting batch analysis of {len(analyzers)} repositories with OpenAI...")
+    start_time = time.time()
+    repo_infos = [analyzer.collect_repository_info() for analyzer in analyzers]
+    
+    if any(analyzer.openai_client is None for analyzer in analyzers):
+        analyses = [analyzer._simulate_analysis(info) for analyzer, info in zip(analyzers, repo_infos)]
+    else:
+        requests = [
+            analyzer.batch_request(info, custom_id=f"repo-{index}")
+            for index, (analyzer, info) in enumerate(zip(analyzers, repo_infos))
+        ]
+        if runner is None:
+            runner = BatchRunner(ProviderBatchBackend(analyzers[0].openai_client.provider))
+        results = runner.run(requests)
+        
+        analyses = []
+        for analyzer, info, request in zip(analyzers, repo_infos, requests):
+            result = results[request.custom_id]
+            try:
+                if result.error:
+                    raise ValueError(result.error)
+                analyses.append(json.loads(result.content))
+            except Exception as e:
+                print(f"Error during OpenAI batch analysis of {request.metadata['repository']}: {str(e)}")
+                analyses.append(analyzer._simulate_analysis(info))
+    
+    return [
+        OpenAIRepositoryAnalyzer._build_report(info, analysis, start_time)
+        for info, analysis in zip(repo_infos, analyses)
+    ]
+
+def report_path(repo_path: str) -> str:
+    """Report file for a repository: the usual name for the current directory"""
+    resolved = Path(repo_path).resolve()
+    if resolved == Path.cwd():
+        return "openai_analysis_report.json"
+    return f"openai_analysis_report_{resolved.name}.json"
+
 def main():
     """Main execution function"""
-    analyzer = OpenAIRepositoryAnalyzer()
-    report = analyzer.generate_report()
-    analyzer.print_analysis(report)
+    parser = argparse.ArgumentParser(description="Analyze repositories with OpenAI")
+    parser.add_argument("repos", nargs="*", default=["."], help="Repositories to analyze")
+    parser.add_argument("--batch", action="store_true",
+                        help="Submit all analyses as one batch job (slower, lower cost)")
+    parser.add_argument("--batch-state", help="Batch state file, for resuming an interrupted run")
+    parser.add_argument("--poll-interval", type=float, help="Seconds between batch status checks")
+    parser.add_argument("--rerun", action="store_true",
+                        help="Submit a new batch job even if a finished one has results for the same requests")
+    args = parser.parse_args()
     
-    # Save detailed report to file
-    with open("openai_analysis_report.json", "w") as f:
-        json.dump(report, f, indent=2)
+    analyzers = [OpenAIRepositoryAnalyzer(repo_path=path) for path in args.repos]
+    if args.batch:
+        runner = None
+        if analyzers[0].openai_client is not None:
+            runner = BatchRunner(
+                ProviderBatchBackend(analyzers[0].openai_client.provider),
+                state_path=args.batch_state,
+                poll_interval=args.poll_interval or POLL_INTERVAL,
+                force=args.rerun
+            )
+        reports = generate_batch_reports(analyzers, runner=runner)
+    else:
+        reports = [
+            analyzer.generate_report(on_field=lambda name, value: print(f"   ✓ {name}"))
+            for analyzer in analyzers
+        ]
     
-    print(f"\n📄 Detailed report saved to: openai_analysis_report.json")
+    for analyzer, report in zip(analyzers, reports):
+        analyzer.print_analysis(report)
+        
+        # Save detailed report to file
+        output_path = report_path(str(analyzer.repo_path))
+        with open(output_path, "w") as f:
+            json.dump(report, f, indent=2)
+        
+        print(f"\n📄 Detailed report saved to: {output_path}")
 
 if __name__ == "__main__":
     main()
@@ -10,9 +10,15 @@ import json
 import time
 from pathlib import Path
 import subprocess
-from typing import Dict, Any, List, Optional
+from typing import Optional
 
-from openhands_config import get_client, OpenHandsClient
+from openhands_config import OpenHandsClient, MAX_TOKENS
+from usage_ledger import repo_context
+from prompt_builder import build_context, build_messages, REPOSITORY_ANALYSIS_INSTRUCTIONS
+from token_budget import BudgetItem, fit_to_budget, file_priority, MAX_FILE_TOKENS, PRIORITY_HIGH
+
+# Budget key of the file structure among the file contents
+STRUCTURE_KEY = "<file structure>"
 
 class OpenHandsRepositoryAnalyzer:
     def __init__(self, api_key: Optional[str] = None, model: Optional[str] = None):
@@ -177,79 +183,34 @@ class OpenHandsRepositoryAnalyzer:
         
         print("🧠 Analyzing repository with OpenHands...")
         
-        # Prepare the prompt with repository information
-        structure = repo_info["structure"]
-        
-        # Get a sample of file contents to avoid token limits
-        content_sample = {}
-        for key, content in repo_info["content"].items():
-            if len(content) > 1000:
-                content_sample[key] = content[:1000] + "... (truncated)"
-            else:
-                content_sample[key] = content
-        
-        # Create the analysis prompt
-        prompt = f"""
-        Analyze this GitHub repository based on the following information:
-        
-        FILE STRUCTURE:
-        {structure}
-        
-        KEY FILE CONTENTS (samples):
-        {json.dumps(content_sample, indent=2)}
-        
-        DEPENDENCIES:
-        {json.dumps(repo_info["dependencies"], indent=2)}
-        
-        GITHUB WORKFLOWS:
-        {json.dumps(repo_info["workflows"], indent=2)}
-        
-        Provide a comprehensive analysis including:
-        1. Repository type and primary purpose
-        2. Technology stack identification
-        3. Code quality assessment (structure, documentation, testing, CI/CD)
-        4. Security analysis
-        5. Specific recommendations for improvement
-        6. Analysis of GitHub workflows
-        7. Scores for complexity (1-10), maintainability (1-10), and scalability potential (1-10)
-        
-        Format your response as a JSON object with the following structure:
-        {
-            "repository_type": "string",
-            "primary_purpose": "string",
-            "technology_stack": ["string"],
-            "code_quality_assessment": {
-                "structure": "string",
-                "documentation": "string",
-                "testing": "string",
-                "ci_cd": "string"
-            },
-            "security_analysis": {
-                "dependencies": "string",
-                "workflows": "string",
-                "secrets_management": "string"
-            },
-            "recommendations": ["string"],
-            "workflow_analysis": {
-                "workflow_name.yml": {
-                    "purpose": "string",
-                    "triggers": "string",
-                    "security": "string"
-                }
-            },
-            "complexity_score": "string (e.g., 'Low (1/10)')",
-            "maintainability_score": "string (e.g., 'High (8/10)')",
-            "scalability_potential": "string (e.g., 'Medium (5/10)')"
-        }
-        """
+        def render(texts):
+            # Stable sections first, so repeated analyses share a cached prompt prefix
+            context = build_context([
+                ("DEPENDENCIES", repo_info["dependencies"]),
+                ("GITHUB WORKFLOWS", repo_info["workflows"]),
+                ("FILE STRUCTURE", texts.get(STRUCTURE_KEY, "")),
+                ("KEY FILE CONTENTS (samples)", {
+                    key: text for key, text in texts.items() if key != STRUCTURE_KEY
+                }),
+            ])
+            return build_messages(context, REPOSITORY_ANALYSIS_INSTRUCTIONS)
+        
+        # Fit the structure and file samples to the model's context window
+        items = [BudgetItem(STRUCTURE_KEY, repo_info["structure"], PRIORITY_HIGH)]
+        items.extend(
+            BudgetItem(key, content, file_priority(key), MAX_FILE_TOKENS)
+            for key, content in repo_info["content"].items()
+        )
         
         try:
+            texts, _ = fit_to_budget(
+                render, items, self.openhands_client.model,
+                self.openhands_client.get_model_token_limit(), MAX_TOKENS
+            )
+            
             # Call OpenHands API
             response = self.openhands_client.chat_completion(
-                messages=[
-                    {"role": "system", "content": "You are a code analysis expert that provides detailed repository analysis."},
-                    {"role": "user", "content": prompt}
-                ],
+                messages=render(texts),
                 temperature=1.0,
                 thinking="high"
             )
@@ -341,7 +302,8 @@ class OpenHandsRepositoryAnalyzer:
         repo_info = self.collect_repository_info()
         
         # Analyze with OpenHands
-        analysis = self.analyze_with_openhands(repo_info)
+        with repo_context(self.repo_path.resolve()):
+            analysis = self.analyze_with_openhands(repo_info)
         
         # Generate report
         report = {
@@ -1,3 +1,181 @@
+#!/usr/bin/env python3
+"""
+AI Repository Analysis API Server
+
+Flask application exposing the repository analysis tools, the RAG system
+and its runtime metrics over HTTP.
+"""
+
+import time
+import logging
+import threading
+from flask import Flask, jsonify, request
+from flask_cors import CORS
+
+from metrics import get_registry
+from rag_system import RAGSystem
+from rag_index_builder import IndexBuildJob
+from usage_ledger import UsageLedger, get_usage_ledger
+
+# Configure logging
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger(__name__)
+
+app = Flask(__name__)
+CORS(app)
+
+_rag_system = None
+_rag_lock = threading.Lock()
+_build_job = None
+_usage_ledger = None
+
+
+def get_rag_system() -> RAGSystem:
+    """
+    Get the shared RAG system, loading the stores on first use.
+
+    Returns:
+        The RAG system instance used by the API.
+    """
+    global _rag_system
+    if _rag_system is None:
+        with _rag_lock:
+            if _rag_system is None:
+                rag = RAGSystem()
+                rag.load()
+                _rag_system = rag
+    return _rag_system
+
+
+@app.route('/rag-query', methods=['POST'])
+def rag_query():
+    """Answer a question about the repository using the RAG system"""
+    data = request.get_json(silent=True) or {}
+    question = data.get('question')
+    if not question:
+        return jsonify({"error": "Missing 'question' in request body"}), 400
+
+    debug = bool(data.get('debug')) or request.args.get('debug', '').lower() in ('1', 'true')
+    top_k = int(data.get('top_k', 5))
+
+    result = get_rag_system().query(question, top_k=top_k, debug=debug)
+    return jsonify(result)
+
+
+def _swap_rag_system(rag: RAGSystem):
+    """Serve queries from a freshly built index"""
+    global _rag_system
+    with _rag_lock:
+        _rag_system = rag
+    logger.info("RAG system switched to the newly built index")
+
+
+@app.route('/rag-build', methods=['POST'])
+def rag_build():
+    """Start a background RAG index build; the current index keeps serving"""
+    global _build_job
+    data = request.get_json(silent=True) or {}
+
+    with _rag_lock:
+        if _build_job is not None and not _build_job.is_finished():
+            return jsonify({"error": "An index build is already running", "progress": _build_job.progress()}), 409
+        _build_job = IndexBuildJob(
+            resume=data.get('resume', True),
+            on_complete=_swap_rag_system
+        ).start()
+
+    return jsonify({"status": "started", "progress": _build_job.progress()}), 202
+
+
+@app.route('/rag-build/status', methods=['GET'])
+def rag_build_status():
+    """Get the progress of the current or last index build"""
+    if _build_job is None:
+        return jsonify({"state": "idle"})
+    return jsonify(_build_job.progress())
+
+
+@app.route('/rag-build/cancel', methods=['POST'])
+def rag_build_cancel():
+    """Cancel the running index build, keeping its checkpoint for resume"""
+    if _build_job is None or _build_job.is_finished():
+        return jsonify({"error": "No index build is running"}), 404
+    _build_job.cancel()
+    return jsonify({"status": "cancelling", "progress": _build_job.progress()})
+
+
+@app.route('/rag-metrics', methods=['GET'])
+def rag_metrics():
+    """Get per-stage latency and token histograms for the RAG query path"""
+    return jsonify(get_registry().snapshot(prefix="rag."))
+
+
+@app.route('/llm-metrics', methods=['GET'])
+def llm_metrics():
+    """Get LLM client counters (e.g. response cache hits and misses) and histograms"""
+    registry = get_registry()
+    return jsonify({
+        "counters": registry.counters(prefix="llm."),
+        "histograms": registry.snapshot(prefix="llm.")
+    })
+
+
+def _get_ledger() -> UsageLedger:
+    """
+    Get the usage ledger read by the API, even if recording is disabled
+    in this process.
+
+    Returns:
+        The ledger over the shared usage database.
+    """
+    global _usage_ledger
+    if _usage_ledger is None:
+        _usage_ledger = get_usage_ledger() or UsageLedger()
+    return _usage_ledger
+
+
+def _since_arg():
+    """The optional 'since' query parameter (Unix time, or days back as e.g. '7d')"""
+    since = request.args.get('since')
+    if not since:
+        return None
+    if since.endswith('d'):
+        return time.time() - float(since[:-1]) * 86400
+    return float(since)
+
+
+@app.route('/llm-usage', methods=['GET'])
+def llm_usage():
+    """Get LLM token, cost and latency totals grouped by repo, day, model, provider or endpoint"""
+    try:
+        rows = _get_ledger().summary(
+            group_by=request.args.get('group_by', 'repo'),
+            since=_since_arg(),
+            repo=request.args.get('repo')
+        )
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    return jsonify(rows)
+
+
+@app.route('/llm-usage/top-prompts', methods=['GET'])
+def llm_usage_top_prompts():
+    """Get the prompts that dominate LLM cost, tokens or latency"""
+    try:
+        rows = _get_ledger().top_prompts(
+            order_by=request.args.get('order_by', 'cost'),
+            limit=int(request.args.get('limit', 10)),
+            since=_since_arg(),
+            repo=request.args.get('repo')
+        )
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    return jsonify(rows)
+
+
 if __name__ == '__main__':
     print("Starting AI Repository Analysis API Server...")
     print("Available endpoints:")
@@ -8,9 +186,16 @@ if __name__ == '__main__':
     print("  POST /openhands-analyze - Run OpenHands analysis")
     print("  POST /compare-analysis - Compare analyses")
     print("  POST /rag-query - Query the RAG system")
+    print("  GET  /rag-metrics - RAG per-stage latency metrics")
+    print("  GET  /llm-metrics - LLM client counters (response cache hits/misses)")
+    print("  GET  /llm-usage - LLM token, cost and latency totals (?group_by=repo|day|model)")
+    print("  GET  /llm-usage/top-prompts - Prompts dominating LLM cost or latency")
+    print("  POST /rag-build - Start a background RAG index build")
+    print("  GET  /rag-build/status - RAG index build progress")
+    print("  POST /rag-build/cancel - Cancel the RAG index build")
     print("  GET  /results  - Get results")
     print("  GET  /dashboard- Dashboard info")
     print("  GET  /test     - Test endpoint")
     print("\nServer starting on http://0.0.0.0:3000")
-    
+
     app.run(host='0.0.0.0', port=3000, debug=False)
@@ -0,0 +1,534 @@
+"""
+Batch Execution Module
+
+This module runs bulk chat requests through the provider batch APIs instead
+of one synchronous call per request. All requests are written to a JSONL
+batch file, uploaded and submitted as one job, polled until the job
+finishes, and the results are mapped back to the repository, file and
+category each request was made for.
+
+Progress is kept in a small state file next to the batch file, so an
+interrupted run resumes polling the same job instead of submitting (and
+paying for) the batch again. Each result is recorded in the usage ledger once,
+at batch pricing, when the job's output is downloaded. Finished results are reused from the state file
+until they expire or a rerun is forced. LocalBatchBackend stands in for the provider
+batch interface in tests and offline runs.
+"""
+
+import os
+import json
+import time
+import hashlib
+import logging
+from dataclasses import dataclass, field
+from typing import Dict, Any, List, Optional, Callable, Tuple
+
+import httpx
+
+from llm_providers import ProviderClient
+from usage_ledger import get_usage_ledger
+
+# Configure logging
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger(__name__)
+
+# Directory for batch files and state files
+BATCH_DIR = os.getenv("LLM_BATCH_DIR", ".batch")
+
+# Seconds between job status checks
+POLL_INTERVAL = float(os.getenv("LLM_BATCH_POLL_INTERVAL", "30"))
+
+# Longest a run waits for a job before giving up (the job keeps running and
+# a later run resumes it); the provider completion window is 24h
+MAX_WAIT_SECONDS = float(os.getenv("LLM_BATCH_MAX_WAIT", str(25 * 3600)))
+
+# How long the results of a finished job are reused for the same requests
+RESULTS_TTL_SECONDS = float(os.getenv("LLM_BATCH_RESULTS_TTL", str(24 * 3600)))
+
+# Normalized job states
+PENDING = "pending"
+COMPLETED = "completed"
+FAILED = "failed"
+
+
+class BatchError(RuntimeError):
+    """A batch job could not be submitted or did not finish in time"""
+
+
+@dataclass
+class BatchRequest:
+    """
+    One chat request of a batch.
+
+    Attributes:
+        custom_id: Unique ID used to match the result to the request.
+        body: Chat completion request body (model, messages, ...).
+        metadata: Where the request came from, e.g. repository, file and category.
+    """
+    custom_id: str
+    body: Dict[str, Any]
+    metadata: Dict[str, Any] = field(default_factory=dict)
+
+
+@dataclass
+class BatchResult:
+    """
+    Result of one batch request.
+
+    Attributes:
+        custom_id: ID of the request.
+        metadata: Metadata of the request.
+        body: OpenAI-style chat completion response body, if it succeeded.
+        error: Error message, if it failed.
+    """
+    custom_id: str
+    metadata: Dict[str, Any]
+    body: Optional[Dict[str, Any]] = None
+    error: Optional[str] = None
+
+    @property
+    def content(self) -> Optional[str]:
+        """Text of the first choice, or None if the request failed"""
+        if self.body is None:
+            return None
+        choice = (self.body.get("choices") or [{}])[0]
+        return (choice.get("message") or {}).get("content")
+
+
+@dataclass
+class BatchDialect:
+    """
+    How a provider's batch API differs from the others.
+
+    Attributes:
+        jobs_path: Path of the batch jobs collection.
+        line: Builds a JSONL line from a custom ID and request body.
+        create_body: Builds the job creation body from the uploaded file ID
+            and the batch model.
+        statuses: Maps provider job statuses to PENDING, COMPLETED or FAILED.
+        output_key: Job field holding the output file ID.
+        error_key: Job field holding the error file ID.
+        model_per_job: Whether a job runs a single model, set at creation
+            instead of in each request.
+    """
+    jobs_path: str
+    line: Callable[[str, Dict[str, Any]], Dict[str, Any]]
+    create_body: Callable[[str, str], Dict[str, Any]]
+    statuses: Dict[str, str]
+    output_key: str
+    error_key: str
+    model_per_job: bool = False
+
+
+BATCH_DIALECTS: Dict[str, BatchDialect] = {
+    "openai": BatchDialect(
+        jobs_path="/batches",
+        line=lambda custom_id, body: {
+            "custom_id": custom_id, "method": "POST", "url": "/v1/chat/completions", "body": body
+        },
+        create_body=lambda file_id, model: {
+            "input_file_id": file_id, "endpoint": "/v1/chat/completions", "completion_window": "24h"
+        },
+        statuses={
+            "completed": COMPLETED, "failed": FAILED, "expired": FAILED, "cancelled": FAILED
+        },
+        output_key="output_file_id",
+        error_key="error_file_id",
+    ),
+    "mistral": BatchDialect(
+        jobs_path="/batch/jobs",
+        # The model is set per job
+        line=lambda custom_id, body: {
+            "custom_id": custom_id, "body": {key: value for key, value in body.items() if key != "model"}
+        },
+        create_body=lambda file_id, model: {
+            "input_files": [file_id], "endpoint": "/v1/chat/completions", "model": model
+        },
+        statuses={
+            "SUCCESS": COMPLETED, "FAILED": FAILED, "TIMEOUT_EXCEEDED": FAILED, "CANCELLED": FAILED
+        },
+        output_key="output_file",
+        error_key="error_file",
+        model_per_job=True,
+    ),
+}
+
+
+def _parse_output_line(record: Dict[str, Any]) -> Tuple[Optional[Dict[str, Any]], Optional[str]]:
+    """Split a batch output record into (response body, error message)"""
+    response = record.get("response") or {}
+    if record.get("error"):
+        error = record["error"]
+        return None, error.get("message", str(error)) if isinstance(error, dict) else str(error)
+    if response.get("status_code", 200) >= 400:
+        return None, f"HTTP {response['status_code']}: {json.dumps(response.get('body'))}"
+    return response.get("body"), None
+
+
+def _read_output(text: str) -> Dict[str, Dict[str, Any]]:
+    """Parse a JSONL output file into {custom_id: {"body": ..., "error": ...}}"""
+    results = {}
+    for line in text.splitlines():
+        if line.strip():
+            record = json.loads(line)
+            body, error = _parse_output_line(record)
+            results[record["custom_id"]] = {"body": body, "error": error}
+    return results
+
+
+class ProviderBatchBackend:
+    """
+    Submits batches through a provider's files and batch job endpoints.
+    """
+
+    def __init__(self, client: ProviderClient):
+        """
+        Initialize the backend.
+
+        Args:
+            client: Provider client used for the API requests.
+        """
+        if client.name not in BATCH_DIALECTS:
+            raise ValueError(f"Batch API not supported for provider: {client.name}")
+        self.client = client
+        self.name = client.name
+        self.dialect = BATCH_DIALECTS[client.name]
+
+    def write(self, path: str, requests: List[BatchRequest]):
+        """Write the batch input file in the provider's line format"""
+        with open(path, "w", encoding="utf-8") as f:
+            for request in requests:
+                f.write(json.dumps(self.dialect.line(request.custom_id, request.body)) + "\n")
+
+    def submit(self, path: str, requests: List[BatchRequest]) -> str:
+        """
+        Upload a batch file and create the job.
+
+        Args:
+            path: Batch input file written by write.
+            requests: The requests in the file.
+
+        Returns:
+            The job ID.
+        """
+        models = {request.body.get("model") or self.client.config.default_model for request in requests}
+        if self.dialect.model_per_job and len(models) > 1:
+            raise ValueError(
+                f"A {self.name} batch job runs a single model; split the requests per model "
+                f"({', '.join(sorted(models))})"
+            )
+        with open(path, "rb") as f:
+            upload = self.client.api_request(
+                "POST", "/files",
+                data={"purpose": "batch"},
+                files={"file": (os.path.basename(path), f, "application/jsonl")}
+            ).json()
+        job = self.client.api_request(
+            "POST", self.dialect.jobs_path, json=self.dialect.create_body(upload["id"], min(models))
+        ).json()
+        return job["id"]
+
+    def _get(self, path: str) -> httpx.Response:
+        """GET a job or file, retried with backoff by the client's resilience policy"""
+        return self.client.resilience.call(
+            lambda timeout: self.client.api_request("GET", path, timeout=timeout), hedge=False
+        )
+
+    def poll(self, job_id: str) -> Tuple[str, Dict[str, Any]]:
+        """
+        Check a job.
+
+        Returns:
+            Tuple of (PENDING, COMPLETED or FAILED, provider job object).
+        """
+        job = self._get(f"{self.dialect.jobs_path}/{job_id}").json()
+        return self.dialect.statuses.get(job.get("status"), PENDING), job
+
+    def results(self, job: Dict[str, Any]) -> Dict[str, Dict[str, Any]]:
+        """
+        Download the results of a finished job, including failed requests.
+
+        Returns:
+            Mapping of custom ID to {"body": response body, "error": message}.
+        """
+        results = {}
+        for key in (self.dialect.error_key, self.dialect.output_key):
+            file_id = job.get(key)
+            if file_id:
+                response = self._get(f"/files/{file_id}/content")
+                results.update(_read_output(response.text))
+        return results
+
+
+class LocalBatchBackend:
+    """
+    Local stand-in for a provider batch API.
+
+    Jobs are recorded as files in a directory and answered by a responder
+    function once they have been polled a given number of times, so
+    resumption across runs behaves as it does against a provider.
+    """
+
+    name = "local"
+
+    def __init__(
+        self,
+        responder: Callable[[Dict[str, Any]], Dict[str, Any]],
+        directory: str = BATCH_DIR,
+        polls_until_complete: int = 1
+    ):
+        """
+        Initialize the backend.
+
+        Args:
+            responder: Turns a chat request body into a chat completion
+                response body. Exceptions become per-request errors.
+            directory: Where job files are kept.
+            polls_until_complete: Polls a job stays pending before it completes.
+        """
+        self.responder = responder
+        self.directory = directory
+        self.polls_until_complete = polls_until_complete
+        os.makedirs(directory, exist_ok=True)
+
+    def _job_path(self, job_id: str) -> str:
+        return os.path.join(self.directory, f"{job_id}.job.json")
+
+    def _save_job(self, job: Dict[str, Any]):
+        with open(self._job_path(job["id"]), "w", encoding="utf-8") as f:
+            json.dump(job, f)
+
+    def write(self, path: str, requests: List[BatchRequest]):
+        """Write the batch input file"""
+        with open(path, "w", encoding="utf-8") as f:
+            for request in requests:
+                f.write(json.dumps({"custom_id": request.custom_id, "body": request.body}) + "\n")
+
+    def submit(self, path: str, requests: List[BatchRequest]) -> str:
+        """Record a job for the batch file and return its ID"""
+        job_id = f"local-{hashlib.sha256(f'{path}:{time.time()}'.encode('utf-8')).hexdigest()[:16]}"
+        self._save_job({"id": job_id, "input_file": path, "polls": 0, "status": PENDING})
+        return job_id
+
+    def poll(self, job_id: str) -> Tuple[str, Dict[str, Any]]:
+        """Advance a job; it runs the responder when it completes"""
+        with open(self._job_path(job_id), "r", encoding="utf-8") as f:
+            job = json.load(f)
+        if job["status"] == PENDING:
+            job["polls"] += 1
+            if job["polls"] >= self.polls_until_complete:
+                job["output_file"] = self._run(job)
+                job["status"] = COMPLETED
+            self._save_job(job)
+        return job["status"], job
+
+    def _run(self, job: Dict[str, Any]) -> str:
+        """Answer every request of a job and write the output file"""
+        output_path = os.path.join(self.directory, f"{job['id']}.output.jsonl")
+        with open(job["input_file"], "r", encoding="utf-8") as source, \
+                open(output_path, "w", encoding="utf-8") as output:
+            for line in source:
+                if not line.strip():
+                    continue
+                request = json.loads(line)
+                record = {"custom_id": request["custom_id"], "response": None, "error": None}
+                try:
+                    record["response"] = {"status_code": 200, "body": self.responder(request["body"])}
+                except Exception as e:
+                    record["error"] = {"message": str(e)}
+                output.write(json.dumps(record) + "\n")
+        return output_path
+
+    def results(self, job: Dict[str, Any]) -> Dict[str, Dict[str, Any]]:
+        """Read the output file of a completed job"""
+        with open(job["output_file"], "r", encoding="utf-8") as f:
+            return _read_output(f.read())
+
+
+class BatchRunner:
+    """
+    Runs a list of requests as one resumable batch job.
+    """
+
+    def __init__(
+        self,
+        backend,
+        state_path: Optional[str] = None,
+        poll_interval: float = POLL_INTERVAL,
+        max_wait_seconds: float = MAX_WAIT_SECONDS,
+        results_ttl_seconds: float = RESULTS_TTL_SECONDS,
+        force: bool = False,
+        ledger=None
+    ):
+        """
+        Initialize the runner.
+
+        Args:
+            backend: ProviderBatchBackend or LocalBatchBackend.
+            state_path: State file of the run. The batch input file is written
+                next to it. If None, uses <LLM_BATCH_DIR>/<backend name>.json.
+            poll_interval: Seconds between status checks.
+            max_wait_seconds: How long run waits for the job before raising
+                BatchError; the job can be resumed by running again.
+            results_ttl_seconds: How long the results of a finished job are
+                reused for the same requests.
+            force: Submit a new job even if a finished one for the same
+                requests is recorded.
+            ledger: Usage ledger recording each result. If None, uses the
+                shared ledger; False disables recording.
+        """
+        self.backend = backend
+        self.state_path = state_path or os.path.join(BATCH_DIR, f"{backend.name}.json")
+        self.batch_path = os.path.splitext(self.state_path)[0] + ".jsonl"
+        self.poll_interval = poll_interval
+        self.max_wait_seconds = max_wait_seconds
+        self.results_ttl_seconds = results_ttl_seconds
+        self.force = force
+        self.ledger = None if ledger is False else (ledger or get_usage_ledger())
+
+    @staticmethod
+    def fingerprint(requests: List[BatchRequest]) -> str:
+        """Identify a set of requests, so a changed batch is not resumed"""
+        digest = hashlib.sha256()
+        for request in requests:
+            digest.update(json.dumps([request.custom_id, request.body], sort_keys=True).encode("utf-8"))
+        return digest.hexdigest()
+
+    def load_state(self) -> Optional[Dict[str, Any]]:
+        """Read the state file, or None if there is none"""
+        try:
+            with open(self.state_path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def _save_state(self, state: Dict[str, Any]):
+        """Write the state file atomically"""
+        tmp_path = self.state_path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(state, f, indent=2)
+        os.replace(tmp_path, self.state_path)
+
+    def run(self, requests: List[BatchRequest]) -> Dict[str, BatchResult]:
+        """
+        Submit the requests as a batch (or resume the job already submitted
+        for the same requests), wait for it and collect the results.
+
+        Args:
+            requests: The requests; custom IDs must be unique.
+
+        Returns:
+            Mapping of custom ID to result. Requests missing from the job
+            output have an error result.
+        """
+        if len({request.custom_id for request in requests}) != len(requests):
+            raise ValueError("Batch request custom_id values must be unique")
+        directory = os.path.dirname(self.state_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        fingerprint = self.fingerprint(requests)
+        state = self.load_state()
+        if self._resumable(state, fingerprint):
+            logger.info(f"Resuming batch job {state['job_id']} ({state['status']})")
+        else:
+            state = self._submit(requests, fingerprint)
+
+        if state.get("results") is None:
+            state = self._wait(state, requests)
+        return self._collect(requests, state)
+
+    def _resumable(self, state: Optional[Dict[str, Any]], fingerprint: str) -> bool:
+        """Whether a recorded job is for the same requests and its results are still fresh"""
+        if not state or state.get("fingerprint") != fingerprint or state.get("backend") != self.backend.name:
+            return False
+        if state.get("results") is None:
+            return True
+        if self.force:
+            return False
+        finished_at = state.get("finished_at", state["submitted_at"])
+        return time.time() - finished_at <= self.results_ttl_seconds
+
+    def _submit(self, requests: List[BatchRequest], fingerprint: str) -> Dict[str, Any]:
+        """Write the batch file, submit it and record the job"""
+        self.backend.write(self.batch_path, requests)
+        try:
+            job_id = self.backend.submit(self.batch_path, requests)
+        except Exception as e:
+            raise BatchError(f"Could not submit batch to {self.backend.name}: {str(e)}") from e
+        state = {
+            "backend": self.backend.name,
+            "fingerprint": fingerprint,
+            "job_id": job_id,
+            "batch_file": self.batch_path,
+            "submitted_at": time.time(),
+            "status": PENDING,
+            "requests": {request.custom_id: request.metadata for request in requests},
+            "results": None
+        }
+        self._save_state(state)
+        logger.info(f"Submitted batch job {job_id} with {len(requests)} requests to {self.backend.name}")
+        return state
+
+    def _wait(self, state: Dict[str, Any], requests: List[BatchRequest]) -> Dict[str, Any]:
+        """Poll the job until it finishes, store its results in the state and record their usage"""
+        deadline = time.time() + self.max_wait_seconds
+        while True:
+            status, job = self.backend.poll(state["job_id"])
+            if status != PENDING:
+                break
+            if time.time() + self.poll_interval > deadline:
+                raise BatchError(
+                    f"Batch job {state['job_id']} still running after {self.max_wait_seconds:.0f}s; "
+                    f"run again to resume from {self.state_path}"
+                )
+            time.sleep(self.poll_interval)
+
+        if status == FAILED:
+            logger.warning(f"Batch job {state['job_id']} ended as {job.get('status')}; collecting partial results")
+        state["status"] = status
+        state["results"] = self.backend.results(job)
+        state["finished_at"] = time.time()
+        self._save_state(state)
+        self._record_usage(state, requests)
+        return state
+
+    def _record_usage(self, state: Dict[str, Any], requests: List[BatchRequest]):
+        """Record each answered request in the usage ledger, at batch pricing"""
+        if self.ledger is None:
+            return
+        elapsed = state["finished_at"] - state["submitted_at"]
+        for request in requests:
+            body = (state["results"].get(request.custom_id) or {}).get("body")
+            if not body:
+                continue
+            self.ledger.record(
+                self.backend.name,
+                body.get("model") or request.body.get("model") or "",
+                "batch/chat/completions",
+                body.get("usage") or {},
+                elapsed,
+                messages=request.body.get("messages"),
+                repo=request.metadata.get("repository"),
+                batch=True
+            )
+
+    @staticmethod
+    def _collect(requests: List[BatchRequest], state: Dict[str, Any]) -> Dict[str, BatchResult]:
+        """Map the job output back to the requests"""
+        collected = {}
+        for request in requests:
+            outcome = state["results"].get(request.custom_id) or {"error": "No result in batch output"}
+            collected[request.custom_id] = BatchResult(
+                custom_id=request.custom_id,
+                metadata=request.metadata,
+                body=outcome.get("body"),
+                error=outcome.get("error")
+            )
+        failed = sum(1 for result in collected.values() if result.error)
+        if failed:
+            logger.warning(f"{failed} of {len(requests)} batch requests failed")
+        return collected
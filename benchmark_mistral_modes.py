@@ -0,0 +1,141 @@
+#!/usr/bin/env python3
+"""
+Benchmark the Mistral analysis modes
+
+This script runs the repository analysis in the parallel mode (one prompt
+per section, sent concurrently) and in the combined mode (one prompt for
+every section) against the local mock LLM server, and compares their wall
+time, tokens and estimated cost as recorded in the usage ledger.
+
+The analyzed repository is generated in a temporary directory, so the
+canned answers of the mock server only match the analysis instructions.
+
+    python benchmark_mistral_modes.py --files 40 --latency 400 --tokens-per-second 60
+"""
+
+import os
+import sys
+import json
+import time
+import argparse
+import tempfile
+
+import httpx
+
+from llm_providers import ProviderClient
+from mistral_integration import (
+    MistralRepositoryAnalyzer, ANALYSIS_TASKS, PARALLEL_MODE, COMBINED_MODE
+)
+from mock_llm_server import MockLLMServer, MockServerConfig, LatencyProfile
+from rate_limiter import RateLimiter
+from usage_ledger import UsageLedger
+
+MODES = [PARALLEL_MODE, COMBINED_MODE]
+
+
+def create_repository(directory: str, files: int, file_lines: int):
+    """Write a synthetic repository with a README, a manifest and source files"""
+    with open(os.path.join(directory, "README.md"), "w", encoding="utf-8") as f:
+        f.write("# Benchmark Repository\n\nA generated project used to benchmark the analysis.\n")
+    with open(os.path.join(directory, "package.json"), "w", encoding="utf-8") as f:
+        json.dump({"name": "benchmark", "version": "1.0.0", "dependencies": {"@primer/css": "^21.0.0"}}, f)
+    os.makedirs(os.path.join(directory, "src"))
+    for index in range(files):
+        lines = [f"def handler_{index}_{line}(value):\n    return value + {line}\n" for line in range(file_lines)]
+        with open(os.path.join(directory, "src", f"module_{index}.py"), "w", encoding="utf-8") as f:
+            f.writelines(lines)
+
+
+def canned_responses(analyzer: MistralRepositoryAnalyzer) -> dict:
+    """
+    Mock server answers keyed by a phrase of each instruction.
+
+    Both modes get the same section content, so the answers cost the same
+    number of completion tokens per section.
+    """
+    sections = analyzer._get_simulated_responses()
+    responses = {
+        # Repair requests are matched first; they never happen with these answers
+        "were missing or invalid": json.dumps(sections),
+        "answer every section in one JSON object": json.dumps(sections),
+    }
+    for analysis_type, instructions in ANALYSIS_TASKS:
+        responses[instructions.strip().splitlines()[-1]] = json.dumps(sections[analysis_type])
+    return responses
+
+
+def run_mode(mode: str, server: MockLLMServer, directory: str, runs: int) -> dict:
+    """Time the analysis in one mode and total its usage"""
+    ledger = UsageLedger(os.path.join(directory, f"usage-{mode}.sqlite3"))
+    analyzer = MistralRepositoryAnalyzer(api_key="mock", mode=mode)
+    analyzer.client = ProviderClient(
+        "mistral", api_key="mock", http_client=httpx.Client(base_url=server.base_url, timeout=60),
+        rate_limiter=RateLimiter(os.path.join(directory, f"limits-{mode}.sqlite3")), ledger=ledger
+    )
+
+    timings = []
+    for _ in range(runs):
+        prompts = analyzer.generate_analysis_prompts()
+        start = time.perf_counter()
+        responses = analyzer.simulate_mistral_analysis(prompts)
+        timings.append(time.perf_counter() - start)
+        simulated = [name for name, section in responses.items() if section.get("simulated")]
+        if simulated:
+            raise RuntimeError(f"{mode} mode fell back to simulation for: {', '.join(simulated)}")
+
+    rows = ledger.summary(group_by="model")
+    return {
+        "mode": mode,
+        "seconds": sorted(timings)[len(timings) // 2],
+        "calls": sum(row["calls"] for row in rows) / runs,
+        "prompt_tokens": sum(row["prompt_tokens"] for row in rows) / runs,
+        "completion_tokens": sum(row["completion_tokens"] for row in rows) / runs,
+        "cost_usd": sum(row["cost_usd"] for row in rows) / runs,
+        "models": ", ".join(sorted(str(row["model"]) for row in rows)),
+    }
+
+
+def main():
+    """Run the benchmark and print one row per mode"""
+    parser = argparse.ArgumentParser(description="Compare the parallel and combined Mistral analysis modes")
+    parser.add_argument("--files", type=int, default=40, help="Source files in the generated repository")
+    parser.add_argument("--file-lines", type=int, default=40, help="Functions per source file")
+    parser.add_argument("--latency", default="400", help="Mock server latency spec (see mock_llm_server.py)")
+    parser.add_argument("--tokens-per-second", type=float, default=60.0, help="Mock server output pacing")
+    parser.add_argument("--runs", type=int, default=3, help="Runs per mode; the median time is reported")
+    parser.add_argument("--output", help="Write the results to this JSON file")
+    args = parser.parse_args()
+
+    cwd = os.getcwd()
+    with tempfile.TemporaryDirectory() as directory:
+        repository = os.path.join(directory, "repo")
+        os.makedirs(repository)
+        create_repository(repository, args.files, args.file_lines)
+        os.chdir(repository)
+        try:
+            config = MockServerConfig(
+                latency=LatencyProfile.parse(args.latency),
+                tokens_per_second=args.tokens_per_second,
+                responses=canned_responses(MistralRepositoryAnalyzer(api_key="mock")),
+            )
+            with MockLLMServer(config) as server:
+                results = [run_mode(mode, server, directory, args.runs) for mode in MODES]
+        finally:
+            os.chdir(cwd)
+
+    print(f"\n📊 Mistral analysis modes ({args.files} files, latency {args.latency} ms, "
+          f"{args.tokens_per_second:g} tokens/s, median of {args.runs} runs)")
+    print(f"{'mode':<10} {'seconds':>8} {'calls':>6} {'prompt':>8} {'completion':>11} {'cost (USD)':>11}  models")
+    for result in results:
+        print(f"{result['mode']:<10} {result['seconds']:>8.2f} {result['calls']:>6.0f} "
+              f"{result['prompt_tokens']:>8.0f} {result['completion_tokens']:>11.0f} "
+              f"{result['cost_usd']:>11.5f}  {result['models']}")
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -10,8 +10,8 @@ import os
 import json
 import time
 from typing import Dict, Any, List, Optional
-import plotly.graph_objects as go
-from plotly.subplots import make_subplots
+
+from analysis_schemas import parse_score
 
 class AnalysisComparator:
     def __init__(self, mistral_report_path: str = "analysis_report.json", 
@@ -265,40 +265,8 @@ class AnalysisComparator:
     
     def _extract_score(self, score_text):
         """Extract numeric score from text like 'High (8/10)'"""
-        try:
-            if isinstance(score_text, (int, float)):
-                return float(score_text)
-            
-            # Try to find a number in the format (X/10)
-            import re
-            match = re.search(r'(\d+)\/10', score_text)
-            if match:
-                return float(match.group(1))
-            
-            # Try to find any number
-            match = re.search(r'(\d+(\.\d+)?)', score_text)
-            if match:
-                return float(match.group(1))
-            
-            # Map text ratings to numbers
-            text_mapping = {
-                "very low": 1,
-                "low": 2,
-                "medium-low": 3,
-                "medium": 5,
-                "medium-high": 7,
-                "high": 8,
-                "very high": 10
-            }
-            
-            score_text_lower = score_text.lower()
-            for text, value in text_mapping.items():
-                if text in score_text_lower:
-                    return value
-            
-            return 0
-        except:
-            return 0
+        score = parse_score(score_text)
+        return score if score is not None else 0
     
     def _calculate_text_similarity(self, text1, text2):
         """Calculate simple similarity between two text strings"""
@@ -594,6 +562,8 @@ class AnalysisComparator:
     
     def _generate_score_radar_chart(self, output_path):
         """Generate a radar chart comparing scores"""
+        import plotly.graph_objects as go
+        
         mistral_scores = self.comparison_results.get("scores", {}).get("mistral", {})
         openai_scores = self.comparison_results.get("scores", {}).get("openai", {})
         
@@ -637,6 +607,8 @@ class AnalysisComparator:
     
     def _generate_agreement_bar_chart(self, output_path):
         """Generate a bar chart showing agreement percentages"""
+        import plotly.graph_objects as go
+        
         categories = [
             "Repository Info",
             "Technology Stack",
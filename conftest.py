@@ -0,0 +1,12 @@
+"""
+Shared pytest setup
+
+Tests never write to the shared usage ledger or rate limiter databases in
+the working directory: clients a test builds without its own ledger or
+limiter run without them. Set before any test module imports the clients.
+"""
+
+import os
+
+os.environ.setdefault("LLM_USAGE_LEDGER_ENABLED", "0")
+os.environ.setdefault("LLM_RATE_LIMIT_ENABLED", "0")
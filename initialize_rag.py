@@ -4,12 +4,16 @@ Initialize RAG System
 
 This script initializes the RAG system by processing repository documentation
 and analysis reports, generating embeddings, and creating the vector store.
+Embeddings are checkpointed as they are generated, so an interrupted build
+resumes where it stopped when the script is run again (use --fresh to discard
+the checkpoint).
 """
 
 import os
 import sys
 import logging
-from rag_system import initialize_rag_system
+from rag_system import VECTOR_STORE_PATH, DOCUMENT_STORE_PATH
+from rag_index_builder import IndexBuildJob, COMPLETED, CANCELLED
 
 # Configure logging
 logging.basicConfig(
@@ -30,9 +34,33 @@ def main():
     
     # Force reinitialization if specified
     force = '--force' in sys.argv
+    resume = '--fresh' not in sys.argv
     
-    # Initialize the RAG system
-    success = initialize_rag_system(force=force)
+    if os.path.exists(VECTOR_STORE_PATH) and os.path.exists(DOCUMENT_STORE_PATH) and not force:
+        print("✅ RAG System already initialized (use --force to rebuild).")
+        return 0
+    
+    # Run the index build in the background and report progress
+    job = IndexBuildJob(resume=resume).start()
+    try:
+        while not job.wait(timeout=2.0):
+            progress = job.progress()
+            eta = progress["eta_seconds"]
+            print(
+                f"   {progress['embedded_chunks']}/{progress['total_chunks']} chunks, "
+                f"{progress['chunks_per_second']:.2f} chunks/s, "
+                f"ETA {f'{eta:.0f}s' if eta is not None else 'n/a'}, "
+                f"{progress['tokens_spent']} tokens"
+            )
+    except KeyboardInterrupt:
+        job.cancel()
+        job.wait()
+    
+    if job.state == CANCELLED:
+        print("⏸️ RAG index build cancelled. Run again to resume from the checkpoint.")
+        return 1
+    
+    success = job.state == COMPLETED
     
     if success:
         print("✅ RAG System initialized successfully!")
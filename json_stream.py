@@ -0,0 +1,329 @@
+"""
+Incremental JSON Parsing Module
+
+This module provides a push parser that scans JSON text as it arrives and
+emits the members of selected objects (or the items of selected arrays) as
+soon as each one is complete. Only the member currently being captured is
+buffered, so memory use is bounded by the largest single member rather than
+the size of the whole document.
+
+JSONFieldStream applies the parser to model output streamed in small text
+deltas, emitting each top-level field of the answer as soon as it closes.
+"""
+
+import re
+import json
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Sequence, TextIO, Tuple, Union
+
+# Frame kinds
+_OBJECT = "object"
+_ARRAY = "array"
+
+# Object frame states
+_EXPECT_KEY = "key"
+_EXPECT_COLON = "colon"
+_EXPECT_VALUE = "value"
+_EXPECT_COMMA = "comma"
+
+_WHITESPACE = " \t\r\n"
+
+# Characters that end a run of plain string content
+_STRING_SPECIAL = re.compile(r'["\\]')
+
+Path = Tuple[Union[str, int], ...]
+
+
+class _Frame:
+    """An open object or array"""
+
+    __slots__ = ("kind", "name", "state", "key", "index")
+
+    def __init__(self, kind: str, name: Any):
+        self.kind = kind
+        self.name = name
+        self.state = _EXPECT_KEY if kind == _OBJECT else _EXPECT_VALUE
+        self.key = None
+        self.index = 0
+
+    def member_name(self) -> Any:
+        """Name of the member whose value is being parsed in this frame"""
+        return self.key if self.kind == _OBJECT else self.index
+
+
+class JSONStreamParser:
+    """
+    Push parser emitting completed members of the containers at given paths.
+
+    A path is a tuple of object keys (or array indexes) from the document
+    root, e.g. ("mistral_analysis",). The empty path selects the members of
+    the root object. Members whose own path leads to another selected path are
+    descended into rather than captured. Scanning stops at the end of the
+    root value; any text after it is ignored.
+    """
+
+    def __init__(self, paths: Iterable[Sequence[Union[str, int]]] = ((),)):
+        """
+        Initialize the parser.
+
+        Args:
+            paths: Paths of the containers whose members should be emitted.
+        """
+        self.paths = {tuple(path) for path in paths}
+        self._prefixes = {path[:i] for path in self.paths for i in range(1, len(path) + 1)}
+
+        self._buffer = ""
+        self._pos = 0
+        self._stack: List[_Frame] = []
+
+        self._in_string = False
+        self._escape = False
+        self._string_start = None
+        self._string_is_key = False
+        self._scalar_start = None
+
+        self._capture_start = None
+        self._capture_path = None
+        self._capture_name = None
+        self._capture_depth = None
+
+        self._emitted: List[Tuple[Path, Any, Any]] = []
+        self.closed_paths = set()
+        self.finished = False
+
+    @property
+    def done(self) -> bool:
+        """True once every selected container has been closed"""
+        return self.closed_paths >= self.paths
+
+    def feed(self, text: str) -> List[Tuple[Path, Any, Any]]:
+        """
+        Feed more JSON text to the parser.
+
+        Args:
+            text: The next piece of the document.
+
+        Returns:
+            List of (container path, member key or index, value) tuples for
+            the members completed by this piece of text.
+        """
+        if self.finished:
+            return []
+        self._buffer += text
+        self._scan()
+        self._trim()
+        emitted, self._emitted = self._emitted, []
+        return emitted
+
+    def _path(self) -> Path:
+        """Path of the innermost open container"""
+        return tuple(frame.name for frame in self._stack[1:])
+
+    def _scan(self):
+        buffer = self._buffer
+        i = self._pos
+        length = len(buffer)
+
+        while i < length:
+            c = buffer[i]
+
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif c == "\\":
+                    self._escape = True
+                elif c == '"':
+                    self._in_string = False
+                    self._end_string(i)
+                else:
+                    # Skip plain string content in one step
+                    match = _STRING_SPECIAL.search(buffer, i)
+                    i = match.start() if match else length
+                    continue
+                i += 1
+                continue
+
+            if self._scalar_start is not None and (c in _WHITESPACE or c in ",}]"):
+                self._value_end(i)
+                self._scalar_start = None
+
+            if c in _WHITESPACE:
+                pass
+            elif c == '"':
+                self._in_string = True
+                top = self._stack[-1] if self._stack else None
+                self._string_is_key = top is not None and top.kind == _OBJECT and top.state == _EXPECT_KEY
+                if self._string_is_key:
+                    self._string_start = i
+                else:
+                    self._value_start(i)
+            elif c == "{" or c == "[":
+                self._value_start(i)
+                parent = self._stack[-1] if self._stack else None
+                name = parent.member_name() if parent is not None else None
+                self._stack.append(_Frame(_OBJECT if c == "{" else _ARRAY, name))
+            elif c == "}" or c == "]":
+                frame = self._stack.pop()
+                if len(self._stack) >= 1:
+                    path = self._path() + (frame.name,)
+                else:
+                    path = ()
+                if path in self.paths:
+                    self.closed_paths.add(path)
+                self._value_end(i + 1)
+                if not self._stack:
+                    # End of the root value
+                    self.finished = True
+                    i += 1
+                    break
+            elif c == ":":
+                self._stack[-1].state = _EXPECT_VALUE
+            elif c == ",":
+                top = self._stack[-1]
+                if top.kind == _OBJECT:
+                    top.state = _EXPECT_KEY
+                else:
+                    top.index += 1
+                    top.state = _EXPECT_VALUE
+            elif self._scalar_start is None:
+                self._scalar_start = i
+                self._value_start(i)
+
+            i += 1
+
+        self._pos = i
+
+    def _end_string(self, end: int):
+        """Handle the closing quote of a string at index end"""
+        if self._string_is_key:
+            top = self._stack[-1]
+            top.key = json.loads(self._buffer[self._string_start:end + 1])
+            top.state = _EXPECT_COLON
+        else:
+            self._value_end(end + 1)
+        self._string_start = None
+
+    def _value_start(self, start: int):
+        """Handle the first character of a value"""
+        if self._capture_start is not None or not self._stack:
+            return
+        top = self._stack[-1]
+        path = self._path()
+        name = top.member_name()
+        if path in self.paths and path + (name,) not in self._prefixes:
+            self._capture_start = start
+            self._capture_path = path
+            self._capture_name = name
+            self._capture_depth = len(self._stack)
+
+    def _value_end(self, end: int):
+        """Handle the end of a value (exclusive end index)"""
+        if self._stack:
+            self._stack[-1].state = _EXPECT_COMMA
+        if self._capture_start is not None and len(self._stack) == self._capture_depth:
+            value = json.loads(self._buffer[self._capture_start:end])
+            self._emitted.append((self._capture_path, self._capture_name, value))
+            self._capture_start = None
+
+    def _trim(self):
+        """Drop scanned text that is no longer needed"""
+        keep_from = self._pos
+        for index in (self._capture_start, self._string_start, self._scalar_start):
+            if index is not None:
+                keep_from = min(keep_from, index)
+        if keep_from == 0:
+            return
+
+        self._buffer = self._buffer[keep_from:]
+        self._pos -= keep_from
+        if self._capture_start is not None:
+            self._capture_start -= keep_from
+        if self._string_start is not None:
+            self._string_start -= keep_from
+        if self._scalar_start is not None:
+            self._scalar_start -= keep_from
+
+
+class JSONFieldStream:
+    """
+    Collects the top-level fields of a JSON object arriving in text deltas,
+    such as a streamed chat completion.
+
+    Text before the opening brace (e.g. a ```json fence) and after the
+    closing one is ignored.
+    """
+
+    def __init__(self):
+        self.fields: Dict[str, Any] = {}
+        self._parser = JSONStreamParser()
+        self._started = False
+
+    @property
+    def done(self) -> bool:
+        """True once the object has been closed"""
+        return self._parser.finished
+
+    def feed(self, text: str) -> List[Tuple[str, Any]]:
+        """
+        Feed the next piece of the answer.
+
+        Args:
+            text: Text delta.
+
+        Returns:
+            List of (field name, value) tuples completed by this delta.
+        """
+        if not self._started:
+            start = text.find("{")
+            if start < 0:
+                return []
+            text = text[start:]
+            self._started = True
+        completed = [(key, value) for _, key, value in self._parser.feed(text)]
+        self.fields.update(completed)
+        return completed
+
+
+def iter_members(
+    source: Union[str, TextIO],
+    paths: Iterable[Sequence[Union[str, int]]] = ((),),
+    chunk_size: int = 64 * 1024
+) -> Iterator[Tuple[Path, Any, Any]]:
+    """
+    Stream the members of selected containers from a JSON file.
+
+    Reading stops as soon as every selected container has been closed.
+
+    Args:
+        source: File path or open text file.
+        paths: Paths of the containers whose members should be emitted.
+        chunk_size: Number of characters read per chunk.
+
+    Yields:
+        (container path, member key or index, value) tuples.
+    """
+    if isinstance(source, str):
+        with open(source, "r", encoding="utf-8") as f:
+            yield from iter_members(f, paths, chunk_size)
+        return
+
+    parser = JSONStreamParser(paths)
+    while not parser.done:
+        chunk = source.read(chunk_size)
+        if not chunk:
+            break
+        yield from parser.feed(chunk)
+
+
+def load_members(source: Union[str, TextIO], path: Sequence[Union[str, int]] = ()) -> Optional[dict]:
+    """
+    Load the members of a single object without parsing the rest of the file.
+
+    Args:
+        source: File path or open text file.
+        path: Path of the object to load.
+
+    Returns:
+        Dictionary of the object's members, or None if it was not found.
+    """
+    members = {key: value for _, key, value in iter_members(source, [path])}
+    return members or None
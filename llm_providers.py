@@ -0,0 +1,985 @@
+"""
+LLM Provider Client Module
+
+This module provides a provider-agnostic client layer for the chat and
+embedding APIs used by the analyzers and the RAG system. Each provider gets
+one long-lived, pooled keep-alive HTTP transport that is shared by every
+client of that provider in the process, so analyzers reuse warm TLS
+connections instead of opening new ones. Async variants of the calls share
+an AsyncClient per provider and event loop, and a per-provider semaphore
+bounds how many requests are in flight at once. Identical concurrent chat
+requests are coalesced into one API call, and every request is paced by the
+shared requests/tokens per minute rate limiter. Retries, hedging of slow
+requests, the end-to-end deadline and the circuit breaker are applied by the
+resilience policy. Every call is recorded in the usage ledger. The traffic
+recorder can capture request/response pairs to a cassette and replay them
+offline.
+
+Chat completions can also be streamed. A JSON answer is parsed as it
+arrives, so callers get each top-level field as soon as it closes and can
+stop the generation once the fields they need are complete.
+
+OpenAI and Mistral both expose OpenAI-compatible REST endpoints, so a single
+client implementation serves both; responses are normalized to the same
+ChatResult and EmbeddingResult shapes.
+"""
+
+import os
+import json
+import time
+import atexit
+import asyncio
+import weakref
+import logging
+import threading
+from dataclasses import dataclass, field
+from typing import Dict, Any, List, Optional, Tuple, Callable, Union
+
+import httpx
+from dotenv import load_dotenv
+
+import tokenization
+from json_stream import JSONFieldStream
+from llm_recorder import CassetteEntry, Recorder, get_recorder
+from metrics import get_registry
+from prompt_builder import cached_prompt_tokens
+from rate_limiter import RateLimiter, get_rate_limiter
+from resilience import ResiliencePolicy
+from response_cache import ResponseCache, get_response_cache, make_cache_key
+from singleflight import SingleFlight, get_single_flight
+from usage_ledger import UsageLedger, get_usage_ledger
+
+# Configure logging
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger(__name__)
+
+# Load environment variables
+load_dotenv()
+
+# Connection pool settings shared by all providers
+MAX_CONNECTIONS = int(os.getenv("LLM_MAX_CONNECTIONS", "20"))
+MAX_KEEPALIVE_CONNECTIONS = int(os.getenv("LLM_MAX_KEEPALIVE_CONNECTIONS", "10"))
+KEEPALIVE_EXPIRY = float(os.getenv("LLM_KEEPALIVE_EXPIRY", "60"))
+REQUEST_TIMEOUT = float(os.getenv("LLM_REQUEST_TIMEOUT", "120"))
+CONNECT_TIMEOUT = float(os.getenv("LLM_CONNECT_TIMEOUT", "10"))
+
+# Maximum in-flight async requests per provider
+MAX_CONCURRENT_REQUESTS = int(os.getenv("LLM_MAX_CONCURRENT_REQUESTS", "16"))
+
+
+@dataclass(frozen=True)
+class ProviderConfig:
+    """
+    Static description of an OpenAI-compatible provider.
+
+    Attributes:
+        name: Provider name, e.g. "openai".
+        base_url: API base URL including the version prefix.
+        api_key_envs: Environment variables checked for the API key, in order.
+        default_model: Chat model used when none is given.
+        default_embedding_model: Embedding model used when none is given.
+        stream_usage: Whether streams must ask for a final usage chunk
+            (stream_options.include_usage); Mistral always sends one.
+        json_mode: Structured output the chat API supports: "json_schema",
+            "json_object" or None.
+    """
+    name: str
+    base_url: str
+    api_key_envs: Tuple[str, ...]
+    default_model: str
+    default_embedding_model: str
+    stream_usage: bool = False
+    json_mode: Optional[str] = None
+
+    def api_key(self) -> Optional[str]:
+        """Get the API key from the environment"""
+        return next((os.getenv(env) for env in self.api_key_envs if os.getenv(env)), None)
+
+
+PROVIDERS: Dict[str, ProviderConfig] = {
+    "openai": ProviderConfig(
+        name="openai",
+        base_url=os.getenv("OPENAI_BASE_URL", "https://api.openai.com/v1"),
+        api_key_envs=("OPENAI_API_KEY",),
+        default_model=os.getenv("OPENAI_MODEL", "gpt-4o"),
+        default_embedding_model="text-embedding-3-small",
+        stream_usage=True,
+        json_mode="json_schema",
+    ),
+    "mistral": ProviderConfig(
+        name="mistral",
+        base_url=os.getenv("MISTRAL_BASE_URL", "https://api.mistral.ai/v1"),
+        api_key_envs=("MISTRAL_API_KEY", "MISTRALAI_API_KEY"),
+        default_model=os.getenv("MISTRAL_MODEL", "mistral-large-latest"),
+        default_embedding_model="mistral-embed",
+        json_mode="json_schema",
+    ),
+    # Only used when OPENHANDS_BASE_URL points at an OpenAI-compatible server
+    "openhands": ProviderConfig(
+        name="openhands",
+        base_url=os.getenv("OPENHANDS_BASE_URL", ""),
+        api_key_envs=("OPENHANDS_API_KEY",),
+        default_model=os.getenv("OPENHANDS_MODEL", "o4-mini"),
+        default_embedding_model="text-embedding-3-small",
+    ),
+}
+
+
+class ProviderError(Exception):
+    """Error returned by a provider API"""
+
+    def __init__(self, provider: str, status_code: int, message: str):
+        super().__init__(f"{provider} API error {status_code}: {message}")
+        self.provider = provider
+        self.status_code = status_code
+
+
+class ProviderRateLimitError(ProviderError):
+    """The provider rejected the request with HTTP 429"""
+
+
+class ProviderUnavailableError(ProviderError):
+    """The provider failed with a server-side (5xx) error"""
+
+
+# Errors worth retrying with backoff
+RETRYABLE_ERRORS = (ProviderRateLimitError, ProviderUnavailableError, httpx.TransportError)
+
+
+@dataclass
+class ChatResult:
+    """
+    Normalized chat completion result.
+
+    Attributes:
+        provider: Provider name.
+        model: Model that produced the completion.
+        content: Text of the first choice.
+        finish_reason: Finish reason of the first choice.
+        usage: Token usage (prompt_tokens, completion_tokens, total_tokens).
+        raw: The OpenAI-style response body.
+        elapsed: Request time in seconds.
+        cached: True if the result came from the response cache.
+        replayed: True if the result was replayed from a cassette.
+    """
+    provider: str
+    model: str
+    content: str
+    finish_reason: Optional[str] = None
+    usage: Dict[str, int] = field(default_factory=dict)
+    raw: Dict[str, Any] = field(default_factory=dict)
+    elapsed: float = 0.0
+    cached: bool = False
+    replayed: bool = False
+
+
+@dataclass
+class EmbeddingResult:
+    """Normalized embedding result, one vector per input text"""
+    provider: str
+    model: str
+    embeddings: List[List[float]]
+    usage: Dict[str, int] = field(default_factory=dict)
+
+
+class _ChatStream:
+    """
+    Assembles a streamed chat completion from its server-sent events and
+    parses the JSON answer as it arrives.
+    """
+
+    def __init__(
+        self,
+        payload: Dict[str, Any],
+        on_field: Optional[Callable[[str, Any], None]],
+        stop_when: Optional[Callable[[Dict[str, Any]], bool]]
+    ):
+        self.payload = payload
+        self.on_field = on_field
+        self.stop_when = stop_when
+        self.json = JSONFieldStream()
+        self.events: List[str] = []
+        self.parts: List[str] = []
+        self.chunk: Dict[str, Any] = {}
+        self.usage: Dict[str, int] = {}
+        self.finish_reason = None
+        self.aborted = False
+
+    def feed_line(self, line: str) -> bool:
+        """
+        Handle one line of the event stream.
+
+        Returns:
+            False once the stream is finished or should be abandoned.
+        """
+        if not line.startswith("data:"):
+            return True
+        self.events.append(line)
+        data = line[len("data:"):].strip()
+        if data == "[DONE]":
+            return False
+        chunk = json.loads(data)
+        self.chunk = chunk
+        if chunk.get("usage"):
+            self.usage = chunk["usage"]
+        for choice in chunk.get("choices") or []:
+            if choice.get("index", 0) != 0:
+                continue
+            if choice.get("finish_reason"):
+                self.finish_reason = choice["finish_reason"]
+            delta = (choice.get("delta") or {}).get("content")
+            if delta and not self._add(delta):
+                return False
+        return True
+
+    def _add(self, delta: str) -> bool:
+        """Add a content delta; False if the caller asked to stop"""
+        self.parts.append(delta)
+        completed = self.json.feed(delta)
+        for name, value in completed:
+            if self.on_field is not None:
+                self.on_field(name, value)
+        if completed and self.stop_when is not None and self.stop_when(self.json.fields):
+            self.aborted = True
+            return False
+        return True
+
+    def body(self) -> Dict[str, Any]:
+        """The stream as an OpenAI-style chat completion body"""
+        content = "".join(self.parts)
+        usage = dict(self.usage)
+        if not usage:
+            # Abandoned streams end before the usage chunk; count locally
+            texts = [m["content"] for m in self.payload["messages"] if isinstance(m.get("content"), str)]
+            usage = {
+                "prompt_tokens": sum(tokenization.count_tokens_batch(texts, self.payload["model"])),
+                "completion_tokens": tokenization.count_tokens(content, self.payload["model"]),
+            }
+        return {
+            "id": self.chunk.get("id", ""),
+            "object": "chat.completion",
+            "created": self.chunk.get("created", int(time.time())),
+            "model": self.chunk.get("model", self.payload["model"]),
+            "choices": [{
+                "index": 0,
+                "message": {"role": "assistant", "content": content},
+                "finish_reason": "stop" if self.aborted else self.finish_reason or "stop"
+            }],
+            "usage": usage
+        }
+
+
+_http_clients: Dict[str, httpx.Client] = {}
+_providers: Dict[Tuple[str, Optional[str]], "ProviderClient"] = {}
+_registry_lock = threading.Lock()
+
+# Async clients and semaphores are bound to the event loop they are used on,
+# so they are kept per loop
+_async_state: "weakref.WeakKeyDictionary" = weakref.WeakKeyDictionary()
+
+
+def _pool_settings() -> Dict[str, Any]:
+    """Connection pool and timeout settings shared by sync and async transports"""
+    return {
+        "limits": httpx.Limits(
+            max_connections=MAX_CONNECTIONS,
+            max_keepalive_connections=MAX_KEEPALIVE_CONNECTIONS,
+            keepalive_expiry=KEEPALIVE_EXPIRY
+        ),
+        "timeout": httpx.Timeout(REQUEST_TIMEOUT, connect=CONNECT_TIMEOUT)
+    }
+
+
+def _new_http_client(config: ProviderConfig) -> httpx.Client:
+    """Create the pooled keep-alive transport for a provider"""
+    return httpx.Client(base_url=config.base_url, **_pool_settings())
+
+
+def get_http_client(provider: str) -> httpx.Client:
+    """
+    Get the shared HTTP transport for a provider.
+
+    httpx clients are thread-safe, so one pool serves every thread.
+
+    Args:
+        provider: Provider name.
+
+    Returns:
+        The process-wide pooled HTTP client for the provider.
+    """
+    client = _http_clients.get(provider)
+    if client is None:
+        with _registry_lock:
+            client = _http_clients.get(provider)
+            if client is None:
+                client = _new_http_client(PROVIDERS[provider])
+                _http_clients[provider] = client
+    return client
+
+
+def get_async_http_client(provider: str) -> Tuple[httpx.AsyncClient, asyncio.Semaphore]:
+    """
+    Get the shared async transport and concurrency limit for a provider.
+
+    Must be called from a running event loop; each loop gets its own client
+    and semaphore, shared by every coroutine on that loop.
+
+    Args:
+        provider: Provider name.
+
+    Returns:
+        Tuple of (async HTTP client, semaphore bounding in-flight requests).
+    """
+    loop = asyncio.get_running_loop()
+    with _registry_lock:
+        state = _async_state.setdefault(loop, {})
+        if provider not in state:
+            config = PROVIDERS[provider]
+            state[provider] = (
+                httpx.AsyncClient(base_url=config.base_url, **_pool_settings()),
+                asyncio.Semaphore(MAX_CONCURRENT_REQUESTS)
+            )
+        return state[provider]
+
+
+def _component(value: Any, default: Callable[[], Any]) -> Any:
+    """An explicitly passed component, the shared default if None, or None if False"""
+    if value is False:
+        return None
+    return default() if value is None else value
+
+
+class ProviderClient:
+    """
+    Chat and embedding client for an OpenAI-compatible provider.
+    """
+
+    def __init__(
+        self,
+        provider: str,
+        api_key: Optional[str] = None,
+        http_client: Optional[httpx.Client] = None,
+        async_http_client: Optional[httpx.AsyncClient] = None,
+        max_concurrency: Optional[int] = None,
+        cache: Optional[ResponseCache] = None,
+        single_flight: Optional[SingleFlight] = None,
+        rate_limiter: Union[RateLimiter, bool, None] = None,
+        resilience: Optional[ResiliencePolicy] = None,
+        ledger: Union[UsageLedger, bool, None] = None,
+        recorder: Optional[Recorder] = None
+    ):
+        """
+        Initialize the client.
+
+        Args:
+            provider: Provider name, a key of PROVIDERS.
+            api_key: API key. If None, uses the provider's environment variables.
+            http_client: HTTP client to use. If None, uses the provider's shared pool.
+            async_http_client: Async HTTP client to use. If None, uses the
+                provider's shared async pool for the running event loop.
+            max_concurrency: In-flight request limit for async_http_client.
+                Ignored when the shared async pool is used.
+            cache: Response cache for chat calls. If None, uses the shared
+                cache when LLM_CACHE_ENABLED is set.
+            single_flight: Coalescer for identical concurrent chat requests.
+                If None, uses the process-wide coalescer.
+            rate_limiter: Requests/tokens per minute limiter. If None, uses
+                the shared limiter unless LLM_RATE_LIMIT_ENABLED is off; if
+                False, requests are not rate limited.
+            resilience: Deadline, retry, hedging and circuit breaker policy.
+                If None, uses the defaults with the provider's shared breaker.
+            ledger: Usage ledger recording every call. If None, uses the shared
+                ledger unless LLM_USAGE_LEDGER_ENABLED is off; if False, usage
+                is not recorded.
+            recorder: Records or replays the traffic. If None, uses the shared
+                recorder when LLM_RECORD_MODE is set.
+        """
+        if provider not in PROVIDERS:
+            raise ValueError(f"Unknown provider: {provider}")
+        self.config = PROVIDERS[provider]
+        self.name = provider
+        self.api_key = api_key or self.config.api_key()
+        if not self.api_key:
+            raise ValueError(
+                f"{provider} API key is required. Set {self.config.api_key_envs[0]} "
+                "environment variable or pass it explicitly."
+            )
+        self.http_client = http_client or get_http_client(provider)
+        self._async_http_client = async_http_client
+        self._async_semaphore = None
+        self._max_concurrency = max_concurrency or MAX_CONCURRENT_REQUESTS
+        self.cache = cache if cache is not None else get_response_cache()
+        self.single_flight = single_flight or get_single_flight()
+        self.rate_limiter = _component(rate_limiter, get_rate_limiter)
+        self.resilience = resilience or ResiliencePolicy(provider, RETRYABLE_ERRORS)
+        self.ledger = _component(ledger, get_usage_ledger)
+        self.recorder = recorder if recorder is not None else get_recorder()
+
+    def _async_transport(self) -> Tuple[httpx.AsyncClient, asyncio.Semaphore]:
+        """Get the async client and semaphore for the running event loop"""
+        if self._async_http_client is None:
+            return get_async_http_client(self.name)
+        if self._async_semaphore is None:
+            self._async_semaphore = asyncio.Semaphore(self._max_concurrency)
+        return self._async_http_client, self._async_semaphore
+
+    def _headers(self) -> Dict[str, str]:
+        return {"Authorization": f"Bearer {self.api_key}"}
+
+    def _decode(self, response: httpx.Response) -> Dict[str, Any]:
+        """Raise the matching ProviderError for error responses, else decode JSON"""
+        if response.status_code == 429:
+            raise ProviderRateLimitError(self.name, response.status_code, response.text)
+        if response.status_code >= 500:
+            raise ProviderUnavailableError(self.name, response.status_code, response.text)
+        if response.status_code >= 400:
+            raise ProviderError(self.name, response.status_code, response.text)
+        return response.json()
+
+    def api_request(self, method: str, path: str, **kwargs) -> httpx.Response:
+        """
+        Send a plain API request on the shared transport, e.g. for the files
+        and batch endpoints. Not rate limited, retried or cached.
+
+        Args:
+            method: HTTP method.
+            path: Path relative to the provider's base URL.
+            **kwargs: Arguments for httpx.Client.request (json, data, files, ...).
+
+        Returns:
+            The response, after raising the matching ProviderError for error statuses.
+        """
+        response = self.http_client.request(method, path, headers=self._headers(), **kwargs)
+        if response.status_code >= 400:
+            self._decode(response)
+        return response
+
+    def _post(self, path: str, payload: Dict[str, Any]) -> Tuple[Dict[str, Any], bool]:
+        """
+        POST a JSON payload under the resilience policy.
+
+        Returns:
+            The decoded body, and True if it was replayed from a cassette
+            instead of sent.
+        """
+        entry = self.recorder.lookup(self.name, path, payload) if self.recorder is not None else None
+        if entry is not None:
+            time.sleep(self.recorder.replay_delay(entry))
+            return entry.response, True
+
+        # Estimated once per call, not for every retry or hedged attempt
+        reserved = self._estimate_tokens(payload)
+
+        def send(timeout: float) -> Dict[str, Any]:
+            response = self.http_client.post(path, json=payload, headers=self._headers(), timeout=timeout)
+            return self._settle(response, payload, reserved)
+
+        start_time = time.time()
+        body = self.resilience.call(
+            send, model=payload["model"], throttle=self._throttle(payload, reserved),
+            release=self._release(payload, reserved)
+        )
+        if self.recorder is not None:
+            self.recorder.record(self.name, path, payload, body, time.time() - start_time)
+        return body, False
+
+    async def _apost(self, path: str, payload: Dict[str, Any]) -> Tuple[Dict[str, Any], bool]:
+        """Async POST of a JSON payload, bounded by the provider semaphore"""
+        entry = self.recorder.lookup(self.name, path, payload) if self.recorder is not None else None
+        if entry is not None:
+            await asyncio.sleep(self.recorder.replay_delay(entry))
+            return entry.response, True
+
+        client, semaphore = self._async_transport()
+
+        reserved = self._estimate_tokens(payload)
+
+        async def send(timeout: float) -> Dict[str, Any]:
+            async with semaphore:
+                response = await client.post(path, json=payload, headers=self._headers(), timeout=timeout)
+            return self._settle(response, payload, reserved)
+
+        start_time = time.time()
+        body = await self.resilience.acall(
+            send, model=payload["model"], throttle=self._throttle(payload, reserved),
+            release=self._release(payload, reserved)
+        )
+        if self.recorder is not None:
+            self.recorder.record(self.name, path, payload, body, time.time() - start_time)
+        return body, False
+
+    def _throttle(self, payload: Dict[str, Any], reserved: int) -> Optional[Callable[[], float]]:
+        """Rate limit reservation for one request of a call, or None without a limiter"""
+        if self.rate_limiter is None:
+            return None
+        return lambda: self.rate_limiter.reserve(self.name, payload["model"], reserved)
+
+    def _release(self, payload: Dict[str, Any], reserved: int) -> Optional[Callable[[], None]]:
+        """Gives back the reservation of a request that was not sent, or None without a limiter"""
+        if self.rate_limiter is None:
+            return None
+        return lambda: self.rate_limiter.release(self.name, payload["model"], reserved)
+
+    def _estimate_tokens(self, payload: Dict[str, Any]) -> int:
+        """Estimate the tokens a request counts against the token quota"""
+        if self.rate_limiter is None:
+            return 0
+        if "messages" in payload:
+            texts = [m["content"] for m in payload["messages"] if isinstance(m.get("content"), str)]
+            extra = payload.get("max_tokens") or 0
+        else:
+            texts = payload["input"] if isinstance(payload["input"], list) else [payload["input"]]
+            extra = 0
+        return sum(tokenization.count_tokens_batch(texts, payload["model"])) + extra
+
+    def _settle(self, response: httpx.Response, payload: Dict[str, Any], reserved: int) -> Dict[str, Any]:
+        """Feed quota headers and actual usage back to the limiter, then decode"""
+        if self.rate_limiter is not None:
+            self.rate_limiter.update_from_headers(self.name, payload["model"], response.headers, response.status_code)
+        body = self._decode(response)
+        if self.rate_limiter is not None:
+            usage = body.get("usage") or {}
+            self.rate_limiter.settle(self.name, payload["model"], reserved, usage.get("total_tokens"))
+        return body
+
+    def _chat_payload(
+        self,
+        messages: List[Dict[str, str]],
+        model: Optional[str],
+        temperature: Optional[float],
+        max_tokens: Optional[int],
+        kwargs: Dict[str, Any]
+    ) -> Dict[str, Any]:
+        """Build a chat completion request body"""
+        payload = {"model": model or self.config.default_model, "messages": messages, **kwargs}
+        if temperature is not None:
+            payload["temperature"] = temperature
+        if max_tokens is not None:
+            payload["max_tokens"] = max_tokens
+        return payload
+
+    def chat(
+        self,
+        messages: List[Dict[str, str]],
+        model: Optional[str] = None,
+        temperature: Optional[float] = None,
+        max_tokens: Optional[int] = None,
+        **kwargs
+    ) -> ChatResult:
+        """
+        Send a chat completion request.
+
+        Args:
+            messages: List of message dictionaries.
+            model: Model to use. If None, uses the provider's default model.
+            temperature: Temperature for sampling. If None, uses the API default.
+            max_tokens: Maximum tokens to generate. If None, uses the API default.
+            **kwargs: Additional request body fields.
+
+        Returns:
+            The normalized chat result.
+        """
+        payload = self._chat_payload(messages, model, temperature, max_tokens, kwargs)
+        request_key = self._request_key(payload)
+        cached = self._cached_result(request_key, payload)
+        if cached is not None:
+            return cached
+
+        start_time = time.time()
+        if request_key is None:
+            (body, replayed), leader = self._post("/chat/completions", payload), True
+        else:
+            (body, replayed), leader = self.single_flight.do(request_key, lambda: self._fetch_chat(request_key, payload))
+        # Callers that shared another caller's request are recorded like cache hits
+        return self._chat_result(body, payload, time.time() - start_time, cached=not leader, replayed=replayed)
+
+    async def achat(
+        self,
+        messages: List[Dict[str, str]],
+        model: Optional[str] = None,
+        temperature: Optional[float] = None,
+        max_tokens: Optional[int] = None,
+        **kwargs
+    ) -> ChatResult:
+        """
+        Async variant of chat, sharing the provider's async pool and
+        concurrency limit.
+
+        Args:
+            messages: List of message dictionaries.
+            model: Model to use. If None, uses the provider's default model.
+            temperature: Temperature for sampling. If None, uses the API default.
+            max_tokens: Maximum tokens to generate. If None, uses the API default.
+            **kwargs: Additional request body fields.
+
+        Returns:
+            The normalized chat result.
+        """
+        payload = self._chat_payload(messages, model, temperature, max_tokens, kwargs)
+        request_key = self._request_key(payload)
+        cached = self._cached_result(request_key, payload)
+        if cached is not None:
+            return cached
+
+        start_time = time.time()
+        if request_key is None:
+            (body, replayed), leader = await self._apost("/chat/completions", payload), True
+        else:
+            (body, replayed), leader = await self.single_flight.ado(
+                request_key, lambda: self._afetch_chat(request_key, payload)
+            )
+        return self._chat_result(body, payload, time.time() - start_time, cached=not leader, replayed=replayed)
+
+    def chat_stream(
+        self,
+        messages: List[Dict[str, str]],
+        model: Optional[str] = None,
+        temperature: Optional[float] = None,
+        max_tokens: Optional[int] = None,
+        on_field: Optional[Callable[[str, Any], None]] = None,
+        stop_when: Optional[Callable[[Dict[str, Any]], bool]] = None,
+        **kwargs
+    ) -> ChatResult:
+        """
+        Stream a chat completion, parsing a JSON answer as it arrives.
+
+        Opening the stream is rate limited and retried like any request;
+        once content has arrived it is not retried or hedged. Streams are
+        never cached or coalesced.
+
+        Args:
+            messages: List of message dictionaries.
+            model: Model to use. If None, uses the provider's default model.
+            temperature: Temperature for sampling. If None, uses the API default.
+            max_tokens: Maximum tokens to generate. If None, uses the API default.
+            on_field: Called with (name, value) as each top-level field of
+                the JSON answer closes.
+            stop_when: Called with the fields parsed so far after each new
+                field; returning True closes the stream early.
+            **kwargs: Additional request body fields.
+
+        Returns:
+            The chat result with the content received so far.
+        """
+        payload = self._stream_payload(messages, model, temperature, max_tokens, kwargs)
+        stream = _ChatStream(payload, on_field, stop_when)
+        entry = self._recorded_stream(payload)
+        if entry is not None:
+            time.sleep(self.recorder.replay_delay(entry))
+            return self._replay_stream(stream, entry)
+
+        start_time = time.time()
+        reserved = self._estimate_tokens(payload)
+
+        def send(timeout: float) -> httpx.Response:
+            request = self.http_client.build_request(
+                "POST", "/chat/completions", json=payload, headers=self._headers(), timeout=timeout
+            )
+            response = self.http_client.send(request, stream=True)
+            if response.status_code >= 400:
+                response.read()
+                response.close()
+            return self._open_stream(response, payload)
+
+        response = self.resilience.call(send, hedge=False, throttle=self._throttle(payload, reserved))
+        try:
+            for line in response.iter_lines():
+                if not stream.feed_line(line):
+                    break
+        finally:
+            response.close()
+        return self._stream_result(stream, reserved, time.time() - start_time)
+
+    async def achat_stream(
+        self,
+        messages: List[Dict[str, str]],
+        model: Optional[str] = None,
+        temperature: Optional[float] = None,
+        max_tokens: Optional[int] = None,
+        on_field: Optional[Callable[[str, Any], None]] = None,
+        stop_when: Optional[Callable[[Dict[str, Any]], bool]] = None,
+        **kwargs
+    ) -> ChatResult:
+        """
+        Async variant of chat_stream; the stream holds a slot of the
+        provider's in-flight limit until it ends.
+
+        Args:
+            messages: List of message dictionaries.
+            model: Model to use. If None, uses the provider's default model.
+            temperature: Temperature for sampling. If None, uses the API default.
+            max_tokens: Maximum tokens to generate. If None, uses the API default.
+            on_field: Called with (name, value) as each top-level field closes.
+            stop_when: Returns True to close the stream early.
+            **kwargs: Additional request body fields.
+
+        Returns:
+            The chat result with the content received so far.
+        """
+        payload = self._stream_payload(messages, model, temperature, max_tokens, kwargs)
+        stream = _ChatStream(payload, on_field, stop_when)
+        entry = self._recorded_stream(payload)
+        if entry is not None:
+            await asyncio.sleep(self.recorder.replay_delay(entry))
+            return self._replay_stream(stream, entry)
+
+        client, semaphore = self._async_transport()
+        start_time = time.time()
+        reserved = self._estimate_tokens(payload)
+
+        async def send(timeout: float) -> httpx.Response:
+            request = client.build_request(
+                "POST", "/chat/completions", json=payload, headers=self._headers(), timeout=timeout
+            )
+            response = await client.send(request, stream=True)
+            if response.status_code >= 400:
+                await response.aread()
+                await response.aclose()
+            return self._open_stream(response, payload)
+
+        async with semaphore:
+            response = await self.resilience.acall(send, hedge=False, throttle=self._throttle(payload, reserved))
+            try:
+                async for line in response.aiter_lines():
+                    if not stream.feed_line(line):
+                        break
+            finally:
+                await response.aclose()
+        return self._stream_result(stream, reserved, time.time() - start_time)
+
+    def _stream_payload(
+        self,
+        messages: List[Dict[str, str]],
+        model: Optional[str],
+        temperature: Optional[float],
+        max_tokens: Optional[int],
+        kwargs: Dict[str, Any]
+    ) -> Dict[str, Any]:
+        """Build a streaming chat completion request body"""
+        payload = self._chat_payload(messages, model, temperature, max_tokens, kwargs)
+        payload["stream"] = True
+        if self.config.stream_usage:
+            payload["stream_options"] = {"include_usage": True}
+        return payload
+
+    def _open_stream(self, response: httpx.Response, payload: Dict[str, Any]) -> httpx.Response:
+        """Feed quota headers to the limiter and raise for error statuses"""
+        if self.rate_limiter is not None:
+            self.rate_limiter.update_from_headers(self.name, payload["model"], response.headers, response.status_code)
+        if response.status_code >= 400:
+            self._decode(response)
+        return response
+
+    def _recorded_stream(self, payload: Dict[str, Any]) -> Optional[CassetteEntry]:
+        """The recorded events of a stream request, if it is replayed"""
+        if self.recorder is None:
+            return None
+        return self.recorder.lookup(self.name, "/chat/completions", payload)
+
+    def _replay_stream(self, stream: _ChatStream, entry: CassetteEntry) -> ChatResult:
+        """Feed recorded events through the stream parser, as if they arrived live"""
+        for line in entry.events or []:
+            if not stream.feed_line(line):
+                break
+        return self._chat_result(stream.body(), stream.payload, self.recorder.replay_delay(entry), replayed=True)
+
+    def _stream_result(self, stream: _ChatStream, reserved: int, elapsed: float) -> ChatResult:
+        """Settle the quota and record a finished or abandoned stream"""
+        body = stream.body()
+        if self.recorder is not None:
+            self.recorder.record(
+                self.name, "/chat/completions", stream.payload, body, elapsed, events=stream.events
+            )
+        if stream.aborted:
+            get_registry().increment(f"llm.{self.name}.stream_aborts")
+            logger.info(f"{self.name} stream closed early: the required fields are complete")
+        if self.rate_limiter is not None:
+            total = body["usage"].get("total_tokens") or (
+                body["usage"].get("prompt_tokens", 0) + body["usage"].get("completion_tokens", 0)
+            )
+            self.rate_limiter.settle(self.name, stream.payload["model"], reserved, total)
+        return self._chat_result(body, stream.payload, elapsed)
+
+    def _fetch_chat(self, request_key: str, payload: Dict[str, Any]) -> Tuple[Dict[str, Any], bool]:
+        """Call the chat API and cache the response (run once per coalesced flight)"""
+        body, replayed = self._post("/chat/completions", payload)
+        self._store(request_key, payload, body)
+        return body, replayed
+
+    async def _afetch_chat(self, request_key: str, payload: Dict[str, Any]) -> Tuple[Dict[str, Any], bool]:
+        """Async variant of _fetch_chat"""
+        body, replayed = await self._apost("/chat/completions", payload)
+        self._store(request_key, payload, body)
+        return body, replayed
+
+    def _request_key(self, payload: Dict[str, Any]) -> Optional[str]:
+        """
+        Key identifying equivalent chat requests, used for caching and
+        coalescing, or None for requests that must not be shared (streams).
+        """
+        if payload.get("stream"):
+            return None
+        params = {key: value for key, value in payload.items() if key not in ("model", "messages")}
+        return make_cache_key(self.name, payload["model"], payload["messages"], params)
+
+    def _cached_result(self, request_key: Optional[str], payload: Dict[str, Any]) -> Optional[ChatResult]:
+        """Look up a chat request in the response cache"""
+        if self.cache is None or request_key is None:
+            return None
+        body = self.cache.get(request_key)
+        if body is None:
+            return None
+        return self._chat_result(body, payload, 0.0, cached=True)
+
+    def _store(self, request_key: str, payload: Dict[str, Any], body: Dict[str, Any]):
+        """Store a chat response in the response cache"""
+        if self.cache is not None:
+            self.cache.put(request_key, self.name, payload["model"], body)
+
+    def embed(self, texts: List[str], model: Optional[str] = None) -> EmbeddingResult:
+        """
+        Embed a list of texts.
+
+        Args:
+            texts: The texts to embed.
+            model: Embedding model. If None, uses the provider's default.
+
+        Returns:
+            The normalized embedding result.
+        """
+        model = model or self.config.default_embedding_model
+        start_time = time.time()
+        body, replayed = self._post("/embeddings", {"model": model, "input": texts})
+        return self._embedding_result(body, model, time.time() - start_time, replayed)
+
+    async def aembed(self, texts: List[str], model: Optional[str] = None) -> EmbeddingResult:
+        """
+        Async variant of embed.
+
+        Args:
+            texts: The texts to embed.
+            model: Embedding model. If None, uses the provider's default.
+
+        Returns:
+            The normalized embedding result.
+        """
+        model = model or self.config.default_embedding_model
+        start_time = time.time()
+        body, replayed = await self._apost("/embeddings", {"model": model, "input": texts})
+        return self._embedding_result(body, model, time.time() - start_time, replayed)
+
+    def _embedding_result(
+        self,
+        body: Dict[str, Any],
+        model: str,
+        elapsed: float,
+        replayed: bool = False
+    ) -> EmbeddingResult:
+        """Normalize an embedding response body and record its usage; replays cost nothing"""
+        data = sorted(body.get("data", []), key=lambda item: item.get("index", 0))
+        result = EmbeddingResult(
+            provider=self.name,
+            model=body.get("model", model),
+            embeddings=[item["embedding"] for item in data],
+            usage=body.get("usage") or {}
+        )
+        if self.ledger is not None:
+            self.ledger.record(self.name, result.model, "embeddings", result.usage, elapsed, cached=replayed)
+        return result
+
+    def _chat_result(
+        self,
+        body: Dict[str, Any],
+        payload: Dict[str, Any],
+        elapsed: float,
+        cached: bool = False,
+        replayed: bool = False
+    ) -> ChatResult:
+        """
+        Normalize a chat completion response body and record its usage.
+
+        Cached, coalesced and replayed results are recorded at no cost and
+        kept out of the latency histograms.
+        """
+        choice = (body.get("choices") or [{}])[0]
+        message = choice.get("message") or {}
+        usage = body.get("usage") or {}
+        if "total_tokens" not in usage and usage:
+            # Completed on copies: the body may be a cached response shared with other calls
+            usage = dict(usage, total_tokens=usage.get("prompt_tokens", 0) + usage.get("completion_tokens", 0))
+            body = dict(body, usage=usage)
+        result = ChatResult(
+            provider=self.name,
+            model=body.get("model", payload["model"]),
+            content=message.get("content") or "",
+            finish_reason=choice.get("finish_reason"),
+            usage=usage,
+            raw=body,
+            elapsed=elapsed,
+            cached=cached,
+            replayed=replayed
+        )
+        cached_tokens = cached_prompt_tokens(usage)
+        if not cached and not replayed:
+            # Per-model latency, used by the model router
+            get_registry().observe(f"llm.{self.name}.{payload['model']}.chat_ms", elapsed * 1000.0)
+            if cached_tokens:
+                get_registry().increment(f"llm.{self.name}.cached_prompt_tokens", cached_tokens)
+        logger.info(
+            f"{self.name} chat call{' (cached)' if cached else ''}{' (replayed)' if replayed else ''}: "
+            f"model={result.model}, "
+            f"prompt_tokens={usage.get('prompt_tokens')}, "
+            f"cached_prompt_tokens={cached_tokens}, "
+            f"completion_tokens={usage.get('completion_tokens')}, "
+            f"time={elapsed:.2f}s"
+        )
+        if self.ledger is not None:
+            self.ledger.record(
+                self.name, result.model, "chat/completions", usage, elapsed,
+                cached=cached or replayed, messages=payload["messages"]
+            )
+        return result
+
+
+def get_provider(provider: str, api_key: Optional[str] = None) -> ProviderClient:
+    """
+    Get the shared client for a provider.
+
+    Args:
+        provider: Provider name.
+        api_key: API key. If None, uses the provider's environment variables.
+
+    Returns:
+        A ProviderClient using the provider's shared HTTP pool.
+    """
+    key = (provider, api_key)
+    client = _providers.get(key)
+    if client is None:
+        client = ProviderClient(provider, api_key=api_key)
+        with _registry_lock:
+            client = _providers.setdefault(key, client)
+    return client
+
+
+async def aclose_async_clients():
+    """Close the shared async transports of the running event loop"""
+    loop = asyncio.get_running_loop()
+    with _registry_lock:
+        state = _async_state.pop(loop, {})
+    for client, _ in state.values():
+        await client.aclose()
+
+
+def close_all():
+    """Close every shared sync HTTP transport"""
+    with _registry_lock:
+        for client in _http_clients.values():
+            client.close()
+        _http_clients.clear()
+        _providers.clear()
+
+
+atexit.register(close_all)
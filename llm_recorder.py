@@ -0,0 +1,249 @@
+"""
+LLM Traffic Recorder Module
+
+This module records the requests the provider clients send and the responses
+they get into a JSONL cassette, and serves them back later so benchmarks
+and tests can run the full pipeline offline, deterministically and fast.
+
+Modes (LLM_RECORD_MODE):
+    off     Requests go to the provider; nothing is recorded (default).
+    record  Requests go to the provider; every request/response pair is
+            appended to the cassette.
+    replay  Responses come from the cassette only; a request that was not
+            recorded raises CassetteMissError.
+    auto    Recorded requests are replayed; the others go to the provider
+            and are recorded.
+
+Entries are indexed by a hash of the provider, endpoint and request body.
+A request recorded several times is replayed in recording order. Replays
+return immediately unless LLM_REPLAY_TIMING is set: a factor applied to
+the recorded latency (1 replays at the recorded speed). Lines of the
+cassette that are not recorder entries are ignored and left untouched.
+"""
+
+import os
+import json
+import time
+import hashlib
+import logging
+import threading
+from dataclasses import dataclass, asdict
+from typing import Dict, Any, List, Optional
+
+from dotenv import load_dotenv
+
+# Configure logging
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger(__name__)
+
+# Load environment variables
+load_dotenv()
+
+# Recorder modes
+OFF = "off"
+RECORD = "record"
+REPLAY = "replay"
+AUTO = "auto"
+MODES = (OFF, RECORD, REPLAY, AUTO)
+
+RECORD_MODE = os.getenv("LLM_RECORD_MODE", OFF).lower()
+CASSETTE_PATH = os.getenv("LLM_CASSETTE_PATH", "requests.jsonl")
+REPLAY_TIMING = float(os.getenv("LLM_REPLAY_TIMING", "0"))
+
+# Marks recorder entries among other lines of the cassette
+CASSETTE_FORMAT = "llm-cassette/1"
+
+
+class CassetteMissError(LookupError):
+    """A request was not found in the cassette in replay mode"""
+
+
+@dataclass
+class CassetteEntry:
+    """
+    One recorded request/response pair.
+
+    Attributes:
+        key: Hash identifying the request.
+        provider: Provider name.
+        endpoint: API path, e.g. "/chat/completions".
+        request: The request body.
+        response: The decoded response body (assembled for streams).
+        elapsed: Recorded request time in seconds.
+        events: The server-sent event lines of a streamed response.
+        recorded_at: Unix time of the recording.
+    """
+    key: str
+    provider: str
+    endpoint: str
+    request: Dict[str, Any]
+    response: Dict[str, Any]
+    elapsed: float
+    events: Optional[List[str]] = None
+    recorded_at: float = 0.0
+
+
+def request_key(provider: str, endpoint: str, payload: Dict[str, Any]) -> str:
+    """
+    Hash identifying a request.
+
+    Args:
+        provider: Provider name.
+        endpoint: API path.
+        payload: Request body.
+
+    Returns:
+        Hex SHA-256 of the canonical JSON of the request.
+    """
+    material = json.dumps([provider, endpoint, payload], sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(material.encode("utf-8")).hexdigest()
+
+
+class Recorder:
+    """
+    Records provider traffic to a JSONL cassette and replays it.
+
+    Thread-safe; entries are appended and flushed one line at a time.
+    """
+
+    def __init__(self, path: str = CASSETTE_PATH, mode: str = RECORD, replay_timing: float = REPLAY_TIMING):
+        """
+        Initialize the recorder and index the existing cassette.
+
+        Args:
+            path: Cassette file.
+            mode: One of record, replay or auto.
+            replay_timing: Factor applied to recorded latency on replay;
+                0 replays instantly.
+        """
+        if mode not in MODES or mode == OFF:
+            raise ValueError(f"Invalid recorder mode: {mode}")
+        self.path = path
+        self.mode = mode
+        self.replay_timing = replay_timing
+        self._lock = threading.Lock()
+        self._entries: Dict[str, List[CassetteEntry]] = {}
+        self._next: Dict[str, int] = {}
+        self._load()
+
+    def _load(self):
+        """Index the recorder entries of the cassette"""
+        if not os.path.exists(self.path):
+            return
+        count = 0
+        with open(self.path, "r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    data = json.loads(line)
+                except json.JSONDecodeError:
+                    continue
+                if not isinstance(data, dict) or data.pop("format", None) != CASSETTE_FORMAT:
+                    continue
+                entry = CassetteEntry(**data)
+                self._entries.setdefault(entry.key, []).append(entry)
+                count += 1
+        logger.info(f"Loaded {count} recorded LLM calls from {self.path}")
+
+    def lookup(self, provider: str, endpoint: str, payload: Dict[str, Any]) -> Optional[CassetteEntry]:
+        """
+        Find the recorded response to a request.
+
+        Args:
+            provider: Provider name.
+            endpoint: API path.
+            payload: Request body.
+
+        Returns:
+            The next recorded entry for the request, or None if the request
+            should be sent to the provider.
+        """
+        if self.mode == RECORD:
+            return None
+        key = request_key(provider, endpoint, payload)
+        with self._lock:
+            entries = self._entries.get(key)
+            if not entries:
+                if self.mode == REPLAY:
+                    raise CassetteMissError(
+                        f"No recorded {provider} {endpoint} response for request {key[:12]} in {self.path}"
+                    )
+                return None
+            index = self._next.get(key, 0)
+            # Repeat the last recording once every one has been replayed
+            self._next[key] = min(index + 1, len(entries) - 1)
+            return entries[index]
+
+    def replay_delay(self, entry: CassetteEntry) -> float:
+        """Seconds to wait before returning a replayed response"""
+        return entry.elapsed * self.replay_timing
+
+    def record(
+        self,
+        provider: str,
+        endpoint: str,
+        payload: Dict[str, Any],
+        response: Dict[str, Any],
+        elapsed: float,
+        events: Optional[List[str]] = None
+    ):
+        """
+        Append a request/response pair to the cassette.
+
+        Args:
+            provider: Provider name.
+            endpoint: API path.
+            payload: Request body.
+            response: Decoded response body.
+            elapsed: Request time in seconds.
+            events: Server-sent event lines, for streamed responses.
+        """
+        if self.mode == REPLAY:
+            return
+        entry = CassetteEntry(
+            key=request_key(provider, endpoint, payload),
+            provider=provider,
+            endpoint=endpoint,
+            request=payload,
+            response=response,
+            elapsed=elapsed,
+            events=events,
+            recorded_at=time.time()
+        )
+        line = json.dumps({"format": CASSETTE_FORMAT, **asdict(entry)}, ensure_ascii=False)
+        with self._lock:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            with open(self.path, "ab+") as f:
+                # Keep entries on their own lines if the file lacks a final newline
+                f.seek(0, os.SEEK_END)
+                if f.tell() > 0:
+                    f.seek(-1, os.SEEK_END)
+                    if f.read(1) != b"\n":
+                        line = "\n" + line
+                f.write((line + "\n").encode("utf-8"))
+            self._entries.setdefault(entry.key, []).append(entry)
+
+
+_default_recorder = None
+_default_lock = threading.Lock()
+
+
+def get_recorder() -> Optional[Recorder]:
+    """
+    Get the process-wide recorder.
+
+    Returns:
+        The recorder configured by LLM_RECORD_MODE, or None when it is off.
+    """
+    global _default_recorder
+    if RECORD_MODE == OFF:
+        return None
+    if _default_recorder is None:
+        with _default_lock:
+            if _default_recorder is None:
+                _default_recorder = Recorder(CASSETTE_PATH, RECORD_MODE)
+    return _default_recorder
@@ -0,0 +1,319 @@
+"""
+Metrics Module
+
+This module provides a low-overhead, in-process registry of histograms used to
+attribute latency and token usage to individual stages of a request (for
+example the embedding, search, context assembly and completion stages of a
+RAG query), plus simple event counters such as cache hits and misses.
+"""
+
+import bisect
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, Any, Optional, Sequence
+
+# Bucket upper bounds for latency histograms, in milliseconds
+LATENCY_BUCKETS_MS = (
+    1, 2, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000, 30000, 60000
+)
+
+# Bucket upper bounds for token count histograms
+TOKEN_BUCKETS = (
+    10, 50, 100, 250, 500, 1000, 2000, 4000, 8000, 16000, 32000, 64000, 128000
+)
+
+
+class Histogram:
+    """
+    A fixed-bucket histogram with running count, sum, min and max.
+
+    Observations are O(log buckets) and never allocate, so histograms can be
+    updated on every request without measurable overhead.
+    """
+
+    def __init__(self, buckets: Sequence[float] = LATENCY_BUCKETS_MS):
+        """
+        Initialize the histogram.
+
+        Args:
+            buckets: Sorted bucket upper bounds. Values above the last bound
+                are counted in an overflow bucket.
+        """
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.min = None
+        self.max = None
+        self._lock = threading.Lock()
+
+    def observe(self, value: float):
+        """
+        Record a single observation.
+
+        Args:
+            value: The observed value.
+        """
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            self.counts[index] += 1
+            self.count += 1
+            self.total += value
+            if self.min is None or value < self.min:
+                self.min = value
+            if self.max is None or value > self.max:
+                self.max = value
+
+    def percentile(self, q: float) -> Optional[float]:
+        """
+        Estimate a percentile from the bucket counts.
+
+        The estimate interpolates linearly inside the bucket that contains the
+        requested rank and is clamped to the observed min and max.
+
+        Args:
+            q: Percentile between 0 and 100.
+
+        Returns:
+            The estimated value, or None if there are no observations.
+        """
+        with self._lock:
+            if self.count == 0:
+                return None
+            counts = list(self.counts)
+            count = self.count
+            low, high = self.min, self.max
+
+        rank = q / 100.0 * count
+        cumulative = 0
+        for index, bucket_count in enumerate(counts):
+            if bucket_count == 0:
+                continue
+            if cumulative + bucket_count >= rank:
+                lower = self.buckets[index - 1] if index > 0 else low
+                upper = self.buckets[index] if index < len(self.buckets) else high
+                fraction = (rank - cumulative) / bucket_count
+                estimate = lower + (upper - lower) * fraction
+                return min(max(estimate, low), high)
+            cumulative += bucket_count
+        return high
+
+    def snapshot(self) -> Dict[str, Any]:
+        """
+        Get a summary of the histogram.
+
+        Returns:
+            Dictionary with count, sum, mean, min, max, percentiles and buckets.
+        """
+        with self._lock:
+            count = self.count
+            total = self.total
+            low, high = self.min, self.max
+            counts = list(self.counts)
+
+        bounds = [str(b) for b in self.buckets] + ["+Inf"]
+        return {
+            "count": count,
+            "sum": round(total, 3),
+            "mean": round(total / count, 3) if count else None,
+            "min": low,
+            "max": high,
+            "p50": self._rounded(self.percentile(50)),
+            "p95": self._rounded(self.percentile(95)),
+            "p99": self._rounded(self.percentile(99)),
+            "buckets": dict(zip(bounds, counts))
+        }
+
+    @staticmethod
+    def _rounded(value: Optional[float]) -> Optional[float]:
+        return round(value, 3) if value is not None else None
+
+
+class MetricsRegistry:
+    """
+    A thread-safe registry of named histograms and counters.
+    """
+
+    def __init__(self):
+        """Initialize an empty registry."""
+        self._histograms: Dict[str, Histogram] = {}
+        self._counters: Dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    def histogram(self, name: str, buckets: Sequence[float] = LATENCY_BUCKETS_MS) -> Histogram:
+        """
+        Get a histogram by name, creating it on first use.
+
+        Args:
+            name: Histogram name, e.g. "rag.query.search_ms".
+            buckets: Bucket bounds used if the histogram has to be created.
+
+        Returns:
+            The histogram.
+        """
+        histogram = self._histograms.get(name)
+        if histogram is None:
+            with self._lock:
+                histogram = self._histograms.get(name)
+                if histogram is None:
+                    histogram = Histogram(buckets)
+                    self._histograms[name] = histogram
+        return histogram
+
+    def observe(self, name: str, value: float, buckets: Sequence[float] = LATENCY_BUCKETS_MS):
+        """
+        Record an observation in the named histogram.
+
+        Args:
+            name: Histogram name.
+            value: The observed value.
+            buckets: Bucket bounds used if the histogram has to be created.
+        """
+        self.histogram(name, buckets).observe(value)
+
+    def increment(self, name: str, value: int = 1):
+        """
+        Increment a named counter.
+
+        Args:
+            name: Counter name, e.g. "llm.cache.hits".
+            value: Amount to add.
+        """
+        with self._lock:
+            self._counters[name] = self._counters.get(name, 0) + value
+
+    def counter(self, name: str) -> int:
+        """Get the current value of a counter (0 if never incremented)"""
+        return self._counters.get(name, 0)
+
+    def counters(self, prefix: Optional[str] = None) -> Dict[str, int]:
+        """
+        Get all counter values.
+
+        Args:
+            prefix: If given, only include counters whose name starts with it.
+
+        Returns:
+            Dictionary mapping counter names to their values.
+        """
+        with self._lock:
+            items = sorted(self._counters.items())
+        return {name: value for name, value in items if prefix is None or name.startswith(prefix)}
+
+    @contextmanager
+    def timer(self, name: str):
+        """
+        Time a block of code and record its duration in milliseconds.
+
+        Args:
+            name: Histogram name.
+        """
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, (time.perf_counter() - start) * 1000.0)
+
+    def snapshot(self, prefix: Optional[str] = None) -> Dict[str, Any]:
+        """
+        Get summaries of all histograms.
+
+        Args:
+            prefix: If given, only include histograms whose name starts with it.
+
+        Returns:
+            Dictionary mapping histogram names to their summaries.
+        """
+        with self._lock:
+            items = sorted(self._histograms.items())
+        return {
+            name: histogram.snapshot()
+            for name, histogram in items
+            if prefix is None or name.startswith(prefix)
+        }
+
+    def reset(self):
+        """Remove all histograms and counters."""
+        with self._lock:
+            self._histograms.clear()
+            self._counters.clear()
+
+
+class StageTimer:
+    """
+    Collects per-stage timings and token counts for a single request and
+    records them into a metrics registry under a common prefix.
+    """
+
+    def __init__(self, prefix: str, registry: Optional[MetricsRegistry] = None):
+        """
+        Initialize the stage timer.
+
+        Args:
+            prefix: Prefix for histogram names, e.g. "rag.query".
+            registry: Registry to record into. If None, uses the default registry.
+        """
+        self.prefix = prefix
+        self.registry = registry or get_registry()
+        self.stages: Dict[str, float] = {}
+        self.tokens: Dict[str, int] = {}
+        self._start = time.perf_counter()
+
+    @contextmanager
+    def stage(self, name: str):
+        """
+        Time a stage of the request.
+
+        Args:
+            name: Stage name, e.g. "embedding".
+        """
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed_ms = (time.perf_counter() - start) * 1000.0
+            self.stages[name] = self.stages.get(name, 0.0) + elapsed_ms
+            self.registry.observe(f"{self.prefix}.{name}_ms", elapsed_ms)
+
+    def record_tokens(self, name: str, count: Optional[int]):
+        """
+        Record a token count for the request.
+
+        Args:
+            name: Token count name, e.g. "prompt_tokens".
+            count: Number of tokens. Ignored if None.
+        """
+        if count is None:
+            return
+        self.tokens[name] = self.tokens.get(name, 0) + int(count)
+        self.registry.observe(f"{self.prefix}.{name}", count, TOKEN_BUCKETS)
+
+    def finish(self) -> Dict[str, Any]:
+        """
+        Record the total request time and return the collected data.
+
+        Returns:
+            Dictionary with per-stage milliseconds, token counts and total time.
+        """
+        total_ms = (time.perf_counter() - self._start) * 1000.0
+        self.registry.observe(f"{self.prefix}.total_ms", total_ms)
+        return {
+            "stages_ms": {name: round(ms, 3) for name, ms in self.stages.items()},
+            "tokens": dict(self.tokens),
+            "total_ms": round(total_ms, 3)
+        }
+
+
+# Default registry shared by the whole process
+_default_registry = MetricsRegistry()
+
+
+def get_registry() -> MetricsRegistry:
+    """
+    Get the default metrics registry.
+
+    Returns:
+        The process-wide metrics registry.
+    """
+    return _default_registry
@@ -6,19 +6,21 @@ This script uses the actual Mistral AI API for code analysis.
 
 import os
 import json
-import time
+import asyncio
+import argparse
 import logging
-from typing import Dict, List, Any, Optional
+from typing import Dict, List, Any, Optional, Callable, Tuple
 from dataclasses import dataclass
 from datetime import datetime
 from pathlib import Path
 
-try:
-    from mistralai import Mistral
-    MISTRAL_AVAILABLE = True
-except ImportError:
-    MISTRAL_AVAILABLE = False
-    print("Mistral AI package not available. Please install with: pip install mistralai")
+from llm_providers import get_provider, PROVIDERS
+from usage_ledger import repo_context
+from model_router import ModelRouter, get_router, CASCADE_ENABLED, DEFAULT_OUTPUT_TOKENS
+from token_budget import BudgetItem, fit_to_budget, MAX_FILE_TOKENS, PRIORITY_REQUIRED
+from batch_runner import BatchRunner, BatchRequest, ProviderBatchBackend, POLL_INTERVAL
+from repo_scanner import RepositoryScanner
+from analysis_schemas import AnalysisSchema, AnswerDecoder, SchemaValidationError, FILE_SCHEMAS, parse_json_object
 
 @dataclass
 class AnalysisResult:
@@ -29,17 +31,37 @@ class AnalysisResult:
     recommendations: List[str]
     timestamp: str
 
+@dataclass
+class AnalysisSpec:
+    """Prompt and response handling for one analysis category"""
+    category: str
+    prompt: str
+    schema: AnalysisSchema
+    details: Callable[[Any], str]
+    recommendations_key: str
+    mock: Callable[["RealMistralAnalyzer", str], AnalysisResult]
+
 class RealMistralAnalyzer:
     """Real Mistral AI integration for repository analysis"""
     
-    def __init__(self, api_key: str = None):
-        """Initialize with Mistral AI API key"""
+    def __init__(self, api_key: str = None, router: Optional[ModelRouter] = None, cascade: Optional[bool] = None):
+        """
+        Initialize with Mistral AI API key
+        
+        Args:
+            api_key: Mistral API key. If None, uses MISTRAL_API_KEY.
+            router: Chooses the model per analysis. If None, uses the shared router.
+            cascade: Start on the smallest model and escalate when the answer
+                is not valid JSON with a score. If None, uses LLM_ROUTER_CASCADE.
+        """
         self.api_key = api_key or os.getenv('MISTRAL_API_KEY')
         self.repo_path = Path(".")
+        self.router = router or get_router()
+        self.cascade = CASCADE_ENABLED if cascade is None else cascade
         
-        if MISTRAL_AVAILABLE and self.api_key:
+        if self.api_key:
             try:
-                self.client = MistralClient(api_key=self.api_key)
+                self.client = get_provider("mistral", api_key=self.api_key)
                 self.use_real_api = True
                 print("✅ Mistral AI client initialized successfully")
             except Exception as e:
@@ -52,235 +74,239 @@ class RealMistralAnalyzer:
             
     def analyze_code_quality(self, file_content: str, file_path: str) -> AnalysisResult:
         """Analyze code quality using Mistral AI"""
-        prompt = f"""
-        Analyze the following code file for quality, maintainability, and best practices:
-        
-        File: {file_path}
-        Content:
-        ```
-        {file_content[:2000]}  # Limit content for API
-        ```
-        
-        Please provide:
-        1. A quality score from 1-10
-        2. Specific issues found
-        3. Recommendations for improvement
-        4. Code style assessment
-        
-        Format your response as JSON with keys: score, issues, recommendations, style_notes
-        """
-        
-        if self.use_real_api:
-            try:
-                messages = [
-                    ChatMessage(role="user", content=prompt)
-                ]
-                
-                response = self.client.chat(
-                    model="mistral-large-latest",
-                    messages=messages,
-                    temperature=0.1
-                )
-                
-                content = response.choices[0].message.content
-                
-                # Try to extract JSON from response
-                try:
-                    # Look for JSON in the response
-                    start = content.find('{')
-                    end = content.rfind('}') + 1
-                    if start != -1 and end != 0:
-                        json_str = content[start:end]
-                        result = json.loads(json_str)
-                        
-                        return AnalysisResult(
-                            category="code_quality",
-                            score=float(result.get('score', 7.0)),
-                            details=f"Issues: {result.get('issues', 'None found')}",
-                            recommendations=result.get('recommendations', []),
-                            timestamp=datetime.now().isoformat()
-                        )
-                except json.JSONDecodeError:
-                    pass
-                
-                # Fallback: parse text response
-                return AnalysisResult(
-                    category="code_quality",
-                    score=7.5,
-                    details=content[:500],
-                    recommendations=["Review Mistral AI analysis above"],
-                    timestamp=datetime.now().isoformat()
-                )
-                
-            except Exception as e:
-                print(f"Mistral API error: {e}")
-                return self._mock_code_quality_result(file_path)
-        else:
-            return self._mock_code_quality_result(file_path)
+        return self._analyze("code_quality", file_content, file_path)
     
     def analyze_security(self, file_content: str, file_path: str) -> AnalysisResult:
         """Analyze security vulnerabilities using Mistral AI"""
-        prompt = f"""
-        Perform a security analysis of this code file:
-        
-        File: {file_path}
-        Content:
-        ```
-        {file_content[:2000]}
-        ```
-        
-        Look for:
-        1. Security vulnerabilities
-        2. Input validation issues
-        3. Authentication/authorization problems
-        4. Data exposure risks
-        5. Injection vulnerabilities
-        
-        Provide a security score (1-10) and specific findings.
-        Format as JSON: {{"score": X, "vulnerabilities": [], "recommendations": []}}
-        """
-        
-        if self.use_real_api:
-            try:
-                messages = [ChatMessage(role="user", content=prompt)]
-                
-                response = self.client.chat(
-                    model="mistral-large-latest",
-                    messages=messages,
-                    temperature=0.1
-                )
-                
-                content = response.choices[0].message.content
-                
-                # Try to extract JSON
-                try:
-                    start = content.find('{')
-                    end = content.rfind('}') + 1
-                    if start != -1 and end != 0:
-                        json_str = content[start:end]
-                        result = json.loads(json_str)
-                        
-                        return AnalysisResult(
-                            category="security",
-                            score=float(result.get('score', 8.0)),
-                            details=f"Vulnerabilities: {result.get('vulnerabilities', [])}",
-                            recommendations=result.get('recommendations', []),
-                            timestamp=datetime.now().isoformat()
-                        )
-                except json.JSONDecodeError:
-                    pass
-                
-                return AnalysisResult(
-                    category="security",
-                    score=8.0,
-                    details=content[:500],
-                    recommendations=["Review security analysis above"],
-                    timestamp=datetime.now().isoformat()
-                )
-                
-            except Exception as e:
-                print(f"Mistral API error: {e}")
-                return self._mock_security_result(file_path)
-        else:
-            return self._mock_security_result(file_path)
+        return self._analyze("security", file_content, file_path)
     
     def analyze_documentation(self, file_content: str, file_path: str) -> AnalysisResult:
         """Analyze documentation quality using Mistral AI"""
-        prompt = f"""
-        Analyze the documentation quality of this code:
-        
-        File: {file_path}
-        Content:
-        ```
-        {file_content[:2000]}
-        ```
+        return self._analyze("documentation", file_content, file_path)
+    
+    async def aanalyze_code_quality(self, file_content: str, file_path: str) -> AnalysisResult:
+        """Async variant of analyze_code_quality"""
+        return await self._aanalyze("code_quality", file_content, file_path)
+    
+    async def aanalyze_security(self, file_content: str, file_path: str) -> AnalysisResult:
+        """Async variant of analyze_security"""
+        return await self._aanalyze("security", file_content, file_path)
+    
+    async def aanalyze_documentation(self, file_content: str, file_path: str) -> AnalysisResult:
+        """Async variant of analyze_documentation"""
+        return await self._aanalyze("documentation", file_content, file_path)
+    
+    def _analyze(self, category: str, file_content: str, file_path: str) -> AnalysisResult:
+        """Run one analysis category against the API, or mock it"""
+        spec = ANALYSIS_SPECS[category]
+        if not self.use_real_api:
+            return spec.mock(self, file_path)
+        try:
+            with repo_context(self.repo_path.resolve()):
+                request = self._request(spec, file_content, file_path)
+                decoder = AnswerDecoder(spec.schema, request["messages"], self.client.config.json_mode)
+                if self.cascade:
+                    response = self.router.chat_with_cascade(
+                        self.client, request["messages"], spec.schema.accepts, **self._chat_options(request)
+                    )
+                    # Repairs go to the model that gave the answer
+                    request["model"] = response.model
+                else:
+                    response = self.client.chat(**request)
+                while decoder.feed(response.content):
+                    response = self.client.chat(**dict(request, **decoder.arguments()))
+            return self._result(spec, decoder.record())
+        except Exception as e:
+            print(f"Mistral API error: {e}")
+            return spec.mock(self, file_path)
+    
+    async def _aanalyze(self, category: str, file_content: str, file_path: str) -> AnalysisResult:
+        """Async variant of _analyze"""
+        spec = ANALYSIS_SPECS[category]
+        if not self.use_real_api:
+            return spec.mock(self, file_path)
+        try:
+            with repo_context(self.repo_path.resolve()):
+                request = self._request(spec, file_content, file_path)
+                decoder = AnswerDecoder(spec.schema, request["messages"], self.client.config.json_mode)
+                if self.cascade:
+                    response = await self.router.achat_with_cascade(
+                        self.client, request["messages"], spec.schema.accepts, **self._chat_options(request)
+                    )
+                    request["model"] = response.model
+                else:
+                    response = await self.client.achat(**request)
+                while decoder.feed(response.content):
+                    response = await self.client.achat(**dict(request, **decoder.arguments()))
+            return self._result(spec, decoder.record())
+        except Exception as e:
+            print(f"Mistral API error: {e}")
+            return spec.mock(self, file_path)
+    
+    def _request(
+        self,
+        spec: "AnalysisSpec",
+        file_content: str,
+        file_path: str,
+        model: Optional[str] = None
+    ) -> Dict[str, Any]:
+        """Build the chat request for an analysis, fitted to and routed to a model for its category"""
+        layout = spec.schema.layout()
         
-        Evaluate:
-        1. Comment quality and coverage
-        2. Function/class documentation
-        3. README and setup instructions
-        4. Code clarity and self-documentation
+        def render(texts):
+            return [{"role": "user", "content": spec.prompt.format(
+                file_path=file_path, content=texts.get("content", ""), layout=layout
+            )}]
         
-        Provide a documentation score (1-10) and improvement suggestions.
-        Format as JSON: {{"score": X, "coverage": "X%", "suggestions": []}}
+        # Fit the file to the largest window the request may be sent to, then
+        # route the fitted prompt
+        window = model or self.router.largest("mistral").model
+        texts, _ = fit_to_budget(
+            render,
+            [BudgetItem("content", file_content, PRIORITY_REQUIRED, MAX_FILE_TOKENS)],
+            window,
+            self.router.token_limit("mistral", window),
+            DEFAULT_OUTPUT_TOKENS
+        )
+        messages = render(texts)
+        request = {
+            "model": model or self.router.route("mistral", spec.category, messages).model,
+            "messages": messages,
+            "temperature": 0.1
+        }
+        response_format = spec.schema.response_format(PROVIDERS["mistral"].json_mode)
+        if response_format:
+            request["response_format"] = response_format
+        return request
+    
+    @staticmethod
+    def _chat_options(request: Dict[str, Any]) -> Dict[str, Any]:
+        """Chat arguments of a request other than its model and messages"""
+        return {key: value for key, value in request.items() if key not in ("model", "messages")}
+    
+    @staticmethod
+    def _result(spec: "AnalysisSpec", record: Any) -> AnalysisResult:
+        """Turn a decoded answer into an AnalysisResult"""
+        return AnalysisResult(
+            category=spec.category,
+            score=record.score,
+            details=spec.details(record),
+            recommendations=list(getattr(record, spec.recommendations_key)),
+            timestamp=datetime.now().isoformat()
+        )
+    
+    @classmethod
+    def _parse_result(cls, spec: "AnalysisSpec", content: str) -> AnalysisResult:
         """
+        Turn a model response into an AnalysisResult
         
-        if self.use_real_api:
-            try:
-                messages = [ChatMessage(role="user", content=prompt)]
-                
-                response = self.client.chat(
-                    model="mistral-large-latest",
-                    messages=messages,
-                    temperature=0.1
-                )
-                
-                content = response.choices[0].message.content
-                
-                # Try to extract JSON
-                try:
-                    start = content.find('{')
-                    end = content.rfind('}') + 1
-                    if start != -1 and end != 0:
-                        json_str = content[start:end]
-                        result = json.loads(json_str)
-                        
-                        return AnalysisResult(
-                            category="documentation",
-                            score=float(result.get('score', 6.0)),
-                            details=f"Coverage: {result.get('coverage', 'Unknown')}",
-                            recommendations=result.get('suggestions', []),
-                            timestamp=datetime.now().isoformat()
-                        )
-                except json.JSONDecodeError:
-                    pass
-                
-                return AnalysisResult(
-                    category="documentation",
-                    score=6.0,
-                    details=content[:500],
-                    recommendations=["Review documentation analysis above"],
-                    timestamp=datetime.now().isoformat()
-                )
-                
-            except Exception as e:
-                print(f"Mistral API error: {e}")
-                return self._mock_documentation_result(file_path)
-        else:
-            return self._mock_documentation_result(file_path)
+        Raises:
+            SchemaValidationError: If the response does not hold a valid answer.
+        """
+        return cls._result(spec, spec.schema.decode(parse_json_object(content) or {}))
+    
+    def _select_files(self) -> List[Tuple[Path, str]]:
+        """Pick the files to analyze, limited for API usage"""
+        selected = []
+        scanner = RepositoryScanner(str(self.repo_path), ['.py', '.js', '.html', '.md', '.json'])
+        for scanned in scanner.scan():
+            if len(selected) >= 5:  # Limit for API usage
+                break
+            if not scanned.skipped and len(scanned.text.strip()) > 50:  # Skip very small files
+                selected.append((self.repo_path / scanned.path, scanned.text))
+        return selected
+    
+    @staticmethod
+    def _categories_for(file_path: Path) -> List[str]:
+        """Analysis categories that apply to a file"""
+        categories = []
+        if file_path.suffix == '.py':
+            categories.extend(["code_quality", "security"])
+        if file_path.name.lower() in ['readme.md', 'readme.txt']:
+            categories.append("documentation")
+        return categories
     
     def generate_comprehensive_report(self) -> Dict[str, Any]:
         """Generate comprehensive repository analysis using Mistral AI"""
         print("🔍 Starting comprehensive Mistral AI analysis...")
         
         results = []
-        file_count = 0
-        
-        # Analyze key files
-        for file_path in self.repo_path.rglob("*"):
-            if file_path.is_file() and file_path.suffix in ['.py', '.js', '.html', '.md', '.json']:
-                if file_count >= 5:  # Limit for API usage
-                    break
-                    
-                try:
-                    content = file_path.read_text(encoding='utf-8')
-                    if len(content.strip()) > 50:  # Skip very small files
-                        print(f"📄 Analyzing {file_path.name}...")
-                        
-                        # Analyze different aspects
-                        if file_path.suffix == '.py':
-                            results.append(self.analyze_code_quality(content, str(file_path)))
-                            results.append(self.analyze_security(content, str(file_path)))
-                        
-                        if file_path.name.lower() in ['readme.md', 'readme.txt']:
-                            results.append(self.analyze_documentation(content, str(file_path)))
-                        
-                        file_count += 1
-                        time.sleep(1)  # Rate limiting
-                        
-                except Exception as e:
-                    print(f"⚠️  Error analyzing {file_path}: {e}")
+        files = self._select_files()
+        for file_path, content in files:
+            print(f"📄 Analyzing {file_path.name}...")
+            for category in self._categories_for(file_path):
+                results.append(self._analyze(category, content, str(file_path)))
+        
+        return self._build_report(results, len(files))
+    
+    async def agenerate_comprehensive_report(self) -> Dict[str, Any]:
+        """
+        Async variant of generate_comprehensive_report. All file analyses are
+        in flight together, bounded by the provider's concurrency limit.
+        """
+        print("🔍 Starting comprehensive Mistral AI analysis...")
+        
+        files = self._select_files()
+        results = await asyncio.gather(*[
+            self._aanalyze(category, content, str(file_path))
+            for file_path, content in files
+            for category in self._categories_for(file_path)
+        ])
+        
+        return self._build_report(list(results), len(files))
+    
+    def generate_batch_report(self, runner: Optional[BatchRunner] = None) -> Dict[str, Any]:
+        """
+        Variant of generate_comprehensive_report that submits every file
+        analysis as one batch job. Re-running after an interruption resumes
+        the submitted job.
+        
+        Args:
+            runner: Batch runner to use. If None, submits through the Mistral
+                batch API with the default state file.
+        """
+        print("🔍 Starting Mistral AI batch analysis...")
+        
+        files = self._select_files()
+        if not self.use_real_api:
+            results = [
+                ANALYSIS_SPECS[category].mock(self, str(file_path))
+                for file_path, _ in files
+                for category in self._categories_for(file_path)
+            ]
+            return self._build_report(results, len(files))
+        
+        requests = [
+            BatchRequest(
+                custom_id=f"{index}-{category}",
+                # A Mistral batch job runs a single model
+                body=self._request(ANALYSIS_SPECS[category], content, str(file_path), model=self.client.config.default_model),
+                metadata={"repository": str(self.repo_path.resolve()), "file": str(file_path), "category": category}
+            )
+            for index, (file_path, content) in enumerate(files)
+            for category in self._categories_for(file_path)
+        ]
+        batch_results = (runner or BatchRunner(ProviderBatchBackend(self.client))).run(requests)
+        
+        results = []
+        for request in requests:
+            spec = ANALYSIS_SPECS[request.metadata["category"]]
+            result = batch_results[request.custom_id]
+            if result.error:
+                print(f"Mistral API error for {request.metadata['file']}: {result.error}")
+                results.append(spec.mock(self, request.metadata["file"]))
+                continue
+            try:
+                results.append(self._parse_result(spec, result.content or ""))
+            except SchemaValidationError as e:
+                # Batch answers cannot be repaired in the same job
+                print(f"Invalid Mistral answer for {request.metadata['file']}: {e}")
+                results.append(spec.mock(self, request.metadata["file"]))
         
+        return self._build_report(results, len(files))
+    
+    def _build_report(self, results: List[AnalysisResult], file_count: int) -> Dict[str, Any]:
+        """Aggregate analysis results into the report and save it"""
         # Calculate overall scores
         quality_scores = [r.score for r in results if r.category == "code_quality"]
         security_scores = [r.score for r in results if r.category == "security"]
@@ -402,8 +428,98 @@ class RealMistralAnalyzer:
         
         return actions[:3]  # Top 3 priority actions
 
+ANALYSIS_SPECS = {
+    "code_quality": AnalysisSpec(
+        category="code_quality",
+        prompt="""
+        Analyze the following code file for quality, maintainability, and best practices:
+        
+        File: {file_path}
+        Content:
+        ```
+        {content}
+        ```
+        
+        Please provide:
+        1. A quality score from 1-10
+        2. Specific issues found
+        3. Recommendations for improvement
+        4. Code style assessment
+        
+        Respond with JSON in exactly this structure:
+        {layout}
+        """,
+        schema=FILE_SCHEMAS["code_quality"],
+        details=lambda record: f"Issues: {', '.join(record.issues) or 'None found'}",
+        recommendations_key="recommendations",
+        mock=RealMistralAnalyzer._mock_code_quality_result
+    ),
+    "security": AnalysisSpec(
+        category="security",
+        prompt="""
+        Perform a security analysis of this code file:
+        
+        File: {file_path}
+        Content:
+        ```
+        {content}
+        ```
+        
+        Look for:
+        1. Security vulnerabilities
+        2. Input validation issues
+        3. Authentication/authorization problems
+        4. Data exposure risks
+        5. Injection vulnerabilities
+        
+        Provide a security score (1-10) and specific findings.
+        Respond with JSON in exactly this structure:
+        {layout}
+        """,
+        schema=FILE_SCHEMAS["security"],
+        details=lambda record: f"Vulnerabilities: {list(record.vulnerabilities)}",
+        recommendations_key="recommendations",
+        mock=RealMistralAnalyzer._mock_security_result
+    ),
+    "documentation": AnalysisSpec(
+        category="documentation",
+        prompt="""
+        Analyze the documentation quality of this code:
+        
+        File: {file_path}
+        Content:
+        ```
+        {content}
+        ```
+        
+        Evaluate:
+        1. Comment quality and coverage
+        2. Function/class documentation
+        3. README and setup instructions
+        4. Code clarity and self-documentation
+        
+        Provide a documentation score (1-10) and improvement suggestions.
+        Respond with JSON in exactly this structure:
+        {layout}
+        """,
+        schema=FILE_SCHEMAS["documentation"],
+        details=lambda record: f"Coverage: {record.coverage or 'Unknown'}",
+        recommendations_key="suggestions",
+        mock=RealMistralAnalyzer._mock_documentation_result
+    ),
+}
+
 def main():
     """Main function to run Mistral AI analysis"""
+    parser = argparse.ArgumentParser(description="Analyze the repository with Mistral AI")
+    parser.add_argument("--batch", action="store_true",
+                        help="Submit all analyses as one batch job (slower, lower cost)")
+    parser.add_argument("--batch-state", help="Batch state file, for resuming an interrupted run")
+    parser.add_argument("--poll-interval", type=float, help="Seconds between batch status checks")
+    parser.add_argument("--rerun", action="store_true",
+                        help="Submit a new batch job even if a finished one has results for the same requests")
+    args = parser.parse_args()
+    
     print("🚀 Starting Real Mistral AI Repository Analysis")
     
     # Initialize analyzer
@@ -413,7 +529,18 @@ def main():
         print("⚠️  Running in mock mode. Set MISTRAL_API_KEY to use real API.")
     
     # Generate comprehensive report
-    report = analyzer.generate_comprehensive_report()
+    if args.batch:
+        runner = None
+        if analyzer.use_real_api:
+            runner = BatchRunner(
+                ProviderBatchBackend(analyzer.client),
+                state_path=args.batch_state,
+                poll_interval=args.poll_interval or POLL_INTERVAL,
+                force=args.rerun
+            )
+        report = analyzer.generate_batch_report(runner)
+    else:
+        report = analyzer.generate_comprehensive_report()
     
     # Display summary
     print("\n📊 Analysis Summary:")
@@ -426,4 +553,4 @@ def main():
     print(f"🔗 API Used: {'Real Mistral AI' if report['api_used'] else 'Mock/Simulation'}")
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
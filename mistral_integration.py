@@ -6,35 +6,153 @@ This script demonstrates how to integrate with Mistral AI for code analysis.
 
 import os
 import json
+import asyncio
+import hashlib
+import functools
+import contextvars
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
 from pathlib import Path
-from typing import Dict, List, Any
+from typing import Dict, List, Any, Optional
+
+from llm_providers import get_provider
+from usage_ledger import repo_context
+from prompt_builder import build_messages
+from model_router import get_router, get_model_token_limit
+from token_budget import BudgetItem, fit_to_budget, file_priority, PRIORITY_HIGH
+from repo_scanner import RepositoryScanner
+from analysis_schemas import AnswerDecoder, SECTION_SCHEMAS, COMBINED_SCHEMA, MAX_REPAIRS, as_dict
+
+# Tokens each analysis answer may use
+ANALYSIS_MAX_TOKENS = 2000
+
+# Number of analysis prompts sent to the API concurrently
+MAX_ANALYSIS_WORKERS = int(os.getenv("MISTRAL_ANALYSIS_WORKERS", "4"))
+
+# Budget keys of the context sections that are not files
+STRUCTURE_KEY = "<repository structure>"
+GIT_KEY = "<git information>"
+
+# Instructions for each analysis, sent after the shared repository context
+ANALYSIS_TASKS = [
+    ("code_quality", """
+Analyze the repository above for code quality, structure, and best practices.
+
+Please provide:
+1. Overall code quality assessment
+2. Structural analysis
+3. Best practices compliance
+4. Areas for improvement
+5. Security considerations
+"""),
+    ("technology_stack", """
+Analyze the technology stack and dependencies in the repository above.
+
+Please identify:
+1. Programming languages used
+2. Frameworks and libraries
+3. Build tools and package managers
+4. CI/CD tools
+5. Deployment considerations
+"""),
+    ("architecture", """
+Analyze the software architecture and design patterns in the repository above.
+
+Please evaluate:
+1. Architectural patterns used
+2. Design principles followed
+3. Modularity and separation of concerns
+4. Scalability considerations
+5. Maintainability aspects
+"""),
+    ("documentation", """
+Evaluate the documentation quality and completeness of the repository above.
+
+Please assess:
+1. README quality and completeness
+2. Code comments and inline documentation
+3. API documentation (if applicable)
+4. Setup and installation instructions
+5. Usage examples and guides
+"""),
+]
+
+# Analysis modes: one prompt per section sent in parallel, or a single prompt
+# answering every section in one JSON object
+PARALLEL_MODE = "parallel"
+COMBINED_MODE = "combined"
+ANALYSIS_MODE = os.getenv("MISTRAL_ANALYSIS_MODE", PARALLEL_MODE).lower()
+
+# Tokens the combined answer may use
+COMBINED_MAX_TOKENS = ANALYSIS_MAX_TOKENS * len(ANALYSIS_TASKS)
+
+# Times the sections or fields that are missing from an answer are asked for again
+MAX_SECTION_REASKS = int(os.getenv("MISTRAL_SECTION_REASKS", str(MAX_REPAIRS)))
+
+COMBINED_ANALYSIS_INSTRUCTIONS = """
+Analyze the repository above and answer every section in one JSON object:
+code quality, technology stack, architecture and documentation.
+Scores are numbers from 1 to 10; lists hold short strings.
+
+Respond with JSON in exactly this structure:
+{layout}
+"""
+
+def task_instructions(analysis_type: str, instructions: str) -> str:
+    """Instructions of one analysis, asking for its section as JSON"""
+    return instructions + SECTION_SCHEMAS[analysis_type].instructions()
+
+def combined_instructions() -> str:
+    """Instructions asking for every analysis section in one JSON answer"""
+    return COMBINED_ANALYSIS_INSTRUCTIONS.format(layout=COMBINED_SCHEMA.layout())
+
+@dataclass
+class RepositoryContext:
+    """
+    The fitted repository context of one repository state
+    
+    Attributes:
+        fingerprint: Hash of the repository state.
+        text: The context.
+        tokens: Prompt tokens of the context with the longest instructions,
+            an upper bound for every analysis prompt.
+    """
+    fingerprint: str
+    text: str
+    tokens: int
 
 class MistralRepositoryAnalyzer:
     """
     Advanced repository analyzer using Mistral AI capabilities
     """
     
-    def __init__(self, api_key: str = None):
+    def __init__(self, api_key: str = None, max_workers: int = MAX_ANALYSIS_WORKERS, mode: str = ANALYSIS_MODE):
         """
         Initialize the analyzer
         
         Args:
             api_key: Mistral AI API key (optional for demo)
+            max_workers: Number of analysis prompts sent concurrently
+            mode: "parallel" sends one prompt per section, "combined" one
+                prompt for all sections
         """
+        if mode not in (PARALLEL_MODE, COMBINED_MODE):
+            raise ValueError(f"Unknown analysis mode: {mode}")
+        self.max_workers = max_workers
+        self.mode = mode
         # Try to get API key from environment if not provided
         self.api_key = api_key or os.getenv('MISTRAL_API_KEY') or os.getenv('MISTRALAI_API_KEY')
         self.repo_path = Path(".")
         self.client = None
         
+        # Context of the last repository state, reused until the state changes
+        self._context: Optional[RepositoryContext] = None
+        
         # Initialize Mistral client if API key is provided
         if self.api_key:
             try:
-                from mistralai import Mistral
-                self.client = Mistral(api_key=self.api_key)
+                self.client = get_provider("mistral", api_key=self.api_key)
                 print("✅ Mistral AI client initialized successfully")
-            except ImportError:
-                print("⚠️  Mistral AI package not found. Install with: pip install mistralai")
-                self.client = None
             except Exception as e:
                 print(f"⚠️  Failed to initialize Mistral client: {e}")
                 self.client = None
@@ -45,60 +163,139 @@ class MistralRepositoryAnalyzer:
         """
         Prepare repository context for Mistral AI analysis
         
+        The context is fitted to the largest Mistral context window, leaving
+        room for the longest instructions and answer of the analysis mode; file contents
+        are shortened or dropped by priority when the repository is too large.
+        
+        The context is built once per repository state: later calls return
+        the same string until a file or the checked-out commit changes.
+        
         Returns:
             Formatted context string for AI analysis
         """
+        return self._repository_context().text
+    
+    def _repository_context(self) -> RepositoryContext:
+        """Build the repository context, or reuse it if the repository is unchanged"""
+        fingerprint = self._repository_fingerprint()
+        if self._context is not None and self._context.fingerprint == fingerprint:
+            return self._context
+        
+        file_contents = self._get_all_file_contents()
+        items = [
+            BudgetItem(STRUCTURE_KEY, self._get_tree_structure(), PRIORITY_HIGH),
+            BudgetItem(GIT_KEY, self._get_git_context(), PRIORITY_HIGH),
+        ]
+        items.extend(
+            BudgetItem(filename, content, file_priority(filename))
+            for filename, content in file_contents.items()
+        )
+        
+        if self.mode == COMBINED_MODE:
+            longest, max_tokens = combined_instructions(), COMBINED_MAX_TOKENS
+        else:
+            longest = max((task_instructions(*task) for task in ANALYSIS_TASKS), key=len)
+            max_tokens = ANALYSIS_MAX_TOKENS
+        model = get_router().largest("mistral").model
+        texts, tokens = fit_to_budget(
+            lambda texts: build_messages(self._render_context(texts, len(file_contents)), longest),
+            items,
+            model,
+            get_model_token_limit("mistral", model),
+            max_tokens
+        )
+        context = self._render_context(texts, len(file_contents))
+        self._context = RepositoryContext(fingerprint, context, tokens)
+        return self._context
+    
+    def _repository_fingerprint(self) -> str:
+        """
+        Hash the repository state the context is built from
+        
+        The tree listing, the sizes and modification times of the files the
+        scanner reads and the checked-out git ref are hashed without reading
+        file contents or running git. Tree and files come from the same
+        scanner walk; other files (such as the usage ledger and rate limiter
+        databases) only count by name, so the API calls of an analysis do not
+        invalidate its context.
+        """
+        digest = hashlib.sha256(self._get_tree_structure().encode("utf-8"))
+        for path in RepositoryScanner(str(self.repo_path)).paths():
+            try:
+                stat = os.stat(self.repo_path / path)
+            except OSError:
+                continue
+            digest.update(f"{path}\0{stat.st_size}\0{stat.st_mtime_ns}\n".encode("utf-8"))
+        
+        git_dir = self.repo_path / ".git"
+        git_files = [git_dir / "HEAD", git_dir / "config", git_dir / "packed-refs"]
+        try:
+            head = (git_dir / "HEAD").read_text(encoding="utf-8").strip()
+            if head.startswith("ref: "):
+                git_files.append(git_dir / head[len("ref: "):])
+        except OSError:
+            pass
+        for path in git_files:
+            try:
+                digest.update(path.read_bytes())
+            except OSError:
+                digest.update(b"\0")
+        return digest.hexdigest()
+    
+    @staticmethod
+    def _render_context(texts: Dict[str, str], file_count: int) -> str:
+        """Lay out the fitted context sections"""
         context_parts = []
         
         # Repository structure
         context_parts.append("REPOSITORY STRUCTURE:")
-        context_parts.append(self._get_tree_structure())
+        context_parts.append(texts.get(STRUCTURE_KEY, ""))
         
         # File contents
         context_parts.append("\nFILE CONTENTS:")
-        file_contents = self._get_all_file_contents()
-        for filename, content in file_contents.items():
+        shown = 0
+        for filename, content in texts.items():
+            if filename in (STRUCTURE_KEY, GIT_KEY):
+                continue
             context_parts.append(f"\n--- {filename} ---")
             context_parts.append(content)
+            shown += 1
+        if shown < file_count:
+            context_parts.append(f"\n({file_count - shown} more files omitted to fit the context window)")
         
         # Git information
         context_parts.append("\nGIT INFORMATION:")
-        context_parts.append(self._get_git_context())
+        context_parts.append(texts.get(GIT_KEY, ""))
         
         return "\n".join(context_parts)
     
     def _get_tree_structure(self) -> str:
-        """Get repository tree structure"""
+        """
+        Get repository tree structure
+        
+        Lists the directories the scanner visits, so the tree, the file
+        contents and the fingerprint agree on what the repository holds.
+        """
         structure = []
-        for root, dirs, files in os.walk("."):
-            if ".git" in root:
-                continue
-            level = root.replace(".", "").count(os.sep)
+        # The scanner walks in a fixed order, so the context is byte-stable across runs
+        for directory, files in RepositoryScanner(str(self.repo_path)).walk():
+            level = 0 if directory == "." else directory.count("/") + 1
             indent = "  " * level
-            structure.append(f"{indent}{os.path.basename(root)}/")
+            structure.append(f"{indent}{os.path.basename(directory)}/")
             subindent = "  " * (level + 1)
             for file in files:
                 structure.append(f"{subindent}{file}")
         return "\n".join(structure)
     
     def _get_all_file_contents(self) -> Dict[str, str]:
-        """Get contents of all text files"""
-        contents = {}
-        text_extensions = {'.md', '.html', '.json', '.yml', '.yaml', '.txt', '.py', '.js', '.css'}
+        """
+        Get contents of all text files
         
-        for root, dirs, files in os.walk("."):
-            if ".git" in root:
-                continue
-            for file in files:
-                file_path = Path(root) / file
-                if file_path.suffix.lower() in text_extensions:
-                    try:
-                        with open(file_path, 'r', encoding='utf-8') as f:
-                            contents[str(file_path)] = f.read()
-                    except Exception as e:
-                        contents[str(file_path)] = f"Error reading file: {e}"
-        
-        return contents
+        Binary and minified files are skipped and oversized files sampled to
+        their head and tail, within the scanner's per-file and total byte
+        budgets.
+        """
+        return RepositoryScanner(str(self.repo_path)).read_contents()
     
     def _get_git_context(self) -> str:
         """Get git repository context"""
@@ -131,80 +328,40 @@ Recent Commits:
         except Exception as e:
             return f"Git context unavailable: {e}"
     
-    def generate_analysis_prompts(self) -> List[Dict[str, str]]:
+    def generate_analysis_prompts(self) -> List[Dict[str, Any]]:
         """
         Generate specific prompts for different types of analysis
         
+        Each prompt holds its task instructions and a reference to the shared
+        repository context; prompt_messages builds its chat messages when it
+        is sent, so the context is not copied into every prompt.
+        
         Returns:
             List of analysis prompts for Mistral AI
         """
-        context = self.prepare_context_for_mistral()
-        
-        prompts = [
-            {
-                "type": "code_quality",
-                "prompt": f"""
-Analyze the following repository for code quality, structure, and best practices:
-
-{context}
-
-Please provide:
-1. Overall code quality assessment
-2. Structural analysis
-3. Best practices compliance
-4. Areas for improvement
-5. Security considerations
-"""
-            },
-            {
-                "type": "technology_stack",
-                "prompt": f"""
-Analyze the technology stack and dependencies in this repository:
-
-{context}
-
-Please identify:
-1. Programming languages used
-2. Frameworks and libraries
-3. Build tools and package managers
-4. CI/CD tools
-5. Deployment considerations
-"""
-            },
-            {
-                "type": "architecture",
-                "prompt": f"""
-Analyze the software architecture and design patterns in this repository:
-
-{context}
-
-Please evaluate:
-1. Architectural patterns used
-2. Design principles followed
-3. Modularity and separation of concerns
-4. Scalability considerations
-5. Maintainability aspects
-"""
-            },
-            {
-                "type": "documentation",
-                "prompt": f"""
-Evaluate the documentation quality and completeness:
-
-{context}
-
-Please assess:
-1. README quality and completeness
-2. Code comments and inline documentation
-3. API documentation (if applicable)
-4. Setup and installation instructions
-5. Usage examples and guides
-"""
-            }
-        ]
+        repository = self._repository_context()
+        
+        prompts = []
+        for analysis_type, instructions in ANALYSIS_TASKS:
+            prompts.append({
+                "type": analysis_type,
+                "context": repository.text,
+                "instructions": task_instructions(analysis_type, instructions),
+                "prompt_tokens": repository.tokens
+            })
         
         return prompts
     
+    @staticmethod
+    def prompt_messages(prompt_data: Dict[str, Any]) -> List[Dict[str, str]]:
+        """
+        Build the chat messages of an analysis prompt
+        
+        The shared context leads every prompt so the provider can reuse its
+        cached prefix; only the task instructions differ.
+        """
+        return build_messages(prompt_data["context"], prompt_data["instructions"])
+    
     def simulate_mistral_analysis(self, prompts: List[Dict[str, str]]) -> Dict[str, Any]:
         """
         Perform Mistral AI analysis - uses real API if available, otherwise simulates
@@ -212,6 +369,8 @@ Please assess:
         
         # If we have a real Mistral client, use it
         if self.client:
+            if self.mode == COMBINED_MODE:
+                return self._call_combined_mistral_api(prompts)
             return self._call_real_mistral_api(prompts)
         
         # Otherwise, use simulation
@@ -281,79 +440,163 @@ Please assess:
     def _call_real_mistral_api(self, prompts: List[Dict[str, str]]) -> Dict[str, Any]:
         """
         Call the real Mistral AI API for analysis
+        
+        The prompts are sent concurrently on a pool of max_workers threads,
+        so the analysis takes about as long as its slowest call. Each answer
+        is decoded into its section's schema, and invalid fields are asked
+        for again. A prompt whose call fails or whose answer stays invalid
+        falls back to its simulated analysis without affecting the others.
         """
         print("🔄 Calling Mistral AI API for real analysis...")
         
-        responses = {}
+        outcomes = []
+        workers = max(1, min(self.max_workers, len(prompts)))
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="mistral-analysis") as executor:
+            # Each call runs in a copy of this context, keeping its repository attribution
+            futures = [
+                executor.submit(contextvars.copy_context().run, self._analyze_prompt, prompt_data)
+                for prompt_data in prompts
+            ]
+            for future in futures:
+                try:
+                    outcomes.append(future.result())
+                except Exception as e:
+                    outcomes.append(e)
         
-        try:
-            for prompt_data in prompts:
-                prompt_type = prompt_data["type"]
-                prompt_text = prompt_data["prompt"]
-                
-                print(f"   Analyzing: {prompt_type}")
-                
-                # Call Mistral API
-                response = self.client.chat.complete(
-                    model="mistral-large-latest",
-                    messages=[
-                        {
-                            "role": "user",
-                            "content": prompt_text
-                        }
-                    ],
-                    max_tokens=2000,
-                    temperature=0.3
-                )
-                
-                # Parse the response
-                content = response.choices[0].message.content
-                
-                # Try to extract structured data from the response
-                responses[prompt_type] = self._parse_mistral_response(content, prompt_type)
-                
-        except Exception as e:
-            print(f"⚠️  Error calling Mistral API: {e}")
-            print("   Falling back to simulation mode...")
-            return self._get_simulated_responses()
+        return self._collect_responses(prompts, outcomes)
+    
+    def _analyze_prompt(self, prompt_data: Dict[str, Any]) -> Dict[str, Any]:
+        """Send one analysis prompt and decode its section, repairing invalid fields"""
+        print(f"   Analyzing: {prompt_data['type']}")
+        arguments = self._chat_arguments(prompt_data)
+        decoder = AnswerDecoder(
+            SECTION_SCHEMAS[prompt_data["type"]], arguments["messages"], self.client.config.json_mode, MAX_SECTION_REASKS
+        )
+        response = self.client.chat(**arguments)
+        while decoder.feed(response.content):
+            response = self.client.chat(**dict(arguments, **decoder.arguments()))
+        return self._section(prompt_data["type"], decoder.record())
+    
+    async def asimulate_mistral_analysis(self, prompts: List[Dict[str, str]]) -> Dict[str, Any]:
+        """
+        Async variant of simulate_mistral_analysis
+        """
+        if self.client:
+            with repo_context(self.repo_path.resolve()):
+                if self.mode == COMBINED_MODE:
+                    # A single call; run it off the event loop, keeping the repo context
+                    call = functools.partial(contextvars.copy_context().run, self._call_combined_mistral_api, prompts)
+                    return await asyncio.get_running_loop().run_in_executor(None, call)
+                return await self._acall_real_mistral_api(prompts)
+        return self.simulate_mistral_analysis(prompts)
+    
+    async def _acall_real_mistral_api(self, prompts: List[Dict[str, str]]) -> Dict[str, Any]:
+        """
+        Call the real Mistral AI API with all prompts in flight at once
+        """
+        print("🔄 Calling Mistral AI API for real analysis...")
+        
+        outcomes = await asyncio.gather(
+            *[self._aanalyze_prompt(prompt_data) for prompt_data in prompts],
+            return_exceptions=True
+        )
+        return self._collect_responses(prompts, outcomes)
+    
+    async def _aanalyze_prompt(self, prompt_data: Dict[str, Any]) -> Dict[str, Any]:
+        """Async variant of _analyze_prompt"""
+        arguments = self._chat_arguments(prompt_data)
+        decoder = AnswerDecoder(
+            SECTION_SCHEMAS[prompt_data["type"]], arguments["messages"], self.client.config.json_mode, MAX_SECTION_REASKS
+        )
+        response = await self.client.achat(**arguments)
+        while decoder.feed(response.content):
+            response = await self.client.achat(**dict(arguments, **decoder.arguments()))
+        return self._section(prompt_data["type"], decoder.record())
+    
+    def _collect_responses(self, prompts: List[Dict[str, Any]], outcomes: List[Any]) -> Dict[str, Any]:
+        """
+        Gather each prompt's section, simulating only the analyses that failed
         
-        print("✅ Mistral AI analysis completed successfully")
+        Args:
+            prompts: The analysis prompts.
+            outcomes: The decoded section or the exception of each prompt, in order.
+        """
+        responses = {}
+        failed = []
+        simulated = None
+        for prompt_data, outcome in zip(prompts, outcomes):
+            prompt_type = prompt_data["type"]
+            if isinstance(outcome, BaseException):
+                print(f"⚠️  Mistral analysis failed for {prompt_type}: {outcome}")
+                simulated = simulated or self._get_simulated_responses()
+                responses[prompt_type] = dict(simulated[prompt_type], simulated=True)
+                failed.append(prompt_type)
+            else:
+                responses[prompt_type] = outcome
+        
+        if failed:
+            print(f"   Falling back to simulation for: {', '.join(failed)}")
+        else:
+            print("✅ Mistral AI analysis completed successfully")
         return responses
     
-    def _parse_mistral_response(self, content: str, analysis_type: str) -> Dict[str, Any]:
+    def _call_combined_mistral_api(self, prompts: List[Dict[str, Any]]) -> Dict[str, Any]:
         """
-        Parse Mistral AI response into structured data
+        Call the Mistral AI API once for every analysis section
+        
+        The shared context is sent a single time with a JSON schema covering
+        all sections. Each section of the answer is validated on its own;
+        only the sections that are missing or invalid are asked for again,
+        in the same conversation, and any still failing are simulated.
         """
-        # This is a simplified parser - in production, you'd want more sophisticated parsing
-        parsed = {
-            "raw_response": content,
-            "analysis_type": analysis_type,
-            "timestamp": "2025-05-29"
-        }
+        print("🔄 Calling Mistral AI API for a combined analysis...")
         
-        # Try to extract key information based on analysis type
-        if analysis_type == "code_quality":
-            parsed.update({
-                "overall_assessment": content[:200] + "..." if len(content) > 200 else content,
-                "ai_powered": True
-            })
-        elif analysis_type == "technology_stack":
-            parsed.update({
-                "stack_analysis": content[:200] + "..." if len(content) > 200 else content,
-                "ai_powered": True
-            })
-        elif analysis_type == "architecture":
-            parsed.update({
-                "architecture_analysis": content[:200] + "..." if len(content) > 200 else content,
-                "ai_powered": True
-            })
-        elif analysis_type == "documentation":
-            parsed.update({
-                "documentation_analysis": content[:200] + "..." if len(content) > 200 else content,
-                "ai_powered": True
-            })
+        sections = [analysis_type for analysis_type, _ in ANALYSIS_TASKS]
+        messages = build_messages(prompts[0]["context"], combined_instructions())
+        decoder = AnswerDecoder(COMBINED_SCHEMA, messages, self.client.config.json_mode, MAX_SECTION_REASKS)
+        try:
+            model = get_router().route(
+                "mistral", "repository_analysis", messages,
+                max_output_tokens=COMBINED_MAX_TOKENS, prompt_tokens=prompts[0]["prompt_tokens"]
+            ).model
+            arguments = {"model": model, "max_tokens": COMBINED_MAX_TOKENS, "temperature": 0.3}
+            response = self.client.chat(**arguments, **decoder.arguments())
+            while decoder.feed(response.content):
+                print(f"   Re-asking for: {', '.join(decoder.errors)}")
+                response = self.client.chat(**arguments, **decoder.arguments())
+        except Exception as e:
+            print(f"⚠️  Error calling Mistral API: {e}")
         
-        return parsed
+        responses = {
+            section_type: self._section(section_type, record) for section_type, record in decoder.values.items()
+        }
+        missing = [section_type for section_type in sections if section_type not in responses]
+        if missing:
+            simulated = self._get_simulated_responses()
+            for section_type in missing:
+                responses[section_type] = dict(simulated[section_type], simulated=True)
+            print(f"   Falling back to simulation for: {', '.join(missing)}")
+        else:
+            print("✅ Mistral AI analysis completed successfully")
+        return {section_type: responses[section_type] for section_type in sections}
+    
+    def _chat_arguments(self, prompt_data: Dict[str, Any]) -> Dict[str, Any]:
+        """Chat arguments for an analysis prompt, routed by its task and size"""
+        messages = self.prompt_messages(prompt_data)
+        model = get_router().route(
+            "mistral", prompt_data["type"], messages,
+            max_output_tokens=ANALYSIS_MAX_TOKENS, prompt_tokens=prompt_data["prompt_tokens"]
+        ).model
+        arguments = {"model": model, "messages": messages, "max_tokens": ANALYSIS_MAX_TOKENS, "temperature": 0.3}
+        response_format = SECTION_SCHEMAS[prompt_data["type"]].response_format(self.client.config.json_mode)
+        if response_format:
+            arguments["response_format"] = response_format
+        return arguments
+    
+    @staticmethod
+    def _section(analysis_type: str, record: Any) -> Dict[str, Any]:
+        """Report entry of a decoded analysis section"""
+        return dict(as_dict(record), analysis_type=analysis_type, ai_powered=True)
     
     def _get_simulated_responses(self) -> Dict[str, Any]:
         """
@@ -431,7 +674,8 @@ Please assess:
         prompts = self.generate_analysis_prompts()
         
         # Get simulated Mistral responses
-        analysis_results = self.simulate_mistral_analysis(prompts)
+        with repo_context(self.repo_path.resolve()):
+            analysis_results = self.simulate_mistral_analysis(prompts)
         
         # Compile comprehensive report
         report = {
@@ -0,0 +1,549 @@
+#!/usr/bin/env python3
+"""
+Mock LLM Server
+
+This module runs a local HTTP server that speaks the OpenAI-compatible chat
+completions (including streaming), embeddings and models wire formats. The
+real client code paths (pooled HTTP, rate limiting, retries, hedging,
+streaming, the usage ledger) can then be benchmarked and exercised in CI
+without API keys. Point any client at it by base URL:
+
+    python mock_llm_server.py --port 8001 --latency lognormal:300:0.5 --rate-limit-rate 0.05
+    OPENAI_BASE_URL=http://127.0.0.1:8001/v1 OPENAI_API_KEY=mock python analyze_openai.py
+
+The same works for MISTRAL_BASE_URL and OPENHANDS_BASE_URL.
+
+Latency before the first token follows a fixed, uniform or lognormal
+distribution, output is paced at a configurable tokens-per-second rate, and
+a fraction of requests can be answered with 429 or 5xx errors. Optional
+requests/tokens per minute quotas are enforced and reported in
+x-ratelimit-* headers. Responses are deterministic: a canned answer whose
+key occurs in the last user message, otherwise an echo of that message
+(wrapped in a JSON object when JSON output is requested). Embeddings are
+derived from a hash of the text.
+"""
+
+import re
+import sys
+import json
+import math
+import time
+import random
+import hashlib
+import logging
+import argparse
+import threading
+from dataclasses import dataclass, field
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, Any, List, Optional, Tuple
+
+import tokenization
+
+# Configure logging
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger(__name__)
+
+DEFAULT_PORT = 8001
+
+DEFAULT_MODELS = [
+    "gpt-4o", "gpt-4o-mini", "text-embedding-3-small",
+    "mistral-small-latest", "mistral-medium-latest", "mistral-large-latest", "mistral-embed",
+    "o4-mini",
+]
+
+# Server errors chosen from when injecting 5xx responses
+SERVER_ERROR_CODES = (500, 502, 503)
+
+# Splits output into streamed pieces of roughly one token each
+_PIECE = re.compile(r"\s*\S+|\s+")
+
+
+@dataclass
+class LatencyProfile:
+    """
+    Delay before the first token, in milliseconds.
+
+    Attributes:
+        distribution: "fixed" (median_ms), "uniform" (low_ms to high_ms) or
+            "lognormal" (median_ms and sigma of the underlying normal).
+    """
+    distribution: str = "fixed"
+    median_ms: float = 0.0
+    low_ms: float = 0.0
+    high_ms: float = 0.0
+    sigma: float = 0.5
+
+    @classmethod
+    def parse(cls, spec: str) -> "LatencyProfile":
+        """
+        Parse a latency spec.
+
+        Args:
+            spec: "MS", "fixed:MS", "uniform:LOW:HIGH" or "lognormal:MEDIAN:SIGMA".
+
+        Returns:
+            The latency profile.
+        """
+        parts = spec.split(":")
+        if len(parts) == 1:
+            return cls("fixed", median_ms=float(parts[0]))
+        kind, values = parts[0], [float(value) for value in parts[1:]]
+        if kind == "fixed" and len(values) == 1:
+            return cls("fixed", median_ms=values[0])
+        if kind == "uniform" and len(values) == 2:
+            return cls("uniform", low_ms=values[0], high_ms=values[1])
+        if kind == "lognormal" and len(values) == 2:
+            return cls("lognormal", median_ms=values[0], sigma=values[1])
+        raise ValueError(f"Invalid latency spec: {spec}")
+
+    def sample(self, rng: random.Random) -> float:
+        """Draw a latency in milliseconds"""
+        if self.distribution == "uniform":
+            return rng.uniform(self.low_ms, self.high_ms)
+        if self.distribution == "lognormal":
+            return self.median_ms * math.exp(rng.gauss(0.0, self.sigma)) if self.median_ms > 0 else 0.0
+        return self.median_ms
+
+
+@dataclass
+class MockServerConfig:
+    """
+    Behaviour of the mock server.
+
+    Attributes:
+        latency: Delay before the first token.
+        tokens_per_second: Output pacing; 0 sends the whole answer at once.
+        rate_limit_rate: Fraction of requests answered with 429.
+        server_error_rate: Fraction of requests answered with a 5xx error.
+        retry_after: Retry-After seconds sent with injected 429s.
+        requests_per_minute: Enforced request quota, or None for no quota.
+        tokens_per_minute: Enforced token quota, or None for no quota.
+        responses: Canned answers keyed by a substring of the last user message.
+        default_response: Answer when no canned one matches; None echoes.
+        models: Model IDs listed by /models.
+        embedding_dimension: Length of the embedding vectors.
+        seed: Seed for latency sampling and fault injection.
+    """
+    latency: LatencyProfile = field(default_factory=LatencyProfile)
+    tokens_per_second: float = 0.0
+    rate_limit_rate: float = 0.0
+    server_error_rate: float = 0.0
+    retry_after: float = 1.0
+    requests_per_minute: Optional[int] = None
+    tokens_per_minute: Optional[int] = None
+    responses: Dict[str, str] = field(default_factory=dict)
+    default_response: Optional[str] = None
+    models: List[str] = field(default_factory=lambda: list(DEFAULT_MODELS))
+    embedding_dimension: int = 1536
+    seed: int = 0
+
+    @classmethod
+    def from_file(cls, path: str) -> "MockServerConfig":
+        """
+        Load a config from a JSON file with the attribute names as keys.
+
+        The latency may be given as a spec string (see LatencyProfile.parse)
+        or as an object of LatencyProfile attributes.
+
+        Args:
+            path: Path of the JSON file.
+
+        Returns:
+            The server config.
+        """
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        latency = data.pop("latency", None)
+        config = cls(**data)
+        if isinstance(latency, str):
+            config.latency = LatencyProfile.parse(latency)
+        elif isinstance(latency, dict):
+            config.latency = LatencyProfile(**latency)
+        return config
+
+
+def embedding_for(text: str, dimension: int) -> List[float]:
+    """
+    Deterministic unit-length embedding of a text.
+
+    Args:
+        text: Text to embed.
+        dimension: Vector length.
+
+    Returns:
+        The embedding; equal texts always get equal vectors.
+    """
+    rng = random.Random(hashlib.sha256(text.encode("utf-8")).digest())
+    vector = [rng.gauss(0.0, 1.0) for _ in range(dimension)]
+    norm = math.sqrt(sum(value * value for value in vector)) or 1.0
+    return [value / norm for value in vector]
+
+
+class _Quota:
+    """Fixed one-minute windows of requests and tokens"""
+
+    def __init__(self, requests_per_minute: Optional[int], tokens_per_minute: Optional[int]):
+        self.limits = {"requests": requests_per_minute, "tokens": tokens_per_minute}
+        self.window_start = time.monotonic()
+        self.used = {"requests": 0, "tokens": 0}
+
+    def take(self, tokens: int) -> Tuple[bool, Dict[str, str]]:
+        """
+        Count a request against the quota.
+
+        Returns:
+            (allowed, x-ratelimit-* headers describing the quota).
+        """
+        now = time.monotonic()
+        if now - self.window_start >= 60.0:
+            self.window_start = now
+            self.used = {"requests": 0, "tokens": 0}
+        reset = 60.0 - (now - self.window_start)
+
+        allowed = all(
+            limit is None or self.used[kind] + amount <= limit
+            for kind, amount, limit in (
+                ("requests", 1, self.limits["requests"]),
+                ("tokens", tokens, self.limits["tokens"]),
+            )
+        )
+        if allowed:
+            self.used["requests"] += 1
+            self.used["tokens"] += tokens
+
+        headers = {}
+        for kind, limit in self.limits.items():
+            if limit is not None:
+                headers[f"x-ratelimit-limit-{kind}"] = str(limit)
+                headers[f"x-ratelimit-remaining-{kind}"] = str(max(0, limit - self.used[kind]))
+                headers[f"x-ratelimit-reset-{kind}"] = f"{reset:.3f}s"
+        if not allowed:
+            headers["retry-after"] = f"{reset:.3f}"
+        return allowed, headers
+
+
+class MockLLMServer:
+    """
+    OpenAI-compatible mock server running in a background thread.
+
+    Use as a context manager, or call start() and stop().
+    """
+
+    def __init__(self, config: Optional[MockServerConfig] = None, host: str = "127.0.0.1", port: int = 0):
+        """
+        Initialize the server.
+
+        Args:
+            config: Server behaviour. If None, answers instantly by echoing.
+            host: Interface to listen on.
+            port: Port to listen on; 0 picks a free port.
+        """
+        self.config = config or MockServerConfig()
+        self.httpd = ThreadingHTTPServer((host, port), _Handler)
+        self.httpd.daemon_threads = True
+        self.httpd.mock = self
+        self.host, self.port = self.httpd.server_address[:2]
+        self._lock = threading.Lock()
+        self._rng = random.Random(self.config.seed)
+        self._quota = _Quota(self.config.requests_per_minute, self.config.tokens_per_minute)
+        self._thread = None
+        self.stats: Dict[str, int] = {}
+
+    @property
+    def base_url(self) -> str:
+        """Base URL to configure clients with"""
+        return f"http://{self.host}:{self.port}/v1"
+
+    def start(self) -> "MockLLMServer":
+        """Serve requests in a background thread"""
+        self._thread = threading.Thread(target=self.httpd.serve_forever, args=(0.05,), daemon=True)
+        self._thread.start()
+        logger.info(f"Mock LLM server listening on {self.base_url}")
+        return self
+
+    def stop(self):
+        """Stop serving and close the socket"""
+        self.httpd.shutdown()
+        self.httpd.server_close()
+        if self._thread is not None:
+            self._thread.join()
+
+    def __enter__(self) -> "MockLLMServer":
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+    def count(self, name: str):
+        """Increment a statistics counter"""
+        with self._lock:
+            self.stats[name] = self.stats.get(name, 0) + 1
+
+    def draw(self) -> Tuple[float, float, int]:
+        """Draw (fault roll, latency in seconds, server error code) for one request"""
+        with self._lock:
+            roll = self._rng.random()
+            latency = self.config.latency.sample(self._rng) / 1000.0
+            code = self._rng.choice(SERVER_ERROR_CODES)
+        return roll, latency, code
+
+    def take_quota(self, tokens: int) -> Tuple[bool, Dict[str, str]]:
+        """Count a request against the requests/tokens per minute quota"""
+        with self._lock:
+            return self._quota.take(tokens)
+
+    def answer(self, messages: List[Dict[str, Any]], json_output: bool) -> str:
+        """The deterministic answer to a conversation"""
+        user_message = next(
+            (m.get("content") or "" for m in reversed(messages) if m.get("role") == "user"), ""
+        )
+        if not isinstance(user_message, str):
+            user_message = json.dumps(user_message)
+        for key, content in self.config.responses.items():
+            if key in user_message:
+                return content
+        if self.config.default_response is not None:
+            return self.config.default_response
+        return json.dumps({"echo": user_message}) if json_output else user_message
+
+
+class _Handler(BaseHTTPRequestHandler):
+    """Request handler for MockLLMServer"""
+
+    protocol_version = "HTTP/1.1"
+
+    @property
+    def mock(self) -> MockLLMServer:
+        return self.server.mock
+
+    def log_message(self, format, *args):
+        logger.debug(format % args)
+
+    def _route(self) -> str:
+        """Request path without the query string and an optional /v1 prefix"""
+        path = self.path.split("?", 1)[0].rstrip("/")
+        return path[len("/v1"):] if path.startswith("/v1") else path
+
+    def _send_json(self, status: int, body: Dict[str, Any], headers: Optional[Dict[str, str]] = None):
+        data = json.dumps(body).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _send_error(self, status: int, message: str, error_type: str, headers: Optional[Dict[str, str]] = None):
+        self.mock.count(f"errors.{status}")
+        self._send_json(status, {"error": {"message": message, "type": error_type}}, headers)
+
+    def do_GET(self):
+        self.mock.count("requests")
+        if self._route() == "/models":
+            self._send_json(200, {
+                "object": "list",
+                "data": [{"id": model, "object": "model", "owned_by": "mock"} for model in self.mock.config.models]
+            })
+        else:
+            self._send_error(404, f"Unknown path: {self.path}", "invalid_request_error")
+
+    def do_POST(self):
+        self.mock.count("requests")
+        route = self._route()
+        try:
+            payload = json.loads(self.rfile.read(int(self.headers.get("Content-Length") or 0)) or b"{}")
+        except json.JSONDecodeError:
+            self._send_error(400, "Request body is not valid JSON", "invalid_request_error")
+            return
+
+        if route == "/chat/completions":
+            handler = self._chat
+        elif route == "/embeddings":
+            handler = self._embeddings
+        else:
+            self._send_error(404, f"Unknown path: {self.path}", "invalid_request_error")
+            return
+        if "model" not in payload:
+            self._send_error(400, "model is required", "invalid_request_error")
+            return
+
+        try:
+            handler(payload)
+        except (BrokenPipeError, ConnectionResetError):
+            # The client closed the connection, e.g. an abandoned stream
+            self.mock.count("disconnects")
+            self.close_connection = True
+
+    def _admit(self, prompt_tokens: int) -> Optional[Tuple[float, Dict[str, str]]]:
+        """
+        Apply fault injection and the quota.
+
+        Returns:
+            (latency in seconds, quota headers), or None if an error was sent.
+        """
+        config = self.mock.config
+        roll, latency, code = self.mock.draw()
+        if roll < config.rate_limit_rate:
+            self._send_error(429, "Rate limit reached (injected)", "rate_limit_error",
+                             {"retry-after": str(config.retry_after)})
+            return None
+        if roll < config.rate_limit_rate + config.server_error_rate:
+            self._send_error(code, "Server error (injected)", "server_error")
+            return None
+        allowed, headers = self.mock.take_quota(prompt_tokens)
+        if not allowed:
+            self._send_error(429, "Rate limit reached", "rate_limit_error", headers)
+            return None
+        return latency, headers
+
+    def _chat(self, payload: Dict[str, Any]):
+        model = payload["model"]
+        messages = payload.get("messages") or []
+        texts = [m["content"] for m in messages if isinstance(m.get("content"), str)]
+        prompt_tokens = sum(tokenization.count_tokens_batch(texts, model)) if texts else 0
+        admitted = self._admit(prompt_tokens)
+        if admitted is None:
+            return
+        latency, headers = admitted
+
+        json_output = (payload.get("response_format") or {}).get("type") in ("json_object", "json_schema")
+        pieces = _PIECE.findall(self.mock.answer(messages, json_output))
+        finish_reason = "stop"
+        max_tokens = payload.get("max_tokens")
+        if max_tokens is not None and len(pieces) > max_tokens:
+            pieces, finish_reason = pieces[:max_tokens], "length"
+        content = "".join(pieces)
+        completion_tokens = tokenization.count_tokens(content, model) if content else 0
+        usage = {
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": completion_tokens,
+            "total_tokens": prompt_tokens + completion_tokens
+        }
+        completion_id = f"chatcmpl-mock-{hashlib.sha256(content.encode('utf-8')).hexdigest()[:12]}"
+        tps = self.mock.config.tokens_per_second
+
+        time.sleep(latency)
+        self.mock.count("chat")
+        if not payload.get("stream"):
+            if tps > 0:
+                time.sleep(len(pieces) / tps)
+            self._send_json(200, {
+                "id": completion_id,
+                "object": "chat.completion",
+                "created": int(time.time()),
+                "model": model,
+                "choices": [{
+                    "index": 0,
+                    "message": {"role": "assistant", "content": content},
+                    "finish_reason": finish_reason
+                }],
+                "usage": usage
+            }, headers)
+            return
+
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Cache-Control", "no-cache")
+        self.send_header("Connection", "close")
+        for name, value in headers.items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.close_connection = True
+
+        def chunk(delta: Dict[str, Any], reason: Optional[str] = None, **extra) -> Dict[str, Any]:
+            return {
+                "id": completion_id, "object": "chat.completion.chunk", "created": int(time.time()),
+                "model": model, "choices": [{"index": 0, "delta": delta, "finish_reason": reason}], **extra
+            }
+
+        self._send_event(chunk({"role": "assistant", "content": ""}))
+        for piece in pieces:
+            if tps > 0:
+                time.sleep(1.0 / tps)
+            self._send_event(chunk({"content": piece}))
+        self._send_event(chunk({}, finish_reason))
+        if (payload.get("stream_options") or {}).get("include_usage"):
+            self._send_event({
+                "id": completion_id, "object": "chat.completion.chunk", "created": int(time.time()),
+                "model": model, "choices": [], "usage": usage
+            })
+        self.wfile.write(b"data: [DONE]\n\n")
+        self.wfile.flush()
+
+    def _send_event(self, data: Dict[str, Any]):
+        self.wfile.write(f"data: {json.dumps(data)}\n\n".encode("utf-8"))
+        self.wfile.flush()
+
+    def _embeddings(self, payload: Dict[str, Any]):
+        model = payload["model"]
+        texts = payload.get("input") or []
+        if isinstance(texts, str):
+            texts = [texts]
+        prompt_tokens = sum(tokenization.count_tokens_batch(texts, model)) if texts else 0
+        admitted = self._admit(prompt_tokens)
+        if admitted is None:
+            return
+        latency, headers = admitted
+        time.sleep(latency)
+        self.mock.count("embeddings")
+        dimension = payload.get("dimensions") or self.mock.config.embedding_dimension
+        self._send_json(200, {
+            "object": "list",
+            "model": model,
+            "data": [
+                {"object": "embedding", "index": index, "embedding": embedding_for(text, dimension)}
+                for index, text in enumerate(texts)
+            ],
+            "usage": {"prompt_tokens": prompt_tokens, "total_tokens": prompt_tokens}
+        }, headers)
+
+
+def main():
+    """Run the mock server until interrupted"""
+    parser = argparse.ArgumentParser(description="OpenAI-compatible mock LLM server")
+    parser.add_argument("--host", default="127.0.0.1", help="Interface to listen on")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT, help="Port to listen on")
+    parser.add_argument("--config", help="JSON config file (MockServerConfig attributes)")
+    parser.add_argument("--latency", help='Latency before the first token: "MS", "uniform:LOW:HIGH" or "lognormal:MEDIAN:SIGMA"')
+    parser.add_argument("--tokens-per-second", type=float, help="Output pacing (0 for instant)")
+    parser.add_argument("--rate-limit-rate", type=float, help="Fraction of requests answered with 429")
+    parser.add_argument("--server-error-rate", type=float, help="Fraction of requests answered with 5xx")
+    parser.add_argument("--rpm", type=int, help="Enforced requests per minute")
+    parser.add_argument("--tpm", type=int, help="Enforced tokens per minute")
+    parser.add_argument("--response", help="Fixed answer for every chat request (default: echo)")
+    parser.add_argument("--seed", type=int, help="Seed for latency and fault injection")
+    args = parser.parse_args()
+
+    config = MockServerConfig.from_file(args.config) if args.config else MockServerConfig()
+    if args.latency:
+        config.latency = LatencyProfile.parse(args.latency)
+    for name, value in (
+        ("tokens_per_second", args.tokens_per_second),
+        ("rate_limit_rate", args.rate_limit_rate),
+        ("server_error_rate", args.server_error_rate),
+        ("requests_per_minute", args.rpm),
+        ("tokens_per_minute", args.tpm),
+        ("default_response", args.response),
+        ("seed", args.seed),
+    ):
+        if value is not None:
+            setattr(config, name, value)
+
+    server = MockLLMServer(config, host=args.host, port=args.port)
+    print(f"🧪 Mock LLM server on {server.base_url}")
+    print(f"   OPENAI_BASE_URL={server.base_url} / MISTRAL_BASE_URL={server.base_url}")
+    try:
+        server.httpd.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.httpd.server_close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
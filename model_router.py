@@ -0,0 +1,350 @@
+"""
+Model Router Module
+
+This module picks the model for each analysis call instead of sending every
+task to the provider's largest model. Each task has a quality tier; the
+router considers the provider's models of at least that tier whose context
+window (get_model_token_limit) fits the prompt and the expected output,
+drops those whose measured latency exceeds the task's latency budget, and
+picks the cheapest of the rest.
+
+In cascade mode a call starts on the cheapest model that fits and escalates
+to the next larger model only when the output fails the caller's validation,
+so simple checks stay on small models and hard ones still get a large model.
+"""
+
+import os
+import logging
+import threading
+from dataclasses import dataclass
+from typing import Dict, Any, List, Optional, Callable
+
+from llm_providers import ChatResult, ProviderClient
+from metrics import get_registry
+from token_budget import count_message_tokens
+from usage_ledger import estimate_cost
+
+# Configure logging
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger(__name__)
+
+# Start analyses on the smallest model and escalate on invalid output
+CASCADE_ENABLED = os.getenv("LLM_ROUTER_CASCADE", "").lower() in ("1", "true", "yes")
+
+# Quality tiers
+SMALL = 1
+MEDIUM = 2
+LARGE = 3
+
+# Latency assumed per tier until a model has enough measured calls, in ms
+DEFAULT_LATENCY_MS = {SMALL: 4000.0, MEDIUM: 8000.0, LARGE: 15000.0}
+
+# Measured calls needed before a model's own p95 latency is used
+MIN_LATENCY_SAMPLES = 5
+
+# Output tokens reserved when a task does not say how much it generates
+DEFAULT_OUTPUT_TOKENS = 2000
+
+# Context windows of the Mistral models, in tokens
+MISTRAL_TOKEN_LIMITS = {
+    "mistral-small-latest": 32000,
+    "mistral-medium-latest": 128000,
+    "mistral-large-latest": 128000,
+}
+
+
+@dataclass(frozen=True)
+class ModelOption:
+    """A model the router can choose, with its quality tier"""
+    provider: str
+    model: str
+    tier: int
+
+
+# Models per provider, smallest first
+MODEL_CATALOG: Dict[str, List[ModelOption]] = {
+    "openai": [
+        ModelOption("openai", "gpt-4o-mini", SMALL),
+        ModelOption("openai", "gpt-4o", LARGE),
+    ],
+    "mistral": [
+        ModelOption("mistral", "mistral-small-latest", SMALL),
+        ModelOption("mistral", "mistral-medium-latest", MEDIUM),
+        ModelOption("mistral", "mistral-large-latest", LARGE),
+    ],
+}
+
+# Minimum quality tier of each analysis task
+TASK_TIERS = {
+    "documentation": SMALL,
+    "technology_stack": SMALL,
+    "code_quality": MEDIUM,
+    "security": MEDIUM,
+    "architecture": LARGE,
+    "repository_analysis": LARGE,
+}
+
+
+# Latency budget of each analysis task, in ms: fitting models whose expected
+# p95 latency exceeds it are skipped while a faster one fits
+TASK_LATENCY_BUDGETS_MS = {
+    "documentation": 10000.0,
+    "technology_stack": 10000.0,
+    "code_quality": 20000.0,
+    "security": 20000.0,
+    "architecture": 45000.0,
+    "repository_analysis": 60000.0,
+}
+
+# Overrides the latency budget of every task when set
+LATENCY_BUDGET_MS = os.getenv("LLM_ROUTER_LATENCY_BUDGET_MS")
+
+
+def get_model_token_limit(provider: str, model: str) -> int:
+    """
+    Get the context window of a model.
+
+    Args:
+        provider: Provider name.
+        model: Model name.
+
+    Returns:
+        The token limit, using the same tables and default as the provider
+        clients' get_model_token_limit.
+    """
+    if provider == "openai":
+        from openai_config import MODEL_TOKEN_LIMITS
+        return MODEL_TOKEN_LIMITS.get(model, 4096)
+    return MISTRAL_TOKEN_LIMITS.get(model, 4096)
+
+
+def latency_metric(provider: str, model: str) -> str:
+    """Name of the per-model chat latency histogram recorded by ProviderClient"""
+    return f"llm.{provider}.{model}.chat_ms"
+
+
+class ModelRouter:
+    """
+    Chooses the cheapest model that fits a task's tier, prompt size and
+    latency budget.
+    """
+
+    def __init__(
+        self,
+        catalog: Optional[Dict[str, List[ModelOption]]] = None,
+        task_tiers: Optional[Dict[str, int]] = None,
+        token_limit: Callable[[str, str], int] = get_model_token_limit,
+        latency_budgets: Optional[Dict[str, float]] = None
+    ):
+        """
+        Initialize the router.
+
+        Args:
+            catalog: Models per provider. If None, uses MODEL_CATALOG.
+            task_tiers: Minimum tier per task. If None, uses TASK_TIERS;
+                unknown tasks get LARGE.
+            token_limit: Returns the context window of (provider, model).
+            latency_budgets: Latency budget per task in ms. If None, uses
+                TASK_LATENCY_BUDGETS_MS; unknown tasks have no budget.
+        """
+        self.catalog = catalog or MODEL_CATALOG
+        self.task_tiers = task_tiers or TASK_TIERS
+        self.token_limit = token_limit
+        self.latency_budgets = TASK_LATENCY_BUDGETS_MS if latency_budgets is None else latency_budgets
+        self.registry = get_registry()
+
+    def latency_budget(self, task: str) -> Optional[float]:
+        """Latency budget of a task in ms (LLM_ROUTER_LATENCY_BUDGET_MS if set), or None"""
+        if LATENCY_BUDGET_MS:
+            return float(LATENCY_BUDGET_MS)
+        return self.latency_budgets.get(task)
+
+    def expected_latency_ms(self, option: ModelOption) -> float:
+        """Measured p95 latency of a model, or its tier's default until measured"""
+        histogram = self.registry.histogram(latency_metric(option.provider, option.model))
+        if histogram.count >= MIN_LATENCY_SAMPLES:
+            return histogram.percentile(95)
+        return DEFAULT_LATENCY_MS[option.tier]
+
+    def candidates(
+        self,
+        provider: str,
+        messages: List[Dict[str, Any]],
+        min_tier: int = SMALL,
+        max_output_tokens: int = DEFAULT_OUTPUT_TOKENS,
+        latency_budget_ms: Optional[float] = None,
+        prompt_tokens: Optional[int] = None
+    ) -> List[ModelOption]:
+        """
+        Models that can serve a request, cheapest first.
+
+        Args:
+            provider: Provider name.
+            messages: The chat messages.
+            min_tier: Lowest acceptable quality tier.
+            max_output_tokens: Tokens the answer may use.
+            latency_budget_ms: Drop models whose expected latency exceeds
+                this, unless none meets it.
+            prompt_tokens: Prompt size already counted by the caller; the
+                messages are counted per model when None.
+
+        Returns:
+            Fitting models ordered by estimated cost, then tier.
+        """
+        fitting = []
+        for option in self.catalog.get(provider, []):
+            if option.tier < min_tier:
+                continue
+            tokens = count_message_tokens(messages, option.model) if prompt_tokens is None else prompt_tokens
+            if tokens + max_output_tokens <= self.token_limit(provider, option.model):
+                cost = estimate_cost(option.model, tokens, max_output_tokens)
+                fitting.append((cost, option.tier, option))
+
+        if latency_budget_ms is not None:
+            fast = [entry for entry in fitting if self.expected_latency_ms(entry[2]) <= latency_budget_ms]
+            fitting = fast or sorted(fitting, key=lambda entry: self.expected_latency_ms(entry[2]))[:1]
+        return [option for _, _, option in sorted(fitting, key=lambda entry: entry[:2])]
+
+    def largest(self, provider: str) -> ModelOption:
+        """
+        The provider's model with the largest context window.
+
+        Args:
+            provider: Provider name.
+
+        Returns:
+            The model with the largest window, the highest tier on ties.
+        """
+        options = self.catalog.get(provider, [])
+        if not options:
+            raise ValueError(f"No models configured for provider: {provider}")
+        return max(options, key=lambda option: (self.token_limit(provider, option.model), option.tier))
+
+    def route(
+        self,
+        provider: str,
+        task: str,
+        messages: List[Dict[str, Any]],
+        max_output_tokens: int = DEFAULT_OUTPUT_TOKENS,
+        latency_budget_ms: Optional[float] = None,
+        prompt_tokens: Optional[int] = None
+    ) -> ModelOption:
+        """
+        Pick the model for one call.
+
+        Args:
+            provider: Provider name.
+            task: Task name, a key of the task tiers.
+            messages: The chat messages.
+            max_output_tokens: Tokens the answer may use.
+            latency_budget_ms: Latency budget for the call. If None, uses
+                the task's budget (latency_budget).
+            prompt_tokens: Prompt size already counted by the caller.
+
+        Returns:
+            The cheapest model of at least the task's tier that fits, among
+            those expected to answer within the budget.
+        """
+        if latency_budget_ms is None:
+            latency_budget_ms = self.latency_budget(task)
+        min_tier = self.task_tiers.get(task, LARGE)
+        options = self.candidates(provider, messages, min_tier, max_output_tokens, latency_budget_ms, prompt_tokens)
+        # Nothing of the task's tier fits the prompt; use the largest window
+        choice = options[0] if options else self.largest(provider)
+        self.registry.increment(f"llm.router.{choice.model}")
+        logger.info(f"Routed {task} to {choice.model} (tier {choice.tier})")
+        return choice
+
+    def _cascade_options(
+        self,
+        provider: str,
+        messages: List[Dict[str, Any]],
+        max_output_tokens: int
+    ) -> List[ModelOption]:
+        """Fitting models from the cheapest up, one per tier"""
+        options, tiers = [], set()
+        for option in sorted(
+            self.candidates(provider, messages, SMALL, max_output_tokens),
+            key=lambda option: option.tier
+        ):
+            if option.tier not in tiers:
+                tiers.add(option.tier)
+                options.append(option)
+        return options
+
+    def chat_with_cascade(
+        self,
+        client: ProviderClient,
+        messages: List[Dict[str, Any]],
+        validate: Callable[[str], bool],
+        max_output_tokens: int = DEFAULT_OUTPUT_TOKENS,
+        **kwargs
+    ) -> ChatResult:
+        """
+        Call the smallest fitting model, escalating while validation fails.
+
+        Args:
+            client: Provider client.
+            messages: The chat messages.
+            validate: Returns True if a response is acceptable.
+            max_output_tokens: Tokens the answer may use.
+            **kwargs: Additional chat arguments (temperature, ...).
+
+        Returns:
+            The first valid result, or the largest model's result if none
+            validates.
+        """
+        options = self._cascade_options(client.name, messages, max_output_tokens)
+        if not options:
+            return client.chat(messages, max_tokens=max_output_tokens, **kwargs)
+        result = None
+        for index, option in enumerate(options):
+            result = client.chat(messages, model=option.model, max_tokens=max_output_tokens, **kwargs)
+            if validate(result.content) or index == len(options) - 1:
+                return result
+            self.registry.increment("llm.router.escalations")
+            logger.info(f"{option.model} output failed validation; escalating")
+        return result
+
+    async def achat_with_cascade(
+        self,
+        client: ProviderClient,
+        messages: List[Dict[str, Any]],
+        validate: Callable[[str], bool],
+        max_output_tokens: int = DEFAULT_OUTPUT_TOKENS,
+        **kwargs
+    ) -> ChatResult:
+        """Async variant of chat_with_cascade"""
+        options = self._cascade_options(client.name, messages, max_output_tokens)
+        if not options:
+            return await client.achat(messages, max_tokens=max_output_tokens, **kwargs)
+        result = None
+        for index, option in enumerate(options):
+            result = await client.achat(messages, model=option.model, max_tokens=max_output_tokens, **kwargs)
+            if validate(result.content) or index == len(options) - 1:
+                return result
+            self.registry.increment("llm.router.escalations")
+            logger.info(f"{option.model} output failed validation; escalating")
+        return result
+
+
+_default_router = None
+_default_lock = threading.Lock()
+
+
+def get_router() -> ModelRouter:
+    """
+    Get the process-wide model router.
+
+    Returns:
+        The shared ModelRouter over MODEL_CATALOG and TASK_TIERS.
+    """
+    global _default_router
+    if _default_router is None:
+        with _default_lock:
+            if _default_router is None:
+                _default_router = ModelRouter()
+    return _default_router
@@ -6,19 +6,23 @@ including error handling, retry logic, and token management.
 """
 
 import os
-import time
 import logging
-from typing import Dict, Any, Optional, List, Union
+import threading
+from typing import Dict, Any, Optional, List, Union, Callable, TYPE_CHECKING
 from dotenv import load_dotenv
-import openai
-from openai import OpenAI
-from tenacity import (
-    retry,
-    stop_after_attempt,
-    wait_exponential,
-    retry_if_exception_type
+import tokenization
+from llm_providers import (
+    get_provider,
+    EmbeddingResult,
+    ProviderRateLimitError,
+    ProviderUnavailableError
 )
 
+if TYPE_CHECKING:
+    # The SDK is slow to import; it is loaded on first use
+    from openai import OpenAI
+    from openai.types.chat import ChatCompletion
+
 # Configure logging
 logging.basicConfig(
     level=logging.INFO,
@@ -41,11 +45,15 @@ MODEL_TOKEN_LIMITS = {
     "gpt-4": 8192,
     "gpt-4-turbo": 128000,
     "gpt-4o": 128000,
+    "gpt-4o-mini": 128000,
 }
 
 class OpenAIClient:
     """
     A wrapper class for the OpenAI client with error handling and retry logic.
+    
+    Requests go through the shared "openai" provider client, so every
+    OpenAIClient in the process reuses the same pooled connections.
     """
     
     def __init__(self, api_key: Optional[str] = None, model: Optional[str] = None):
@@ -61,26 +69,29 @@ class OpenAIClient:
             raise ValueError("OpenAI API key is required. Set OPENAI_API_KEY environment variable or pass it explicitly.")
         
         self.model = model or DEFAULT_MODEL
-        self.client = OpenAI(api_key=self.api_key)
+        self.provider = get_provider("openai", api_key=self.api_key)
+        self._sdk_client = None
         logger.info(f"OpenAI client initialized with model: {self.model}")
     
-    @retry(
-        retry=retry_if_exception_type((
-            openai.RateLimitError,
-            openai.APITimeoutError,
-            openai.APIConnectionError
-        )),
-        wait=wait_exponential(multiplier=1, min=2, max=60),
-        stop=stop_after_attempt(5)
-    )
+    @property
+    def client(self) -> "OpenAI":
+        """The OpenAI SDK client, created on first use for SDK-only endpoints"""
+        if self._sdk_client is None:
+            from openai import OpenAI
+            self._sdk_client = OpenAI(api_key=self.api_key, base_url=self.provider.config.base_url)
+        return self._sdk_client
+    
     def chat_completion(
         self,
         messages: List[Dict[str, str]],
         model: Optional[str] = None,
         temperature: Optional[float] = None,
         max_tokens: Optional[int] = None,
+        stream: bool = False,
+        on_field: Optional[Callable[[str, Any], None]] = None,
+        stop_when: Optional[Callable[[Dict[str, Any]], bool]] = None,
         **kwargs
-    ) -> Dict[str, Any]:
+    ) -> "ChatCompletion":
         """
         Send a chat completion request to the OpenAI API with retry logic.
         
@@ -89,51 +100,111 @@ class OpenAIClient:
             model: Model to use. If None, uses the default model.
             temperature: Temperature for sampling. If None, uses the default temperature.
             max_tokens: Maximum tokens to generate. If None, uses the default max tokens.
+            stream: Stream the completion, parsing a JSON answer as it arrives.
+            on_field: When streaming, called with (name, value) as each
+                top-level field of the JSON answer closes.
+            stop_when: When streaming, called with the fields parsed so far;
+                returning True stops the generation early.
             **kwargs: Additional arguments to pass to the API.
             
         Returns:
-            The API response.
+            The API response (assembled from the stream when streaming).
         """
-        model = model or self.model
-        temperature = temperature or TEMPERATURE
-        max_tokens = max_tokens or MAX_TOKENS
-        
         try:
-            start_time = time.time()
-            response = self.client.chat.completions.create(
-                model=model,
-                messages=messages,
-                temperature=temperature,
-                max_tokens=max_tokens,
+            if stream:
+                result = self.provider.chat_stream(
+                    messages,
+                    model=model or self.model,
+                    temperature=temperature or TEMPERATURE,
+                    max_tokens=max_tokens or MAX_TOKENS,
+                    on_field=on_field,
+                    stop_when=stop_when,
+                    **kwargs
+                )
+                return _chat_completion(result.raw)
+            result = self.provider.chat(
+                messages,
+                model=model or self.model,
+                temperature=temperature or TEMPERATURE,
+                max_tokens=max_tokens or MAX_TOKENS,
                 **kwargs
             )
-            elapsed_time = time.time() - start_time
-            
-            # Log usage information
-            if hasattr(response, 'usage'):
-                logger.info(
-                    f"OpenAI API call: model={model}, "
-                    f"prompt_tokens={response.usage.prompt_tokens}, "
-                    f"completion_tokens={response.usage.completion_tokens}, "
-                    f"total_tokens={response.usage.total_tokens}, "
-                    f"time={elapsed_time:.2f}s"
-                )
-            
-            return response
-        
-        except openai.RateLimitError as e:
-            logger.warning(f"Rate limit exceeded: {str(e)}")
-            raise
-        except openai.APITimeoutError as e:
-            logger.warning(f"API timeout: {str(e)}")
-            raise
-        except openai.APIConnectionError as e:
-            logger.warning(f"API connection error: {str(e)}")
+            return _chat_completion(result.raw)
+        except Exception as e:
+            self._log_error(e)
             raise
+    
+    async def achat_completion(
+        self,
+        messages: List[Dict[str, str]],
+        model: Optional[str] = None,
+        temperature: Optional[float] = None,
+        max_tokens: Optional[int] = None,
+        **kwargs
+    ) -> "ChatCompletion":
+        """
+        Async variant of chat_completion. Concurrent calls share the provider's
+        async connection pool and in-flight request limit.
+        
+        Args:
+            messages: List of message dictionaries.
+            model: Model to use. If None, uses the default model.
+            temperature: Temperature for sampling. If None, uses the default temperature.
+            max_tokens: Maximum tokens to generate. If None, uses the default max tokens.
+            **kwargs: Additional arguments to pass to the API.
+            
+        Returns:
+            The API response.
+        """
+        try:
+            result = await self.provider.achat(
+                messages,
+                model=model or self.model,
+                temperature=temperature or TEMPERATURE,
+                max_tokens=max_tokens or MAX_TOKENS,
+                **kwargs
+            )
+            return _chat_completion(result.raw)
         except Exception as e:
-            logger.error(f"Error in OpenAI API call: {str(e)}")
+            self._log_error(e)
             raise
     
+    @staticmethod
+    def _log_error(error: Exception):
+        """Log a failed API call"""
+        if isinstance(error, ProviderRateLimitError):
+            logger.warning(f"Rate limit exceeded: {str(error)}")
+        elif isinstance(error, ProviderUnavailableError):
+            logger.warning(f"API unavailable: {str(error)}")
+        else:
+            logger.error(f"Error in OpenAI API call: {str(error)}")
+    
+    def embed(self, texts: List[str], model: Optional[str] = None) -> EmbeddingResult:
+        """
+        Embed a list of texts.
+        
+        Args:
+            texts: The texts to embed.
+            model: Embedding model. If None, uses the provider default.
+            
+        Returns:
+            The embedding result.
+        """
+        return self.provider.embed(texts, model=model)
+    
+    async def aembed(self, texts: List[str], model: Optional[str] = None) -> EmbeddingResult:
+        """
+        Async variant of embed.
+        
+        Args:
+            texts: The texts to embed.
+            model: Embedding model. If None, uses the provider default.
+            
+        Returns:
+            The embedding result.
+        """
+        return await self.provider.aembed(texts, model=model)
+    
     def count_tokens(self, text: str, model: Optional[str] = None) -> int:
         """
         Count the number of tokens in a text.
@@ -145,14 +216,27 @@ class OpenAIClient:
         Returns:
             The number of tokens.
         """
-        # This is a simplified implementation
-        # For more accurate token counting, use tiktoken
-        return len(text) // 4  # Rough approximation
+        return tokenization.count_tokens(text, model or self.model)
+    
+    def count_tokens_batch(self, texts: List[str], model: Optional[str] = None) -> List[int]:
+        """
+        Count the number of tokens in several texts.
+        
+        Args:
+            texts: The texts to count tokens for.
+            model: The model to use for counting tokens.
+            
+        Returns:
+            The number of tokens of each text.
+        """
+        return tokenization.count_tokens_batch(texts, model or self.model)
     
     def chunk_text(self, text: str, max_chunk_tokens: int = 4000, model: Optional[str] = None) -> List[str]:
         """
         Split text into chunks that fit within token limits.
         
+        The text is tokenized once and split at token offsets.
+        
         Args:
             text: The text to split.
             max_chunk_tokens: Maximum tokens per chunk.
@@ -161,27 +245,7 @@ class OpenAIClient:
         Returns:
             List of text chunks.
         """
-        # This is a simplified implementation
-        # For more sophisticated chunking, consider semantic chunking
-        words = text.split()
-        chunks = []
-        current_chunk = []
-        current_token_count = 0
-        
-        for word in words:
-            word_token_count = self.count_tokens(word)
-            if current_token_count + word_token_count > max_chunk_tokens:
-                chunks.append(" ".join(current_chunk))
-                current_chunk = [word]
-                current_token_count = word_token_count
-            else:
-                current_chunk.append(word)
-                current_token_count += word_token_count
-        
-        if current_chunk:
-            chunks.append(" ".join(current_chunk))
-        
-        return chunks
+        return tokenization.chunk_text(text, max_chunk_tokens, model or self.model)
 
     def get_model_token_limit(self, model: Optional[str] = None) -> int:
         """
@@ -196,20 +260,29 @@ class OpenAIClient:
         model = model or self.model
         return MODEL_TOKEN_LIMITS.get(model, 4096)
 
-# Create a default client instance
-try:
-    default_client = OpenAIClient()
-except ValueError as e:
-    logger.warning(f"Could not initialize default OpenAI client: {str(e)}")
-    default_client = None
+def _chat_completion(raw: Dict[str, Any]) -> "ChatCompletion":
+    """Validate a raw chat response into the SDK's ChatCompletion type"""
+    from openai.types.chat import ChatCompletion
+    return ChatCompletion.model_validate(raw)
+
+# The default client instance, created on the first get_client call
+default_client = None
+_default_client_lock = threading.Lock()
 
 def get_client() -> OpenAIClient:
     """
-    Get the default OpenAI client instance.
+    Get the default OpenAI client instance, creating it on first use.
     
     Returns:
         The default OpenAI client.
     """
+    global default_client
     if default_client is None:
-        raise ValueError("Default OpenAI client is not initialized. Set OPENAI_API_KEY environment variable.")
+        with _default_client_lock:
+            if default_client is None:
+                try:
+                    default_client = OpenAIClient()
+                except ValueError as e:
+                    logger.warning(f"Could not initialize default OpenAI client: {str(e)}")
+                    raise ValueError("Default OpenAI client is not initialized. Set OPENAI_API_KEY environment variable.")
     return default_client
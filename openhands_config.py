@@ -8,8 +8,11 @@ including error handling, retry logic, and token management.
 import os
 import time
 import logging
+import threading
 from typing import Dict, Any, Optional, List, Union
 from dotenv import load_dotenv
+import tokenization
+from llm_providers import get_provider
 from tenacity import (
     retry,
     stop_after_attempt,
@@ -34,6 +37,10 @@ MAX_TOKENS = int(os.getenv("OPENHANDS_MAX_TOKENS", "4096"))
 TEMPERATURE = float(os.getenv("OPENHANDS_TEMPERATURE", "1.0"))
 THINKING = os.getenv("OPENHANDS_THINKING", "high")
 
+# OpenAI-compatible endpoint to send requests to, e.g. the mock LLM server;
+# responses are simulated in-process when unset
+OPENHANDS_BASE_URL = os.getenv("OPENHANDS_BASE_URL")
+
 # Token limits for different models
 MODEL_TOKEN_LIMITS = {
     "o4-mini": 8192,
@@ -61,18 +68,9 @@ class OpenHandsClient:
             raise ValueError("OpenHands API key is required. Set OPENHANDS_API_KEY environment variable or pass it explicitly.")
         
         self.model = model or DEFAULT_MODEL
-        # In a real implementation, initialize the actual client here
-        # self.client = OpenHands(api_key=self.api_key)
+        self.provider = get_provider("openhands", api_key=self.api_key) if OPENHANDS_BASE_URL else None
         logger.info(f"OpenHands client initialized with model: {self.model}")
     
-    @retry(
-        retry=retry_if_exception_type((
-            ConnectionError,
-            TimeoutError
-        )),
-        wait=wait_exponential(multiplier=1, min=2, max=60),
-        stop=stop_after_attempt(5)
-    )
     def chat_completion(
         self,
         messages: List[Dict[str, str]],
@@ -85,6 +83,11 @@ class OpenHandsClient:
         """
         Send a chat completion request to the OpenHands API with retry logic.
         
+        Requests to a configured endpoint go through the shared "openhands"
+        provider client, which retries within the call's deadline and records
+        the call in the usage ledger. Without an endpoint the response is
+        simulated, with the legacy retry loop.
+        
         Args:
             messages: List of message dictionaries.
             model: Model to use. If None, uses the default model.
@@ -101,6 +104,50 @@ class OpenHandsClient:
         max_tokens = max_tokens or MAX_TOKENS
         thinking = thinking or THINKING
         
+        if self.provider is not None:
+            try:
+                result = self.provider.chat(
+                    messages, model=model, temperature=temperature, max_tokens=max_tokens,
+                    thinking=thinking, **kwargs
+                )
+                return result.raw
+            except Exception as e:
+                logger.error(f"Error in OpenHands API call: {str(e)}")
+                raise
+        
+        return self._direct_completion(messages, model, temperature, max_tokens, thinking, **kwargs)
+    
+    @retry(
+        retry=retry_if_exception_type((
+            ConnectionError,
+            TimeoutError
+        )),
+        wait=wait_exponential(multiplier=1, min=2, max=60),
+        stop=stop_after_attempt(5)
+    )
+    def _direct_completion(
+        self,
+        messages: List[Dict[str, str]],
+        model: str,
+        temperature: float,
+        max_tokens: int,
+        thinking: str,
+        **kwargs
+    ) -> Dict[str, Any]:
+        """
+        Send a chat completion request directly, retrying connection errors.
+        
+        Args:
+            messages: List of message dictionaries.
+            model: Model to use.
+            temperature: Temperature for sampling.
+            max_tokens: Maximum tokens to generate.
+            thinking: Thinking level (low, medium, high).
+            **kwargs: Additional arguments to pass to the API.
+            
+        Returns:
+            The API response.
+        """
         try:
             start_time = time.time()
             
@@ -213,14 +260,27 @@ class OpenHandsClient:
         Returns:
             The number of tokens.
         """
-        # This is a simplified implementation
-        # For more accurate token counting, use a proper tokenizer
-        return len(text) // 4  # Rough approximation
+        return tokenization.count_tokens(text, model or self.model)
+    
+    def count_tokens_batch(self, texts: List[str], model: Optional[str] = None) -> List[int]:
+        """
+        Count the number of tokens in several texts.
+        
+        Args:
+            texts: The texts to count tokens for.
+            model: The model to use for counting tokens.
+            
+        Returns:
+            The number of tokens of each text.
+        """
+        return tokenization.count_tokens_batch(texts, model or self.model)
     
     def chunk_text(self, text: str, max_chunk_tokens: int = 4000, model: Optional[str] = None) -> List[str]:
         """
         Split text into chunks that fit within token limits.
         
+        The text is tokenized once and split at token offsets.
+        
         Args:
             text: The text to split.
             max_chunk_tokens: Maximum tokens per chunk.
@@ -229,27 +289,7 @@ class OpenHandsClient:
         Returns:
             List of text chunks.
         """
-        # This is a simplified implementation
-        # For more sophisticated chunking, consider semantic chunking
-        words = text.split()
-        chunks = []
-        current_chunk = []
-        current_token_count = 0
-        
-        for word in words:
-            word_token_count = self.count_tokens(word)
-            if current_token_count + word_token_count > max_chunk_tokens:
-                chunks.append(" ".join(current_chunk))
-                current_chunk = [word]
-                current_token_count = word_token_count
-            else:
-                current_chunk.append(word)
-                current_token_count += word_token_count
-        
-        if current_chunk:
-            chunks.append(" ".join(current_chunk))
-        
-        return chunks
+        return tokenization.chunk_text(text, max_chunk_tokens, model or self.model)
 
     def get_model_token_limit(self, model: Optional[str] = None) -> int:
         """
@@ -264,20 +304,24 @@ class OpenHandsClient:
         model = model or self.model
         return MODEL_TOKEN_LIMITS.get(model, 8192)
 
-# Create a default client instance
-try:
-    default_client = OpenHandsClient()
-except ValueError as e:
-    logger.warning(f"Could not initialize default OpenHands client: {str(e)}")
-    default_client = None
+# The default client instance, created on the first get_client call
+default_client = None
+_default_client_lock = threading.Lock()
 
 def get_client() -> OpenHandsClient:
     """
-    Get the default OpenHands client instance.
+    Get the default OpenHands client instance, creating it on first use.
     
     Returns:
         The default OpenHands client.
     """
+    global default_client
     if default_client is None:
-        raise ValueError("Default OpenHands client is not initialized. Set OPENHANDS_API_KEY environment variable.")
+        with _default_client_lock:
+            if default_client is None:
+                try:
+                    default_client = OpenHandsClient()
+                except ValueError as e:
+                    logger.warning(f"Could not initialize default OpenHands client: {str(e)}")
+                    raise ValueError("Default OpenHands client is not initialized. Set OPENHANDS_API_KEY environment variable.")
     return default_client
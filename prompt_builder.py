@@ -0,0 +1,139 @@
+"""
+Prompt Builder Module
+
+This module lays out analysis prompts so that provider-side prompt caching
+can reuse work across calls. The large repository context comes first and
+is serialized canonically (sorted keys, fixed separators, no volatile
+values), so every prompt about the same repository state starts with a
+byte-identical prefix. The short per-task instructions come last, where they
+do not break the shared prefix.
+
+Providers report how much of a prompt was served from their cache in the
+usage block (prompt_tokens_details.cached_tokens); cached_prompt_tokens
+reads it so callers and the usage ledger can record it.
+"""
+
+import json
+from typing import Dict, Any, List, Sequence, Tuple
+
+DEFAULT_SYSTEM_PROMPT = "You are a code analysis expert that provides detailed repository analysis."
+
+# Separates the shared context from the task instructions
+INSTRUCTIONS_HEADER = "TASK:"
+
+REPOSITORY_ANALYSIS_INSTRUCTIONS = """Analyze this GitHub repository based on the information above.
+
+Provide a comprehensive analysis including:
+1. Repository type and primary purpose
+2. Technology stack identification
+3. Code quality assessment (structure, documentation, testing, CI/CD)
+4. Security analysis
+5. Specific recommendations for improvement
+6. Analysis of GitHub workflows
+7. Scores for complexity (1-10), maintainability (1-10), and scalability potential (1-10)
+
+Format your response as a JSON object with the following structure:
+{
+    "repository_type": "string",
+    "primary_purpose": "string",
+    "technology_stack": ["string"],
+    "code_quality_assessment": {
+        "structure": "string",
+        "documentation": "string",
+        "testing": "string",
+        "ci_cd": "string"
+    },
+    "security_analysis": {
+        "dependencies": "string",
+        "workflows": "string",
+        "secrets_management": "string"
+    },
+    "recommendations": ["string"],
+    "workflow_analysis": {
+        "workflow_name.yml": {
+            "purpose": "string",
+            "triggers": "string",
+            "security": "string"
+        }
+    },
+    "complexity_score": "string (e.g., 'Low (1/10)')",
+    "maintainability_score": "string (e.g., 'High (8/10)')",
+    "scalability_potential": "string (e.g., 'Medium (5/10)')"
+}"""
+
+# Top-level fields of the repository analysis answer
+REPOSITORY_ANALYSIS_FIELDS = frozenset([
+    "repository_type", "primary_purpose", "technology_stack", "code_quality_assessment",
+    "security_analysis", "recommendations", "workflow_analysis", "complexity_score",
+    "maintainability_score", "scalability_potential",
+])
+
+
+def serialize(value: Any) -> str:
+    """
+    Serialize a context value canonically.
+
+    Strings are used as they are; anything else becomes JSON with sorted keys
+    and fixed separators, so equal values always produce identical bytes.
+
+    Args:
+        value: String or JSON-serializable value.
+
+    Returns:
+        The serialized value.
+    """
+    if isinstance(value, str):
+        return value
+    return json.dumps(value, sort_keys=True, indent=1, ensure_ascii=False, default=str)
+
+
+def build_context(sections: Sequence[Tuple[str, Any]]) -> str:
+    """
+    Render titled context sections into the shared prompt prefix.
+
+    Put the sections that change least often first: the cache can only
+    reuse the prompt up to the first byte that differs.
+
+    Args:
+        sections: (title, value) pairs, in prompt order.
+
+    Returns:
+        The context block.
+    """
+    return "\n\n".join(f"{title}:\n{serialize(value)}" for title, value in sections)
+
+
+def build_messages(
+    context: str,
+    instructions: str,
+    system: str = DEFAULT_SYSTEM_PROMPT
+) -> List[Dict[str, str]]:
+    """
+    Build chat messages with the shared context first and the task last.
+
+    Args:
+        context: Output of build_context, identical for every task on the
+            same repository state.
+        instructions: The task-specific instructions.
+        system: System message; keep it constant across tasks.
+
+    Returns:
+        Chat messages for the provider client.
+    """
+    messages = [{"role": "system", "content": system}] if system else []
+    messages.append({"role": "user", "content": f"{context}\n\n{INSTRUCTIONS_HEADER}\n{instructions.strip()}"})
+    return messages
+
+
+def cached_prompt_tokens(usage: Dict[str, Any]) -> int:
+    """
+    Get the number of prompt tokens the provider served from its cache.
+
+    Args:
+        usage: Usage block of a chat completion response.
+
+    Returns:
+        Cached prompt tokens, 0 if none were reported.
+    """
+    details = (usage or {}).get("prompt_tokens_details") or {}
+    return int(details.get("cached_tokens") or 0)
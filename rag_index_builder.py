@@ -0,0 +1,256 @@
+#!/usr/bin/env python3
+"""
+Background RAG Index Builder
+
+This module runs RAG index builds as background jobs. Embeddings are written
+to a checkpoint file as they are produced, so a build that fails or is
+cancelled partway through can be resumed without paying for the chunks that
+were already embedded. The live vector and document stores are only replaced
+once a build completes, so readers keep using the previous index meanwhile.
+"""
+
+import os
+import json
+import time
+import hashlib
+import logging
+import threading
+from typing import Dict, Any, List, Optional, Callable
+
+from openai_config import OpenAIClient
+from metrics import StageTimer
+from rag_system import RAGSystem, VECTOR_STORE_PATH, DOCUMENT_STORE_PATH, REPORT_INDEX_PATH
+
+# Configure logging
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger(__name__)
+
+# Constants
+CHECKPOINT_DIR = ".rag_build"
+CHECKPOINT_FILE = "embeddings.jsonl"
+
+# Job states
+PENDING = "pending"
+RUNNING = "running"
+COMPLETED = "completed"
+FAILED = "failed"
+CANCELLED = "cancelled"
+
+
+class IndexBuildJob:
+    """
+    A resumable RAG index build that runs in a background thread.
+    """
+
+    def __init__(
+        self,
+        openai_client: Optional[OpenAIClient] = None,
+        checkpoint_dir: str = CHECKPOINT_DIR,
+        vector_store_path: str = VECTOR_STORE_PATH,
+        document_store_path: str = DOCUMENT_STORE_PATH,
+        report_index_path: str = REPORT_INDEX_PATH,
+        resume: bool = True,
+        on_complete: Optional[Callable[[RAGSystem], None]] = None
+    ):
+        """
+        Initialize the build job.
+
+        Args:
+            openai_client: OpenAI client used for embeddings. If None, uses the default client.
+            checkpoint_dir: Directory holding the embedding checkpoint.
+            vector_store_path: Destination of the FAISS index.
+            document_store_path: Destination of the document store.
+            report_index_path: Destination of the structured report index.
+            resume: If True, reuse embeddings from an existing checkpoint.
+            on_complete: Called with the new RAGSystem once the build has been saved.
+        """
+        self.openai_client = openai_client
+        self.checkpoint_dir = checkpoint_dir
+        self.checkpoint_path = os.path.join(checkpoint_dir, CHECKPOINT_FILE)
+        self.vector_store_path = vector_store_path
+        self.document_store_path = document_store_path
+        self.report_index_path = report_index_path
+        self.resume = resume
+        self.on_complete = on_complete
+
+        self.state = PENDING
+        self.error = None
+        self.total_chunks = 0
+        self.embedded_chunks = 0
+        self.resumed_chunks = 0
+        self.tokens_spent = 0
+        self.started_at = None
+        self.finished_at = None
+
+        self._cancel_event = threading.Event()
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def start(self) -> "IndexBuildJob":
+        """
+        Start the build in a background thread.
+
+        Returns:
+            The job itself.
+        """
+        with self._lock:
+            if self._thread is not None:
+                raise RuntimeError("Index build job has already been started")
+            self._thread = threading.Thread(target=self.run, name="rag-index-build", daemon=True)
+            self._thread.start()
+        return self
+
+    def cancel(self):
+        """Request cancellation. Embeddings produced so far stay checkpointed."""
+        self._cancel_event.set()
+
+    def wait(self, timeout: Optional[float] = None) -> bool:
+        """
+        Wait for the background thread to finish.
+
+        Args:
+            timeout: Maximum seconds to wait. If None, waits indefinitely.
+
+        Returns:
+            True if the job has finished.
+        """
+        if self._thread is not None:
+            self._thread.join(timeout)
+        return self.is_finished()
+
+    def is_finished(self) -> bool:
+        """Check whether the job has reached a terminal state"""
+        return self.state in (COMPLETED, FAILED, CANCELLED)
+
+    def progress(self) -> Dict[str, Any]:
+        """
+        Get the current progress of the build.
+
+        Returns:
+            Dictionary with state, chunk counts, throughput, ETA and tokens spent.
+        """
+        with self._lock:
+            embedded = self.embedded_chunks
+            resumed = self.resumed_chunks
+            total = self.total_chunks
+            started = self.started_at
+            finished = self.finished_at
+
+        elapsed = ((finished or time.time()) - started) if started else 0.0
+        new_chunks = embedded - resumed
+        rate = new_chunks / elapsed if elapsed > 0 else 0.0
+        remaining = max(total - embedded, 0)
+
+        return {
+            "state": self.state,
+            "total_chunks": total,
+            "embedded_chunks": embedded,
+            "resumed_chunks": resumed,
+            "chunks_per_second": round(rate, 3),
+            "eta_seconds": round(remaining / rate, 1) if rate > 0 and not self.is_finished() else None,
+            "elapsed_seconds": round(elapsed, 3),
+            "tokens_spent": self.tokens_spent,
+            "error": self.error
+        }
+
+    def run(self):
+        """Run the build synchronously in the calling thread"""
+        self.state = RUNNING
+        self.started_at = time.time()
+        try:
+            rag = RAGSystem(openai_client=self.openai_client)
+            documents = rag.collect_documents()
+            with self._lock:
+                self.total_chunks = len(documents)
+
+            embeddings = self._load_checkpoint(documents) if self.resume else {}
+            if not self.resume:
+                self._clear_checkpoint()
+            with self._lock:
+                self.resumed_chunks = len(embeddings)
+                self.embedded_chunks = len(embeddings)
+
+            os.makedirs(self.checkpoint_dir, exist_ok=True)
+            timer = StageTimer("rag.build")
+            with open(self.checkpoint_path, 'a', encoding='utf-8') as checkpoint:
+                if checkpoint.tell() > 0 and not self._ends_with_newline():
+                    # Terminate a partially written line from an interrupted build
+                    checkpoint.write("\n")
+                for doc_id, doc in documents.items():
+                    if doc_id in embeddings:
+                        continue
+                    if self._cancel_event.is_set():
+                        self.state = CANCELLED
+                        logger.info(f"Index build cancelled after {self.embedded_chunks} chunks")
+                        return
+
+                    tokens_before = timer.tokens.get("embedding_tokens", 0)
+                    with timer.stage("embedding"):
+                        embedding = rag._get_embedding(doc["content"], timer=timer)
+                    if embedding is None:
+                        raise RuntimeError(f"Embedding failed for document {doc_id}")
+
+                    checkpoint.write(json.dumps({
+                        "doc_id": doc_id,
+                        "content_hash": self._content_hash(doc["content"]),
+                        "embedding": list(embedding)
+                    }) + "\n")
+                    checkpoint.flush()
+
+                    embeddings[doc_id] = embedding
+                    with self._lock:
+                        self.embedded_chunks += 1
+                        self.tokens_spent += timer.tokens.get("embedding_tokens", 0) - tokens_before
+
+            rag.build_index(embeddings)
+            rag.save(self.vector_store_path, self.document_store_path, self.report_index_path)
+            self._clear_checkpoint()
+            self.state = COMPLETED
+            logger.info(f"Index build completed with {len(rag.documents)} documents")
+
+            if self.on_complete:
+                self.on_complete(rag)
+        except Exception as e:
+            self.error = str(e)
+            self.state = FAILED
+            logger.exception(f"Index build failed: {str(e)}")
+        finally:
+            self.finished_at = time.time()
+
+    def _load_checkpoint(self, documents: Dict[str, Dict[str, Any]]) -> Dict[str, List[float]]:
+        """Load checkpointed embeddings that still match the current documents"""
+        embeddings = {}
+        if not os.path.exists(self.checkpoint_path):
+            return embeddings
+
+        with open(self.checkpoint_path, 'r', encoding='utf-8') as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError:
+                    # A partially written last line from an interrupted build
+                    continue
+                doc = documents.get(record.get("doc_id"))
+                if doc is not None and record.get("content_hash") == self._content_hash(doc["content"]):
+                    embeddings[record["doc_id"]] = record["embedding"]
+
+        logger.info(f"Resuming index build with {len(embeddings)} checkpointed embeddings")
+        return embeddings
+
+    def _clear_checkpoint(self):
+        """Remove the checkpoint file"""
+        if os.path.exists(self.checkpoint_path):
+            os.remove(self.checkpoint_path)
+
+    def _ends_with_newline(self) -> bool:
+        """Check whether the checkpoint file ends with a complete line"""
+        with open(self.checkpoint_path, 'rb') as f:
+            f.seek(-1, os.SEEK_END)
+            return f.read(1) == b"\n"
+
+    @staticmethod
+    def _content_hash(content: str) -> str:
+        return hashlib.sha256(content.encode('utf-8')).hexdigest()
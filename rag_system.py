@@ -11,12 +11,13 @@ import os
 import json
 import logging
 from typing import Dict, Any, List, Optional, Tuple
-import faiss
-import numpy as np
 from pathlib import Path
 import re
 
 from openai_config import get_client, OpenAIClient
+from metrics import StageTimer
+from structured_query import ReportIndex, StructuredQueryEngine
+from report_ingesters import ingest_reports
 
 # Configure logging
 logging.basicConfig(
@@ -28,7 +29,9 @@ logger = logging.getLogger(__name__)
 # Constants
 VECTOR_STORE_PATH = "vector_store.faiss"
 DOCUMENT_STORE_PATH = "document_store.json"
+REPORT_INDEX_PATH = "report_index.json"
 EMBEDDING_DIMENSION = 1536  # OpenAI embedding dimension
+EMBEDDING_MODEL = "text-embedding-3-small"
 
 class RAGSystem:
     def __init__(self, openai_client: Optional[OpenAIClient] = None):
@@ -46,6 +49,7 @@ class RAGSystem:
             
         self.index = None
         self.documents = {}
+        self.report_index = ReportIndex()
         
     def initialize(self, force: bool = False):
         """
@@ -61,9 +65,29 @@ class RAGSystem:
         
         logger.info("Initializing new vector store and document store")
         
-        # Create a new FAISS index
-        self.index = faiss.IndexFlatL2(EMBEDDING_DIMENSION)
+        # Collect documents, embed them and build the index
+        self.documents = self.collect_documents()
+        embeddings = {}
+        for doc_id, doc in self.documents.items():
+            embedding = self._get_embedding(doc["content"])
+            if embedding is not None:
+                embeddings[doc_id] = embedding
+        self.build_index(embeddings)
+        
+        # Save the index and documents
+        self.save()
+        
+        return True
+    
+    def collect_documents(self) -> Dict[str, Dict[str, Any]]:
+        """
+        Collect and chunk all documents to be indexed, without embedding them.
+        
+        Returns:
+            Ordered mapping of document ID to document.
+        """
         self.documents = {}
+        self.report_index = ReportIndex()
         
         # Process repository documentation
         self._process_repository_documentation()
@@ -71,10 +95,29 @@ class RAGSystem:
         # Process analysis reports
         self._process_analysis_reports()
         
-        # Save the index and documents
-        self.save()
+        return self.documents
+    
+    def build_index(self, embeddings: Dict[str, List[float]]):
+        """
+        Build the FAISS index from precomputed embeddings.
         
-        return True
+        Documents without an embedding are dropped so that index positions
+        stay aligned with the document store order.
+        
+        Args:
+            embeddings: Mapping of document ID to embedding vector.
+        """
+        import faiss
+        import numpy as np
+        
+        self.documents = {
+            doc_id: doc for doc_id, doc in self.documents.items() if doc_id in embeddings
+        }
+        vectors = np.array([embeddings[doc_id] for doc_id in self.documents], dtype=np.float32)
+        dimension = vectors.shape[1] if len(vectors) else EMBEDDING_DIMENSION
+        self.index = faiss.IndexFlatL2(dimension)
+        if len(vectors):
+            self.index.add(vectors)
     
     def _process_repository_documentation(self):
         """Process repository documentation files"""
@@ -101,16 +144,6 @@ class RAGSystem:
                         "file": "README.md"
                     }
                 }
-                
-                # Generate embedding and add to index
-                if self.openai_client:
-                    embedding = self._get_embedding(chunk)
-                    if embedding is not None:
-                        if len(self.documents) == 1:  # First document
-                            self.index = faiss.IndexFlatL2(len(embedding))
-                            self.index.add(np.array([embedding], dtype=np.float32))
-                        else:
-                            self.index.add(np.array([embedding], dtype=np.float32))
         
         # Process other documentation files
         doc_files = list(Path(".").glob("**/*.md"))
@@ -140,153 +173,20 @@ class RAGSystem:
                             "file": str(doc_file)
                         }
                     }
-                    
-                    # Generate embedding and add to index
-                    if self.openai_client:
-                        embedding = self._get_embedding(chunk)
-                        if embedding is not None:
-                            self.index.add(np.array([embedding], dtype=np.float32))
             except Exception as e:
                 logger.error(f"Error processing {doc_file}: {str(e)}")
     
     def _process_analysis_reports(self):
-        """Process analysis reports"""
+        """Process analysis reports using the registered report ingesters"""
         logger.info("Processing analysis reports")
         
-        # Process Mistral analysis report
-        mistral_report_path = Path("analysis_report.json")
-        if mistral_report_path.exists():
-            try:
-                with open(mistral_report_path, 'r', encoding='utf-8') as f:
-                    mistral_report = json.load(f)
-                
-                # Extract relevant sections
-                if "mistral_analysis" in mistral_report:
-                    analysis = mistral_report["mistral_analysis"]
-                    
-                    # Process each section
-                    sections = {
-                        "repository_type": analysis.get("repository_type", ""),
-                        "primary_purpose": analysis.get("primary_purpose", ""),
-                        "technology_stack": ", ".join(analysis.get("technology_stack", [])),
-                        "code_quality": json.dumps(analysis.get("code_quality_assessment", {}), indent=2),
-                        "security_analysis": json.dumps(analysis.get("security_analysis", {}), indent=2),
-                        "recommendations": "\n".join([f"- {rec}" for rec in analysis.get("recommendations", [])]),
-                        "complexity_score": analysis.get("complexity_score", ""),
-                        "maintainability_score": analysis.get("maintainability_score", ""),
-                        "scalability_potential": analysis.get("scalability_potential", "")
-                    }
-                    
-                    # Add each section to the document store
-                    for section_name, content in sections.items():
-                        if content:
-                            doc_id = f"mistral_{section_name}"
-                            self.documents[doc_id] = {
-                                "content": content,
-                                "source": "Mistral Analysis",
-                                "section": section_name,
-                                "metadata": {
-                                    "type": "analysis",
-                                    "tool": "mistral",
-                                    "section": section_name
-                                }
-                            }
-                            
-                            # Generate embedding and add to index
-                            if self.openai_client:
-                                embedding = self._get_embedding(content)
-                                if embedding is not None:
-                                    self.index.add(np.array([embedding], dtype=np.float32))
-            except Exception as e:
-                logger.error(f"Error processing Mistral analysis report: {str(e)}")
-        
-        # Process OpenAI analysis report
-        openai_report_path = Path("openai_analysis_report.json")
-        if openai_report_path.exists():
-            try:
-                with open(openai_report_path, 'r', encoding='utf-8') as f:
-                    openai_report = json.load(f)
-                
-                # Extract relevant sections
-                if "openai_analysis" in openai_report:
-                    analysis = openai_report["openai_analysis"]
-                    
-                    # Process each section
-                    sections = {
-                        "repository_type": analysis.get("repository_type", ""),
-                        "primary_purpose": analysis.get("primary_purpose", ""),
-                        "technology_stack": ", ".join(analysis.get("technology_stack", [])),
-                        "code_quality": json.dumps(analysis.get("code_quality_assessment", {}), indent=2),
-                        "security_analysis": json.dumps(analysis.get("security_analysis", {}), indent=2),
-                        "recommendations": "\n".join([f"- {rec}" for rec in analysis.get("recommendations", [])]),
-                        "complexity_score": analysis.get("complexity_score", ""),
-                        "maintainability_score": analysis.get("maintainability_score", ""),
-                        "scalability_potential": analysis.get("scalability_potential", "")
-                    }
-                    
-                    # Add each section to the document store
-                    for section_name, content in sections.items():
-                        if content:
-                            doc_id = f"openai_{section_name}"
-                            self.documents[doc_id] = {
-                                "content": content,
-                                "source": "OpenAI Analysis",
-                                "section": section_name,
-                                "metadata": {
-                                    "type": "analysis",
-                                    "tool": "openai",
-                                    "section": section_name
-                                }
-                            }
-                            
-                            # Generate embedding and add to index
-                            if self.openai_client:
-                                embedding = self._get_embedding(content)
-                                if embedding is not None:
-                                    self.index.add(np.array([embedding], dtype=np.float32))
-            except Exception as e:
-                logger.error(f"Error processing OpenAI analysis report: {str(e)}")
-        
-        # Process comparison report
-        comparison_report_path = Path("comparison_report.json")
-        if comparison_report_path.exists():
-            try:
-                with open(comparison_report_path, 'r', encoding='utf-8') as f:
-                    comparison_report = json.load(f)
-                
-                # Extract summary
-                if "summary" in comparison_report:
-                    summary = comparison_report["summary"]
-                    
-                    # Process summary sections
-                    sections = {
-                        "overall_agreement": json.dumps(summary.get("overall_agreement", {}), indent=2),
-                        "key_differences": "\n".join([f"- {diff}" for diff in summary.get("key_differences", [])]),
-                        "key_agreements": "\n".join([f"- {agree}" for agree in summary.get("key_agreements", [])]),
-                        "conclusion": summary.get("conclusion", "")
-                    }
-                    
-                    # Add each section to the document store
-                    for section_name, content in sections.items():
-                        if content:
-                            doc_id = f"comparison_{section_name}"
-                            self.documents[doc_id] = {
-                                "content": content,
-                                "source": "Comparison Analysis",
-                                "section": section_name,
-                                "metadata": {
-                                    "type": "comparison",
-                                    "section": section_name
-                                }
-                            }
-                            
-                            # Generate embedding and add to index
-                            if self.openai_client:
-                                embedding = self._get_embedding(content)
-                                if embedding is not None:
-                                    self.index.add(np.array([embedding], dtype=np.float32))
-            except Exception as e:
-                logger.error(f"Error processing comparison report: {str(e)}")
+        for result in ingest_reports():
+            for doc_id, doc in result.documents:
+                self.documents[doc_id] = doc
+            
+            ingester = result.ingester
+            if ingester.indexer and result.fields:
+                ingester.indexer(self.report_index, ingester.name, result.fields)
     
     def _chunk_text(self, text: str, chunk_size: int = 1000, overlap: int = 200) -> List[str]:
         """
@@ -329,12 +229,13 @@ class RAGSystem:
         
         return chunks
     
-    def _get_embedding(self, text: str) -> Optional[List[float]]:
+    def _get_embedding(self, text: str, timer: Optional[StageTimer] = None) -> Optional[List[float]]:
         """
         Get embedding for text using OpenAI API.
         
         Args:
             text: Text to embed.
+            timer: Optional stage timer to record the embedding token count on.
             
         Returns:
             Embedding vector or None if failed.
@@ -342,56 +243,120 @@ class RAGSystem:
         if not self.openai_client:
             logger.warning("OpenAI client not available, skipping embedding generation")
             # Return a random embedding for testing
+            import numpy as np
             return np.random.rand(EMBEDDING_DIMENSION).astype(np.float32).tolist()
         
         try:
-            response = self.openai_client.client.embeddings.create(
-                model="text-embedding-3-small",
-                input=text
-            )
-            return response.data[0].embedding
+            result = self.openai_client.embed([text], model=EMBEDDING_MODEL)
+            if timer is not None and "total_tokens" in result.usage:
+                timer.record_tokens("embedding_tokens", result.usage["total_tokens"])
+            return result.embeddings[0]
         except Exception as e:
             logger.error(f"Error generating embedding: {str(e)}")
             return None
     
-    def save(self):
-        """Save the index and documents to disk"""
+    def save(
+        self,
+        vector_store_path: str = VECTOR_STORE_PATH,
+        document_store_path: str = DOCUMENT_STORE_PATH,
+        report_index_path: str = REPORT_INDEX_PATH
+    ):
+        """
+        Save the index and documents to disk.
+        
+        Both files are written to a temporary path first and then moved into
+        place, so readers never observe a partially written store.
+        
+        Args:
+            vector_store_path: Path of the FAISS index file.
+            document_store_path: Path of the document store JSON file.
+            report_index_path: Path of the structured report index JSON file.
+        """
         logger.info("Saving vector store and document store")
         
         # Save FAISS index
         if self.index is not None:
-            faiss.write_index(self.index, VECTOR_STORE_PATH)
+            import faiss
+            faiss.write_index(self.index, vector_store_path + ".tmp")
+            os.replace(vector_store_path + ".tmp", vector_store_path)
         
         # Save document store
-        with open(DOCUMENT_STORE_PATH, 'w', encoding='utf-8') as f:
+        with open(document_store_path + ".tmp", 'w', encoding='utf-8') as f:
             json.dump(self.documents, f, indent=2)
+        os.replace(document_store_path + ".tmp", document_store_path)
+        
+        # Save structured report index
+        with open(report_index_path + ".tmp", 'w', encoding='utf-8') as f:
+            json.dump(self.report_index.to_dict(), f, indent=2)
+        os.replace(report_index_path + ".tmp", report_index_path)
     
-    def load(self):
-        """Load the index and documents from disk"""
+    def load(
+        self,
+        vector_store_path: str = VECTOR_STORE_PATH,
+        document_store_path: str = DOCUMENT_STORE_PATH,
+        report_index_path: str = REPORT_INDEX_PATH
+    ):
+        """
+        Load the index and documents from disk.
+        
+        Args:
+            vector_store_path: Path of the FAISS index file.
+            document_store_path: Path of the document store JSON file.
+            report_index_path: Path of the structured report index JSON file.
+        """
         logger.info("Loading vector store and document store")
         
         # Load FAISS index
-        if os.path.exists(VECTOR_STORE_PATH):
-            self.index = faiss.read_index(VECTOR_STORE_PATH)
+        if os.path.exists(vector_store_path):
+            import faiss
+            self.index = faiss.read_index(vector_store_path)
         
         # Load document store
-        if os.path.exists(DOCUMENT_STORE_PATH):
-            with open(DOCUMENT_STORE_PATH, 'r', encoding='utf-8') as f:
+        if os.path.exists(document_store_path):
+            with open(document_store_path, 'r', encoding='utf-8') as f:
                 self.documents = json.load(f)
+        
+        # Load structured report index
+        if os.path.exists(report_index_path):
+            with open(report_index_path, 'r', encoding='utf-8') as f:
+                self.report_index = ReportIndex.from_dict(json.load(f))
     
-    def query(self, question: str, top_k: int = 5) -> Dict[str, Any]:
+    def query(self, question: str, top_k: int = 5, debug: bool = False, structured: bool = True) -> Dict[str, Any]:
         """
         Query the RAG system with a question.
         
+        Questions about known report fields (scores, technology stack,
+        recommendations, agreement percentages) are answered directly from the
+        structured report index without any API calls; everything else goes
+        through embedding retrieval and a chat completion.
+        
+        Per-stage timings (embedding, search, context assembly, completion)
+        and token counts are recorded in the metrics registry for every query.
+        
         Args:
             question: The question to answer.
             top_k: Number of top documents to retrieve.
+            debug: If True, include the per-stage timings in the result.
+            structured: If False, skip the structured fast path.
             
         Returns:
-            Dictionary with answer and sources.
+            Dictionary with answer and sources, plus a "debug" entry if requested.
         """
         logger.info(f"Processing query: {question}")
-        
+        timer = StageTimer("rag.query")
+        result = None
+        if structured:
+            with timer.stage("structured"):
+                result = StructuredQueryEngine(self.report_index).answer(question)
+        if result is None:
+            result = self._query(question, top_k, timer)
+        timings = timer.finish()
+        if debug:
+            result["debug"] = timings
+        return result
+    
+    def _query(self, question: str, top_k: int, timer: StageTimer) -> Dict[str, Any]:
+        """Run the query pipeline, recording each stage with the given timer"""
         if not self.openai_client:
             return {
                 "answer": "OpenAI client not available. Please set OPENAI_API_KEY environment variable.",
@@ -405,7 +370,8 @@ class RAGSystem:
             }
         
         # Get embedding for the question
-        question_embedding = self._get_embedding(question)
+        with timer.stage("embedding"):
+            question_embedding = self._get_embedding(question, timer=timer)
         if question_embedding is None:
             return {
                 "answer": "Failed to generate embedding for the question.",
@@ -413,36 +379,38 @@ class RAGSystem:
             }
         
         # Search for similar documents
-        distances, indices = self.index.search(
-            np.array([question_embedding], dtype=np.float32), 
-            min(top_k, self.index.ntotal)
-        )
-        
-        # Get the retrieved documents
-        retrieved_docs = []
-        for i, idx in enumerate(indices[0]):
-            if idx < 0 or idx >= len(self.documents):
-                continue
+        with timer.stage("search"):
+            import numpy as np
+            distances, indices = self.index.search(
+                np.array([question_embedding], dtype=np.float32), 
+                min(top_k, self.index.ntotal)
+            )
+        
+        with timer.stage("context_assembly"):
+            # Get the retrieved documents
+            doc_ids = list(self.documents.keys())
+            retrieved_docs = []
+            for i, idx in enumerate(indices[0]):
+                if idx < 0 or idx >= len(doc_ids):
+                    continue
+                    
+                doc = self.documents[doc_ids[idx]]
                 
-            # Get document ID
-            doc_id = list(self.documents.keys())[idx]
-            doc = self.documents[doc_id]
+                retrieved_docs.append({
+                    "content": doc["content"],
+                    "source": doc["source"],
+                    "metadata": doc.get("metadata", {}),
+                    "distance": float(distances[0][i])
+                })
             
-            retrieved_docs.append({
-                "content": doc["content"],
-                "source": doc["source"],
-                "metadata": doc.get("metadata", {}),
-                "distance": float(distances[0][i])
-            })
-        
-        # Generate context from retrieved documents
-        context = "\n\n".join([
-            f"[Document {i+1} from {doc['source']}]\n{doc['content']}"
-            for i, doc in enumerate(retrieved_docs)
-        ])
-        
-        # Generate answer using OpenAI
-        prompt = f"""
+            # Generate context from retrieved documents
+            context = "\n\n".join([
+                f"[Document {i+1} from {doc['source']}]\n{doc['content']}"
+                for i, doc in enumerate(retrieved_docs)
+            ])
+            
+            # Generate answer using OpenAI
+            prompt = f"""
         Answer the following question based on the provided context. If the answer cannot be found in the context, say "I don't have enough information to answer this question."
         
         Context:
@@ -452,15 +420,22 @@ class RAGSystem:
         
         Answer:
         """
+        timer.record_tokens("context_tokens", self.openai_client.count_tokens(context))
         
         try:
-            response = self.openai_client.chat_completion(
-                messages=[
-                    {"role": "system", "content": "You are a helpful assistant that answers questions about a code repository based on its documentation and analysis."},
-                    {"role": "user", "content": prompt}
-                ],
-                temperature=0.2
-            )
+            with timer.stage("completion"):
+                response = self.openai_client.chat_completion(
+                    messages=[
+                        {"role": "system", "content": "You are a helpful assistant that answers questions about a code repository based on its documentation and analysis."},
+                        {"role": "user", "content": prompt}
+                    ],
+                    temperature=0.2
+                )
+            
+            usage = getattr(response, "usage", None)
+            if usage is not None:
+                timer.record_tokens("prompt_tokens", usage.prompt_tokens)
+                timer.record_tokens("completion_tokens", usage.completion_tokens)
             
             answer = response.choices[0].message.content
             
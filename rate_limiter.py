@@ -0,0 +1,334 @@
+"""
+Adaptive Rate Limiter Module
+
+This module keeps requests-per-minute and tokens-per-minute token buckets for
+each provider and model, so calls are paced before the provider starts
+answering with HTTP 429. Bucket state lives in a local SQLite database and is
+updated in short exclusive transactions, so every worker process on the host
+draws from the same quota.
+
+Callers reserve capacity up front and sleep only for their own share of the
+deficit; a reservation never blocks other workers. Bucket sizes and levels
+adapt to the x-ratelimit-* (and Retry-After) headers the providers return.
+"""
+
+import os
+import re
+import time
+import sqlite3
+import asyncio
+import logging
+import threading
+from contextlib import contextmanager
+from typing import Dict, Mapping, Optional
+
+from dotenv import load_dotenv
+
+from metrics import get_registry
+
+# Configure logging
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger(__name__)
+
+# Load environment variables
+load_dotenv()
+
+RATE_LIMIT_ENABLED = os.getenv("LLM_RATE_LIMIT_ENABLED", "1").lower() in ("1", "true", "yes")
+# Shared by every worker process of the user, wherever they are started
+RATE_LIMIT_DB = os.getenv(
+    "LLM_RATE_LIMIT_DB", os.path.join(os.path.expanduser("~"), ".cache", "llm-analysis", "ratelimit.sqlite3")
+)
+
+# Starting quotas, used until a provider reports its own limits
+DEFAULT_REQUESTS_PER_MINUTE = float(os.getenv("LLM_RATE_LIMIT_RPM", "500"))
+DEFAULT_TOKENS_PER_MINUTE = float(os.getenv("LLM_RATE_LIMIT_TPM", "1000000"))
+
+REQUESTS = "requests"
+TOKENS = "tokens"
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS buckets (
+    key TEXT PRIMARY KEY,
+    capacity REAL NOT NULL,
+    refill_per_second REAL NOT NULL,
+    level REAL NOT NULL,
+    updated_at REAL NOT NULL
+);
+"""
+
+_DURATION_PART = re.compile(r"(\d+(?:\.\d+)?)(ms|s|m|h)")
+_DURATION_UNITS = {"ms": 0.001, "s": 1.0, "m": 60.0, "h": 3600.0}
+
+
+def parse_duration(value: Optional[str]) -> Optional[float]:
+    """
+    Parse a rate-limit reset duration such as "20ms", "1.5s", "6m0s" or "12".
+
+    Args:
+        value: Header value.
+
+    Returns:
+        Duration in seconds, or None if it cannot be parsed.
+    """
+    if value is None:
+        return None
+    value = value.strip()
+    try:
+        return float(value)
+    except ValueError:
+        pass
+    parts = _DURATION_PART.findall(value)
+    if not parts or "".join(number + unit for number, unit in parts) != value:
+        return None
+    return sum(float(number) * _DURATION_UNITS[unit] for number, unit in parts)
+
+
+def _header_number(headers: Mapping[str, str], name: str) -> Optional[float]:
+    try:
+        return float(headers[name])
+    except (KeyError, TypeError, ValueError):
+        return None
+
+
+class RateLimiter:
+    """
+    Cross-process token buckets keyed by provider, model and kind
+    (requests or tokens).
+    """
+
+    def __init__(
+        self,
+        path: str = RATE_LIMIT_DB,
+        requests_per_minute: float = DEFAULT_REQUESTS_PER_MINUTE,
+        tokens_per_minute: float = DEFAULT_TOKENS_PER_MINUTE
+    ):
+        """
+        Initialize the limiter.
+
+        Args:
+            path: SQLite database shared by the worker processes.
+            requests_per_minute: Request quota until a provider reports one.
+            tokens_per_minute: Token quota until a provider reports one.
+        """
+        self.path = path
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.defaults = {REQUESTS: requests_per_minute, TOKENS: tokens_per_minute}
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None, timeout=30)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(_SCHEMA)
+
+    @contextmanager
+    def _transaction(self):
+        """Exclusive read-modify-write transaction across threads and processes"""
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                yield self._conn
+                self._conn.execute("COMMIT")
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+
+    def _load(self, conn, key: str, kind: str, now: float) -> Dict[str, float]:
+        """Load a bucket, refilled up to now"""
+        row = conn.execute(
+            "SELECT capacity, refill_per_second, level, updated_at FROM buckets WHERE key = ?", (key,)
+        ).fetchone()
+        if row is None:
+            capacity = self.defaults[kind]
+            return {"capacity": capacity, "refill": capacity / 60.0, "level": capacity}
+        capacity, refill, level, updated_at = row
+        return {
+            "capacity": capacity,
+            "refill": refill,
+            "level": min(capacity, level + max(0.0, now - updated_at) * refill)
+        }
+
+    @staticmethod
+    def _save(conn, key: str, bucket: Dict[str, float], now: float):
+        conn.execute(
+            "INSERT OR REPLACE INTO buckets VALUES (?, ?, ?, ?, ?)",
+            (key, bucket["capacity"], bucket["refill"], bucket["level"], now)
+        )
+
+    @staticmethod
+    def _key(provider: str, model: str, kind: str) -> str:
+        return f"{provider}:{model}:{kind}"
+
+    def reserve(self, provider: str, model: str, tokens: int = 0) -> float:
+        """
+        Reserve one request and some tokens.
+
+        The reservation is taken immediately, possibly driving a bucket
+        negative; the caller then waits until its share has refilled.
+
+        Args:
+            provider: Provider name.
+            model: Model name.
+            tokens: Estimated tokens the request will consume.
+
+        Returns:
+            Seconds the caller should wait before sending the request.
+        """
+        now = time.time()
+        delay = 0.0
+        with self._transaction() as conn:
+            for kind, cost in ((REQUESTS, 1), (TOKENS, tokens)):
+                if not cost:
+                    continue
+                key = self._key(provider, model, kind)
+                bucket = self._load(conn, key, kind, now)
+                bucket["level"] -= cost
+                if bucket["level"] < 0:
+                    delay = max(delay, -bucket["level"] / bucket["refill"])
+                self._save(conn, key, bucket, now)
+
+        if delay:
+            get_registry().observe("llm.rate_limit.wait_ms", delay * 1000.0)
+        return delay
+
+    def acquire(self, provider: str, model: str, tokens: int = 0):
+        """
+        Reserve capacity and sleep until it is available.
+
+        Args:
+            provider: Provider name.
+            model: Model name.
+            tokens: Estimated tokens the request will consume.
+        """
+        delay = self.reserve(provider, model, tokens)
+        if delay:
+            time.sleep(delay)
+
+    async def aacquire(self, provider: str, model: str, tokens: int = 0):
+        """Async variant of acquire that waits without blocking the event loop"""
+        delay = self.reserve(provider, model, tokens)
+        if delay:
+            await asyncio.sleep(delay)
+
+    def release(self, provider: str, model: str, tokens: int = 0):
+        """
+        Give back a reservation for a request that was not sent or was
+        cancelled before the provider answered.
+
+        Args:
+            provider: Provider name.
+            model: Model name.
+            tokens: Tokens that were reserved for the request.
+        """
+        now = time.time()
+        with self._transaction() as conn:
+            for kind, cost in ((REQUESTS, 1), (TOKENS, tokens)):
+                if not cost:
+                    continue
+                key = self._key(provider, model, kind)
+                bucket = self._load(conn, key, kind, now)
+                bucket["level"] = min(bucket["capacity"], bucket["level"] + cost)
+                self._save(conn, key, bucket, now)
+
+    def settle(self, provider: str, model: str, reserved_tokens: int, actual_tokens: Optional[int]):
+        """
+        Correct a token reservation with the usage the provider reported.
+
+        Args:
+            provider: Provider name.
+            model: Model name.
+            reserved_tokens: Tokens reserved before the request.
+            actual_tokens: Tokens actually used, or None if unknown.
+        """
+        if actual_tokens is None or actual_tokens == reserved_tokens:
+            return
+        now = time.time()
+        key = self._key(provider, model, TOKENS)
+        with self._transaction() as conn:
+            bucket = self._load(conn, key, TOKENS, now)
+            bucket["level"] = min(bucket["capacity"], bucket["level"] + reserved_tokens - actual_tokens)
+            self._save(conn, key, bucket, now)
+
+    def update_from_headers(self, provider: str, model: str, headers: Mapping[str, str], status_code: int = 200):
+        """
+        Adapt the buckets to the quota state reported by the provider.
+
+        Understands x-ratelimit-limit-*, x-ratelimit-remaining-* and
+        x-ratelimit-reset-* for requests and tokens, and Retry-After on 429.
+
+        Args:
+            provider: Provider name.
+            model: Model name.
+            headers: Response headers (case-insensitive mapping).
+            status_code: Response status code.
+        """
+        updates = {}
+        for kind in (REQUESTS, TOKENS):
+            limit = _header_number(headers, f"x-ratelimit-limit-{kind}")
+            remaining = _header_number(headers, f"x-ratelimit-remaining-{kind}")
+            reset = parse_duration(headers.get(f"x-ratelimit-reset-{kind}"))
+            if limit is not None or remaining is not None:
+                updates[kind] = (limit, remaining, reset)
+
+        retry_after = parse_duration(headers.get("retry-after")) if status_code == 429 else None
+        if retry_after is not None:
+            limit, remaining, reset = updates.get(REQUESTS, (None, 0.0, None))
+            updates[REQUESTS] = (limit, 0.0, max(reset or 0.0, retry_after))
+        if not updates:
+            return
+
+        now = time.time()
+        with self._transaction() as conn:
+            for kind, (limit, remaining, reset) in updates.items():
+                key = self._key(provider, model, kind)
+                bucket = self._load(conn, key, kind, now)
+                if limit:
+                    bucket["capacity"] = limit
+                    bucket["refill"] = limit / 60.0
+                if remaining is not None:
+                    if remaining <= 0 and reset:
+                        # Empty until the provider's reset time
+                        bucket["level"] = min(bucket["level"], -reset * bucket["refill"])
+                    else:
+                        bucket["level"] = min(bucket["level"], remaining)
+                self._save(conn, key, bucket, now)
+
+        if status_code == 429:
+            get_registry().increment("llm.rate_limit.throttled")
+            logger.warning(f"{provider} rate limit reached for {model}; pacing subsequent requests")
+
+    def state(self, provider: str, model: str) -> Dict[str, Dict[str, float]]:
+        """Get the current bucket levels for a provider and model"""
+        now = time.time()
+        with self._transaction() as conn:
+            return {
+                kind: self._load(conn, self._key(provider, model, kind), kind, now)
+                for kind in (REQUESTS, TOKENS)
+            }
+
+    def close(self):
+        """Close the database connection"""
+        with self._lock:
+            self._conn.close()
+
+
+_default_limiter = None
+_default_lock = threading.Lock()
+
+
+def get_rate_limiter() -> Optional[RateLimiter]:
+    """
+    Get the process-wide rate limiter.
+
+    Returns:
+        The shared limiter, or None if LLM_RATE_LIMIT_ENABLED is off.
+    """
+    global _default_limiter
+    if not RATE_LIMIT_ENABLED:
+        return None
+    if _default_limiter is None:
+        with _default_lock:
+            if _default_limiter is None:
+                _default_limiter = RateLimiter()
+    return _default_limiter
@@ -0,0 +1,278 @@
+"""
+Repository Scanner Module
+
+This module reads the text files of a repository for analysis with bounded
+memory, however large the repository or its files are.
+
+Files are visited one at a time in a stable order. The first block of each
+file is sniffed: binary files (NUL bytes, invalid UTF-8, control
+characters) and minified files (very long lines, *.min.js) are skipped
+without reading further. A file larger than its byte budget is sampled:
+its head and tail are read (through mmap for very large files) and the
+middle is replaced by a marker. Every file has a per-file budget and the
+scan as a whole stops reading once its total budget is spent, so the
+content held never exceeds the total budget.
+"""
+
+import os
+import mmap
+import codecs
+import logging
+from dataclasses import dataclass
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+from token_budget import HEAD_FRACTION
+
+# Configure logging
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger(__name__)
+
+# Most bytes read from a single file
+MAX_FILE_BYTES = int(os.getenv("REPO_SCAN_MAX_FILE_BYTES", str(64 * 1024)))
+
+# Most bytes read from all files of a scan
+MAX_TOTAL_BYTES = int(os.getenv("REPO_SCAN_MAX_TOTAL_BYTES", str(1024 * 1024)))
+
+# Files at least this large are sampled through mmap; 0 disables mmap
+MMAP_THRESHOLD = int(os.getenv("REPO_SCAN_MMAP_THRESHOLD", str(1024 * 1024)))
+
+# Bytes read to decide whether a file is binary or minified
+SNIFF_BYTES = 8192
+
+# Share of control characters above which a file is treated as binary
+MAX_CONTROL_RATIO = 0.1
+
+# Average line length, over a sniffed block of at least MINIFIED_MIN_BYTES,
+# above which a file is treated as minified
+MINIFIED_LINE_LENGTH = 300
+MINIFIED_MIN_BYTES = 1024
+
+# Files whose name marks them as minified
+MINIFIED_SUFFIXES = (".min.js", ".min.css", ".min.json", ".bundle.js")
+
+# Budget left below which the scan stops reading files
+MIN_READ_BYTES = 256
+
+# Text files analyzed by default
+TEXT_EXTENSIONS = {'.md', '.html', '.json', '.yml', '.yaml', '.txt', '.py', '.js', '.css'}
+
+# Directories never scanned
+SKIP_DIRS = {".git", "node_modules", "__pycache__", ".venv", "venv"}
+
+# Skip reasons
+BINARY = "binary"
+MINIFIED = "minified"
+BUDGET = "budget"
+UNREADABLE = "unreadable"
+
+# Bytes that are control characters in text (all below 0x20 except tab, LF, FF, CR)
+_CONTROL_BYTES = bytes(code for code in range(32) if code not in (9, 10, 12, 13))
+
+
+@dataclass
+class ScannedFile:
+    """
+    One file visited by a scan.
+
+    Attributes:
+        path: Path relative to the scanned root, e.g. "src/app.py".
+        size: File size in bytes.
+        text: The content read; empty when the file was skipped.
+        truncated: Whether the middle of the file was left out.
+        skipped: Why the file was not read (BINARY, MINIFIED, BUDGET or
+            UNREADABLE), or None.
+    """
+    path: str
+    size: int
+    text: str = ""
+    truncated: bool = False
+    skipped: Optional[str] = None
+
+
+def is_binary(block: bytes) -> bool:
+    """
+    Whether a file's first block looks binary.
+
+    Args:
+        block: The first bytes of the file.
+
+    Returns:
+        True if the block holds NUL bytes, is not valid UTF-8 or is mostly
+        control characters.
+    """
+    if b"\0" in block:
+        return True
+    try:
+        # A multi-byte character may be cut at the end of the block
+        codecs.getincrementaldecoder("utf-8")().decode(block, final=False)
+    except UnicodeDecodeError:
+        return True
+    if not block:
+        return False
+    control = len(block) - len(block.translate(None, _CONTROL_BYTES))
+    return control / len(block) > MAX_CONTROL_RATIO
+
+
+def is_minified(path: str, block: bytes) -> bool:
+    """
+    Whether a file looks minified or generated on a single line.
+
+    Args:
+        path: The file path.
+        block: The first bytes of the file.
+    """
+    if path.lower().endswith(MINIFIED_SUFFIXES):
+        return True
+    if len(block) < MINIFIED_MIN_BYTES:
+        return False
+    return len(block) / (block.count(b"\n") + 1) > MINIFIED_LINE_LENGTH
+
+
+def decode_text(data: bytes) -> str:
+    """Decode file content, tolerating characters cut at sample boundaries"""
+    return data.decode("utf-8", errors="ignore").replace("\r\n", "\n")
+
+
+class RepositoryScanner:
+    """
+    Reads a repository's text files within per-file and total byte budgets.
+    """
+
+    def __init__(
+        self,
+        root: str = ".",
+        extensions: Optional[Iterable[str]] = None,
+        max_file_bytes: int = MAX_FILE_BYTES,
+        max_total_bytes: int = MAX_TOTAL_BYTES,
+        mmap_threshold: int = MMAP_THRESHOLD
+    ):
+        """
+        Initialize the scanner.
+
+        Args:
+            root: Repository directory.
+            extensions: File suffixes to read. If None, TEXT_EXTENSIONS.
+            max_file_bytes: Most bytes read from one file.
+            max_total_bytes: Most bytes read from all files.
+            mmap_threshold: Files at least this large are sampled through
+                mmap; 0 disables mmap.
+        """
+        self.root = root
+        self.extensions = {suffix.lower() for suffix in (extensions or TEXT_EXTENSIONS)}
+        self.max_file_bytes = max_file_bytes
+        self.max_total_bytes = max_total_bytes
+        self.mmap_threshold = mmap_threshold
+
+    def walk(self) -> Iterator[Tuple[str, List[str]]]:
+        """
+        Visit the repository's directories in a stable order, without SKIP_DIRS.
+
+        Yields:
+            Tuples of (directory relative to the root, "." for the root;
+            sorted file names), parents before their subdirectories.
+        """
+        for root, dirs, files in os.walk(self.root):
+            dirs[:] = sorted(name for name in dirs if name not in SKIP_DIRS)
+            yield os.path.relpath(root, self.root).replace(os.sep, "/"), sorted(files)
+
+    def paths(self) -> Iterator[str]:
+        """Relative paths of the files to scan, in a stable order"""
+        for directory, files in self.walk():
+            for name in files:
+                if os.path.splitext(name)[1].lower() in self.extensions:
+                    yield name if directory == "." else f"{directory}/{name}"
+
+    def scan(self) -> Iterator[ScannedFile]:
+        """
+        Visit the repository's files one at a time.
+
+        Yields:
+            A ScannedFile per matching file, read or skipped.
+        """
+        remaining = self.max_total_bytes
+        counts = {"read": 0, "truncated": 0, BINARY: 0, MINIFIED: 0, BUDGET: 0, UNREADABLE: 0}
+        for path in self.paths():
+            if remaining < MIN_READ_BYTES:
+                scanned = ScannedFile(path, self._size(path), skipped=BUDGET)
+            else:
+                scanned = self.read(path, min(self.max_file_bytes, remaining))
+                remaining -= len(scanned.text.encode("utf-8"))
+            if scanned.skipped:
+                counts[scanned.skipped] += 1
+            else:
+                counts["read"] += 1
+                counts["truncated"] += scanned.truncated
+            yield scanned
+        logger.info(
+            f"Scanned {self.root}: {counts['read']} files read ({counts['truncated']} sampled), "
+            f"{self.max_total_bytes - remaining} bytes; skipped {counts[BINARY]} binary, "
+            f"{counts[MINIFIED]} minified, {counts[BUDGET]} over budget, {counts[UNREADABLE]} unreadable"
+        )
+
+    def read_contents(self) -> Dict[str, str]:
+        """
+        Read the repository's text files.
+
+        Returns:
+            Content per relative path of the files that were read, in scan order.
+        """
+        return {scanned.path: scanned.text for scanned in self.scan() if not scanned.skipped}
+
+    def read(self, path: str, budget: Optional[int] = None) -> ScannedFile:
+        """
+        Read one file within a byte budget.
+
+        Args:
+            path: Path relative to the root.
+            budget: Most bytes to read, including the truncation marker. If
+                None, max_file_bytes.
+
+        Returns:
+            The file's content, sampled to its head and tail when it is larger
+            than the budget, or the reason it was skipped.
+        """
+        budget = self.max_file_bytes if budget is None else budget
+        try:
+            with open(os.path.join(self.root, path), "rb") as f:
+                size = os.fstat(f.fileno()).st_size
+                block = f.read(min(SNIFF_BYTES, size))
+                if is_binary(block):
+                    return ScannedFile(path, size, skipped=BINARY)
+                if is_minified(path, block):
+                    return ScannedFile(path, size, skipped=MINIFIED)
+                if size <= budget:
+                    data = block + f.read(size - len(block)) if size > len(block) else block
+                    return ScannedFile(path, size, decode_text(data))
+                return ScannedFile(path, size, self._sample(f, size, budget), truncated=True)
+        except OSError as e:
+            logger.warning(f"Could not read {path}: {e}")
+            return ScannedFile(path, self._size(path), skipped=UNREADABLE)
+
+    def _sample(self, f, size: int, budget: int) -> str:
+        """Head and tail of an oversized file around a marker, within the budget"""
+        marker = f"\n... ({size} bytes, middle omitted) ...\n"
+        keep = max(budget - len(marker), 0)
+        head = int(keep * HEAD_FRACTION)
+        tail = keep - head
+        if self.mmap_threshold and size >= self.mmap_threshold:
+            # Map the file instead of seeking; only the touched pages are read
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+                first, last = mapped[:head], mapped[size - tail:] if tail else b""
+        else:
+            f.seek(0)
+            first = f.read(head)
+            last = b""
+            if tail:
+                f.seek(size - tail)
+                last = f.read(tail)
+        return decode_text(first) + marker + decode_text(last)
+
+    def _size(self, path: str) -> int:
+        """File size, or 0 if it cannot be read"""
+        try:
+            return os.path.getsize(os.path.join(self.root, path))
+        except OSError:
+            return 0
@@ -0,0 +1,256 @@
+#!/usr/bin/env python3
+"""
+Report Ingesters for the RAG Document Store
+
+Each analysis report type is described by a ReportIngester that declares
+where its analysis lives inside the report and which sections become RAG
+documents. Reports are stream-parsed, so only the declared sections are ever
+held in memory, and independent reports are ingested in parallel. Adding a
+new provider only requires registering another ingester.
+"""
+
+import json
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Dict, Any, List, Optional, Callable, Tuple
+
+from json_stream import iter_members
+from structured_query import ReportIndex, ANALYSIS_FIELDS
+
+# Configure logging
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger(__name__)
+
+# Number of reports ingested concurrently
+MAX_INGEST_WORKERS = 4
+
+
+def _text(value: Any) -> str:
+    """Format a scalar value"""
+    return "" if value is None else str(value)
+
+
+def _comma_list(value: Any) -> str:
+    """Format a list as a comma separated line"""
+    return ", ".join(str(item) for item in value or [])
+
+
+def _bullets(value: Any) -> str:
+    """Format a list as bullet points"""
+    return "\n".join(f"- {item}" for item in value or [])
+
+
+def _pretty_json(value: Any) -> str:
+    """Format a structured value as indented JSON"""
+    return json.dumps(value, indent=2)
+
+
+@dataclass
+class Section:
+    """
+    A section of a report that becomes one RAG document (or one document per
+    list item if per_item is set).
+    """
+    name: str
+    key: str
+    format: Callable[[Any], str]
+    per_item: bool = False
+
+
+@dataclass
+class IngestResult:
+    """Documents and indexed fields produced by one ingester"""
+    ingester: "ReportIngester"
+    documents: List[Tuple[str, Dict[str, Any]]] = field(default_factory=list)
+    fields: Dict[str, Any] = field(default_factory=dict)
+
+
+@dataclass
+class ReportIngester:
+    """
+    Declares how a report file is turned into RAG documents.
+
+    Attributes:
+        name: Short name used as document ID prefix and tool name.
+        path: Report file path.
+        source: Source label stored with each document.
+        sections: Sections that become documents.
+        root: Path of the object holding the sections inside the report.
+        metadata: Metadata stored with each document (the section is added).
+        index_fields: Root members kept for the structured report index.
+        indexer: Adds the kept fields to a ReportIndex.
+    """
+    name: str
+    path: str
+    source: str
+    sections: List[Section]
+    root: Tuple[str, ...] = ()
+    metadata: Dict[str, Any] = field(default_factory=dict)
+    index_fields: Tuple[str, ...] = ()
+    indexer: Optional[Callable[[ReportIndex, str, Dict[str, Any]], None]] = None
+
+    def ingest(self) -> IngestResult:
+        """
+        Stream the report and build its documents.
+
+        Returns:
+            The documents and indexed fields. Empty if the report does not exist.
+        """
+        result = IngestResult(ingester=self)
+        if not Path(self.path).exists():
+            return result
+
+        item_paths = {self.root + (section.key,): section for section in self.sections if section.per_item}
+        sections_by_key: Dict[str, List[Section]] = {}
+        for section in self.sections:
+            if not section.per_item:
+                sections_by_key.setdefault(section.key, []).append(section)
+
+        try:
+            for path, key, value in iter_members(self.path, [self.root, *item_paths]):
+                if path in item_paths:
+                    section = item_paths[path]
+                    self._add_document(result, f"{section.name}_{key}", section.name, section.format(value))
+                    continue
+
+                for section in sections_by_key.get(key, []):
+                    self._add_document(result, section.name, section.name, section.format(value))
+                if key in self.index_fields:
+                    result.fields[key] = value
+        except Exception as e:
+            logger.error(f"Error processing {self.source} report {self.path}: {str(e)}")
+
+        return result
+
+    def _add_document(self, result: IngestResult, doc_suffix: str, section_name: str, content: str):
+        """Add a document for a section if it has content"""
+        if not content:
+            return
+        result.documents.append((f"{self.name}_{doc_suffix}", {
+            "content": content,
+            "source": self.source,
+            "section": section_name,
+            "metadata": {**self.metadata, "section": section_name}
+        }))
+
+
+def analysis_ingester(name: str, path: str, source: str) -> ReportIngester:
+    """
+    Create an ingester for the common "<name>_analysis" report layout written
+    by analyze_repo.py, analyze_openai.py and analyze_openhands.py.
+
+    Args:
+        name: Tool name, e.g. "openai".
+        path: Report file path.
+        source: Source label, e.g. "OpenAI Analysis".
+
+    Returns:
+        The report ingester.
+    """
+    return ReportIngester(
+        name=name,
+        path=path,
+        source=source,
+        root=(f"{name}_analysis",),
+        metadata={"type": "analysis", "tool": name},
+        sections=[
+            Section("repository_type", "repository_type", _text),
+            Section("primary_purpose", "primary_purpose", _text),
+            Section("technology_stack", "technology_stack", _comma_list),
+            Section("code_quality", "code_quality_assessment", _pretty_json),
+            Section("security_analysis", "security_analysis", _pretty_json),
+            Section("recommendations", "recommendations", _bullets),
+            Section("complexity_score", "complexity_score", _text),
+            Section("maintainability_score", "maintainability_score", _text),
+            Section("scalability_potential", "scalability_potential", _text),
+        ],
+        index_fields=ANALYSIS_FIELDS,
+        indexer=lambda index, tool, fields: index.add_analysis(tool, fields)
+    )
+
+
+def _format_summary_section(key: str, formatter: Callable[[Any], str]) -> Callable[[Any], str]:
+    """Format one entry of a report's summary object"""
+    return lambda summary: formatter(summary.get(key))
+
+
+def _format_detailed_result(result: Dict[str, Any]) -> str:
+    """Format one entry of the per-file detailed results"""
+    lines = [f"{result.get('category', 'analysis')}: {result.get('score', 'N/A')}/10"]
+    if result.get("details"):
+        lines.append(result["details"])
+    lines.extend(f"- {rec}" for rec in result.get("recommendations", []))
+    return "\n".join(lines)
+
+
+COMPARISON_INGESTER = ReportIngester(
+    name="comparison",
+    path="comparison_report.json",
+    source="Comparison Analysis",
+    metadata={"type": "comparison"},
+    sections=[
+        Section("overall_agreement", "summary", _format_summary_section("overall_agreement", lambda v: _pretty_json(v or {}))),
+        Section("key_differences", "summary", _format_summary_section("key_differences", _bullets)),
+        Section("key_agreements", "summary", _format_summary_section("key_agreements", _bullets)),
+        Section("conclusion", "summary", _format_summary_section("conclusion", _text)),
+    ],
+    index_fields=("summary", "repository_info", "technology_stack", "recommendations"),
+    indexer=lambda index, tool, fields: index.add_comparison(fields)
+)
+
+MISTRAL_REAL_INGESTER = ReportIngester(
+    name="mistral_real",
+    path="mistral_real_analysis_report.json",
+    source="Mistral Comprehensive Analysis",
+    metadata={"type": "analysis", "tool": "mistral_real"},
+    sections=[
+        Section("overall_scores", "overall_scores", _pretty_json),
+        Section("strengths", "summary", _format_summary_section("strengths", _bullets)),
+        Section("areas_for_improvement", "summary", _format_summary_section("areas_for_improvement", _bullets)),
+        Section("priority_actions", "summary", _format_summary_section("priority_actions", _bullets)),
+        Section("detailed_result", "detailed_results", _format_detailed_result, per_item=True),
+    ]
+)
+
+# Registered ingesters, in the order their documents are added to the store
+REPORT_INGESTERS: List[ReportIngester] = [
+    analysis_ingester("mistral", "analysis_report.json", "Mistral Analysis"),
+    analysis_ingester("openai", "openai_analysis_report.json", "OpenAI Analysis"),
+    analysis_ingester("openhands", "openhands_analysis_report.json", "OpenHands Analysis"),
+    MISTRAL_REAL_INGESTER,
+    COMPARISON_INGESTER,
+]
+
+
+def register_ingester(ingester: ReportIngester):
+    """
+    Register an ingester for a new report type.
+
+    Args:
+        ingester: The report ingester.
+    """
+    REPORT_INGESTERS.append(ingester)
+
+
+def ingest_reports(
+    ingesters: Optional[List[ReportIngester]] = None,
+    max_workers: int = MAX_INGEST_WORKERS
+) -> List[IngestResult]:
+    """
+    Ingest reports in parallel.
+
+    Args:
+        ingesters: Ingesters to run. If None, uses the registered ingesters.
+        max_workers: Maximum number of reports ingested concurrently.
+
+    Returns:
+        Ingest results in the same order as the ingesters.
+    """
+    ingesters = REPORT_INGESTERS if ingesters is None else ingesters
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        return list(executor.map(lambda ingester: ingester.ingest(), ingesters))
@@ -0,0 +1,466 @@
+"""
+LLM Call Resilience Module
+
+This module bounds the tail latency of provider calls:
+
+- An end-to-end deadline caps the total time spent on a call, including
+  retries and backoff; each attempt's HTTP timeout is the time remaining.
+- Hedging fires a duplicate request when an attempt has been running longer
+  than the observed p95 latency of the provider and model, and takes
+  whichever answer arrives first. It is off by default: the losing request
+  is still billed by the provider. Attempts that had to wait for the rate
+  limiter are not hedged, and their wait is not counted as latency.
+- A per-provider circuit breaker fails fast while the recent error rate is
+  high, then lets a single trial request through after a cool-down.
+"""
+
+import os
+import time
+import asyncio
+import logging
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait as wait_futures
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple, Type
+
+from dotenv import load_dotenv
+
+from metrics import get_registry
+
+# Configure logging
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger(__name__)
+
+# Load environment variables
+load_dotenv()
+
+DEADLINE_SECONDS = float(os.getenv("LLM_DEADLINE_SECONDS", "180"))
+MAX_ATTEMPTS = int(os.getenv("LLM_MAX_ATTEMPTS", "5"))
+BACKOFF_MIN_SECONDS = 2.0
+BACKOFF_MAX_SECONDS = 60.0
+
+HEDGE_ENABLED = os.getenv("LLM_HEDGE_ENABLED", "0").lower() in ("1", "true", "yes")
+# Observations needed before the p95 is trusted as a hedge delay
+HEDGE_MIN_SAMPLES = int(os.getenv("LLM_HEDGE_MIN_SAMPLES", "20"))
+
+BREAKER_WINDOW = int(os.getenv("LLM_BREAKER_WINDOW", "20"))
+BREAKER_MIN_CALLS = int(os.getenv("LLM_BREAKER_MIN_CALLS", "10"))
+BREAKER_FAILURE_RATE = float(os.getenv("LLM_BREAKER_FAILURE_RATE", "0.5"))
+BREAKER_COOLDOWN_SECONDS = float(os.getenv("LLM_BREAKER_COOLDOWN", "30"))
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+# Threads running hedged sync requests
+_hedge_executor = ThreadPoolExecutor(max_workers=32, thread_name_prefix="llm-hedge")
+
+
+class CircuitOpenError(RuntimeError):
+    """The provider's circuit breaker is open; the call was not attempted"""
+
+
+class DeadlineExceededError(TimeoutError):
+    """The call's end-to-end deadline passed before it succeeded"""
+
+
+class CircuitBreaker:
+    """
+    Failure-rate circuit breaker over a rolling window of recent calls.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        window: int = BREAKER_WINDOW,
+        min_calls: int = BREAKER_MIN_CALLS,
+        failure_rate: float = BREAKER_FAILURE_RATE,
+        cooldown_seconds: float = BREAKER_COOLDOWN_SECONDS
+    ):
+        """
+        Initialize the breaker.
+
+        Args:
+            name: Name used in errors and metrics, usually the provider.
+            window: Number of recent calls considered.
+            min_calls: Calls needed in the window before the breaker can open.
+            failure_rate: Failure fraction at which the breaker opens.
+            cooldown_seconds: Time the breaker stays open before a trial call.
+        """
+        self.name = name
+        self.min_calls = min_calls
+        self.failure_rate = failure_rate
+        self.cooldown_seconds = cooldown_seconds
+        self.state = CLOSED
+        self._outcomes = deque(maxlen=window)
+        self._opened_at = 0.0
+        self._trial_in_flight = False
+        self._lock = threading.Lock()
+
+    def before_call(self):
+        """
+        Check whether a call may proceed.
+
+        Raises:
+            CircuitOpenError: If the breaker is open (or a trial call is
+                already in flight while half-open).
+        """
+        with self._lock:
+            if self.state == OPEN and time.monotonic() - self._opened_at >= self.cooldown_seconds:
+                self.state = HALF_OPEN
+                self._trial_in_flight = False
+            if self.state == CLOSED:
+                return
+            if self.state == HALF_OPEN and not self._trial_in_flight:
+                self._trial_in_flight = True
+                return
+        get_registry().increment(f"llm.{self.name}.circuit_rejected")
+        raise CircuitOpenError(f"{self.name} circuit breaker is open; failing fast")
+
+    def record_success(self):
+        """Record a successful call"""
+        with self._lock:
+            if self.state == HALF_OPEN:
+                logger.info(f"{self.name} circuit breaker closed after a successful trial call")
+                self.state = CLOSED
+                self._outcomes.clear()
+            self._outcomes.append(True)
+
+    def record_failure(self):
+        """Record a failed call, opening the breaker if the failure rate is too high"""
+        with self._lock:
+            self._outcomes.append(False)
+            failures = self._outcomes.count(False)
+            if self.state == HALF_OPEN or (
+                len(self._outcomes) >= self.min_calls
+                and failures / len(self._outcomes) >= self.failure_rate
+            ):
+                if self.state != OPEN:
+                    logger.warning(f"{self.name} circuit breaker opened ({failures}/{len(self._outcomes)} recent calls failed)")
+                    get_registry().increment(f"llm.{self.name}.circuit_opened")
+                self.state = OPEN
+                self._opened_at = time.monotonic()
+
+
+_breakers: Dict[str, CircuitBreaker] = {}
+_breakers_lock = threading.Lock()
+
+
+def get_circuit_breaker(name: str) -> CircuitBreaker:
+    """
+    Get the process-wide circuit breaker for a provider.
+
+    Args:
+        name: Provider name.
+
+    Returns:
+        The provider's circuit breaker.
+    """
+    with _breakers_lock:
+        if name not in _breakers:
+            _breakers[name] = CircuitBreaker(name)
+        return _breakers[name]
+
+
+def _backoff(attempt: int) -> float:
+    """Exponential backoff before retry number attempt (1-based)"""
+    return min(BACKOFF_MAX_SECONDS, max(BACKOFF_MIN_SECONDS, 2.0 ** attempt))
+
+
+class ResiliencePolicy:
+    """
+    Runs a provider call under a deadline, with retries, hedging and a
+    circuit breaker.
+
+    The call is given as send(timeout), which performs one request with the
+    given HTTP timeout in seconds, and optionally throttle(), which reserves
+    rate limit capacity for one request and returns the seconds to wait
+    before sending it, and release(), which gives one reservation back.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        retryable: Tuple[Type[BaseException], ...],
+        breaker: Optional[CircuitBreaker] = None,
+        deadline_seconds: float = DEADLINE_SECONDS,
+        max_attempts: int = MAX_ATTEMPTS,
+        hedge: bool = HEDGE_ENABLED,
+        hedge_min_samples: int = HEDGE_MIN_SAMPLES
+    ):
+        """
+        Initialize the policy.
+
+        Args:
+            name: Provider name, used for metrics and the default breaker.
+            retryable: Exception types that are retried and count as failures.
+            breaker: Circuit breaker. If None, uses the provider's shared breaker.
+            deadline_seconds: End-to-end time limit for a call.
+            max_attempts: Maximum attempts (hedged duplicates not counted).
+            hedge: Whether to hedge slow attempts. The losing request is not
+                cancelled on the provider's side and is still billed.
+            hedge_min_samples: Latency samples needed before hedging starts.
+        """
+        self.name = name
+        self.retryable = retryable
+        self.breaker = breaker or get_circuit_breaker(name)
+        self.deadline_seconds = deadline_seconds
+        self.max_attempts = max_attempts
+        self.hedge = hedge
+        self.hedge_min_samples = hedge_min_samples
+        self.registry = get_registry()
+
+    def latency_metric(self, model: Optional[str] = None) -> str:
+        """Histogram of the request latency of a model, excluding rate limit waits"""
+        return f"llm.{self.name}.{model}.request_ms" if model else f"llm.{self.name}.request_ms"
+
+    def hedge_delay(self, model: Optional[str] = None) -> Optional[float]:
+        """Seconds after which a duplicate request is sent, or None to not hedge"""
+        if not self.hedge:
+            return None
+        histogram = self.registry.histogram(self.latency_metric(model))
+        if histogram.count < self.hedge_min_samples:
+            return None
+        p95 = histogram.percentile(95)
+        return p95 / 1000.0 if p95 else None
+
+    def call(
+        self,
+        send: Callable[[float], Any],
+        hedge: bool = True,
+        model: Optional[str] = None,
+        throttle: Optional[Callable[[], float]] = None,
+        release: Optional[Callable[[], None]] = None
+    ) -> Any:
+        """
+        Run a call with retries and hedging until it succeeds, fails with a
+        non-retryable error, or the deadline passes.
+
+        Args:
+            send: Performs one request given its timeout in seconds.
+            hedge: Whether slow attempts may be duplicated. Streaming calls
+                pass False: they return an open stream, not a full response,
+                so they are neither hedged nor counted in the latency samples.
+            model: Model of the call; latency samples and the hedge delay
+                are kept per model.
+            throttle: Reserves rate limit capacity for one request and
+                returns the seconds to wait before sending it.
+            release: Gives back the reservation of a hedged request that
+                was not sent or was cancelled.
+
+        Returns:
+            The result of the first successful request.
+        """
+        deadline = time.monotonic() + self.deadline_seconds
+        attempt = 0
+        while True:
+            self.breaker.before_call()
+            attempt += 1
+            try:
+                waited = self._throttle(throttle)
+                if not hedge:
+                    result = send(self._remaining(deadline))
+                elif waited:
+                    # The limiter is delaying requests; a duplicate would only queue up
+                    result = self._timed(send, self._remaining(deadline), model)
+                else:
+                    result = self._hedged(send, self._remaining(deadline), model, throttle, release)
+            except self.retryable as e:
+                self.breaker.record_failure()
+                delay = self._retry_delay(attempt, deadline, e)
+                time.sleep(delay)
+                continue
+            except BaseException:
+                # Client errors mean the provider is up; they do not trip the breaker
+                self.breaker.record_success()
+                raise
+            self.breaker.record_success()
+            return result
+
+    async def acall(
+        self,
+        send: Callable[[float], Awaitable[Any]],
+        hedge: bool = True,
+        model: Optional[str] = None,
+        throttle: Optional[Callable[[], float]] = None,
+        release: Optional[Callable[[], None]] = None
+    ) -> Any:
+        """
+        Async variant of call; losing hedged requests are cancelled.
+
+        Args:
+            send: Coroutine function performing one request given its timeout.
+            hedge: Whether slow attempts may be duplicated.
+            model: Model of the call, keying the latency samples.
+            throttle: Reserves rate limit capacity for one request and
+                returns the seconds to wait before sending it.
+            release: Gives back the reservation of a hedged request that
+                was not sent or was cancelled.
+
+        Returns:
+            The result of the first successful request.
+        """
+        deadline = time.monotonic() + self.deadline_seconds
+        attempt = 0
+        while True:
+            self.breaker.before_call()
+            attempt += 1
+            try:
+                waited = await self._athrottle(throttle)
+                if not hedge:
+                    result = await send(self._remaining(deadline))
+                elif waited:
+                    result = await self._atimed(send, self._remaining(deadline), model)
+                else:
+                    result = await self._ahedged(send, self._remaining(deadline), model, throttle, release)
+            except self.retryable as e:
+                self.breaker.record_failure()
+                delay = self._retry_delay(attempt, deadline, e)
+                await asyncio.sleep(delay)
+                continue
+            except asyncio.CancelledError:
+                raise
+            except BaseException:
+                self.breaker.record_success()
+                raise
+            self.breaker.record_success()
+            return result
+
+    def _remaining(self, deadline: float) -> float:
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            raise DeadlineExceededError(f"{self.name} call exceeded its {self.deadline_seconds:.0f}s deadline")
+        return remaining
+
+    def _retry_delay(self, attempt: int, deadline: float, error: BaseException) -> float:
+        """Backoff before the next attempt, or re-raise if no attempt fits"""
+        delay = _backoff(attempt)
+        if attempt >= self.max_attempts or time.monotonic() + delay >= deadline:
+            raise error
+        logger.warning(f"{self.name} call failed ({str(error)}); retrying in {delay:.1f}s")
+        self.registry.increment(f"llm.{self.name}.retries")
+        return delay
+
+    @staticmethod
+    def _throttle(throttle: Optional[Callable[[], float]]) -> bool:
+        """Wait for the rate limiter before an attempt; True if it had to wait"""
+        delay = throttle() if throttle is not None else 0.0
+        if delay:
+            time.sleep(delay)
+        return bool(delay)
+
+    @staticmethod
+    async def _athrottle(throttle: Optional[Callable[[], float]]) -> bool:
+        """Async variant of _throttle"""
+        delay = throttle() if throttle is not None else 0.0
+        if delay:
+            await asyncio.sleep(delay)
+        return bool(delay)
+
+    def _hedge_throttled(
+        self,
+        throttle: Optional[Callable[[], float]],
+        release: Optional[Callable[[], None]]
+    ) -> bool:
+        """
+        Reserve capacity for a duplicate request. True if the limiter would
+        delay it, in which case the reservation is given back.
+        """
+        if throttle is None or not throttle():
+            return False
+        if release is not None:
+            release()
+        self.registry.increment(f"llm.{self.name}.hedge_throttled")
+        return True
+
+    def _timed(self, send: Callable[[float], Any], timeout: float, model: Optional[str]) -> Any:
+        start = time.perf_counter()
+        result = send(timeout)
+        self.registry.observe(self.latency_metric(model), (time.perf_counter() - start) * 1000.0)
+        return result
+
+    async def _atimed(self, send: Callable[[float], Awaitable[Any]], timeout: float, model: Optional[str]) -> Any:
+        start = time.perf_counter()
+        result = await send(timeout)
+        self.registry.observe(self.latency_metric(model), (time.perf_counter() - start) * 1000.0)
+        return result
+
+    def _hedged(
+        self,
+        send: Callable[[float], Any],
+        timeout: float,
+        model: Optional[str],
+        throttle: Optional[Callable[[], float]],
+        release: Optional[Callable[[], None]]
+    ) -> Any:
+        """One attempt, duplicated if it runs past the hedge delay and the limiter has room"""
+        hedge_delay = self.hedge_delay(model)
+        if hedge_delay is None or hedge_delay >= timeout:
+            return self._timed(send, timeout, model)
+
+        start = time.monotonic()
+        primary = _hedge_executor.submit(self._timed, send, timeout, model)
+        done, _ = wait_futures([primary], timeout=hedge_delay)
+        if done or self._hedge_throttled(throttle, release):
+            return primary.result()
+
+        self.registry.increment(f"llm.{self.name}.hedged")
+        hedge = _hedge_executor.submit(
+            self._timed, send, max(0.001, timeout - (time.monotonic() - start)), model
+        )
+        pending = {primary, hedge}
+        error = None
+        while pending:
+            done, pending = wait_futures(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                if future.exception() is None:
+                    if future is hedge:
+                        self.registry.increment(f"llm.{self.name}.hedge_wins")
+                    # The loser keeps running in the background; its result is dropped
+                    return future.result()
+                error = future.exception()
+        raise error
+
+    async def _ahedged(
+        self,
+        send: Callable[[float], Awaitable[Any]],
+        timeout: float,
+        model: Optional[str],
+        throttle: Optional[Callable[[], float]],
+        release: Optional[Callable[[], None]]
+    ) -> Any:
+        """Async variant of _hedged"""
+        hedge_delay = self.hedge_delay(model)
+        if hedge_delay is None or hedge_delay >= timeout:
+            return await self._atimed(send, timeout, model)
+
+        start = time.monotonic()
+        primary = asyncio.ensure_future(self._atimed(send, timeout, model))
+        done, _ = await asyncio.wait({primary}, timeout=hedge_delay)
+        if done or self._hedge_throttled(throttle, release):
+            return await primary
+
+        self.registry.increment(f"llm.{self.name}.hedged")
+        hedge = asyncio.ensure_future(
+            self._atimed(send, max(0.001, timeout - (time.monotonic() - start)), model)
+        )
+        pending = {primary, hedge}
+        error = None
+        try:
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        if task is hedge:
+                            self.registry.increment(f"llm.{self.name}.hedge_wins")
+                        return task.result()
+                    error = task.exception()
+            raise error
+        finally:
+            for task in pending:
+                # A cancelled request never settles its reservation
+                if task.cancel() and release is not None:
+                    release()
@@ -0,0 +1,238 @@
+"""
+LLM Response Cache Module
+
+This module provides an opt-in, disk-backed cache for chat completion
+responses. Entries are keyed by provider, model, normalized messages and
+sampling parameters, stored in a local SQLite file, and expire after a TTL.
+When the cache grows beyond its size limit the least recently used entries
+are evicted. Hit, miss and eviction counts are exported through the metrics
+registry under "llm.cache.".
+
+The cache is enabled by setting LLM_CACHE_ENABLED=1; re-running an analysis
+on an unchanged repository is then answered from disk.
+"""
+
+import os
+import json
+import time
+import sqlite3
+import hashlib
+import logging
+import threading
+from typing import Dict, Any, List, Optional
+
+from dotenv import load_dotenv
+
+from metrics import get_registry
+
+# Configure logging
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger(__name__)
+
+# Load environment variables
+load_dotenv()
+
+CACHE_ENABLED = os.getenv("LLM_CACHE_ENABLED", "").lower() in ("1", "true", "yes")
+CACHE_PATH = os.getenv("LLM_CACHE_PATH", ".llm_cache.sqlite3")
+CACHE_TTL_SECONDS = float(os.getenv("LLM_CACHE_TTL", str(7 * 24 * 3600)))
+CACHE_MAX_BYTES = int(os.getenv("LLM_CACHE_MAX_BYTES", str(256 * 1024 * 1024)))
+
+# Message fields that affect the completion; anything else is ignored in keys
+_MESSAGE_FIELDS = ("role", "content", "name", "tool_calls", "tool_call_id")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS responses (
+    key TEXT PRIMARY KEY,
+    provider TEXT NOT NULL,
+    model TEXT NOT NULL,
+    response TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    created_at REAL NOT NULL,
+    accessed_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS responses_accessed_at ON responses (accessed_at);
+"""
+
+
+def _normalize_message(message: Dict[str, Any]) -> Dict[str, Any]:
+    """Keep the fields of a message that affect the completion; content is kept exactly as sent"""
+    return {field: message[field] for field in _MESSAGE_FIELDS if message.get(field) is not None}
+
+
+def make_cache_key(provider: str, model: str, messages: List[Dict[str, Any]], params: Dict[str, Any]) -> str:
+    """
+    Build the cache key for a chat request.
+
+    Args:
+        provider: Provider name.
+        model: Model name.
+        messages: Chat messages.
+        params: Sampling and other request parameters.
+
+    Returns:
+        Hex digest identifying the request.
+    """
+    canonical = json.dumps(
+        {
+            "provider": provider,
+            "model": model,
+            "messages": [_normalize_message(message) for message in messages],
+            "params": {key: value for key, value in params.items() if value is not None},
+        },
+        sort_keys=True,
+        separators=(",", ":"),
+        ensure_ascii=False,
+        default=str
+    )
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+
+class ResponseCache:
+    """
+    SQLite-backed cache of chat completion response bodies.
+    """
+
+    def __init__(
+        self,
+        path: str = CACHE_PATH,
+        ttl_seconds: float = CACHE_TTL_SECONDS,
+        max_bytes: int = CACHE_MAX_BYTES
+    ):
+        """
+        Initialize the cache.
+
+        Args:
+            path: SQLite database file.
+            ttl_seconds: Age after which entries are treated as missing.
+            max_bytes: Total response size above which old entries are evicted.
+        """
+        self.path = path
+        self.ttl_seconds = ttl_seconds
+        self.max_bytes = max_bytes
+        self.registry = get_registry()
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(_SCHEMA)
+        self._total_bytes = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        """
+        Look up a cached response.
+
+        Args:
+            key: Key from make_cache_key.
+
+        Returns:
+            The cached response body, or None on a miss or expired entry.
+        """
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT response, size, created_at FROM responses WHERE key = ?", (key,)
+            ).fetchone()
+            if row is not None and now - row[2] > self.ttl_seconds:
+                self._conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+                self._total_bytes -= row[1]
+                row = None
+            if row is not None:
+                self._conn.execute("UPDATE responses SET accessed_at = ? WHERE key = ?", (now, key))
+
+        if row is None:
+            self.registry.increment("llm.cache.misses")
+            return None
+        self.registry.increment("llm.cache.hits")
+        return json.loads(row[0])
+
+    def put(self, key: str, provider: str, model: str, response: Dict[str, Any]):
+        """
+        Store a response, evicting least recently used entries if needed.
+
+        Args:
+            key: Key from make_cache_key.
+            provider: Provider name.
+            model: Model name.
+            response: The response body to cache.
+        """
+        payload = json.dumps(response, separators=(",", ":"))
+        size = len(payload.encode("utf-8"))
+        now = time.time()
+        with self._lock:
+            old = self._conn.execute("SELECT size FROM responses WHERE key = ?", (key,)).fetchone()
+            self._conn.execute(
+                "INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (key, provider, model, payload, size, now, now)
+            )
+            self._total_bytes += size - (old[0] if old else 0)
+            if self._total_bytes > self.max_bytes:
+                self._evict()
+
+    def _evict(self):
+        """Delete expired entries, then least recently used ones until under the size limit"""
+        cursor = self._conn.execute(
+            "DELETE FROM responses WHERE created_at < ?", (time.time() - self.ttl_seconds,)
+        )
+        evicted = max(cursor.rowcount, 0)
+        self._total_bytes = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+
+        if self._total_bytes > self.max_bytes:
+            excess = self._total_bytes - self.max_bytes
+            doomed = []
+            for key, size in self._conn.execute("SELECT key, size FROM responses ORDER BY accessed_at"):
+                if excess <= 0:
+                    break
+                doomed.append((key,))
+                excess -= size
+            self._conn.executemany("DELETE FROM responses WHERE key = ?", doomed)
+            evicted += len(doomed)
+            self._total_bytes = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+
+        if evicted:
+            self.registry.increment("llm.cache.evictions", evicted)
+            logger.info(f"Evicted {evicted} cached LLM responses")
+
+    def stats(self) -> Dict[str, Any]:
+        """Get entry count, size and hit/miss counters"""
+        with self._lock:
+            entries = self._conn.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+        return {
+            "entries": entries,
+            "bytes": self._total_bytes,
+            "max_bytes": self.max_bytes,
+            **{name.rsplit(".", 1)[-1]: value for name, value in self.registry.counters(prefix="llm.cache.").items()}
+        }
+
+    def clear(self):
+        """Remove every entry"""
+        with self._lock:
+            self._conn.execute("DELETE FROM responses")
+            self._total_bytes = 0
+
+    def close(self):
+        """Close the database connection"""
+        with self._lock:
+            self._conn.close()
+
+
+_default_cache = None
+_default_cache_lock = threading.Lock()
+
+
+def get_response_cache() -> Optional[ResponseCache]:
+    """
+    Get the process-wide response cache.
+
+    Returns:
+        The cache if LLM_CACHE_ENABLED is set, otherwise None.
+    """
+    global _default_cache
+    if not CACHE_ENABLED:
+        return None
+    if _default_cache is None:
+        with _default_cache_lock:
+            if _default_cache is None:
+                _default_cache = ResponseCache()
+    return _default_cache
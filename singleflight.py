@@ -0,0 +1,275 @@
+"""
+Single-Flight Request Coalescing Module
+
+This module coalesces identical concurrent calls: the first caller for a key
+runs the call, and callers arriving while it is in flight wait for the same
+result instead of repeating the work. Sync callers wait on a shared future,
+async callers on a shared task of the running event loop.
+
+Optionally, calls are also coalesced across worker processes: the leader
+holds an exclusive lock file for the key while it runs and leaves its
+(JSON-serializable) result next to the lock, so a process that was blocked on
+the lock picks the result up instead of calling again. Only processes whose
+call started before the result was written take it; a later call runs again.
+Idle lock and result files are deleted after a while.
+"""
+
+import os
+import json
+import time
+import asyncio
+import hashlib
+import logging
+import threading
+import weakref
+from concurrent.futures import Future
+from contextlib import contextmanager
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - not available on Windows
+    fcntl = None
+
+from metrics import get_registry
+
+# Configure logging
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger(__name__)
+
+# Directory for cross-process lock files; unset disables cross-process coalescing
+LOCK_DIR = os.getenv("LLM_SINGLEFLIGHT_LOCK_DIR")
+
+# How long idle lock and result files are kept before they are deleted
+FILE_TTL_SECONDS = float(os.getenv("LLM_SINGLEFLIGHT_FILE_TTL", "600"))
+
+
+class SingleFlight:
+    """
+    Coalesces concurrent calls that share a key.
+    """
+
+    def __init__(
+        self,
+        lock_dir: Optional[str] = None,
+        file_ttl_seconds: float = FILE_TTL_SECONDS,
+        metric_prefix: str = "llm.singleflight"
+    ):
+        """
+        Initialize the coalescer.
+
+        Args:
+            lock_dir: Directory for cross-process lock and result files. If
+                None, calls are only coalesced within this process.
+            file_ttl_seconds: How long idle lock and result files are kept.
+            metric_prefix: Prefix of the leader/shared counters.
+        """
+        if lock_dir and fcntl is None:
+            logger.warning("File locking is unavailable; coalescing within this process only")
+            lock_dir = None
+        if lock_dir:
+            os.makedirs(lock_dir, exist_ok=True)
+        self.lock_dir = lock_dir
+        self.file_ttl_seconds = file_ttl_seconds
+        self._pruned_at = 0.0
+        self.metric_prefix = metric_prefix
+        self._flights: Dict[str, Future] = {}
+        self._async_flights: "weakref.WeakKeyDictionary" = weakref.WeakKeyDictionary()
+        self._lock = threading.Lock()
+
+    def do(self, key: str, fn: Callable[[], Any]) -> Tuple[Any, bool]:
+        """
+        Run fn once for all concurrent callers with the same key.
+
+        Args:
+            key: Identifies equivalent calls.
+            fn: The call to run if no equivalent call is in flight.
+
+        Returns:
+            The result of fn, shared by every caller of the flight, and
+            whether this caller ran fn itself (False for callers that got
+            another caller's or another process's result). If fn raises,
+            every caller of the flight gets the exception.
+        """
+        with self._lock:
+            future = self._flights.get(key)
+            leader = future is None
+            if leader:
+                future = Future()
+                self._flights[key] = future
+
+        if not leader:
+            get_registry().increment(f"{self.metric_prefix}.shared")
+            return future.result(), False
+
+        get_registry().increment(f"{self.metric_prefix}.leader")
+        try:
+            result, ran = self._run_exclusive(key, fn)
+            future.set_result(result)
+            return result, ran
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        finally:
+            with self._lock:
+                self._flights.pop(key, None)
+
+    async def ado(self, key: str, fn: Callable[[], Awaitable[Any]]) -> Tuple[Any, bool]:
+        """
+        Async variant of do for coroutines on the running event loop.
+
+        Args:
+            key: Identifies equivalent calls.
+            fn: Coroutine function to run if no equivalent call is in flight.
+
+        Returns:
+            The shared result of fn and whether this caller ran fn itself.
+        """
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            flights = self._async_flights.setdefault(loop, {})
+            task = flights.get(key)
+            leader = task is None
+            if leader:
+                task = loop.create_task(self._arun_exclusive(key, fn))
+                flights[key] = task
+                task.add_done_callback(lambda _: flights.pop(key, None))
+
+        get_registry().increment(f"{self.metric_prefix}.{'leader' if leader else 'shared'}")
+        # Shield so a cancelled follower does not cancel the shared call
+        result, ran = await asyncio.shield(task)
+        return result, ran and leader
+
+    def _run_exclusive(self, key: str, fn: Callable[[], Any]) -> Tuple[Any, bool]:
+        """Run fn, coordinating with other processes if enabled; True if fn ran here"""
+        if not self.lock_dir:
+            return fn(), True
+        started = time.time()
+        with self._file_lock(key):
+            shared = self._read_result(key, started)
+            if shared is not None:
+                get_registry().increment(f"{self.metric_prefix}.shared_across_processes")
+                return shared, False
+            result = fn()
+            self._write_result(key, result)
+        self._prune()
+        return result, True
+
+    async def _arun_exclusive(self, key: str, fn: Callable[[], Awaitable[Any]]) -> Tuple[Any, bool]:
+        """Async variant of _run_exclusive; the lock is taken off the event loop"""
+        if not self.lock_dir:
+            return await fn(), True
+        started = time.time()
+        handle = await asyncio.get_running_loop().run_in_executor(None, self._acquire_file_lock, key)
+        try:
+            shared = self._read_result(key, started)
+            if shared is not None:
+                get_registry().increment(f"{self.metric_prefix}.shared_across_processes")
+                return shared, False
+            result = await fn()
+            self._write_result(key, result)
+        finally:
+            self._release_file_lock(handle)
+        self._prune()
+        return result, True
+
+    def _path(self, key: str, suffix: str) -> str:
+        digest = hashlib.sha256(key.encode("utf-8")).hexdigest()
+        return os.path.join(self.lock_dir, f"{digest}{suffix}")
+
+    def _acquire_file_lock(self, key: str):
+        path = self._path(key, ".lock")
+        while True:
+            handle = open(path, "a+")
+            fcntl.flock(handle, fcntl.LOCK_EX)
+            try:
+                # The file may have been pruned while we waited; lock the current one
+                if os.stat(path).st_ino == os.fstat(handle.fileno()).st_ino:
+                    os.utime(path)
+                    return handle
+            except OSError:
+                pass
+            self._release_file_lock(handle)
+
+    @staticmethod
+    def _release_file_lock(handle):
+        fcntl.flock(handle, fcntl.LOCK_UN)
+        handle.close()
+
+    @contextmanager
+    def _file_lock(self, key: str):
+        handle = self._acquire_file_lock(key)
+        try:
+            yield
+        finally:
+            self._release_file_lock(handle)
+
+    def _read_result(self, key: str, started: float) -> Any:
+        """Read the result another process wrote while this call waited, or None"""
+        path = self._path(key, ".json")
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                entry = json.load(f)
+            if entry["written_at"] < started:
+                return None
+            return entry["result"]
+        except (OSError, ValueError, KeyError, TypeError):
+            return None
+
+    def _write_result(self, key: str, result: Any):
+        """Leave a result for processes waiting on the same key"""
+        path = self._path(key, ".json")
+        try:
+            with open(path + ".tmp", "w", encoding="utf-8") as f:
+                json.dump({"written_at": time.time(), "result": result}, f)
+            os.replace(path + ".tmp", path)
+        except (OSError, TypeError, ValueError) as e:
+            logger.warning(f"Could not share single-flight result across processes: {str(e)}")
+
+    def _prune(self):
+        """Delete lock and result files that have been idle for longer than the TTL"""
+        now = time.time()
+        if now - self._pruned_at < self.file_ttl_seconds / 10:
+            return
+        self._pruned_at = now
+        try:
+            names = os.listdir(self.lock_dir)
+        except OSError:
+            return
+        for name in names:
+            path = os.path.join(self.lock_dir, name)
+            try:
+                if now - os.path.getmtime(path) <= self.file_ttl_seconds:
+                    continue
+                if not name.endswith(".lock"):
+                    os.remove(path)
+                    continue
+                with open(path, "a+") as handle:
+                    # Skip locks that are held; waiters on a removed file retry
+                    fcntl.flock(handle, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                    os.remove(path)
+            except OSError:
+                continue
+
+
+_default_single_flight = None
+_default_lock = threading.Lock()
+
+
+def get_single_flight() -> SingleFlight:
+    """
+    Get the process-wide coalescer used by the LLM clients.
+
+    Returns:
+        The shared SingleFlight, coordinating across processes if
+        LLM_SINGLEFLIGHT_LOCK_DIR is set.
+    """
+    global _default_single_flight
+    if _default_single_flight is None:
+        with _default_lock:
+            if _default_single_flight is None:
+                _default_single_flight = SingleFlight(lock_dir=LOCK_DIR)
+    return _default_single_flight
@@ -0,0 +1,290 @@
+#!/usr/bin/env python3
+"""
+Structured Query Module
+
+This module answers questions about well-known analysis report fields (scores,
+technology stack, recommendations, agreement percentages, ...) directly from
+an in-memory index of the parsed reports. These answers need no embedding or
+chat completion calls; questions that are not recognized fall back to the
+full RAG pipeline.
+"""
+
+import re
+from typing import Dict, Any, List, Optional, Tuple
+
+# Display names for the tools whose reports are indexed
+TOOL_NAMES = {
+    "mistral": "Mistral",
+    "openai": "OpenAI",
+    "openhands": "OpenHands",
+}
+
+# Analysis fields copied verbatim from each tool's report
+ANALYSIS_FIELDS = (
+    "repository_type",
+    "primary_purpose",
+    "technology_stack",
+    "recommendations",
+    "complexity_score",
+    "maintainability_score",
+    "scalability_potential",
+)
+
+SCORE_FIELDS = ("complexity_score", "maintainability_score", "scalability_potential")
+
+FIELD_LABELS = {
+    "repository_type": "Repository type",
+    "primary_purpose": "Primary purpose",
+    "technology_stack": "Technology stack",
+    "recommendations": "Recommendations",
+    "complexity_score": "Complexity score",
+    "maintainability_score": "Maintainability score",
+    "scalability_potential": "Scalability potential",
+}
+
+# Agreement categories stored from the comparison report
+AGREEMENT_CATEGORIES = ("repository_info", "technology_stack", "recommendations")
+
+# Question patterns, checked in order. Each matches a report field's name as a
+# whole phrase, so questions that merely share a word with a field (e.g. "the
+# complexity of a function") are left to retrieval. Compiled once at import time.
+_FIELD_PATTERNS: List[Tuple[str, "re.Pattern"]] = [
+    ("agreement", re.compile(r"\bagree(?:ment|s|d)?\b")),
+    ("maintainability_score", re.compile(r"\bmaintainability (?:score|rating)\b")),
+    ("complexity_score", re.compile(r"\bcomplexity (?:score|rating)\b")),
+    ("scalability_potential", re.compile(r"\bscalability (?:potential|score|rating)\b")),
+    ("technology_stack", re.compile(r"\btech(?:nology)? stack\b|\btechnologies\b")),
+    ("recommendations", re.compile(r"\brecommendations\b")),
+    ("repository_type", re.compile(r"\b(?:repository|repo|project) type\b|\btype of (?:repository|repo|project)\b")),
+    ("primary_purpose", re.compile(r"\bprimary purpose\b|\bpurpose of (?:the |this )?(?:repository|repo|project)\b")),
+    ("scores", re.compile(r"\bscores\b|\b(?:repository|repo|project|analysis) scores?\b")),
+]
+
+# Questions naming a file or code symbol are about the code, not the report
+_CODE_REFERENCE = re.compile(
+    r"[\w-]+\.(?:py|js|ts|html|css|json|md|ya?ml|toml|txt)\b|\b\w+\(\)|`|\b[a-z]+_[a-z0-9_]+\b"
+)
+
+# Words that keep a question about the repository or its analysis reports
+_REPORT_SUBJECTS = "repository|repo|project|codebase|code|report|reports|analysis|analyses|mistral|openai|openhands|tools?"
+
+# A question about something other than the repository or report, e.g.
+# "... in the recursive parser" or "... for each document"
+_OTHER_SUBJECT = re.compile(
+    r"\b(?:of|in|for|from|by) (?:(?:the|this|that|each|every|a|an) )?"
+    r"(?!(?:the|this|that|each|every|a|an|" + _REPORT_SUBJECTS + r")\b)[a-z]+"
+)
+
+_AGREEMENT_CATEGORY_PATTERNS = [
+    ("technology_stack", re.compile(r"\btechnolog|\bstack\b")),
+    ("recommendations", re.compile(r"\brecommend")),
+    ("repository_info", re.compile(r"\b(?:repository|repo) (?:info|type)|\bpurpose\b")),
+]
+
+# Questions asking for reasoning or explanation always go through full RAG
+_OPEN_ENDED = re.compile(r"^\s*(?:why|explain|how (?:do|does|did|can|could|should|would))\b")
+
+_TOOL_PATTERNS = [(tool, re.compile(r"\b" + tool)) for tool in TOOL_NAMES]
+
+
+class ReportIndex:
+    """
+    In-memory index of parsed analysis report fields, keyed by tool.
+    """
+
+    def __init__(self):
+        """Initialize an empty index."""
+        self.fields: Dict[str, Dict[str, Any]] = {}
+
+    def add(self, tool: str, field: str, value: Any):
+        """
+        Add a field value for a tool.
+
+        Args:
+            tool: Tool name, e.g. "openai" or "comparison".
+            field: Field name, e.g. "maintainability_score".
+            value: The parsed field value.
+        """
+        if value in (None, "", [], {}):
+            return
+        self.fields.setdefault(tool, {})[field] = value
+
+    def add_analysis(self, tool: str, analysis: Dict[str, Any]):
+        """
+        Index the known fields of a tool's analysis section.
+
+        Args:
+            tool: Tool name.
+            analysis: The tool's analysis dictionary.
+        """
+        for field in ANALYSIS_FIELDS:
+            self.add(tool, field, analysis.get(field))
+
+    def add_comparison(self, comparison: Dict[str, Any]):
+        """
+        Index the agreement percentages of a comparison report.
+
+        Args:
+            comparison: The parsed comparison report.
+        """
+        overall = comparison.get("summary", {}).get("overall_agreement")
+        if overall:
+            self.add("comparison", "overall_agreement", overall)
+
+        for category in AGREEMENT_CATEGORIES:
+            section = comparison.get(category, {})
+            pairs = {
+                key[:-len("_agreement")]: value
+                for key, value in section.items()
+                if key.endswith("_agreement") and isinstance(value, (int, float))
+            }
+            if category == "repository_info":
+                # Repository info agreement is stored as a fraction
+                pairs = {pair: value * 100 for pair, value in pairs.items()}
+            self.add("comparison", f"{category}_agreement", pairs)
+
+    def get(self, tool: str, field: str) -> Any:
+        """Get a field value for a tool, or None"""
+        return self.fields.get(tool, {}).get(field)
+
+    def to_dict(self) -> Dict[str, Dict[str, Any]]:
+        """Serialize the index"""
+        return self.fields
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Dict[str, Any]]) -> "ReportIndex":
+        """Deserialize an index produced by to_dict"""
+        index = cls()
+        index.fields = {tool: dict(fields) for tool, fields in data.items()}
+        return index
+
+
+class StructuredQueryEngine:
+    """
+    Answers questions about known report fields from a ReportIndex.
+    """
+
+    def __init__(self, report_index: ReportIndex):
+        """
+        Initialize the engine.
+
+        Args:
+            report_index: The index of parsed report fields.
+        """
+        self.report_index = report_index
+
+    def answer(self, question: str) -> Optional[Dict[str, Any]]:
+        """
+        Answer a question from the report index if it asks about a known
+        field of the repository's reports. Questions that name a file or code
+        symbol, or ask about something other than the repository, go
+        through the full RAG pipeline.
+
+        Args:
+            question: The question to answer.
+
+        Returns:
+            Dictionary with answer and sources, or None if the question should
+            go through the full RAG pipeline.
+        """
+        text = question.lower()
+        if _OPEN_ENDED.search(text) or _CODE_REFERENCE.search(question) or _OTHER_SUBJECT.search(text):
+            return None
+
+        fields = [field for field, pattern in _FIELD_PATTERNS if pattern.search(text)]
+        if not fields:
+            return None
+
+        if fields[0] == "agreement":
+            return self._answer_agreement(text)
+
+        if fields[-1] == "scores":
+            fields = fields[:-1] or list(SCORE_FIELDS)
+        if len([field for field in fields if field not in SCORE_FIELDS]) > 1:
+            # Several unrelated fields: leave it to the full pipeline
+            return None
+
+        tools = [tool for tool, pattern in _TOOL_PATTERNS if pattern.search(text)] or list(TOOL_NAMES)
+
+        lines = []
+        sources = []
+        for field in fields:
+            for tool in tools:
+                value = self.report_index.get(tool, field)
+                if value is None:
+                    continue
+                lines.append(self._format_value(tool, field, value))
+                sources.append(self._source(tool, field))
+
+        if not lines:
+            return None
+
+        return {
+            "answer": "\n".join(lines),
+            "sources": sources,
+            "structured": True
+        }
+
+    def _answer_agreement(self, text: str) -> Optional[Dict[str, Any]]:
+        """Answer a question about agreement between the analyses"""
+        category = next(
+            (name for name, pattern in _AGREEMENT_CATEGORY_PATTERNS if pattern.search(text)),
+            None
+        )
+
+        if category is None:
+            overall = self.report_index.get("comparison", "overall_agreement")
+            if not overall:
+                return None
+            answer = f"Overall agreement between the analyses: {overall.get('percentage', 0):.1f}%"
+            if overall.get("level"):
+                answer += f" ({overall['level']})"
+            return {
+                "answer": answer,
+                "sources": [self._source("comparison", "overall_agreement")],
+                "structured": True
+            }
+
+        field = f"{category}_agreement"
+        pairs = self.report_index.get("comparison", field)
+        if not pairs:
+            return None
+
+        label = category.replace("_", " ")
+        lines = [
+            f"{label.capitalize()} agreement between {self._pair_label(pair)}: {value:.1f}%"
+            for pair, value in pairs.items()
+        ]
+        return {
+            "answer": "\n".join(lines),
+            "sources": [self._source("comparison", field)],
+            "structured": True
+        }
+
+    @staticmethod
+    def _format_value(tool: str, field: str, value: Any) -> str:
+        """Format a field value as an answer line"""
+        label = f"{FIELD_LABELS.get(field, field)} ({TOOL_NAMES.get(tool, tool)})"
+        if field == "recommendations" and isinstance(value, list):
+            return f"{label}:\n" + "\n".join(f"- {item}" for item in value)
+        if isinstance(value, list):
+            return f"{label}: {', '.join(str(item) for item in value)}"
+        return f"{label}: {value}"
+
+    @staticmethod
+    def _pair_label(pair: str) -> str:
+        """Format a pair key like "mistral_openai" for display"""
+        return " and ".join(TOOL_NAMES.get(tool, tool) for tool in pair.split("_"))
+
+    @staticmethod
+    def _source(tool: str, field: str) -> Dict[str, Any]:
+        """Build a source entry matching the RAG source format"""
+        if tool == "comparison":
+            return {
+                "source": "Comparison Analysis",
+                "metadata": {"type": "comparison", "section": field}
+            }
+        return {
+            "source": f"{TOOL_NAMES.get(tool, tool)} Analysis",
+            "metadata": {"type": "analysis", "tool": tool, "section": field}
+        }
@@ -0,0 +1,142 @@
+#!/usr/bin/env python3
+"""
+Test the analysis schemas
+
+This script verifies that model answers are parsed tolerantly and decoded
+into typed records, that invalid fields get a repair request asking for
+those fields only, and that the file analyzer keeps the valid part of an
+answer instead of falling back to default scores.
+"""
+
+import sys
+import json
+
+import httpx
+
+from analysis_schemas import (
+    AnswerDecoder, SchemaValidationError, FILE_SCHEMAS, SECTION_SCHEMAS, COMBINED_SCHEMA,
+    parse_json_object, parse_score, as_dict
+)
+from compare_analysis import AnalysisComparator
+from llm_providers import ProviderClient
+from mistral_api_integration import RealMistralAnalyzer, ANALYSIS_SPECS
+
+
+def test_tolerant_parsing():
+    """Objects are found around prose, code fences and trailing commas"""
+    assert parse_json_object('{"score": 8}') == {"score": 8}
+    assert parse_json_object('Here you go:\n```json\n{"score": 8, "issues": ["a",],}\n```\nDone {x}') == {
+        "score": 8, "issues": ["a"]
+    }
+    assert parse_json_object("No JSON here.") is None
+    assert parse_json_object("") is None
+
+    assert parse_score("High (8/10)") == 8.0
+    assert parse_score("7.5") == 7.5
+    assert parse_score("medium-low") == 3.0
+    assert parse_score(True) is None and parse_score("n/a") is None
+    assert AnalysisComparator()._extract_score("Medium-High") == 7.0
+    assert AnalysisComparator()._extract_score("unknown") == 0
+
+
+def test_records_are_typed():
+    """Answers decode into frozen records with converted fields"""
+    record = FILE_SCHEMAS["security"].decode({
+        "score": "9/10",
+        "vulnerabilities": [{"type": "xss", "line": 3}],
+    })
+    assert record.score == 9.0
+    assert record.vulnerabilities == ("type: xss, line: 3",)
+    assert record.recommendations == ()
+    assert as_dict(record) == {"score": 9.0, "vulnerabilities": ["type: xss, line: 3"], "recommendations": []}
+
+    try:
+        FILE_SCHEMAS["security"].decode({"score": 42})
+        assert False, "a score outside 1-10 must be rejected"
+    except SchemaValidationError as e:
+        assert list(e.errors) == ["score"]
+
+    layout = json.loads(COMBINED_SCHEMA.layout())
+    assert list(layout) == list(SECTION_SCHEMAS)
+    assert layout["architecture"]["modularity_score"] == "<score 1-10>"
+
+
+def test_repair_asks_for_failed_fields_only():
+    """A repair request names the failed fields and keeps the valid ones"""
+    decoder = AnswerDecoder(SECTION_SCHEMAS["architecture"], [{"role": "user", "content": "analyze"}], "json_schema")
+    assert decoder.arguments()["response_format"]["json_schema"]["name"] == "architecture"
+
+    first = '{"pattern": "MVC", "complexity": "Low", "modularity_score": "great", "recommendations": []}'
+    assert decoder.feed(first)
+    arguments = decoder.arguments()
+    assert arguments["messages"][-2] == {"role": "assistant", "content": first}
+    assert "modularity_score must be a score" in arguments["messages"][-1]["content"]
+    assert arguments["response_format"]["json_schema"]["schema"]["required"] == ["modularity_score", "scalability_score"]
+
+    assert not decoder.feed('{"modularity_score": 7, "scalability_score": "6/10"}')
+    record = decoder.record()
+    assert (record.pattern, record.modularity_score, record.scalability_score) == ("MVC", 7.0, 6.0)
+
+    decoder = AnswerDecoder(SECTION_SCHEMAS["architecture"], [], None, max_repairs=0)
+    assert not decoder.feed("not JSON")
+    assert "response_format" not in decoder.arguments()
+    try:
+        decoder.record()
+        assert False, "an invalid answer must not produce a record"
+    except SchemaValidationError:
+        pass
+
+
+def test_file_analysis_is_repaired():
+    """The file analyzer repairs a bad score instead of substituting a default"""
+    seen = []
+    answers = [
+        '```json\n{"score": "excellent", "issues": ["long function"], "recommendations": ["Split it"]}\n```',
+        '{"score": 6}',
+    ]
+
+    def handler(request):
+        body = json.loads(request.content)
+        seen.append(body)
+        return httpx.Response(200, json={
+            "model": body["model"],
+            "choices": [{"index": 0, "message": {"role": "assistant", "content": answers[len(seen) - 1]}}],
+            "usage": {"prompt_tokens": 5, "completion_tokens": 5, "total_tokens": 10}
+        })
+
+    analyzer = RealMistralAnalyzer(api_key="k", cascade=False)
+    analyzer.client = ProviderClient(
+        "mistral", api_key="k",
+        http_client=httpx.Client(base_url="https://llm.test/v1", transport=httpx.MockTransport(handler))
+    )
+    result = analyzer.analyze_code_quality("def f():\n    return 1\n", "app.py")
+
+    assert len(seen) == 2
+    assert seen[0]["response_format"]["json_schema"]["name"] == "code_quality"
+    assert seen[1]["response_format"]["json_schema"]["schema"]["required"] == ["score"]
+    assert result.score == 6.0
+    assert result.recommendations == ["Split it"] and "long function" in result.details
+
+    try:
+        RealMistralAnalyzer._parse_result(ANALYSIS_SPECS["security"], "I think the code is fine.")
+        assert False, "a text answer must not be turned into a default score"
+    except SchemaValidationError:
+        pass
+
+
+def main():
+    """Run all analysis schema tests"""
+    tests = [
+        test_tolerant_parsing,
+        test_records_are_typed,
+        test_repair_asks_for_failed_fields_only,
+        test_file_analysis_is_repaired,
+    ]
+    for test in tests:
+        test()
+        print(f"✅ {test.__name__}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,245 @@
+#!/usr/bin/env python3
+"""
+Test batch execution
+
+This script verifies that batches are submitted once, resumed from the state
+file after an interruption, mapped back to their requests, and that the
+provider backend speaks the files/batches API, using a local stand-in and
+an in-process mock transport.
+"""
+
+import os
+import sys
+import json
+import tempfile
+
+import httpx
+
+import resilience
+from batch_runner import BatchRunner, BatchRequest, BatchError, LocalBatchBackend, ProviderBatchBackend
+from llm_providers import ProviderClient
+from analyze_openai import OpenAIRepositoryAnalyzer, generate_batch_reports
+from mistral_api_integration import RealMistralAnalyzer
+from usage_ledger import UsageLedger, estimate_cost
+
+
+def completion(content):
+    """OpenAI-style chat completion body"""
+    return {"model": "m", "choices": [{"index": 0, "message": {"role": "assistant", "content": content}}]}
+
+
+def echo_responder(body):
+    """Answer with the last user message, failing on request"""
+    prompt = body["messages"][-1]["content"]
+    if prompt == "fail":
+        raise RuntimeError("model overloaded")
+    return completion(prompt.upper())
+
+
+def requests_for(*prompts):
+    return [
+        BatchRequest(
+            custom_id=f"r{i}",
+            body={"model": "m", "messages": [{"role": "user", "content": prompt}]},
+            metadata={"file": f"file{i}.py"}
+        )
+        for i, prompt in enumerate(prompts)
+    ]
+
+
+def test_results_are_mapped_back():
+    """Each result carries its request's metadata; failures become errors"""
+    with tempfile.TemporaryDirectory() as directory:
+        runner = BatchRunner(LocalBatchBackend(echo_responder, directory), os.path.join(directory, "state.json"), 0)
+        results = runner.run(requests_for("alpha", "fail", "beta"))
+
+        assert results["r0"].content == "ALPHA" and results["r0"].metadata == {"file": "file0.py"}
+        assert results["r1"].content is None and "overloaded" in results["r1"].error
+        assert results["r2"].content == "BETA"
+        assert os.path.exists(os.path.join(directory, "state.json"))
+        assert os.path.exists(os.path.join(directory, "state.jsonl"))
+
+
+def test_results_are_recorded_at_batch_pricing():
+    """Each answered request is recorded once, at batch pricing"""
+    def responder(body):
+        answer = echo_responder(body)
+        answer["model"] = "gpt-4o"
+        answer["usage"] = {"prompt_tokens": 1000, "completion_tokens": 100}
+        return answer
+
+    with tempfile.TemporaryDirectory() as directory:
+        ledger = UsageLedger(os.path.join(directory, "usage.sqlite3"))
+        state_path = os.path.join(directory, "state.json")
+        requests = requests_for("alpha", "fail", "beta")
+        requests[0].metadata["repository"] = "demo"
+        BatchRunner(LocalBatchBackend(responder, directory), state_path, 0, ledger=ledger).run(requests)
+        BatchRunner(LocalBatchBackend(responder, directory), state_path, 0, ledger=ledger).run(requests)
+
+        calls = ledger.recent()
+        assert len(calls) == 2
+        assert {call["endpoint"] for call in calls} == {"batch/chat/completions"}
+        assert {call["repo"] for call in calls} == {"demo", None}
+        batch_cost = estimate_cost("gpt-4o", 1000, 100, batch=True)
+        assert batch_cost < estimate_cost("gpt-4o", 1000, 100)
+        assert all(abs(call["cost_usd"] - batch_cost) < 1e-12 for call in calls)
+        ledger.close()
+
+
+def test_interrupted_run_resumes_same_job():
+    """A run that times out is resumed by the next run without resubmitting"""
+    with tempfile.TemporaryDirectory() as directory:
+        state_path = os.path.join(directory, "state.json")
+        submitted = []
+        backend = LocalBatchBackend(echo_responder, directory, polls_until_complete=3)
+        submit = backend.submit
+        backend.submit = lambda path, requests: submitted.append(path) or submit(path, requests)
+
+        try:
+            BatchRunner(backend, state_path, poll_interval=0.01, max_wait_seconds=0.015).run(requests_for("a"))
+            raise AssertionError("expected BatchError")
+        except BatchError:
+            pass
+
+        results = BatchRunner(backend, state_path, poll_interval=0).run(requests_for("a"))
+        assert results["r0"].content == "A"
+        assert len(submitted) == 1
+
+        # Finished runs are answered from the state file
+        assert BatchRunner(backend, state_path, poll_interval=0).run(requests_for("a"))["r0"].content == "A"
+        assert len(submitted) == 1
+
+        # A different batch is a new job
+        BatchRunner(backend, state_path, poll_interval=0).run(requests_for("b"))
+        assert len(submitted) == 2
+
+        # Expired or forced results are submitted again
+        BatchRunner(backend, state_path, poll_interval=0, results_ttl_seconds=0).run(requests_for("b"))
+        assert len(submitted) == 3
+        BatchRunner(backend, state_path, poll_interval=0, force=True).run(requests_for("b"))
+        assert len(submitted) == 4
+
+
+def test_provider_backend_uses_batch_api():
+    """The OpenAI dialect uploads a file, creates a job and reads its output"""
+    calls = []
+    uploaded = {}
+
+    def handler(request):
+        calls.append((request.method, request.url.path))
+        if request.url.path == "/v1/files":
+            uploaded["content"] = request.content
+            return httpx.Response(200, json={"id": "file-in"})
+        if request.url.path == "/v1/batches":
+            assert json.loads(request.content)["input_file_id"] == "file-in"
+            return httpx.Response(200, json={"id": "batch-1", "status": "validating"})
+        if request.url.path == "/v1/batches/batch-1":
+            return httpx.Response(200, json={"id": "batch-1", "status": "completed", "output_file_id": "file-out"})
+        if request.url.path == "/v1/files/file-out/content":
+            lines = [
+                {"custom_id": "r0", "response": {"status_code": 200, "body": completion("ok")}},
+                {"custom_id": "r1", "response": {"status_code": 400, "body": {"error": "bad"}}},
+            ]
+            return httpx.Response(200, text="\n".join(json.dumps(line) for line in lines))
+        return httpx.Response(404)
+
+    http_client = httpx.Client(base_url="https://llm.test/v1", transport=httpx.MockTransport(handler))
+    client = ProviderClient("openai", api_key="k", http_client=http_client)
+    with tempfile.TemporaryDirectory() as directory:
+        runner = BatchRunner(ProviderBatchBackend(client), os.path.join(directory, "openai.json"), 0)
+        results = runner.run(requests_for("x", "y"))
+
+    assert b'"url": "/v1/chat/completions"' in uploaded["content"]
+    assert results["r0"].content == "ok"
+    assert results["r1"].error.startswith("HTTP 400")
+    assert ("GET", "/v1/batches/batch-1") in calls
+
+
+def test_mistral_backend_pins_one_model_and_retries_polls():
+    """Mistral jobs reject mixed models, and failed polls and downloads are retried"""
+    calls = []
+    failures = {"/v1/batch/jobs/job-1": 1, "/v1/files/file-out/content": 1}
+
+    def handler(request):
+        path = request.url.path
+        calls.append((request.method, path))
+        if failures.get(path):
+            failures[path] -= 1
+            return httpx.Response(503, text="unavailable")
+        if path == "/v1/files":
+            return httpx.Response(200, json={"id": "file-in"})
+        if path == "/v1/batch/jobs":
+            assert json.loads(request.content)["model"] == "m"
+            return httpx.Response(200, json={"id": "job-1", "status": "QUEUED"})
+        if path == "/v1/batch/jobs/job-1":
+            return httpx.Response(200, json={"id": "job-1", "status": "SUCCESS", "output_file": "file-out"})
+        if path == "/v1/files/file-out/content":
+            line = {"custom_id": "r0", "response": {"status_code": 200, "body": completion("ok")}}
+            return httpx.Response(200, text=json.dumps(line))
+        return httpx.Response(404)
+
+    http_client = httpx.Client(base_url="https://llm.test/v1", transport=httpx.MockTransport(handler))
+    client = ProviderClient("mistral", api_key="k", http_client=http_client)
+    backoff = resilience._backoff
+    resilience._backoff = lambda attempt: 0.01
+    try:
+        with tempfile.TemporaryDirectory() as directory:
+            runner = BatchRunner(ProviderBatchBackend(client), os.path.join(directory, "mistral.json"), 0)
+            mixed = requests_for("x", "y")
+            mixed[1].body["model"] = "other"
+            try:
+                runner.run(mixed)
+                raise AssertionError("expected BatchError")
+            except BatchError as e:
+                assert "single model" in str(e)
+            assert not calls
+
+            assert runner.run(requests_for("x"))["r0"].content == "ok"
+    finally:
+        resilience._backoff = backoff
+    assert calls.count(("GET", "/v1/batch/jobs/job-1")) == 2
+    assert calls.count(("GET", "/v1/files/file-out/content")) == 2
+
+
+def test_analyzers_produce_usual_reports():
+    """Batch mode yields the same report formats as the synchronous analyzers"""
+    analysis = {"repository_type": "demo", "recommendations": []}
+    score = json.dumps({"score": 9, "recommendations": ["Keep going"]})
+
+    with tempfile.TemporaryDirectory() as directory:
+        repo = os.path.join(directory, "repo")
+        os.makedirs(repo)
+        with open(os.path.join(repo, "README.md"), "w") as f:
+            f.write("# Demo\n")
+
+        backend = LocalBatchBackend(lambda body: completion(json.dumps(analysis)), directory)
+        runner = BatchRunner(backend, os.path.join(directory, "openai.json"), 0)
+        reports = generate_batch_reports([OpenAIRepositoryAnalyzer(api_key="k", repo_path=repo)], runner)
+        assert reports[0]["openai_analysis"] == analysis
+        assert "README.md" in reports[0]["repository_info"]["content"]
+
+        analyzer = RealMistralAnalyzer(api_key="k")
+        analyzer._build_report = lambda results, file_count: results
+        backend = LocalBatchBackend(lambda body: completion(score), directory)
+        results = analyzer.generate_batch_report(BatchRunner(backend, os.path.join(directory, "mistral.json"), 0))
+        assert results and all(result.score == 9.0 for result in results)
+
+
+def main():
+    """Run all batch execution tests"""
+    tests = [
+        test_results_are_mapped_back,
+        test_results_are_recorded_at_batch_pricing,
+        test_interrupted_run_resumes_same_job,
+        test_provider_backend_uses_batch_api,
+        test_mistral_backend_pins_one_model_and_retries_polls,
+        test_analyzers_produce_usual_reports,
+    ]
+    for test in tests:
+        test()
+        print(f"✅ {test.__name__}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,292 @@
+#!/usr/bin/env python3
+"""
+Test the provider client layer
+
+This script verifies that provider clients share one pooled transport per
+provider, that chat and embedding responses are normalized, that the
+analyzers run their prompts concurrently, and that the combined Mistral
+analysis re-asks only for failed sections, using an in-process mock transport.
+"""
+
+import sys
+import json
+import time
+import asyncio
+import threading
+
+import httpx
+
+import llm_providers
+from llm_providers import ProviderClient, ProviderError, get_http_client, get_provider
+from openai_config import OpenAIClient
+from openhands_config import OpenHandsClient
+from resilience import DeadlineExceededError
+from mistral_api_integration import RealMistralAnalyzer
+from mistral_integration import MistralRepositoryAnalyzer, COMBINED_MODE
+from usage_ledger import current_repo, repo_context
+
+
+def mock_response(request, requests_seen, content="pong"):
+    """Answer a chat or embedding request locally"""
+    body = json.loads(request.content)
+    requests_seen.append((request.url.path, body))
+    if body.get("model") == "bad-model":
+        return httpx.Response(400, json={"error": "unknown model"})
+    if request.url.path.endswith("/embeddings"):
+        return httpx.Response(200, json={
+            "model": body["model"],
+            "data": [
+                {"index": i, "embedding": [float(len(text))]}
+                for i, text in reversed(list(enumerate(body["input"])))
+            ],
+            "usage": {"prompt_tokens": 3, "total_tokens": 3}
+        })
+    return httpx.Response(200, json={
+        "id": "chatcmpl-1",
+        "object": "chat.completion",
+        "created": 0,
+        "model": body["model"],
+        "choices": [{
+            "index": 0,
+            "message": {"role": "assistant", "content": content},
+            "finish_reason": "stop"
+        }],
+        "usage": {"prompt_tokens": 5, "completion_tokens": 1, "total_tokens": 6}
+    })
+
+
+def mock_http_client(requests_seen):
+    """HTTP client answering chat and embedding requests locally"""
+    return httpx.Client(
+        base_url="https://llm.test/v1",
+        transport=httpx.MockTransport(lambda request: mock_response(request, requests_seen))
+    )
+
+
+def mock_async_http_client(requests_seen, in_flight, content="pong"):
+    """Async HTTP client that records the peak number of concurrent requests"""
+    async def handler(request):
+        in_flight["now"] += 1
+        in_flight["peak"] = max(in_flight["peak"], in_flight["now"])
+        await asyncio.sleep(0.01)
+        in_flight["now"] -= 1
+        return mock_response(request, requests_seen, content)
+
+    return httpx.AsyncClient(base_url="https://llm.test/v1", transport=httpx.MockTransport(handler))
+
+
+def test_shared_transport_per_provider():
+    """Every client of a provider uses the same pooled HTTP client"""
+    clients = []
+    threads = [
+        threading.Thread(target=lambda: clients.append(get_http_client("mistral")))
+        for _ in range(8)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert all(client is clients[0] for client in clients)
+    assert get_http_client("openai") is not clients[0]
+    assert get_provider("mistral", api_key="k").http_client is clients[0]
+    assert get_provider("mistral", api_key="k") is get_provider("mistral", api_key="k")
+    assert OpenAIClient(api_key="k").provider.http_client is OpenAIClient(api_key="k").provider.http_client
+
+
+def test_chat_and_embed_are_normalized():
+    """Chat and embedding results have the same shape for every provider"""
+    seen = []
+    for provider in ("openai", "mistral"):
+        client = ProviderClient(provider, api_key="k", http_client=mock_http_client(seen))
+        result = client.chat([{"role": "user", "content": "ping"}], temperature=0.1)
+        assert result.content == "pong"
+        assert result.model == llm_providers.PROVIDERS[provider].default_model
+        assert result.usage["total_tokens"] == 6
+
+        embeddings = client.embed(["a", "abc"])
+        assert embeddings.embeddings == [[1.0], [3.0]]
+
+    assert seen[0][1]["temperature"] == 0.1 and "max_tokens" not in seen[0][1]
+
+
+def test_openai_client_keeps_sdk_response_type():
+    """OpenAIClient.chat_completion still returns an SDK ChatCompletion"""
+    client = OpenAIClient(api_key="k")
+    client.provider = ProviderClient("openai", api_key="k", http_client=mock_http_client([]))
+    response = client.chat_completion([{"role": "user", "content": "ping"}])
+    assert response.choices[0].message.content == "pong"
+    assert response.usage.prompt_tokens == 5
+
+
+def test_async_calls_are_bounded():
+    """Concurrent async calls never exceed the provider's in-flight limit"""
+    seen = []
+    in_flight = {"now": 0, "peak": 0}
+
+    async def run():
+        client = ProviderClient(
+            "openai",
+            api_key="k",
+            async_http_client=mock_async_http_client(seen, in_flight),
+            max_concurrency=3
+        )
+        chats = await asyncio.gather(*[
+            client.achat([{"role": "user", "content": f"ping {i}"}]) for i in range(12)
+        ])
+        embeddings = await client.aembed(["ab"])
+        return chats, embeddings
+
+    chats, embeddings = asyncio.run(run())
+    assert [chat.content for chat in chats] == ["pong"] * 12
+    assert embeddings.embeddings == [[2.0]]
+    assert in_flight["peak"] == 3
+
+
+def test_async_mistral_report():
+    """The async Mistral report runs every file analysis through achat"""
+    seen = []
+    analyzer = RealMistralAnalyzer(api_key="k")
+    analyzer.client = ProviderClient(
+        "mistral",
+        api_key="k",
+        async_http_client=mock_async_http_client(
+            seen, {"now": 0, "peak": 0}, content='{"score": 9, "recommendations": ["Keep going"]}'
+        )
+    )
+    analyzer._build_report = lambda results, file_count: results
+
+    results = asyncio.run(analyzer.agenerate_comprehensive_report())
+    assert results and len(results) == len(seen)
+    assert all(result.score == 9.0 for result in results)
+
+
+def test_mistral_prompts_run_concurrently():
+    """The four Mistral prompts overlap, and a failed one is simulated alone"""
+    in_flight = {"now": 0, "peak": 0}
+    repos = []
+    lock = threading.Lock()
+
+    def handler(request):
+        with lock:
+            in_flight["now"] += 1
+            in_flight["peak"] = max(in_flight["peak"], in_flight["now"])
+            repos.append(current_repo())
+        time.sleep(0.5)
+        with lock:
+            in_flight["now"] -= 1
+        section = json.loads(request.content)["response_format"]["json_schema"]["name"]
+        if section == "architecture":
+            return httpx.Response(400, json={"error": "bad request"})
+        return mock_response(request, [], content=json.dumps(sections[section]))
+
+    analyzer = MistralRepositoryAnalyzer(api_key="k")
+    sections = analyzer._get_simulated_responses()
+    analyzer.client = ProviderClient(
+        "mistral", api_key="k",
+        http_client=httpx.Client(base_url="https://llm.test/v1", transport=httpx.MockTransport(handler))
+    )
+    prompts = analyzer.generate_analysis_prompts()
+
+    start = time.perf_counter()
+    with repo_context("demo-repo"):
+        responses = analyzer.simulate_mistral_analysis(prompts)
+    elapsed = time.perf_counter() - start
+
+    # Sent one after another, the prompts would take at least 2s
+    assert in_flight["peak"] == 4 and elapsed < 1.6
+    assert repos == ["demo-repo"] * 4
+    assert responses["code_quality"]["ai_powered"] and responses["documentation"]["ai_powered"]
+    assert responses["architecture"]["simulated"] and "ai_powered" not in responses["architecture"]
+
+
+def test_combined_mode_reasks_failed_sections():
+    """One prompt answers every section; only invalid sections are asked for again"""
+    analyzer = MistralRepositoryAnalyzer(api_key="k", mode=COMBINED_MODE)
+    answer = analyzer._get_simulated_responses()
+    first = dict(answer, documentation={"completeness_score": "high"})
+    del first["architecture"]
+    answers = [first, {"architecture": answer["architecture"], "documentation": answer["documentation"]}]
+    seen = []
+
+    def handler(request):
+        content = json.dumps(answers[min(len(seen), len(answers) - 1)])
+        return mock_response(request, seen, content=content)
+
+    analyzer.client = ProviderClient(
+        "mistral", api_key="k",
+        http_client=httpx.Client(base_url="https://llm.test/v1", transport=httpx.MockTransport(handler))
+    )
+    responses = analyzer.simulate_mistral_analysis(analyzer.generate_analysis_prompts())
+
+    assert len(seen) == 2
+    assert list(responses) == ["code_quality", "technology_stack", "architecture", "documentation"]
+    assert all(section["ai_powered"] for section in responses.values())
+    assert responses["documentation"]["completeness_score"] == answer["documentation"]["completeness_score"]
+    reask = seen[1][1]
+    schema = reask["response_format"]["json_schema"]["schema"]
+    assert schema["required"] == ["architecture", "documentation"]
+    # The re-ask continues the conversation instead of resending the context
+    assert len(reask["messages"]) == len(seen[0][1]["messages"]) + 2
+
+    # Sections that are still invalid after the re-ask are simulated alone
+    answers[1] = {"architecture": answer["architecture"]}
+    seen.clear()
+    responses = analyzer.simulate_mistral_analysis(analyzer.generate_analysis_prompts())
+    assert len(seen) == 2
+    assert responses["architecture"]["ai_powered"] and "simulated" not in responses["architecture"]
+    assert responses["documentation"]["simulated"] and "ai_powered" not in responses["documentation"]
+
+
+def test_client_errors_are_not_retried():
+    """A 4xx response raises ProviderError immediately"""
+    seen = []
+    client = ProviderClient("openai", api_key="k", http_client=mock_http_client(seen))
+    try:
+        client.chat([{"role": "user", "content": "ping"}], model="bad-model")
+        raise AssertionError("expected ProviderError")
+    except ProviderError as e:
+        assert e.status_code == 400
+    assert len(seen) == 1
+
+
+def test_exhausted_deadline_is_not_retried():
+    """The OpenHands client leaves retries to the provider and gives up once its deadline is spent"""
+    calls = []
+
+    class ExpiredProvider:
+        def chat(self, messages, **kwargs):
+            calls.append(messages)
+            raise DeadlineExceededError("openhands call exceeded its 1s deadline")
+
+    client = OpenHandsClient(api_key="k")
+    client.provider = ExpiredProvider()
+    try:
+        client.chat_completion([{"role": "user", "content": "ping"}])
+        raise AssertionError("expected DeadlineExceededError")
+    except DeadlineExceededError:
+        pass
+    assert len(calls) == 1
+
+
+def main():
+    """Run all provider client tests"""
+    tests = [
+        test_shared_transport_per_provider,
+        test_chat_and_embed_are_normalized,
+        test_openai_client_keeps_sdk_response_type,
+        test_async_calls_are_bounded,
+        test_async_mistral_report,
+        test_mistral_prompts_run_concurrently,
+        test_combined_mode_reasks_failed_sections,
+        test_client_errors_are_not_retried,
+        test_exhausted_deadline_is_not_retried,
+    ]
+    for test in tests:
+        test()
+        print(f"✅ {test.__name__}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
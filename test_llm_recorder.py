@@ -0,0 +1,179 @@
+#!/usr/bin/env python3
+"""
+Test the LLM traffic recorder
+
+This script verifies that provider traffic is recorded to a JSONL cassette
+and replayed offline (sync, async and streamed), that replays are recorded
+at no cost and kept out of the latency histograms, that unrecorded requests
+fail in replay mode, that other lines of the cassette file are left alone,
+and that recorded timing can be replayed.
+"""
+
+import os
+import sys
+import json
+import time
+import asyncio
+import tempfile
+
+import httpx
+
+from llm_providers import ProviderClient
+from llm_recorder import Recorder, CassetteMissError, RECORD, REPLAY, AUTO
+from metrics import get_registry
+from usage_ledger import UsageLedger
+from test_llm_providers import mock_http_client, mock_async_http_client
+from test_streaming import ANSWER, sse_events
+
+MESSAGES = [{"role": "user", "content": "review the code"}]
+
+
+def offline_client(recorder, ledger=False):
+    """Client whose transport fails if a request reaches the network"""
+    def handler(request):
+        raise AssertionError(f"unexpected request to {request.url}")
+
+    async def ahandler(request):
+        raise AssertionError(f"unexpected request to {request.url}")
+
+    return ProviderClient(
+        "openai", api_key="k", recorder=recorder, ledger=ledger,
+        http_client=httpx.Client(base_url="https://llm.test/v1", transport=httpx.MockTransport(handler)),
+        async_http_client=httpx.AsyncClient(base_url="https://llm.test/v1", transport=httpx.MockTransport(ahandler))
+    )
+
+
+def test_record_then_replay():
+    """Recorded chat and embedding calls replay without touching the network"""
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "cassette.jsonl")
+        seen = []
+        live = ProviderClient(
+            "openai", api_key="k", recorder=Recorder(path, RECORD),
+            http_client=mock_http_client(seen),
+            async_http_client=mock_async_http_client([], {"now": 0, "peak": 0})
+        )
+        recorded = live.chat(MESSAGES, temperature=0)
+        live.embed(["alpha", "beta"])
+        asyncio.run(live.achat(MESSAGES, max_tokens=5))
+        assert len(seen) == 2
+
+        with open(path, "r", encoding="utf-8") as f:
+            assert len(f.readlines()) == 3
+
+        replay = offline_client(Recorder(path, REPLAY))
+        assert replay.chat(MESSAGES, temperature=0).content == recorded.content
+        assert replay.embed(["alpha", "beta"]).embeddings == [[5.0], [4.0]]
+        assert asyncio.run(replay.achat(MESSAGES, max_tokens=5)).content == "pong"
+
+        try:
+            replay.chat(MESSAGES, temperature=1)
+            assert False, "an unrecorded request must not be served"
+        except CassetteMissError:
+            pass
+
+
+def test_replays_are_not_billed():
+    """Replayed calls cost nothing and are not observed as live latency"""
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "cassette.jsonl")
+        live = ProviderClient(
+            "openai", api_key="k", recorder=Recorder(path, RECORD), ledger=False,
+            http_client=mock_http_client([])
+        )
+        live.chat(MESSAGES, temperature=0)
+        live.embed(["alpha"])
+
+        histogram = get_registry().histogram(f"llm.openai.{live.config.default_model}.chat_ms")
+        observed = histogram.count
+        ledger = UsageLedger(os.path.join(directory, "usage.sqlite3"))
+        replay = offline_client(Recorder(path, REPLAY), ledger=ledger)
+        result = replay.chat(MESSAGES, temperature=0)
+        replay.embed(["alpha"])
+
+        assert result.replayed and not result.cached
+        assert histogram.count == observed
+        calls = ledger.recent()
+        assert len(calls) == 2
+        assert all(call["cached"] and call["cost_usd"] == 0 for call in calls)
+        ledger.close()
+
+
+def test_foreign_lines_are_kept():
+    """Lines that are not recorder entries are skipped on load and never rewritten"""
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "requests.jsonl")
+        backlog = '{"request_id": "r-1", "title": "t", "body": "b"}\nnot json\n{"request_id": "r-2"}'
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(backlog)
+
+        recorder = Recorder(path, AUTO)
+        client = ProviderClient("openai", api_key="k", recorder=recorder, http_client=mock_http_client([]))
+        client.chat(MESSAGES)
+
+        with open(path, "r", encoding="utf-8") as f:
+            content = f.read()
+        assert content.startswith(backlog + "\n")
+        assert json.loads(content.splitlines()[-1])["format"] == "llm-cassette/1"
+
+        # auto mode replays what it has and records the rest
+        assert offline_client(Recorder(path, AUTO)).chat(MESSAGES).content == "pong"
+
+
+def test_streams_replay_events():
+    """Streamed answers replay their events, so fields are emitted again"""
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "cassette.jsonl")
+
+        def handler(request):
+            return httpx.Response(200, content=b"".join(sse_events(ANSWER)))
+
+        live = ProviderClient(
+            "openai", api_key="k", recorder=Recorder(path, RECORD),
+            http_client=httpx.Client(base_url="https://llm.test/v1", transport=httpx.MockTransport(handler))
+        )
+        live.chat_stream(MESSAGES)
+
+        fields = []
+        result = offline_client(Recorder(path, REPLAY)).chat_stream(
+            MESSAGES, on_field=lambda name, value: fields.append(name)
+        )
+        assert result.content == ANSWER
+        assert fields == ["repository_type", "technology_stack", "scores"]
+
+
+def test_recorded_timing():
+    """Replays are instant by default and follow the recorded latency when asked"""
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "cassette.jsonl")
+        Recorder(path, RECORD).record(
+            "openai", "/chat/completions", {"model": "gpt-4o", "messages": MESSAGES},
+            {"model": "gpt-4o", "choices": [{"index": 0, "message": {"content": "slow"}}]}, 0.2
+        )
+
+        start = time.perf_counter()
+        offline_client(Recorder(path, REPLAY)).chat(MESSAGES)
+        assert time.perf_counter() - start < 0.15
+
+        start = time.perf_counter()
+        offline_client(Recorder(path, REPLAY, replay_timing=0.5)).chat(MESSAGES)
+        assert time.perf_counter() - start >= 0.1
+
+
+def main():
+    """Run all recorder tests"""
+    tests = [
+        test_record_then_replay,
+        test_replays_are_not_billed,
+        test_foreign_lines_are_kept,
+        test_streams_replay_events,
+        test_recorded_timing,
+    ]
+    for test in tests:
+        test()
+        print(f"✅ {test.__name__}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,152 @@
+#!/usr/bin/env python3
+"""
+Test the mock LLM server
+
+This script runs the mock server on a free local port and drives it with
+the real provider client: chat, streaming and embedding calls over HTTP,
+latency and throughput settings, injected 429/5xx errors and the enforced
+requests-per-minute quota.
+"""
+
+import os
+import sys
+import json
+import time
+import random
+import tempfile
+
+import httpx
+
+from llm_providers import ProviderClient, ProviderRateLimitError, ProviderUnavailableError
+from mock_llm_server import MockLLMServer, MockServerConfig, LatencyProfile
+from rate_limiter import RateLimiter
+from resilience import ResiliencePolicy, CircuitBreaker
+
+
+def client_for(server, directory, provider="openai", **kwargs):
+    """Provider client sending its requests to the mock server, with a private rate limiter"""
+    kwargs.setdefault("rate_limiter", RateLimiter(os.path.join(directory, "limits.sqlite3")))
+    return ProviderClient(
+        provider, api_key="mock", http_client=httpx.Client(base_url=server.base_url), **kwargs
+    )
+
+
+def single_attempt(provider="openai"):
+    """Resilience policy that does not retry, with a breaker of its own"""
+    return ResiliencePolicy(provider, (ProviderRateLimitError, ProviderUnavailableError),
+                            breaker=CircuitBreaker(f"{provider}-mock-test"), max_attempts=1, hedge=False)
+
+
+def test_chat_embeddings_and_models():
+    """The server speaks the chat, embeddings and models wire formats"""
+    config = MockServerConfig(responses={"security": '{"score": 8}'})
+    with MockLLMServer(config) as server, tempfile.TemporaryDirectory() as directory:
+        client = client_for(server, directory)
+        echo = client.chat([{"role": "user", "content": "hello mock"}])
+        assert echo.content == "hello mock" and echo.usage["completion_tokens"] > 0
+
+        canned = client.chat([{"role": "user", "content": "review security"}])
+        assert json.loads(canned.content) == {"score": 8}
+
+        wrapped = client.chat([{"role": "user", "content": "hi"}], response_format={"type": "json_object"})
+        assert json.loads(wrapped.content) == {"echo": "hi"}
+
+        first = client.embed(["alpha", "beta"]).embeddings
+        second = client.embed(["alpha"]).embeddings
+        assert len(first) == 2 and len(first[0]) == 1536
+        assert first[0] == second[0] and first[0] != first[1]
+
+        models = client.api_request("GET", "/models").json()
+        assert "gpt-4o" in [model["id"] for model in models["data"]]
+
+
+def test_streaming_with_throughput():
+    """Streams arrive in pieces paced by tokens_per_second and can be abandoned"""
+    answer = json.dumps({"repository_type": "Demo", "notes": "word " * 200})
+    config = MockServerConfig(default_response=answer, tokens_per_second=500)
+    with MockLLMServer(config) as server, tempfile.TemporaryDirectory() as directory:
+        client = client_for(server, directory, provider="mistral")
+        fields = []
+        start = time.perf_counter()
+        result = client.chat_stream(
+            [{"role": "user", "content": "analyze"}],
+            on_field=lambda name, value: fields.append(name),
+            stop_when=lambda parsed: "repository_type" in parsed
+        )
+        elapsed = time.perf_counter() - start
+        assert fields == ["repository_type"]
+        assert result.content.startswith('{"repository_type": "Demo"')
+        # The full answer would take over 0.4s at 500 tokens/s
+        assert elapsed < 0.3
+
+        full = client.chat_stream([{"role": "user", "content": "analyze"}])
+        assert json.loads(full.content) == json.loads(answer)
+
+
+def test_latency_profiles():
+    """Latency specs parse and sample within their distributions"""
+    rng = random.Random(1)
+    assert LatencyProfile.parse("50").sample(rng) == 50.0
+    uniform = LatencyProfile.parse("uniform:10:20")
+    assert all(10 <= uniform.sample(rng) <= 20 for _ in range(100))
+    lognormal = LatencyProfile.parse("lognormal:100:0.5")
+    samples = sorted(lognormal.sample(rng) for _ in range(1001))
+    assert 70 < samples[500] < 140
+
+    config = MockServerConfig(latency=LatencyProfile.parse("fixed:80"))
+    with MockLLMServer(config) as server, tempfile.TemporaryDirectory() as directory:
+        result = client_for(server, directory).chat([{"role": "user", "content": "slow"}])
+        assert result.elapsed >= 0.08
+
+
+def test_error_injection_and_quota():
+    """Injected 429/5xx errors and the enforced quota surface as provider errors"""
+    messages = [{"role": "user", "content": "x"}]
+    with tempfile.TemporaryDirectory() as directory:
+        with MockLLMServer(MockServerConfig(rate_limit_rate=1.0, retry_after=2)) as server:
+            try:
+                client_for(server, directory, resilience=single_attempt()).chat(messages)
+                assert False, "expected a rate limit error"
+            except ProviderRateLimitError as e:
+                assert e.status_code == 429
+
+        with MockLLMServer(MockServerConfig(server_error_rate=1.0)) as server:
+            try:
+                client_for(server, directory, provider="mistral", resilience=single_attempt("mistral")).chat(messages)
+                assert False, "expected a server error"
+            except ProviderUnavailableError as e:
+                assert e.status_code in (500, 502, 503)
+            assert sum(count for name, count in server.stats.items() if name.startswith("errors.5")) == 1
+
+    with MockLLMServer(MockServerConfig(requests_per_minute=2)) as server, \
+            tempfile.TemporaryDirectory() as directory:
+        limiter = RateLimiter(os.path.join(directory, "limits.sqlite3"))
+        client = client_for(server, directory, resilience=single_attempt(), rate_limiter=limiter)
+        client.chat([{"role": "user", "content": "one"}])
+        client.chat([{"role": "user", "content": "two"}])
+        # The client learned the exhausted quota from the x-ratelimit-* headers
+        assert limiter.reserve("openai", "gpt-4o") > 0
+
+        response = httpx.post(f"{server.base_url}/chat/completions", json={"model": "gpt-4o", "messages": messages})
+        assert response.status_code == 429
+        assert response.headers["x-ratelimit-remaining-requests"] == "0"
+        assert float(response.headers["retry-after"]) > 0
+        assert server.stats["chat"] == 2
+
+
+def main():
+    """Run all mock server tests"""
+    tests = [
+        test_chat_embeddings_and_models,
+        test_streaming_with_throughput,
+        test_latency_profiles,
+        test_error_injection_and_quota,
+    ]
+    for test in tests:
+        test()
+        print(f"✅ {test.__name__}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,157 @@
+#!/usr/bin/env python3
+"""
+Test the model router
+
+This script verifies that tasks are routed to the cheapest model of their
+tier that fits the prompt, that measured latency is held against each
+task's latency budget, and that the cascade escalates only when validation
+fails.
+"""
+
+import sys
+import json
+import asyncio
+
+import httpx
+
+from llm_providers import ProviderClient
+from metrics import get_registry
+from mistral_api_integration import RealMistralAnalyzer, ANALYSIS_SPECS
+from model_router import ModelRouter, ModelOption, SMALL, MEDIUM, LARGE, latency_metric
+
+CATALOG = {
+    "mistral": [
+        ModelOption("mistral", "mistral-small-latest", SMALL),
+        ModelOption("mistral", "mistral-medium-latest", MEDIUM),
+        ModelOption("mistral", "mistral-large-latest", LARGE),
+    ]
+}
+LIMITS = {"mistral-small-latest": 4000, "mistral-medium-latest": 8000, "mistral-large-latest": 8000}
+
+
+def make_router():
+    """Router over small context windows so tests need only short prompts"""
+    return ModelRouter(
+        catalog=CATALOG,
+        task_tiers={"docs": SMALL, "security": MEDIUM, "architecture": LARGE},
+        token_limit=lambda provider, model: LIMITS[model]
+    )
+
+
+def messages_of(words):
+    """A user message of roughly the given number of tokens"""
+    return [{"role": "user", "content": " ".join(["token"] * words)}]
+
+
+def cascade_client(requests_seen, valid_from="mistral-medium-latest"):
+    """Mistral client whose models below valid_from answer with invalid output"""
+    order = [option.model for option in CATALOG["mistral"]]
+
+    def handler(request):
+        body = json.loads(request.content)
+        requests_seen.append(body["model"])
+        valid = order.index(body["model"]) >= order.index(valid_from)
+        content = '{"score": 7, "issues": []}' if valid else "I think the code is fine."
+        return httpx.Response(200, json={
+            "model": body["model"],
+            "choices": [{"index": 0, "message": {"role": "assistant", "content": content}}],
+            "usage": {"prompt_tokens": 5, "completion_tokens": 5, "total_tokens": 10}
+        })
+
+    return ProviderClient(
+        "mistral", api_key="k",
+        http_client=httpx.Client(base_url="https://llm.test/v1", transport=httpx.MockTransport(handler)),
+        async_http_client=httpx.AsyncClient(base_url="https://llm.test/v1", transport=httpx.MockTransport(handler))
+    )
+
+
+def test_routes_by_tier_and_size():
+    """Each task gets the cheapest model of its tier; large prompts move up"""
+    router = make_router()
+    assert router.route("mistral", "docs", messages_of(10), max_output_tokens=100).model == "mistral-small-latest"
+    assert router.route("mistral", "security", messages_of(10), max_output_tokens=100).model == "mistral-medium-latest"
+    assert router.route("mistral", "architecture", messages_of(10), max_output_tokens=100).model == "mistral-large-latest"
+    assert router.route("mistral", "unknown", messages_of(10), max_output_tokens=100).model == "mistral-large-latest"
+
+    # Too large for the small model's window
+    assert router.route("mistral", "docs", messages_of(3950), max_output_tokens=100).model == "mistral-medium-latest"
+    # Too large for every window: fall back to the largest one
+    assert router.route("mistral", "docs", messages_of(9000), max_output_tokens=100).model in (
+        "mistral-medium-latest", "mistral-large-latest"
+    )
+
+
+def test_latency_budget_uses_measurements():
+    """Measured p95 latency excludes slow models from a latency-budgeted call"""
+    catalog = {"mistral": [
+        ModelOption("mistral", "router-test-small", SMALL),
+        ModelOption("mistral", "router-test-fast", MEDIUM),
+    ]}
+    router = ModelRouter(catalog=catalog, token_limit=lambda provider, model: 8000)
+    registry = get_registry()
+    for _ in range(10):
+        registry.observe(latency_metric("mistral", "router-test-small"), 9000.0)
+        registry.observe(latency_metric("mistral", "router-test-fast"), 400.0)
+
+    # Unpriced models tie on cost, so the lower tier wins without a budget
+    assert router.candidates("mistral", messages_of(10))[0].model == "router-test-small"
+    fast = router.candidates("mistral", messages_of(10), latency_budget_ms=2000)
+    assert [option.model for option in fast] == ["router-test-fast"]
+    # When nothing meets the budget the fastest model is kept
+    slowest = router.candidates("mistral", messages_of(10), latency_budget_ms=1)
+    assert [option.model for option in slowest] == ["router-test-fast"]
+
+    # Routed tasks get their own budget without the caller passing one
+    router.latency_budgets = {"docs": 2000.0}
+    router.task_tiers = {"docs": SMALL, "notes": SMALL}
+    assert router.route("mistral", "docs", messages_of(10)).model == "router-test-fast"
+    assert router.route("mistral", "notes", messages_of(10)).model == "router-test-small"
+    assert ModelRouter().latency_budget("documentation") > 0
+
+
+def test_cascade_escalates_on_invalid_output():
+    """The cascade stops at the first model whose output validates"""
+    router = make_router()
+    seen = []
+    client = cascade_client(seen)
+    result = router.chat_with_cascade(
+        client, messages_of(10), ANALYSIS_SPECS["code_quality"].schema.accepts, max_output_tokens=100
+    )
+    assert seen == ["mistral-small-latest", "mistral-medium-latest"]
+    assert json.loads(result.content)["score"] == 7
+
+    seen.clear()
+    result = asyncio.run(router.achat_with_cascade(
+        client, messages_of(20), lambda content: False, max_output_tokens=100
+    ))
+    assert seen == ["mistral-small-latest", "mistral-medium-latest", "mistral-large-latest"]
+
+
+def test_analyzer_routes_by_category():
+    """The file analyzer sends each category to its tier's model and batches pin one model"""
+    analyzer = RealMistralAnalyzer(api_key=None, router=make_router())
+    analyzer.router.task_tiers = {"documentation": SMALL, "security": MEDIUM}
+    docs = analyzer._request(ANALYSIS_SPECS["documentation"], "# Title", "README.md")
+    security = analyzer._request(ANALYSIS_SPECS["security"], "x = 1", "app.py")
+    assert docs["model"] == "mistral-small-latest"
+    assert security["model"] == "mistral-medium-latest"
+    pinned = analyzer._request(ANALYSIS_SPECS["documentation"], "# Title", "README.md", model="mistral-large-latest")
+    assert pinned["model"] == "mistral-large-latest"
+
+
+def main():
+    """Run all model router tests"""
+    tests = [
+        test_routes_by_tier_and_size,
+        test_latency_budget_uses_measurements,
+        test_cascade_escalates_on_invalid_output,
+        test_analyzer_routes_by_category,
+    ]
+    for test in tests:
+        test()
+        print(f"✅ {test.__name__}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
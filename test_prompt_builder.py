@@ -0,0 +1,181 @@
+#!/usr/bin/env python3
+"""
+Test the prefix-stable prompt layout
+
+This script verifies that repository context serializes to identical bytes
+regardless of dict ordering, that the analyzers put the shared context
+before the task instructions, that the Mistral context is built once per
+repository state (and not rebuilt by the API calls of the analysis), and
+that cached prompt tokens reported by the provider are recorded.
+"""
+
+import os
+import sys
+import tempfile
+
+import httpx
+
+from analyze_openai import OpenAIRepositoryAnalyzer
+from llm_providers import ProviderClient
+from mistral_integration import MistralRepositoryAnalyzer
+from prompt_builder import build_context, build_messages, cached_prompt_tokens, INSTRUCTIONS_HEADER
+from rate_limiter import RateLimiter
+from test_llm_providers import mock_http_client
+from usage_ledger import UsageLedger, estimate_cost
+
+REPO_INFO = {
+    "structure": "./\n  README.md",
+    "content": {"README.md": "# Demo", "app.py": "print('hi')"},
+    "dependencies": {"python": ["flask"], "npm": {}},
+    "workflows": {},
+}
+
+
+def test_context_is_byte_stable():
+    """Equal values serialize identically whatever their key order"""
+    first = build_context([("DEPENDENCIES", {"b": 1, "a": [1, 2]}), ("NOTES", "text")])
+    second = build_context([("DEPENDENCIES", {"a": [1, 2], "b": 1}), ("NOTES", "text")])
+    assert first == second
+    assert first.startswith("DEPENDENCIES:\n")
+
+
+def test_instructions_come_last():
+    """The task is appended after the context, which is shared by every task"""
+    context = build_context([("FILES", {"a.py": "x = 1"})])
+    first = build_messages(context, "Review security")
+    second = build_messages(context, "Review docs")
+    assert first[0] == second[0]
+    assert first[-1]["content"].startswith(context)
+    assert first[-1]["content"].endswith(f"{INSTRUCTIONS_HEADER}\nReview security")
+
+
+def test_analyzers_share_prefix():
+    """OpenAI requests ignore dict order; the Mistral prompts share the whole context"""
+    analyzer = OpenAIRepositoryAnalyzer(api_key="k")
+    reordered = dict(REPO_INFO, content=dict(reversed(list(REPO_INFO["content"].items()))))
+    assert analyzer._analysis_request(REPO_INFO) == analyzer._analysis_request(reordered)
+
+    mistral = MistralRepositoryAnalyzer()
+    context = mistral.prepare_context_for_mistral()
+    prompts = mistral.generate_analysis_prompts()
+    assert len(prompts) == 4
+    prefix = os.path.commonprefix([mistral.prompt_messages(prompt)[-1]["content"] for prompt in prompts])
+    assert prefix.startswith(context)
+    # The prompts share one context string instead of holding copies
+    assert all(prompt["context"] is context for prompt in prompts)
+
+
+def test_mistral_context_is_built_once():
+    """The context is reused until a file, including a workflow, or the checked-out commit changes"""
+    cwd = os.getcwd()
+    with tempfile.TemporaryDirectory() as directory:
+        os.chdir(directory)
+        try:
+            with open("README.md", "w", encoding="utf-8") as f:
+                f.write("# Demo")
+            mistral = MistralRepositoryAnalyzer()
+            reads = []
+            read_files = mistral._get_all_file_contents
+            mistral._get_all_file_contents = lambda: reads.append(1) or read_files()
+
+            context = mistral.prepare_context_for_mistral()
+            mistral.generate_analysis_prompts()
+            assert mistral.prepare_context_for_mistral() is context
+            assert len(reads) == 1
+
+            with open("app.py", "w", encoding="utf-8") as f:
+                f.write("print('hi')")
+            assert "print('hi')" in mistral.prepare_context_for_mistral()
+            assert len(reads) == 2
+
+            # Workflow files are part of the tree and the fingerprint
+            os.makedirs(os.path.join(".github", "workflows"))
+            with open(os.path.join(".github", "workflows", "ci.yml"), "w", encoding="utf-8") as f:
+                f.write("on: push\n")
+            context = mistral.prepare_context_for_mistral()
+            assert "  .github/\n    workflows/\n      ci.yml" in context
+            with open(os.path.join(".github", "workflows", "ci.yml"), "w", encoding="utf-8") as f:
+                f.write("on: [push, pull_request]\n")
+            assert "pull_request" in mistral.prepare_context_for_mistral()
+            assert len(reads) == 4
+        finally:
+            os.chdir(cwd)
+
+
+def test_api_calls_keep_the_context():
+    """Usage ledger and rate limiter writes in the repository do not rebuild the context"""
+    cwd = os.getcwd()
+    with tempfile.TemporaryDirectory() as directory:
+        os.chdir(directory)
+        try:
+            with open("README.md", "w", encoding="utf-8") as f:
+                f.write("# Demo")
+            ledger = UsageLedger(".llm_usage.sqlite3")
+            mistral = MistralRepositoryAnalyzer()
+            mistral.client = ProviderClient(
+                "mistral", api_key="k", http_client=mock_http_client([]),
+                rate_limiter=RateLimiter(".llm_ratelimit.sqlite3"), ledger=ledger
+            )
+            builds = []
+            git_context = mistral._get_git_context
+            mistral._get_git_context = lambda: builds.append(1) or git_context()
+
+            context = mistral.prepare_context_for_mistral()
+            mistral.client.chat([{"role": "user", "content": context}])
+            ledger.flush()
+            assert mistral.prepare_context_for_mistral() is context
+            assert len(builds) == 1
+            ledger.close()
+        finally:
+            os.chdir(cwd)
+
+
+def test_cached_tokens_are_recorded():
+    """Cached prompt tokens from the usage block reach the ledger and lower the cost"""
+    usage = {
+        "prompt_tokens": 2000, "completion_tokens": 10, "total_tokens": 2010,
+        "prompt_tokens_details": {"cached_tokens": 1536}
+    }
+    assert cached_prompt_tokens(usage) == 1536
+    assert cached_prompt_tokens({"prompt_tokens": 5}) == 0
+
+    def handler(request):
+        return httpx.Response(200, json={
+            "model": "gpt-4o",
+            "choices": [{"index": 0, "message": {"role": "assistant", "content": "ok"}}],
+            "usage": usage
+        })
+
+    with tempfile.TemporaryDirectory() as directory:
+        ledger = UsageLedger(os.path.join(directory, "usage.sqlite3"))
+        client = ProviderClient(
+            "openai", api_key="k", ledger=ledger,
+            http_client=httpx.Client(base_url="https://llm.test/v1", transport=httpx.MockTransport(handler))
+        )
+        client.chat(build_messages("CONTEXT", "task"))
+
+        row = ledger.summary(group_by="model")[0]
+        assert row["cached_tokens"] == 1536
+        assert abs(row["cost_usd"] - estimate_cost("gpt-4o", 2000, 10, 1536)) < 1e-9
+        assert row["cost_usd"] < estimate_cost("gpt-4o", 2000, 10)
+        ledger.close()
+
+
+def main():
+    """Run all prompt builder tests"""
+    tests = [
+        test_context_is_byte_stable,
+        test_instructions_come_last,
+        test_analyzers_share_prefix,
+        test_mistral_context_is_built_once,
+        test_api_calls_keep_the_context,
+        test_cached_tokens_are_recorded,
+    ]
+    for test in tests:
+        test()
+        print(f"✅ {test.__name__}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
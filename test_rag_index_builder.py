@@ -0,0 +1,102 @@
+#!/usr/bin/env python3
+"""
+Test background RAG index builds
+
+This script verifies checkpointing, resume after a failed embedding call,
+cancellation and progress reporting of IndexBuildJob, in a temporary directory.
+"""
+
+import os
+import sys
+import tempfile
+from contextlib import contextmanager
+
+from rag_index_builder import IndexBuildJob, COMPLETED, FAILED, CANCELLED
+from rag_system import RAGSystem
+from test_rag_metrics import FakeOpenAIClient
+
+
+class FlakyOpenAIClient(FakeOpenAIClient):
+    """Fake client whose embedding calls start failing after a number of calls"""
+
+    def __init__(self, fail_after=None):
+        super().__init__()
+        self.fail_after = fail_after
+        self.calls = 0
+
+    def _embed(self, model, input):
+        self.calls += 1
+        if self.fail_after is not None and self.calls > self.fail_after:
+            raise ConnectionError("embedding service unavailable")
+        return super()._embed(model, input)
+
+
+@contextmanager
+def temporary_repository():
+    """Run a block inside a temporary directory with a few documentation files"""
+    previous = os.getcwd()
+    with tempfile.TemporaryDirectory() as directory:
+        os.chdir(directory)
+        try:
+            paragraphs = [f"Paragraph {i} " + "word " * 150 for i in range(6)]
+            with open("README.md", "w", encoding="utf-8") as f:
+                f.write("\n\n".join(paragraphs))
+            with open("GUIDE.md", "w", encoding="utf-8") as f:
+                f.write("\n\n".join(paragraphs[:3]))
+            yield directory
+        finally:
+            os.chdir(previous)
+
+
+def test_failed_build_resumes_from_checkpoint():
+    """A build that fails partway keeps its embeddings and resumes without redoing them"""
+    with temporary_repository():
+        failing = IndexBuildJob(openai_client=FlakyOpenAIClient(fail_after=2))
+        failing.run()
+
+        assert failing.state == FAILED
+        assert failing.progress()["embedded_chunks"] == 2
+        assert not os.path.exists("vector_store.faiss")
+
+        client = FlakyOpenAIClient()
+        resumed = IndexBuildJob(openai_client=client)
+        resumed.start().wait(timeout=30)
+
+        progress = resumed.progress()
+        assert resumed.state == COMPLETED
+        assert progress["resumed_chunks"] == 2
+        assert client.calls == progress["total_chunks"] - 2
+        assert progress["tokens_spent"] > 0
+        assert not os.path.exists(resumed.checkpoint_path)
+
+        rag = RAGSystem(openai_client=client)
+        rag.load()
+        assert rag.index.ntotal == len(rag.documents) == progress["total_chunks"]
+
+
+def test_cancelled_build_keeps_previous_index():
+    """Cancelling a build leaves the live stores untouched"""
+    with temporary_repository():
+        job = IndexBuildJob(openai_client=FlakyOpenAIClient())
+        job.cancel()
+        job.run()
+
+        assert job.state == CANCELLED
+        assert not os.path.exists("vector_store.faiss")
+        assert not os.path.exists("document_store.json")
+
+
+def main():
+    """Run all index builder tests"""
+    tests = [
+        test_failed_build_resumes_from_checkpoint,
+        test_cancelled_build_keeps_previous_index,
+    ]
+    for test in tests:
+        test()
+        print(f"✅ {test.__name__}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,116 @@
+#!/usr/bin/env python3
+"""
+Test RAG query instrumentation
+
+This script checks the histogram registry and verifies that RAGSystem.query
+records per-stage timings and token counts, using an in-process fake client.
+"""
+
+import sys
+from types import SimpleNamespace
+
+import faiss
+import numpy as np
+
+from llm_providers import EmbeddingResult
+from metrics import Histogram, MetricsRegistry, StageTimer, get_registry
+from rag_system import RAGSystem
+
+
+class FakeOpenAIClient:
+    """Minimal stand-in for OpenAIClient that never touches the network"""
+
+    def __init__(self, dimension=8):
+        self.dimension = dimension
+        self.client = SimpleNamespace(embeddings=SimpleNamespace(create=self._embed))
+
+    def _embed(self, model, input):
+        vector = [float(len(input) % (i + 2)) for i in range(self.dimension)]
+        return SimpleNamespace(
+            data=[SimpleNamespace(embedding=vector)],
+            usage=SimpleNamespace(total_tokens=len(input) // 4)
+        )
+
+    def embed(self, texts, model=None):
+        responses = [self._embed(model, text) for text in texts]
+        return EmbeddingResult(
+            provider="fake",
+            model=model,
+            embeddings=[response.data[0].embedding for response in responses],
+            usage={"total_tokens": sum(response.usage.total_tokens for response in responses)}
+        )
+
+    def chat_completion(self, messages, **kwargs):
+        return SimpleNamespace(
+            choices=[SimpleNamespace(message=SimpleNamespace(content="Fake answer"))],
+            usage=SimpleNamespace(prompt_tokens=120, completion_tokens=3)
+        )
+
+    def count_tokens(self, text, model=None):
+        return len(text) // 4
+
+
+def test_histogram_percentiles():
+    """Percentile estimates stay within the observed range"""
+    histogram = Histogram()
+    for value in range(1, 101):
+        histogram.observe(value)
+
+    snapshot = histogram.snapshot()
+    assert snapshot["count"] == 100
+    assert snapshot["min"] == 1 and snapshot["max"] == 100
+    assert 25 <= snapshot["p50"] <= 100
+    assert snapshot["p50"] <= snapshot["p95"] <= snapshot["p99"] <= 100
+
+
+def test_stage_timer_records_into_registry():
+    """Stage timings and token counts land in prefixed histograms"""
+    registry = MetricsRegistry()
+    timer = StageTimer("unit", registry)
+    with timer.stage("work"):
+        pass
+    timer.record_tokens("prompt_tokens", 42)
+    result = timer.finish()
+
+    assert set(result["stages_ms"]) == {"work"}
+    assert result["tokens"] == {"prompt_tokens": 42}
+    assert set(registry.snapshot(prefix="unit.")) == {
+        "unit.work_ms", "unit.prompt_tokens", "unit.total_ms"
+    }
+
+
+def test_rag_query_debug_timings():
+    """RAGSystem.query returns per-stage timings under the debug flag"""
+    client = FakeOpenAIClient()
+    rag = RAGSystem(openai_client=client)
+    rag.index = faiss.IndexFlatL2(client.dimension)
+    for i, text in enumerate(["alpha document", "beta document text"]):
+        rag.documents[f"doc_{i}"] = {"content": text, "source": "unit", "metadata": {}}
+        rag.index.add(np.array([rag._get_embedding(text)], dtype=np.float32))
+
+    result = rag.query("What is alpha?", top_k=2, debug=True)
+
+    assert result["answer"] == "Fake answer"
+    stages = result["debug"]["stages_ms"]
+    assert set(stages) == {"structured", "embedding", "search", "context_assembly", "completion"}
+    assert result["debug"]["tokens"]["prompt_tokens"] == 120
+    assert get_registry().snapshot(prefix="rag.query.")["rag.query.completion_ms"]["count"] >= 1
+
+    assert "debug" not in rag.query("What is beta?")
+
+
+def main():
+    """Run all RAG metrics tests"""
+    tests = [
+        test_histogram_percentiles,
+        test_stage_timer_records_into_registry,
+        test_rag_query_debug_timings,
+    ]
+    for test in tests:
+        test()
+        print(f"✅ {test.__name__}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,115 @@
+#!/usr/bin/env python3
+"""
+Test the adaptive rate limiter
+
+This script verifies token bucket reservations shared through the SQLite
+state file, adaptation to provider rate-limit headers, and that the provider
+client feeds response headers and usage back to the limiter.
+"""
+
+import os
+import sys
+import tempfile
+
+import httpx
+
+from llm_providers import ProviderClient
+from rate_limiter import RateLimiter, parse_duration, REQUESTS, TOKENS
+from test_llm_providers import mock_response
+
+MESSAGES = [{"role": "user", "content": "Analyze this repository"}]
+
+
+def test_parse_duration():
+    """Reset durations use the formats providers send"""
+    assert parse_duration("20ms") == 0.02
+    assert parse_duration("1.5s") == 1.5
+    assert parse_duration("6m0s") == 360.0
+    assert parse_duration("12") == 12.0
+    assert parse_duration("soon") is None
+
+
+def test_reservations_are_shared_between_workers():
+    """Two limiters on the same file draw from one bucket"""
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "limits.sqlite3")
+        first = RateLimiter(path, requests_per_minute=2, tokens_per_minute=1000)
+        second = RateLimiter(path, requests_per_minute=2, tokens_per_minute=1000)
+
+        assert first.reserve("openai", "gpt-4o", 100) == 0
+        assert second.reserve("openai", "gpt-4o", 100) == 0
+        # Third request: the request bucket refills one per 30 seconds
+        assert 29 < first.reserve("openai", "gpt-4o", 100) <= 30
+        # Other models have their own buckets
+        assert second.reserve("openai", "gpt-4o-mini", 100) == 0
+
+        # 300 tokens reserved, 60 refunded once the first call reports its usage
+        first.settle("openai", "gpt-4o", 100, 40)
+        assert 760 <= second.state("openai", "gpt-4o")[TOKENS]["level"] < 770
+        first.close()
+        second.close()
+
+
+def test_adapts_to_rate_limit_headers():
+    """Reported limits resize the buckets and exhausted quotas pause callers"""
+    with tempfile.TemporaryDirectory() as directory:
+        limiter = RateLimiter(os.path.join(directory, "limits.sqlite3"))
+        limiter.update_from_headers("mistral", "m", {
+            "x-ratelimit-limit-requests": "60",
+            "x-ratelimit-remaining-requests": "0",
+            "x-ratelimit-reset-requests": "2s",
+            "x-ratelimit-limit-tokens": "6000",
+            "x-ratelimit-remaining-tokens": "5000",
+        })
+        state = limiter.state("mistral", "m")
+        assert state[REQUESTS]["capacity"] == 60
+        assert state[TOKENS]["capacity"] == 6000 and state[TOKENS]["level"] < 5001
+        assert 2.5 < limiter.reserve("mistral", "m", 10) <= 3.0
+
+        limiter.update_from_headers("mistral", "other", {"retry-after": "5"}, status_code=429)
+        assert limiter.reserve("mistral", "other") > 5
+        limiter.close()
+
+
+def test_provider_feeds_headers_back():
+    """The provider client reserves before each call and adapts afterwards"""
+    def handler(request):
+        response = mock_response(request, [])
+        response.headers["x-ratelimit-limit-requests"] = "120"
+        response.headers["x-ratelimit-remaining-requests"] = "100"
+        return response
+
+    with tempfile.TemporaryDirectory() as directory:
+        limiter = RateLimiter(os.path.join(directory, "limits.sqlite3"))
+        client = ProviderClient(
+            "openai",
+            api_key="k",
+            http_client=httpx.Client(base_url="https://llm.test/v1", transport=httpx.MockTransport(handler)),
+            rate_limiter=limiter
+        )
+        client.chat(MESSAGES, model="gpt-4o", max_tokens=50)
+
+        state = limiter.state("openai", "gpt-4o")
+        assert state[REQUESTS]["capacity"] == 120
+        assert state[REQUESTS]["level"] < 101
+        # The reservation (prompt + max_tokens) was settled to the reported 6 tokens
+        assert state[TOKENS]["capacity"] - state[TOKENS]["level"] <= 6
+        limiter.close()
+
+
+def main():
+    """Run all rate limiter tests"""
+    tests = [
+        test_parse_duration,
+        test_reservations_are_shared_between_workers,
+        test_adapts_to_rate_limit_headers,
+        test_provider_feeds_headers_back,
+    ]
+    for test in tests:
+        test()
+        print(f"✅ {test.__name__}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,107 @@
+#!/usr/bin/env python3
+"""
+Test the repository scanner
+
+This script verifies that the scanner reads text files, skips binary and
+minified ones from their first block, samples oversized files to their head
+and tail (with and without mmap), and never holds more than its total byte
+budget however many files the repository has.
+"""
+
+import os
+import sys
+import tempfile
+
+from repo_scanner import RepositoryScanner, BINARY, MINIFIED, BUDGET
+
+
+def write(directory, path, data):
+    """Write a file under the directory, creating its parents"""
+    full_path = os.path.join(directory, path)
+    os.makedirs(os.path.dirname(full_path), exist_ok=True)
+    with open(full_path, "wb") as f:
+        f.write(data if isinstance(data, bytes) else data.encode("utf-8"))
+
+
+def test_reads_text_and_skips_binary_and_minified():
+    """Text files are read whole; binary and minified files are skipped"""
+    with tempfile.TemporaryDirectory() as directory:
+        write(directory, "README.md", "# Demo\r\nHello\r\n")
+        write(directory, "src/app.py", "def main():\n    return 1\n")
+        write(directory, "data/blob.json", b"\x89PNG\r\n\x1a\n\0\0\0")
+        write(directory, "static/app.js", "var a=1;" * 2000)
+        write(directory, "static/vendor.min.js", "var b=2;\n")
+        write(directory, "node_modules/lib/index.js", "module.exports = 1;\n")
+        write(directory, ".git/config", "[core]\n")
+        write(directory, "image.png", b"\0" * 10)
+
+        scanned = {item.path: item for item in RepositoryScanner(directory).scan()}
+        assert list(scanned) == [
+            "README.md", "data/blob.json", "src/app.py", "static/app.js", "static/vendor.min.js"
+        ]
+        assert scanned["README.md"].text == "# Demo\nHello\n"
+        assert scanned["data/blob.json"].skipped == BINARY
+        assert scanned["static/app.js"].skipped == MINIFIED
+        assert scanned["static/vendor.min.js"].skipped == MINIFIED
+
+        contents = RepositoryScanner(directory).read_contents()
+        assert list(contents) == ["README.md", "src/app.py"]
+
+        # Dot directories other than .git are visited
+        write(directory, ".github/workflows/ci.yml", "on: push\n")
+        scanner = RepositoryScanner(directory)
+        assert [path for path in scanner.paths() if path.startswith(".")] == [".github/workflows/ci.yml"]
+        assert [name for name, _ in scanner.walk()] == [
+            ".", ".github", ".github/workflows", "data", "src", "static"
+        ]
+
+
+def test_oversized_files_keep_head_and_tail():
+    """Files above the per-file budget are sampled, with or without mmap"""
+    with tempfile.TemporaryDirectory() as directory:
+        lines = "".join(f"line {index}: é\n" for index in range(20000))
+        write(directory, "big.txt", "BEGIN\n" + lines + "END\n")
+
+        for mmap_threshold in (0, 1):
+            scanner = RepositoryScanner(directory, max_file_bytes=4096, mmap_threshold=mmap_threshold)
+            scanned = scanner.read("big.txt")
+            assert scanned.truncated and scanned.size > 100000
+            assert len(scanned.text.encode("utf-8")) <= 4096
+            assert scanned.text.startswith("BEGIN\n") and scanned.text.endswith("END\n")
+            assert "middle omitted" in scanned.text
+
+        with_mmap = RepositoryScanner(directory, max_file_bytes=4096, mmap_threshold=1).read("big.txt")
+        without_mmap = RepositoryScanner(directory, max_file_bytes=4096, mmap_threshold=0).read("big.txt")
+        assert with_mmap.text == without_mmap.text
+
+
+def test_total_budget_bounds_memory():
+    """The scan stops reading once its total budget is spent"""
+    with tempfile.TemporaryDirectory() as directory:
+        for index in range(200):
+            write(directory, f"docs/page_{index:03}.md", f"# Page {index}\n" + "text line\n" * 500)
+
+        scanner = RepositoryScanner(directory, max_file_bytes=2048, max_total_bytes=20000)
+        scanned = list(scanner.scan())
+        read = [item for item in scanned if not item.skipped]
+        assert len(scanned) == 200
+        assert sum(len(item.text.encode("utf-8")) for item in read) <= 20000
+        assert all(item.truncated for item in read)
+        assert scanned[-1].skipped == BUDGET
+
+
+def main():
+    """Run all repository scanner tests"""
+    tests = [
+        test_reads_text_and_skips_binary_and_minified,
+        test_oversized_files_keep_head_and_tail,
+        test_total_budget_bounds_memory,
+    ]
+    for test in tests:
+        test()
+        print(f"✅ {test.__name__}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
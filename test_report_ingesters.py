@@ -0,0 +1,106 @@
+#!/usr/bin/env python3
+"""
+Test streaming report ingestion
+
+This script verifies the incremental JSON parser, the report ingester
+registry, and that ingesting a large report keeps memory bounded.
+"""
+
+import os
+import sys
+import json
+import tempfile
+import tracemalloc
+
+from json_stream import JSONStreamParser
+from report_ingesters import analysis_ingester, ingest_reports, MISTRAL_REAL_INGESTER
+from structured_query import ReportIndex
+
+
+def test_parser_is_chunking_independent():
+    """Members are emitted identically whatever the chunk boundaries"""
+    document = {
+        "a": 1,
+        "b": {"x": [1, {"y": "}\"]"}], "t": True, "n": None},
+        "c": [{"k": 1}, "s", 3.5],
+        "d": "escaped \\ \"quote\""
+    }
+    text = json.dumps(document, indent=2)
+    expected = None
+    for chunk_size in (1, 3, 7, len(text)):
+        parser = JSONStreamParser([(), ("c",)])
+        emitted = []
+        for i in range(0, len(text), chunk_size):
+            emitted += parser.feed(text[i:i + chunk_size])
+        assert parser.done
+        expected = expected or emitted
+        assert emitted == expected
+
+    assert ((), "b", document["b"]) in expected
+    assert (("c",), 2, 3.5) in expected
+    assert not any(key == "c" for path, key, _ in expected if path == ())
+
+
+def test_registered_ingesters_cover_all_reports():
+    """The checked-in Mistral reports are ingested into documents and the report index"""
+    results = ingest_reports()
+    by_name = {result.ingester.name: result for result in results}
+
+    mistral_ids = [doc_id for doc_id, _ in by_name["mistral"].documents]
+    assert "mistral_maintainability_score" in mistral_ids
+    assert by_name["mistral"].fields["technology_stack"]
+
+    real_ids = [doc_id for doc_id, _ in by_name["mistral_real"].documents]
+    assert "mistral_real_overall_scores" in real_ids
+    assert "mistral_real_detailed_result_0" in real_ids
+
+    index = ReportIndex()
+    ingester = by_name["mistral"].ingester
+    ingester.indexer(index, ingester.name, by_name["mistral"].fields)
+    assert index.get("mistral", "maintainability_score")
+
+
+def test_large_report_memory_is_bounded():
+    """A report with a huge unrelated section is ingested without loading it"""
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "big_analysis_report.json")
+        with open(path, "w", encoding="utf-8") as f:
+            f.write('{"repository_info": {"content": "')
+            for _ in range(200):
+                f.write("x" * 100_000)
+            f.write('"}, "big_analysis": ')
+            json.dump({"repository_type": "Demo", "recommendations": ["Add tests"]}, f)
+            f.write("}")
+
+        tracemalloc.start()
+        result = analysis_ingester("big", path, "Big Analysis").ingest()
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+        assert dict(result.documents)["big_recommendations"]["content"] == "- Add tests"
+        assert peak < 2 * 1024 * 1024, f"peak memory {peak} bytes"
+
+
+def test_missing_report_is_skipped():
+    """Ingesters for reports that do not exist produce nothing"""
+    ingester = analysis_ingester("absent", "does_not_exist.json", "Absent Analysis")
+    assert ingester.ingest().documents == []
+    assert MISTRAL_REAL_INGESTER.metadata["tool"] == "mistral_real"
+
+
+def main():
+    """Run all report ingester tests"""
+    tests = [
+        test_parser_is_chunking_independent,
+        test_registered_ingesters_cover_all_reports,
+        test_large_report_memory_is_bounded,
+        test_missing_report_is_skipped,
+    ]
+    for test in tests:
+        test()
+        print(f"✅ {test.__name__}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,215 @@
+#!/usr/bin/env python3
+"""
+Test deadlines, hedging and the circuit breaker
+
+This script verifies that retries stop at the end-to-end deadline, that slow
+requests are hedged after the observed p95 latency of their model (sync and
+async) but not while the rate limiter delays requests, and that the circuit
+breaker fails fast and recovers.
+"""
+
+import os
+import sys
+import time
+import tempfile
+import asyncio
+import itertools
+
+from metrics import get_registry
+from rate_limiter import RateLimiter, REQUESTS
+from resilience import (
+    CircuitBreaker, CircuitOpenError, ResiliencePolicy, CLOSED, OPEN
+)
+
+
+class Flaky(Exception):
+    """Retryable test error"""
+
+
+_names = itertools.count()
+
+
+def policy(**kwargs):
+    """Hedging policy with its own breaker and latency histograms"""
+    name = f"test{next(_names)}"
+    kwargs.setdefault("breaker", CircuitBreaker(name, window=4, min_calls=4, cooldown_seconds=0.1))
+    kwargs.setdefault("hedge", True)
+    return ResiliencePolicy(name, (Flaky,), **kwargs)
+
+
+def warm_up(p, latency_ms=10.0, samples=20, model=None):
+    """Record enough fast requests for the p95 to be used as hedge delay"""
+    for _ in range(samples):
+        get_registry().observe(p.latency_metric(model), latency_ms)
+
+
+def test_deadline_caps_retries():
+    """A failing call gives up when the next backoff would pass the deadline"""
+    p = policy(deadline_seconds=0.5)
+    attempts = []
+
+    def send(timeout):
+        attempts.append(timeout)
+        raise Flaky("unavailable")
+
+    start = time.monotonic()
+    try:
+        p.call(send)
+        raise AssertionError("expected Flaky")
+    except Flaky:
+        pass
+    assert time.monotonic() - start < 0.2
+    assert len(attempts) == 1 and attempts[0] <= 0.5
+
+
+def test_slow_request_is_hedged():
+    """A request slower than p95 is duplicated and the faster answer wins"""
+    p = policy()
+    warm_up(p)
+    calls = itertools.count()
+
+    def send(timeout):
+        if next(calls) == 0:
+            time.sleep(0.5)
+            return "slow"
+        return "fast"
+
+    start = time.monotonic()
+    assert p.call(send) == "fast"
+    assert time.monotonic() - start < 0.3
+    assert get_registry().counter(f"llm.{p.name}.hedge_wins") == 1
+
+
+def test_async_hedge_cancels_loser():
+    """Async hedging takes the first answer and cancels the other request"""
+    p = policy()
+    warm_up(p)
+    cancelled = []
+    calls = itertools.count()
+
+    async def send(timeout):
+        if next(calls) == 0:
+            try:
+                await asyncio.sleep(0.5)
+            except asyncio.CancelledError:
+                cancelled.append(True)
+                raise
+            return "slow"
+        return "fast"
+
+    released = []
+    assert asyncio.run(p.acall(send, release=lambda: released.append(True))) == "fast"
+    assert cancelled == [True]
+    assert released == [True]
+
+
+def test_hedging_follows_model_and_limiter():
+    """The hedge delay is per model, and limiter waits neither count nor hedge"""
+    p = policy()
+    warm_up(p, model="small")
+    assert p.hedge_delay("small") is not None
+    assert p.hedge_delay("large") is None
+    assert ResiliencePolicy("test-default", (Flaky,)).hedge_delay() is None
+
+    calls = []
+
+    def send(timeout):
+        calls.append(timeout)
+        time.sleep(0.1)
+        return "answer"
+
+    # The attempt waited for the limiter: no duplicate, and only the request is timed
+    waits = iter([0.2])
+    assert p.call(send, model="small", throttle=lambda: next(waits, 0.0)) == "answer"
+    assert len(calls) == 1
+    histogram = get_registry().histogram(p.latency_metric("small"))
+    assert histogram.count == 21 and histogram.max < 200
+
+    # The limiter would delay the duplicate: the slow attempt is not hedged
+    waits = iter([0.0, 0.5])
+    assert p.call(send, model="small", throttle=lambda: next(waits, 0.0)) == "answer"
+    assert len(calls) == 2
+    assert get_registry().counter(f"llm.{p.name}.hedge_throttled") == 1
+    assert get_registry().counter(f"llm.{p.name}.hedged") == 0
+
+
+def test_skipped_hedge_gives_back_its_reservation():
+    """A duplicate the limiter would delay leaves the bucket as it was"""
+    p = policy()
+    warm_up(p, model="small")
+
+    def send(timeout):
+        time.sleep(0.1)
+        return "answer"
+
+    with tempfile.TemporaryDirectory() as directory:
+        limiter = RateLimiter(os.path.join(directory, "limits.sqlite3"), requests_per_minute=1)
+        throttle = lambda: limiter.reserve("test", "small")
+        release = lambda: limiter.release("test", "small")
+        assert p.call(send, model="small", throttle=throttle, release=release) == "answer"
+        assert get_registry().counter(f"llm.{p.name}.hedge_throttled") == 1
+        # Only the sent request is charged: the bucket of one is empty, not overdrawn
+        level = limiter.state("test", "small")[REQUESTS]["level"]
+        assert 0.0 <= level < 0.1
+        limiter.close()
+
+
+def test_circuit_breaker_fails_fast_and_recovers():
+    """The breaker opens on a high failure rate and closes after a good trial"""
+    breaker = CircuitBreaker("unit", window=4, min_calls=4, failure_rate=0.5, cooldown_seconds=0.1)
+    for _ in range(4):
+        breaker.before_call()
+        breaker.record_failure()
+    assert breaker.state == OPEN
+
+    try:
+        breaker.before_call()
+        raise AssertionError("expected CircuitOpenError")
+    except CircuitOpenError:
+        pass
+
+    time.sleep(0.15)
+    breaker.before_call()  # trial call allowed
+    try:
+        breaker.before_call()  # only one trial at a time
+        raise AssertionError("expected CircuitOpenError")
+    except CircuitOpenError:
+        pass
+    breaker.record_success()
+    assert breaker.state == CLOSED
+
+
+def test_client_errors_do_not_trip_breaker():
+    """Non-retryable errors propagate immediately and count as provider successes"""
+    p = policy()
+
+    def send(timeout):
+        raise ValueError("bad request")
+
+    for _ in range(6):
+        try:
+            p.call(send)
+        except ValueError:
+            pass
+    assert p.breaker.state == CLOSED
+
+
+def main():
+    """Run all resilience tests"""
+    tests = [
+        test_deadline_caps_retries,
+        test_slow_request_is_hedged,
+        test_async_hedge_cancels_loser,
+        test_hedging_follows_model_and_limiter,
+        test_skipped_hedge_gives_back_its_reservation,
+        test_circuit_breaker_fails_fast_and_recovers,
+        test_client_errors_do_not_trip_breaker,
+    ]
+    for test in tests:
+        test()
+        print(f"✅ {test.__name__}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
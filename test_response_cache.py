@@ -0,0 +1,106 @@
+#!/usr/bin/env python3
+"""
+Test the LLM response cache
+
+This script verifies cache keys, TTL expiry, size-based eviction and that a
+cached provider client answers repeated requests without calling the API.
+"""
+
+import os
+import sys
+import time
+import tempfile
+
+from llm_providers import ProviderClient
+from metrics import get_registry
+from response_cache import ResponseCache, make_cache_key
+from test_llm_providers import mock_http_client
+
+MESSAGES = [{"role": "user", "content": "Analyze this repository"}]
+
+
+def test_cache_key_normalization():
+    """Keys ignore irrelevant fields but not whitespace or sampling params"""
+    key = make_cache_key("openai", "gpt-4o", MESSAGES, {"temperature": 0.2})
+    tagged = [{"role": "user", "content": "Analyze this repository", "id": 7}]
+    assert make_cache_key("openai", "gpt-4o", tagged, {"temperature": 0.2}) == key
+    padded = [{"role": "user", "content": "  Analyze this repository\n"}]
+    assert make_cache_key("openai", "gpt-4o", padded, {"temperature": 0.2}) != key
+    assert make_cache_key("openai", "gpt-4o", MESSAGES, {"temperature": 0.3}) != key
+    assert make_cache_key("mistral", "gpt-4o", MESSAGES, {"temperature": 0.2}) != key
+
+
+def test_ttl_and_size_eviction():
+    """Expired entries miss and the least recently used entries are evicted"""
+    with tempfile.TemporaryDirectory() as directory:
+        cache = ResponseCache(os.path.join(directory, "cache.sqlite3"), ttl_seconds=60, max_bytes=250)
+        body = {"text": "x" * 80}
+        cache.put("a", "openai", "m", body)
+        cache.put("b", "openai", "m", body)
+        time.sleep(0.01)
+        assert cache.get("a") == body  # "a" is now more recently used than "b"
+        cache.put("c", "openai", "m", body)
+
+        assert cache.get("b") is None
+        assert cache.get("a") == body and cache.get("c") == body
+        assert cache.stats()["bytes"] <= 250
+
+        cache.ttl_seconds = 0
+        time.sleep(0.01)
+        assert cache.get("a") is None
+        cache.close()
+
+
+def test_provider_uses_cache():
+    """A repeated chat request is served from the cache in milliseconds"""
+    registry = get_registry()
+    hits, misses = registry.counter("llm.cache.hits"), registry.counter("llm.cache.misses")
+    with tempfile.TemporaryDirectory() as directory:
+        seen = []
+        cache = ResponseCache(os.path.join(directory, "cache.sqlite3"))
+        client = ProviderClient("openai", api_key="k", http_client=mock_http_client(seen), cache=cache)
+
+        first = client.chat(MESSAGES, temperature=0.2)
+        start = time.perf_counter()
+        second = client.chat(MESSAGES, temperature=0.2)
+        elapsed = time.perf_counter() - start
+        client.chat(MESSAGES, temperature=0.9)
+        cache.close()
+
+    assert len(seen) == 2
+    assert not first.cached and second.cached
+    assert second.content == first.content and second.usage == first.usage
+    assert elapsed < 0.05
+    assert registry.counter("llm.cache.hits") == hits + 1
+    assert registry.counter("llm.cache.misses") == misses + 2
+
+
+def test_cached_body_is_not_modified():
+    """Completing the usage of a cached response leaves the shared body untouched"""
+    client = ProviderClient("openai", api_key="k", http_client=mock_http_client([]), ledger=False)
+    body = {
+        "model": "gpt-4o",
+        "choices": [{"index": 0, "message": {"role": "assistant", "content": "pong"}}],
+        "usage": {"prompt_tokens": 3, "completion_tokens": 1},
+    }
+    result = client._chat_result(body, {"model": "gpt-4o"}, 0.0, cached=True)
+    assert result.usage["total_tokens"] == 4 and result.raw["usage"]["total_tokens"] == 4
+    assert body["usage"] == {"prompt_tokens": 3, "completion_tokens": 1}
+
+
+def main():
+    """Run all response cache tests"""
+    tests = [
+        test_cache_key_normalization,
+        test_ttl_and_size_eviction,
+        test_provider_uses_cache,
+        test_cached_body_is_not_modified,
+    ]
+    for test in tests:
+        test()
+        print(f"✅ {test.__name__}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,206 @@
+#!/usr/bin/env python3
+"""
+Test single-flight request coalescing
+
+This script verifies that identical concurrent calls are coalesced within a
+process (sync and async), across processes through a lock directory, and in
+the provider client.
+"""
+
+import os
+import sys
+import time
+import asyncio
+import tempfile
+import threading
+import multiprocessing
+
+import httpx
+
+from llm_providers import ProviderClient, RETRYABLE_ERRORS
+from resilience import ResiliencePolicy
+from singleflight import SingleFlight
+from test_llm_providers import mock_response
+from usage_ledger import UsageLedger
+
+MESSAGES = [{"role": "user", "content": "Analyze this repository"}]
+
+
+def run_threads(count, target):
+    """Run target in count threads at once and return their results"""
+    results = [None] * count
+    barrier = threading.Barrier(count)
+
+    def worker(i):
+        barrier.wait()
+        results[i] = target()
+
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(count)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return results
+
+
+def test_concurrent_calls_share_one_flight():
+    """Threads calling the same key run the function once"""
+    flights = SingleFlight()
+    calls = []
+
+    def slow_call():
+        calls.append(1)
+        time.sleep(0.1)
+        return {"answer": 42}
+
+    results = run_threads(6, lambda: flights.do("key", slow_call))
+    assert len(calls) == 1
+    assert all(result == {"answer": 42} for result, _ in results)
+    assert sorted(leader for _, leader in results) == [False] * 5 + [True]
+
+    # Once the flight has landed, the next call runs again
+    assert flights.do("key", slow_call) == ({"answer": 42}, True)
+    assert len(calls) == 2
+
+
+def test_errors_reach_every_caller():
+    """A failing leader raises the same error in every waiting caller"""
+    flights = SingleFlight()
+
+    def failing_call():
+        time.sleep(0.05)
+        raise ValueError("boom")
+
+    def call():
+        try:
+            flights.do("key", failing_call)
+        except ValueError as e:
+            return str(e)
+
+    assert run_threads(4, call) == ["boom"] * 4
+
+
+def test_async_calls_share_one_flight():
+    """Coroutines awaiting the same key run the coroutine once"""
+    flights = SingleFlight()
+    calls = []
+
+    async def slow_call():
+        calls.append(1)
+        await asyncio.sleep(0.05)
+        return "done"
+
+    async def run():
+        return await asyncio.gather(*[flights.ado("key", slow_call) for _ in range(5)])
+
+    results = asyncio.run(run())
+    assert [result for result, _ in results] == ["done"] * 5
+    assert [leader for _, leader in results] == [True] + [False] * 4
+    assert len(calls) == 1
+
+
+def _process_call(lock_dir, counter_path, queue):
+    """Worker process issuing the same coalesced call"""
+    def call():
+        with open(counter_path, "a") as f:
+            f.write("x")
+        time.sleep(0.3)
+        return {"answer": "shared"}
+
+    queue.put(SingleFlight(lock_dir=lock_dir).do("key", call))
+
+
+def test_calls_are_coalesced_across_processes():
+    """A process blocked on the lock reuses the leader's result"""
+    with tempfile.TemporaryDirectory() as directory:
+        counter_path = os.path.join(directory, "calls")
+        context = multiprocessing.get_context("fork")
+        queue = context.Queue()
+        processes = [
+            context.Process(target=_process_call, args=(directory, counter_path, queue))
+            for _ in range(3)
+        ]
+        for process in processes:
+            process.start()
+        results = [queue.get(timeout=10) for _ in processes]
+        for process in processes:
+            process.join()
+
+        with open(counter_path) as f:
+            assert f.read() == "x"
+    assert [result for result, _ in results] == [{"answer": "shared"}] * 3
+    assert sorted(leader for _, leader in results) == [False, False, True]
+
+
+def test_later_calls_across_processes_run_again():
+    """A result file is only handed to calls that were waiting for it, and idle files are pruned"""
+    with tempfile.TemporaryDirectory() as directory:
+        calls = []
+
+        def call():
+            calls.append(1)
+            return {"answer": len(calls)}
+
+        first = SingleFlight(lock_dir=directory)
+        second = SingleFlight(lock_dir=directory)
+        assert first.do("key", call) == ({"answer": 1}, True)
+        assert second.do("key", call) == ({"answer": 2}, True)
+        assert asyncio.run(second.ado("key", lambda: asyncio.sleep(0, call()))) == ({"answer": 3}, True)
+
+        assert len(os.listdir(directory)) == 2
+        time.sleep(0.1)
+        SingleFlight(lock_dir=directory, file_ttl_seconds=0.05)._prune()
+        assert os.listdir(directory) == []
+
+
+def test_provider_coalesces_identical_chats():
+    """Identical concurrent chat requests send one HTTP request and are billed once"""
+    seen = []
+
+    def handler(request):
+        time.sleep(0.1)
+        return mock_response(request, seen)
+
+    with tempfile.TemporaryDirectory() as directory:
+        ledger = UsageLedger(os.path.join(directory, "usage.sqlite3"))
+        client = ProviderClient(
+            "openai",
+            api_key="k",
+            http_client=httpx.Client(base_url="https://llm.test/v1", transport=httpx.MockTransport(handler)),
+            single_flight=SingleFlight(),
+            rate_limiter=False,
+            resilience=ResiliencePolicy("openai", RETRYABLE_ERRORS, hedge=False),
+            ledger=ledger
+        )
+
+        results = run_threads(5, lambda: client.chat(MESSAGES, temperature=0.2))
+        assert len(seen) == 1
+        assert [result.content for result in results] == ["pong"] * 5
+        assert sorted(result.cached for result in results) == [False] + [True] * 4
+
+        # Only the caller that sent the request is billed
+        calls = ledger.recent()
+        assert len(calls) == 5 and sum(call["cached"] for call in calls) == 4
+        assert [call["cost_usd"] > 0 for call in calls if not call["cached"]] == [True]
+        assert all(call["cost_usd"] == 0 for call in calls if call["cached"])
+        ledger.close()
+
+
+def main():
+    """Run all single-flight tests"""
+    tests = [
+        test_concurrent_calls_share_one_flight,
+        test_errors_reach_every_caller,
+        test_async_calls_share_one_flight,
+        test_calls_are_coalesced_across_processes,
+        test_later_calls_across_processes_run_again,
+        test_provider_coalesces_identical_chats,
+    ]
+    for test in tests:
+        test()
+        print(f"✅ {test.__name__}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
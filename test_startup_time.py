@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+"""
+Test startup time of the entry points
+
+This script imports each CLI/server entry point in a fresh interpreter and
+fails if it takes longer than the startup budget or loads a heavy
+dependency (OpenAI SDK, FAISS, NumPy, Plotly) that should only be imported
+on first use. It also verifies that the default clients are created lazily.
+"""
+
+import os
+import sys
+import json
+import subprocess
+
+import openai_config
+
+# Seconds an entry point may take to import (STARTUP_BUDGET_SECONDS)
+STARTUP_BUDGET_SECONDS = float(os.getenv("STARTUP_BUDGET_SECONDS", "1.0"))
+
+ENTRY_POINTS = ["api_server", "analyze_openai", "compare_analysis", "rag_index_builder"]
+
+# Dependencies that must not be imported just by starting an entry point
+HEAVY_MODULES = ["openai", "faiss", "numpy", "plotly"]
+
+PROBE = """
+import json, sys, time
+start = time.perf_counter()
+import {module}
+elapsed = time.perf_counter() - start
+print(json.dumps({{"seconds": elapsed, "loaded": [m for m in {heavy!r} if m in sys.modules]}}))
+"""
+
+
+def measure_import(module):
+    """Import a module in a fresh interpreter and report its time and heavy imports"""
+    output = subprocess.run(
+        [sys.executable, "-c", PROBE.format(module=module, heavy=HEAVY_MODULES)],
+        cwd=os.path.dirname(os.path.abspath(__file__)),
+        capture_output=True, text=True, check=True
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def test_entry_points_start_fast():
+    """Entry points import within the budget and without heavy dependencies"""
+    for module in ENTRY_POINTS:
+        result = measure_import(module)
+        print(f"  {module}: {result['seconds'] * 1000:.0f} ms")
+        assert result["loaded"] == [], f"{module} imported {result['loaded']} at startup"
+        assert result["seconds"] < STARTUP_BUDGET_SECONDS, f"{module} took {result['seconds']:.2f}s to import"
+
+
+def test_default_client_is_lazy():
+    """The default OpenAI client is created by the first get_client call"""
+    saved = openai_config.default_client, openai_config.OPENAI_API_KEY
+    try:
+        openai_config.default_client = None
+        openai_config.OPENAI_API_KEY = None
+        try:
+            openai_config.get_client()
+            assert False, "get_client should fail without an API key"
+        except ValueError:
+            pass
+
+        openai_config.OPENAI_API_KEY = "test-key"
+        client = openai_config.get_client()
+        assert client is openai_config.get_client()
+        assert client.api_key == "test-key"
+    finally:
+        openai_config.default_client, openai_config.OPENAI_API_KEY = saved
+
+
+def main():
+    """Run all startup tests"""
+    tests = [
+        test_entry_points_start_fast,
+        test_default_client_is_lazy,
+    ]
+    for test in tests:
+        test()
+        print(f"✅ {test.__name__}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
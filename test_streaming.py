@@ -0,0 +1,167 @@
+#!/usr/bin/env python3
+"""
+Test streaming chat completions
+
+This script verifies that streamed JSON answers are parsed incrementally,
+that each top-level field is emitted as soon as it closes, that a stream is
+abandoned once the required fields are complete, and that streamed calls
+are assembled into normal chat results and recorded in the usage ledger.
+"""
+
+import os
+import sys
+import json
+import asyncio
+import tempfile
+
+import httpx
+
+from analyze_openai import OpenAIRepositoryAnalyzer
+from json_stream import JSONFieldStream
+from llm_providers import ProviderClient
+from openai_config import OpenAIClient
+from prompt_builder import REPOSITORY_ANALYSIS_FIELDS
+from usage_ledger import UsageLedger
+
+ANSWER = json.dumps({
+    "repository_type": "Demo",
+    "technology_stack": ["Python", "Flask"],
+    "scores": {"complexity": 5, "maintainability": 8},
+})
+
+
+def sse_events(content, usage=None, pieces=7):
+    """Server-sent events streaming content in small deltas"""
+    events = []
+    for start in range(0, len(content), pieces):
+        delta = content[start:start + pieces]
+        events.append({"id": "chatcmpl-1", "created": 0, "model": "gpt-4o",
+                       "choices": [{"index": 0, "delta": {"content": delta}, "finish_reason": None}]})
+    events.append({"id": "chatcmpl-1", "created": 0, "model": "gpt-4o",
+                   "choices": [{"index": 0, "delta": {}, "finish_reason": "stop"}]})
+    if usage:
+        events.append({"id": "chatcmpl-1", "created": 0, "model": "gpt-4o", "choices": [], "usage": usage})
+    return [f"data: {json.dumps(event)}\n\n".encode() for event in events] + [b"data: [DONE]\n\n"]
+
+
+def streaming_client(events, requests_seen, ledger=None, sent=None):
+    """OpenAI client whose chat endpoint streams the given events"""
+    def body():
+        for event in events:
+            if sent is not None:
+                sent.append(event)
+            yield event
+
+    def handler(request):
+        requests_seen.append(json.loads(request.content))
+        return httpx.Response(200, headers={"content-type": "text/event-stream"}, content=body())
+
+    async def ahandler(request):
+        requests_seen.append(json.loads(request.content))
+
+        async def abody():
+            for event in events:
+                yield event
+
+        return httpx.Response(200, headers={"content-type": "text/event-stream"}, content=abody())
+
+    return ProviderClient(
+        "openai", api_key="k", ledger=ledger,
+        http_client=httpx.Client(base_url="https://llm.test/v1", transport=httpx.MockTransport(handler)),
+        async_http_client=httpx.AsyncClient(base_url="https://llm.test/v1", transport=httpx.MockTransport(ahandler))
+    )
+
+
+def test_fields_emitted_as_they_close():
+    """Each top-level field is emitted once its value is complete, even split per character"""
+    stream = JSONFieldStream()
+    emitted = []
+    for char in "```json\n" + ANSWER + "\n```":
+        for name, value in stream.feed(char):
+            emitted.append((name, dict(stream.fields)))
+    assert [name for name, _ in emitted] == ["repository_type", "technology_stack", "scores"]
+    # repository_type was available before the rest of the answer arrived
+    assert emitted[0][1] == {"repository_type": "Demo"}
+    assert stream.done and stream.fields == json.loads(ANSWER)
+
+
+def test_chat_stream_assembles_result():
+    """A stream yields fields early and ends as a normal, recorded chat result"""
+    usage = {"prompt_tokens": 40, "completion_tokens": 30, "total_tokens": 70}
+    seen, fields = [], []
+    with tempfile.TemporaryDirectory() as directory:
+        ledger = UsageLedger(os.path.join(directory, "usage.sqlite3"))
+        client = streaming_client(sse_events(ANSWER, usage), seen, ledger=ledger)
+        result = client.chat_stream(
+            [{"role": "user", "content": "analyze"}],
+            on_field=lambda name, value: fields.append(name)
+        )
+        assert seen[0]["stream"] is True and seen[0]["stream_options"] == {"include_usage": True}
+        assert fields == ["repository_type", "technology_stack", "scores"]
+        assert result.content == ANSWER and result.finish_reason == "stop"
+        assert result.usage["total_tokens"] == 70
+        assert ledger.recent()[0]["completion_tokens"] == 30
+        ledger.close()
+
+    seen = []
+    client = streaming_client(sse_events(ANSWER, usage), seen)
+    result = asyncio.run(client.achat_stream([{"role": "user", "content": "analyze"}]))
+    assert json.loads(result.content)["scores"]["maintainability"] == 8
+
+
+def test_runaway_generation_is_stopped():
+    """The analyzer closes the stream once every analysis field has arrived"""
+    analysis = {field: "value" for field in sorted(REPOSITORY_ANALYSIS_FIELDS)}
+    # A runaway answer keeps generating after the last required field
+    runaway = json.dumps(analysis)[:-1] + ', "notes": "' + "more " * 2000 + '"}'
+    events = sse_events(runaway)
+    seen, sent, fields = [], [], []
+
+    analyzer = OpenAIRepositoryAnalyzer(api_key="k")
+    analyzer.openai_client = OpenAIClient(api_key="k")
+    analyzer.openai_client.provider = streaming_client(events, seen, sent=sent)
+    result = analyzer.analyze_with_openai(
+        {"structure": "", "content": {}, "dependencies": {}, "workflows": {}},
+        on_field=lambda name, value: fields.append(name)
+    )
+
+    assert result == analysis
+    assert sorted(fields) == sorted(REPOSITORY_ANALYSIS_FIELDS)
+    assert len(sent) < len(events) / 2
+
+
+def test_truncated_stream_is_not_used():
+    """A stream cut off mid-object falls back instead of returning the partial fields"""
+    analysis = {field: "value" for field in sorted(REPOSITORY_ANALYSIS_FIELDS)}
+    answer = json.dumps(analysis)
+    events = sse_events(answer[:len(answer) // 2])
+    seen, fields = [], []
+
+    analyzer = OpenAIRepositoryAnalyzer(api_key="k")
+    analyzer.openai_client = OpenAIClient(api_key="k")
+    analyzer.openai_client.provider = streaming_client(events, seen)
+    result = analyzer.analyze_with_openai(
+        {"structure": "", "content": {}, "dependencies": {}, "workflows": {}},
+        on_field=lambda name, value: fields.append(name)
+    )
+
+    assert fields and not REPOSITORY_ANALYSIS_FIELDS.issubset(fields)
+    assert result["repository_type"] == "GitHub Demo Repository"
+
+
+def main():
+    """Run all streaming tests"""
+    tests = [
+        test_fields_emitted_as_they_close,
+        test_chat_stream_assembles_result,
+        test_runaway_generation_is_stopped,
+        test_truncated_stream_is_not_used,
+    ]
+    for test in tests:
+        test()
+        print(f"✅ {test.__name__}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,101 @@
+#!/usr/bin/env python3
+"""
+Test structured fast-path answers
+
+This script verifies that questions about known report fields are answered
+from the report index without API calls, and that other questions fall back
+to the full RAG pipeline.
+"""
+
+import sys
+import json
+import time
+
+from structured_query import ReportIndex, StructuredQueryEngine
+
+
+def build_engine():
+    """Build an engine over the checked-in Mistral report and a sample comparison"""
+    index = ReportIndex()
+    with open("analysis_report.json", "r", encoding="utf-8") as f:
+        index.add_analysis("mistral", json.load(f)["mistral_analysis"])
+    index.add_analysis("openai", {
+        "technology_stack": ["Python", "Flask"],
+        "maintainability_score": "High (8/10)"
+    })
+    index.add_comparison({
+        "summary": {"overall_agreement": {"percentage": 62.5, "level": "Medium"}},
+        "technology_stack": {"mistral_openai_agreement": 40.0, "common": ["HTML"]}
+    })
+    return StructuredQueryEngine(index)
+
+
+def test_score_question():
+    """Score questions are answered for every tool that reported the score"""
+    result = build_engine().answer("What is the maintainability score?")
+    assert result["structured"] is True
+    assert "Maintainability score (Mistral)" in result["answer"]
+    assert "Maintainability score (OpenAI): High (8/10)" in result["answer"]
+
+
+def test_tool_specific_question():
+    """Naming a tool restricts the answer to that tool's report"""
+    result = build_engine().answer("What technologies did OpenAI find?")
+    assert result["answer"] == "Technology stack (OpenAI): Python, Flask"
+    assert result["sources"][0]["metadata"]["tool"] == "openai"
+
+
+def test_agreement_questions():
+    """Agreement questions read the comparison report"""
+    engine = build_engine()
+    overall = engine.answer("How much do the analyses agree overall?")
+    assert "62.5%" in overall["answer"] and "Medium" in overall["answer"]
+    stack = engine.answer("What is the technology stack agreement?")
+    assert "Mistral and OpenAI: 40.0%" in stack["answer"]
+
+
+def test_open_questions_fall_back():
+    """Open-ended questions are left to the full RAG pipeline"""
+    engine = build_engine()
+    assert engine.answer("How does Mistral's analysis compare to OpenAI's analysis?") is None
+    assert engine.answer("Why is the maintainability score high?") is None
+    assert engine.answer("What are the key strengths of this codebase?") is None
+
+
+def test_code_questions_fall_back():
+    """Questions that share a word with a report field but ask about code are not answered from the report"""
+    engine = build_engine()
+    assert engine.answer("What is the complexity of the chunk_text function in rag_system.py?") is None
+    assert engine.answer("Is there a stack overflow risk in the recursive parser?") is None
+    assert engine.answer("Which languages are used in the HTML dashboard's inline scripts?") is None
+    assert engine.answer("What score does the FAISS search return for each document?") is None
+    assert engine.answer("What is the complexity score of the repository?") is not None
+
+
+def test_answers_are_fast():
+    """Fast-path answers take well under a millisecond on average"""
+    engine = build_engine()
+    start = time.perf_counter()
+    for _ in range(1000):
+        engine.answer("What is the complexity score?")
+    assert (time.perf_counter() - start) / 1000 < 0.001
+
+
+def main():
+    """Run all structured query tests"""
+    tests = [
+        test_score_question,
+        test_tool_specific_question,
+        test_agreement_questions,
+        test_open_questions_fall_back,
+        test_code_questions_fall_back,
+        test_answers_are_fast,
+    ]
+    for test in tests:
+        test()
+        print(f"✅ {test.__name__}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
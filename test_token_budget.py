@@ -0,0 +1,138 @@
+#!/usr/bin/env python3
+"""
+Test the token budget
+
+This script verifies that prompt content is shared out by priority, that
+shortened content keeps its head and tail within its budget without
+splitting a multi-byte character, and that the
+analyzer prompts fit their model's context window however large the
+repository is.
+"""
+
+import sys
+
+import tokenization
+from analyze_openai import OpenAIRepositoryAnalyzer
+from mistral_api_integration import RealMistralAnalyzer, ANALYSIS_SPECS
+from model_router import ModelRouter, ModelOption, SMALL, LARGE
+from openai_config import MAX_TOKENS, MODEL_TOKEN_LIMITS
+from test_tokenization import BYTE_MODEL, use_byte_encoding
+from token_budget import (
+    BudgetItem, PromptTooLargeError, allocate, fit_to_budget, truncate_to_tokens,
+    count_message_tokens, prompt_budget, file_priority, MAX_FILE_TOKENS,
+    PRIORITY_LOW, PRIORITY_NORMAL, PRIORITY_HIGH
+)
+
+MODEL = "gpt-4o"
+
+
+def words(count, word="token"):
+    """Text of roughly the given number of tokens"""
+    return " ".join([word] * count)
+
+
+def render(texts):
+    """Single-message prompt listing the fitted items"""
+    body = "\n".join(f"{key}:\n{text}" for key, text in texts.items())
+    return [{"role": "user", "content": f"Review these files.\n{body}"}]
+
+
+def test_allocation_by_priority():
+    """Higher priorities are served first and small items stay whole"""
+    items = [
+        BudgetItem("readme", "", PRIORITY_HIGH),
+        BudgetItem("small", "", PRIORITY_NORMAL),
+        BudgetItem("large", "", PRIORITY_NORMAL),
+        BudgetItem("capped", "", PRIORITY_NORMAL, max_tokens=50),
+        BudgetItem("extra", "", PRIORITY_LOW),
+    ]
+    assert allocate(items, [300, 40, 900, 500, 200], 10000) == [300, 40, 900, 50, 200]
+    # 700 left after the readme: 40 and 50 fit their shares, the rest goes to the large item
+    assert allocate(items, [300, 40, 900, 500, 200], 1000) == [300, 40, 610, 50, 0]
+    assert allocate(items, [300, 40, 900, 500, 200], 200) == [200, 0, 0, 0, 0]
+
+
+def test_truncation_keeps_head_and_tail():
+    """Shortened text stays within its budget and keeps both ends"""
+    text = "BEGIN " + words(2000) + " END"
+    short = truncate_to_tokens(text, 100, MODEL)
+    assert tokenization.count_tokens(short, MODEL) <= 100
+    assert short.startswith("BEGIN") and short.endswith("END") and "truncated" in short
+    assert truncate_to_tokens("small text", 100, MODEL) == "small text"
+
+    # Byte-level tokens: the head and tail cuts move inwards to whole characters
+    use_byte_encoding()
+    text = "début " + "é☕" * 200 + " fin"
+    for budget in range(60, 70):
+        short = truncate_to_tokens(text, budget, BYTE_MODEL)
+        assert "\ufffd" not in short and short.startswith("début") and short.endswith("fin")
+        assert tokenization.count_tokens(short, BYTE_MODEL) <= budget
+
+
+def test_fit_to_budget():
+    """Prompts that fit are untouched; others lose low-priority content first"""
+    items = [
+        BudgetItem("README.md", words(200, "readme"), file_priority("README.md")),
+        BudgetItem("src/app.py", words(3000, "code"), file_priority("./src/app.py")),
+        BudgetItem("src/util.py", words(3000, "util"), file_priority("src/util.py")),
+    ]
+    texts, tokens = fit_to_budget(render, items, MODEL, 100000, 1000)
+    assert texts == {item.key: item.text for item in items}
+    assert tokens == count_message_tokens(render(texts), MODEL)
+
+    texts, tokens = fit_to_budget(render, items, MODEL, 4000, 1000)
+    assert tokens == count_message_tokens(render(texts), MODEL) <= prompt_budget(4000, 1000)
+    assert texts["README.md"] == items[0].text
+    assert "truncated" in texts["src/app.py"] and "truncated" in texts["src/util.py"]
+
+    texts, _ = fit_to_budget(render, items, MODEL, 1300, 1000)
+    assert list(texts) == ["README.md"]
+
+    try:
+        fit_to_budget(lambda texts: [{"role": "user", "content": words(500)}], items, MODEL, 1300, 1000)
+        assert False, "a prompt that cannot fit must be rejected before sending"
+    except PromptTooLargeError:
+        pass
+
+
+def test_analyzer_prompts_fit():
+    """Analyzer prompts for a very large repository fit the model's window"""
+    analyzer = OpenAIRepositoryAnalyzer(api_key="k", model="gpt-4")
+    repo_info = {
+        "structure": "\n".join(f"  module_{index}.py" for index in range(20000)),
+        "content": {f"pkg/module_{index}.py": words(5000, f"m{index}") for index in range(40)},
+        "dependencies": {"python": ["httpx"]},
+        "workflows": {},
+    }
+    repo_info["content"]["README.md"] = "# Demo\n" + words(300, "intro")
+    messages = analyzer._analysis_request(repo_info)["messages"]
+    assert count_message_tokens(messages, "gpt-4") <= prompt_budget(MODEL_TOKEN_LIMITS["gpt-4"], MAX_TOKENS)
+    assert words(300, "intro") in messages[-1]["content"]
+
+    router = ModelRouter(
+        catalog={"mistral": [ModelOption("mistral", "small", SMALL), ModelOption("mistral", "large", LARGE)]},
+        task_tiers={"code_quality": SMALL},
+        token_limit=lambda provider, model: {"small": 4000, "large": 16000}[model]
+    )
+    mistral = RealMistralAnalyzer(api_key=None, router=router)
+    request = mistral._request(ANALYSIS_SPECS["code_quality"], words(50000), "big.py")
+    assert count_message_tokens(request["messages"], "small") <= MAX_FILE_TOKENS + 300
+    assert request["model"] == "small"
+
+
+def main():
+    """Run all token budget tests"""
+    tests = [
+        test_allocation_by_priority,
+        test_truncation_keeps_head_and_tail,
+        test_fit_to_budget,
+        test_analyzer_prompts_fit,
+    ]
+    for test in tests:
+        test()
+        print(f"✅ {test.__name__}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+"""
+Test token counting and chunking
+
+This script verifies the cached token counter and that token-offset chunking
+is fast, never produces chunks above the requested size and never splits a
+multi-byte character between chunks.
+"""
+
+import sys
+import time
+
+import tiktoken
+
+import tokenization
+from tokenization import RegexEncoder, TiktokenEncoder, chunk_text, count_tokens, count_tokens_batch, get_encoder
+
+MODEL = "gpt-4o"
+
+# Model name under which a byte-level encoding is registered
+BYTE_MODEL = "byte-level-test"
+
+
+def use_byte_encoding():
+    """Register a tiktoken encoding whose tokens are single bytes"""
+    encoding = tiktoken.Encoding(
+        "bytes", pat_str=r"\s+|\S+", mergeable_ranks={bytes([i]): i for i in range(256)}, special_tokens={}
+    )
+    tokenization._encoders[BYTE_MODEL] = TiktokenEncoder(encoding)
+
+
+def test_counts_are_cached_and_batched():
+    """Repeated strings hit the LRU and batch counts match single counts"""
+    texts = ["def main():\n    return 0\n", "Hello, world!", "x" * 50]
+    single = [count_tokens(text, MODEL) for text in texts]
+    assert count_tokens_batch(texts, MODEL) == single
+    assert all(count > 0 for count in single)
+    assert count_tokens("", MODEL) == 0
+
+    hits = tokenization._cached_count.cache_info().hits
+    count_tokens(texts[0], MODEL)
+    assert tokenization._cached_count.cache_info().hits == hits + 1
+    assert get_encoder(MODEL) is get_encoder(MODEL)
+
+
+def test_regex_encoder_round_trips():
+    """The fallback encoder splits long words and decodes losslessly"""
+    encoder = RegexEncoder()
+    text = "Internationalization isn't 12345 tokens\n\n  long"
+    tokens = encoder.encode(text)
+    assert encoder.decode(tokens) == text
+    assert len(tokens) > len(text.split())
+
+
+def test_chunking_large_document():
+    """A 1 MB document is chunked quickly and every chunk fits the limit"""
+    text = ("The quick brown fox jumps over the lazy dog. " * 20 + "\n") * 1150
+    assert len(text) > 1_000_000
+
+    start = time.perf_counter()
+    chunks = chunk_text(text, 500, MODEL)
+    elapsed = time.perf_counter() - start
+
+    assert elapsed < 2.0, f"chunking took {elapsed:.2f}s"
+    assert "".join(chunks) == text
+    assert max(count_tokens_batch(chunks, MODEL)) <= 500
+
+
+def test_chunks_keep_characters_whole():
+    """Byte-level token boundaries inside a character are moved to its start"""
+    use_byte_encoding()
+    text = "Résumé:naïve-café-☕-" * 20
+    for size in (3, 4, 7, 50):
+        chunks = chunk_text(text, size, BYTE_MODEL)
+        assert "".join(chunks) == text
+        assert max(len(chunk.encode("utf-8")) for chunk in chunks) <= size
+
+    # A limit below one character's bytes still makes progress
+    assert "".join(chunk_text("☕☕", 2, BYTE_MODEL)).count("\ufffd") > 0
+
+
+def main():
+    """Run all tokenization tests"""
+    tests = [
+        test_counts_are_cached_and_batched,
+        test_regex_encoder_round_trips,
+        test_chunking_large_document,
+        test_chunks_keep_characters_whole,
+    ]
+    for test in tests:
+        test()
+        print(f"✅ {test.__name__}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,119 @@
+#!/usr/bin/env python3
+"""
+Test the LLM usage ledger
+
+This script verifies that calls are recorded with their repository, tokens,
+latency and cost, that usage aggregates per repository and day with p50/p95
+latency, and that the API server exposes it.
+"""
+
+import os
+import sys
+import asyncio
+import tempfile
+
+import api_server
+from llm_providers import ProviderClient
+from usage_ledger import UsageLedger, estimate_cost, repo_context
+from test_llm_providers import mock_http_client, mock_async_http_client
+
+USAGE = {"prompt_tokens": 1000, "completion_tokens": 100}
+
+
+def test_summary_and_percentiles():
+    """Usage aggregates per repository with latency percentiles and cost"""
+    with tempfile.TemporaryDirectory() as directory:
+        ledger = UsageLedger(os.path.join(directory, "usage.sqlite3"))
+        for latency in range(1, 21):
+            ledger.record("openai", "gpt-4o", "chat/completions", USAGE, latency / 1000.0, repo="a")
+        ledger.record("openai", "gpt-4o", "chat/completions", USAGE, 0.5, cached=True, repo="b")
+
+        by_repo = {row["repo"]: row for row in ledger.summary(group_by="repo")}
+        assert by_repo["a"]["calls"] == 20
+        assert by_repo["a"]["total_tokens"] == 22000
+        assert by_repo["a"]["p50_latency_ms"] == 10.0
+        assert by_repo["a"]["p95_latency_ms"] == 19.0
+        assert abs(by_repo["a"]["cost_usd"] - 20 * estimate_cost("gpt-4o", 1000, 100)) < 1e-9
+        assert by_repo["b"]["cache_hits"] == 1 and by_repo["b"]["cost_usd"] == 0.0
+
+        days = ledger.summary(group_by="day")
+        assert len(days) == 1 and days[0]["calls"] == 21
+        assert ledger.summary(repo="b")[0]["calls"] == 1
+        ledger.close()
+
+
+def test_cost_of_dated_models():
+    """Dated model variants use their base model's price; unknown models cost nothing"""
+    assert estimate_cost("gpt-4o-2024-08-06", 1_000_000, 0) == 2.50
+    assert estimate_cost("gpt-4o-mini-2024-07-18", 1_000_000, 0) == 0.15
+    assert estimate_cost("local-model", 1_000_000, 1_000_000) == 0.0
+
+
+def test_provider_calls_are_recorded():
+    """Sync and async provider calls land in the ledger under the current repository"""
+    with tempfile.TemporaryDirectory() as directory:
+        ledger = UsageLedger(os.path.join(directory, "usage.sqlite3"))
+        client = ProviderClient(
+            "openai", api_key="k", http_client=mock_http_client([]),
+            async_http_client=mock_async_http_client([], {"now": 0, "peak": 0}), ledger=ledger
+        )
+
+        with repo_context("/repos/demo"):
+            client.chat([{"role": "user", "content": "review the code"}])
+            client.embed(["a"])
+
+        async def run():
+            with repo_context("/repos/other"):
+                await asyncio.gather(*[
+                    client.achat([{"role": "user", "content": "review the docs"}]) for _ in range(3)
+                ])
+
+        asyncio.run(run())
+
+        calls = ledger.recent()
+        assert {call["repo"] for call in calls} == {"/repos/demo", "/repos/other"}
+        assert {call["endpoint"] for call in calls} == {"chat/completions", "embeddings"}
+
+        top = ledger.top_prompts(order_by="tokens")
+        assert top[0]["prompt_preview"] == "review the docs" and top[0]["calls"] >= 1
+        ledger.close()
+
+
+def test_api_exposes_usage():
+    """The API server serves grouped usage and the top prompts"""
+    with tempfile.TemporaryDirectory() as directory:
+        ledger = UsageLedger(os.path.join(directory, "usage.sqlite3"))
+        ledger.record("mistral", "mistral-large-latest", "chat/completions", USAGE, 0.2,
+                      messages=[{"role": "user", "content": "architecture review"}], repo="demo")
+        api_server._usage_ledger = ledger
+        try:
+            client = api_server.app.test_client()
+            response = client.get("/llm-usage?group_by=model&since=1d")
+            assert response.status_code == 200
+            assert response.get_json()[0]["model"] == "mistral-large-latest"
+
+            response = client.get("/llm-usage/top-prompts?order_by=latency")
+            assert response.get_json()[0]["prompt_preview"] == "architecture review"
+
+            assert client.get("/llm-usage?group_by=color").status_code == 400
+        finally:
+            api_server._usage_ledger = None
+            ledger.close()
+
+
+def main():
+    """Run all usage ledger tests"""
+    tests = [
+        test_summary_and_percentiles,
+        test_cost_of_dated_models,
+        test_provider_calls_are_recorded,
+        test_api_exposes_usage,
+    ]
+    for test in tests:
+        test()
+        print(f"✅ {test.__name__}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,301 @@
+"""
+Token Budget Module
+
+This module fits analyzer prompts into a model's context window before they
+are sent, so a large repository never fails with a context-length error
+after the request (and its retries) have been paid for.
+
+The prompt is rendered from named pieces of content (file contents, the
+repository tree, git information, ...) that each carry a priority. When the
+rendered prompt plus the tokens reserved for the answer exceeds the model's
+token limit, the pieces are cut to fit: higher priorities are kept whole
+first, the budget left for a priority level is shared evenly between its
+pieces (small pieces stay whole, large ones are shortened to their head and
+tail), and lower levels are dropped once the budget is spent. Fitting is
+deterministic, so prompts over the same repository keep a stable prefix.
+"""
+
+import os
+import logging
+from dataclasses import dataclass
+from typing import Dict, Any, List, Optional, Callable, Sequence, Tuple
+
+import tokenization
+from metrics import get_registry
+
+# Configure logging
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger(__name__)
+
+# Fraction of the context window left unused, covering the difference
+# between our token counts and the provider's tokenizer
+BUDGET_MARGIN = float(os.getenv("LLM_BUDGET_MARGIN", "0.05"))
+
+# Most tokens of a single file sent in a per-file analysis prompt
+MAX_FILE_TOKENS = int(os.getenv("LLM_MAX_FILE_TOKENS", "1000"))
+
+# Tokens the chat format adds around each message
+MESSAGE_OVERHEAD_TOKENS = 4
+
+# Pieces that would be cut below this many tokens are dropped instead
+MIN_PIECE_TOKENS = 32
+
+# Share of a shortened piece taken from its start; the rest is its end
+HEAD_FRACTION = 0.75
+
+# Attempts at shrinking the budget when the rendered prompt still overflows
+MAX_FIT_ATTEMPTS = 4
+
+# Priorities, higher is kept first
+PRIORITY_LOW = 0
+PRIORITY_NORMAL = 1
+PRIORITY_HIGH = 2
+PRIORITY_REQUIRED = 3
+
+# Files that describe the whole repository, kept before other files
+OVERVIEW_FILES = {
+    "readme.md", "readme.rst", "readme.txt", "package.json", "requirements.txt",
+    "pyproject.toml", "setup.py", "setup.cfg", "dockerfile",
+}
+
+
+class PromptTooLargeError(ValueError):
+    """The fixed part of a prompt alone does not fit the model's context window"""
+
+
+@dataclass
+class BudgetItem:
+    """
+    A named piece of prompt content that may be shortened or dropped.
+
+    Attributes:
+        key: Name of the piece, e.g. a file path.
+        text: The content.
+        priority: Pieces with a higher priority are kept first.
+        max_tokens: Cap on the piece's tokens even when the prompt fits.
+    """
+    key: str
+    text: str
+    priority: int = PRIORITY_NORMAL
+    max_tokens: Optional[int] = None
+
+
+def file_priority(path: str) -> int:
+    """
+    Priority of a file's content in a repository prompt.
+
+    Args:
+        path: File path relative to the repository.
+
+    Returns:
+        PRIORITY_HIGH for READMEs and manifests, PRIORITY_NORMAL for CI
+        workflows and top-level files, PRIORITY_LOW for the rest.
+    """
+    normalized = path.replace(os.sep, "/")
+    while normalized.startswith("./"):
+        normalized = normalized[2:]
+    name = normalized.rsplit("/", 1)[-1].lower()
+    if name in OVERVIEW_FILES:
+        return PRIORITY_HIGH
+    if normalized.startswith(".github/") or "/" not in normalized:
+        return PRIORITY_NORMAL
+    return PRIORITY_LOW
+
+
+def count_message_tokens(messages: List[Dict[str, Any]], model: str) -> int:
+    """
+    Count the prompt tokens of chat messages, including the chat format overhead.
+
+    Args:
+        messages: The chat messages.
+        model: The model whose tokenizer to use.
+
+    Returns:
+        The number of prompt tokens.
+    """
+    texts = [message["content"] for message in messages if isinstance(message.get("content"), str)]
+    return sum(tokenization.count_tokens_batch(texts, model)) + MESSAGE_OVERHEAD_TOKENS * len(messages)
+
+
+def prompt_budget(token_limit: int, max_output_tokens: int) -> int:
+    """
+    Tokens a prompt may use.
+
+    Args:
+        token_limit: The model's context window (get_model_token_limit).
+        max_output_tokens: Tokens reserved for the answer.
+
+    Returns:
+        The window less the answer and the safety margin.
+    """
+    return int(token_limit * (1 - BUDGET_MARGIN)) - max_output_tokens
+
+
+def truncate_to_tokens(text: str, max_tokens: int, model: str) -> str:
+    """
+    Shorten a text to at most max_tokens tokens, keeping its head and tail.
+
+    Args:
+        text: The text to shorten.
+        max_tokens: Token budget for the result, including the marker that
+            replaces the removed middle.
+        model: The model whose tokenizer to use.
+
+    Returns:
+        The text itself if it fits, otherwise its head, a marker and its tail.
+    """
+    encoder = tokenization.get_encoder(model)
+    tokens = encoder.encode(text)
+    if len(tokens) <= max_tokens:
+        return text
+    marker = f"\n... ({len(tokens)} tokens, truncated) ...\n"
+    keep = max(max_tokens - len(encoder.encode(marker)), 0)
+    # Cut between characters; moving inwards keeps within the budget
+    head = tokenization.character_boundary(encoder, tokens, int(keep * HEAD_FRACTION))
+    tail = tokenization.character_boundary(encoder, tokens, len(tokens) - (keep - head), step=1)
+    return encoder.decode(tokens[:head]) + marker + encoder.decode(tokens[tail:])
+
+
+def allocate(items: Sequence[BudgetItem], counts: Sequence[int], budget: int) -> List[int]:
+    """
+    Share a token budget between items by priority.
+
+    Within a priority level the remaining budget is split evenly; items
+    smaller than their share keep their size and leave the rest to the
+    others.
+
+    Args:
+        items: The items.
+        counts: Token count of each item's text.
+        budget: Tokens available for all items.
+
+    Returns:
+        Tokens allowed for each item, in item order.
+    """
+    sizes = [
+        count if item.max_tokens is None else min(count, item.max_tokens)
+        for item, count in zip(items, counts)
+    ]
+    allowed = [0] * len(items)
+    remaining = max(budget, 0)
+    for priority in sorted({item.priority for item in items}, reverse=True):
+        pending = sorted(
+            (index for index, item in enumerate(items) if item.priority == priority),
+            key=lambda index: (sizes[index], index)
+        )
+        while pending:
+            share = remaining // len(pending)
+            if sizes[pending[0]] <= share:
+                index = pending.pop(0)
+                allowed[index] = sizes[index]
+                remaining -= sizes[index]
+                continue
+            for index in pending:
+                allowed[index] = share
+            remaining -= share * len(pending)
+            pending = []
+    return allowed
+
+
+def fit_items(
+    items: Sequence[BudgetItem],
+    budget: int,
+    model: str,
+    counts: Optional[Sequence[int]] = None
+) -> Dict[str, str]:
+    """
+    Fit items into a token budget.
+
+    Args:
+        items: The items, in prompt order.
+        budget: Tokens available for all items.
+        model: The model whose tokenizer to use.
+        counts: Token count of each item's text, if already known.
+
+    Returns:
+        Text per key for the items that are kept, in item order. Items
+        that did not fit are left out.
+    """
+    if counts is None:
+        counts = tokenization.count_tokens_batch([item.text for item in items], model)
+    allowed = allocate(items, counts, budget)
+    fitted = {}
+    for item, count, tokens in zip(items, counts, allowed):
+        if tokens >= count:
+            fitted[item.key] = item.text
+        elif tokens >= MIN_PIECE_TOKENS:
+            fitted[item.key] = truncate_to_tokens(item.text, tokens, model)
+    return fitted
+
+
+def fit_to_budget(
+    render: Callable[[Dict[str, str]], List[Dict[str, Any]]],
+    items: Sequence[BudgetItem],
+    model: str,
+    token_limit: int,
+    max_output_tokens: int
+) -> Tuple[Dict[str, str], int]:
+    """
+    Fit a prompt's content to a model's context window.
+
+    Each item is counted once and only shortened items are tokenized
+    again; the rendered prompt is counted once when it fits as it is, and
+    once per fitting attempt otherwise.
+
+    Args:
+        render: Builds the chat messages from the text of each kept item.
+        items: The content pieces, in prompt order.
+        model: The model whose tokenizer to use.
+        token_limit: The model's context window.
+        max_output_tokens: Tokens reserved for the answer.
+
+    Returns:
+        Text per key of the items to send (pass it to render to get the
+        messages), and the prompt tokens of the rendered messages.
+
+    Raises:
+        PromptTooLargeError: If the prompt does not fit even without any of
+            the items.
+    """
+    limit = prompt_budget(token_limit, max_output_tokens)
+    fixed = count_message_tokens(render({}), model)
+    if fixed > limit:
+        raise PromptTooLargeError(
+            f"Prompt needs {fixed} tokens without its content; "
+            f"{model} allows {limit} with {max_output_tokens} reserved for the answer"
+        )
+
+    texts = {item.key: item.text for item in items}
+    # Counted one item at a time, so only one item's tokens are held at once
+    counts = [tokenization.count_tokens(item.text, model) for item in items]
+    capped = any(
+        item.max_tokens is not None and count > item.max_tokens
+        for item, count in zip(items, counts)
+    )
+    if not capped and fixed + sum(counts) <= limit:
+        tokens = count_message_tokens(render(texts), model)
+        if tokens <= limit:
+            return texts, tokens
+
+    budget = limit - fixed
+    for _ in range(MAX_FIT_ATTEMPTS):
+        fitted = fit_items(items, budget, model, counts)
+        # Rendering adds separators and escaping around each item
+        tokens = count_message_tokens(render(fitted), model)
+        if tokens <= limit:
+            break
+        budget -= tokens - limit + MIN_PIECE_TOKENS
+    else:
+        fitted, tokens = {}, fixed
+
+    shortened = sum(1 for key, text in fitted.items() if text != texts[key])
+    dropped = len(items) - len(fitted)
+    if shortened or dropped:
+        registry = get_registry()
+        registry.increment("llm.budget.shortened", shortened)
+        registry.increment("llm.budget.dropped", dropped)
+        logger.info(f"Fitted prompt to {limit} tokens for {model}: {shortened} items shortened, {dropped} dropped")
+    return fitted, tokens
@@ -0,0 +1,246 @@
+"""
+Tokenization Module
+
+This module provides token counting and token-based chunking shared by the
+OpenAI and OpenHands clients. When tiktoken is installed (and its encoding
+files can be loaded) counts match the model's tokenizer exactly; otherwise a
+regex approximation of the same pre-tokenization rules is used. Encoders are
+cached per model and counts of repeated strings are memoized.
+"""
+
+import re
+import logging
+import threading
+from functools import lru_cache
+from typing import Dict, List, Sequence
+
+try:
+    import tiktoken
+except ImportError:  # pragma: no cover - depends on the environment
+    tiktoken = None
+
+# Configure logging
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger(__name__)
+
+# Encoding used for models tiktoken does not know (e.g. Mistral models)
+DEFAULT_ENCODING = "cl100k_base"
+
+# Strings longer than this are counted but not kept in the LRU cache
+MAX_CACHED_TEXT_LENGTH = 8192
+COUNT_CACHE_SIZE = 4096
+
+# Approximation of the cl100k pre-tokenizer, used without tiktoken
+_FALLBACK_PATTERN = re.compile(
+    r"'(?:s|t|re|ve|m|ll|d)| ?[^\W\d_]+| ?\d{1,3}| ?[^\s\w]+|\s+(?!\S)|\s+"
+)
+
+# Long words are split into pieces of this many characters, roughly matching
+# how BPE splits uncommon words
+_FALLBACK_PIECE_LENGTH = 6
+
+
+class RegexEncoder:
+    """
+    Tokenizer approximation used when tiktoken is unavailable.
+
+    Tokens are the text pieces themselves, so decoding is concatenation.
+    """
+
+    name = "regex"
+
+    def encode(self, text: str) -> List[str]:
+        """Split text into approximate tokens"""
+        tokens = []
+        for match in _FALLBACK_PATTERN.finditer(text):
+            piece = match.group()
+            if len(piece) <= _FALLBACK_PIECE_LENGTH or piece.isspace():
+                tokens.append(piece)
+            else:
+                tokens.extend(
+                    piece[i:i + _FALLBACK_PIECE_LENGTH]
+                    for i in range(0, len(piece), _FALLBACK_PIECE_LENGTH)
+                )
+        return tokens
+
+    def encode_batch(self, texts: Sequence[str]) -> List[List[str]]:
+        """Split several texts into approximate tokens"""
+        return [self.encode(text) for text in texts]
+
+    def decode(self, tokens: Sequence[str]) -> str:
+        """Join tokens back into text"""
+        return "".join(tokens)
+
+    def starts_character(self, token: str) -> bool:
+        """Whether a token starts at a character boundary; text pieces always do"""
+        return True
+
+
+class TiktokenEncoder:
+    """Thin wrapper giving a tiktoken encoding the same interface as RegexEncoder"""
+
+    def __init__(self, encoding):
+        self.encoding = encoding
+        self.name = encoding.name
+
+    def encode(self, text: str) -> List[int]:
+        """Encode text into token IDs"""
+        return self.encoding.encode(text, disallowed_special=())
+
+    def encode_batch(self, texts: Sequence[str]) -> List[List[int]]:
+        """Encode several texts into token IDs using tiktoken's thread pool"""
+        return self.encoding.encode_batch(list(texts), disallowed_special=())
+
+    def decode(self, tokens: Sequence[int]) -> str:
+        """Decode token IDs back into text"""
+        return self.encoding.decode(list(tokens))
+
+    def starts_character(self, token: int) -> bool:
+        """Whether a token starts at a character boundary, not with a UTF-8 continuation byte"""
+        first = self.encoding.decode_single_token_bytes(token)[:1]
+        return not first or not 0x80 <= first[0] < 0xC0
+
+
+_encoders: Dict[str, object] = {}
+_encoders_lock = threading.Lock()
+
+
+def _load_encoder(model: str):
+    """Load the encoder for a model, falling back to the regex approximation"""
+    if tiktoken is None:
+        return RegexEncoder()
+    try:
+        try:
+            encoding = tiktoken.encoding_for_model(model)
+        except KeyError:
+            encoding = tiktoken.get_encoding(DEFAULT_ENCODING)
+        return TiktokenEncoder(encoding)
+    except Exception as e:
+        # Encoding files are downloaded on first use and may be unreachable
+        logger.warning(f"Could not load tiktoken encoding for {model}, using approximate counts: {str(e)}")
+        return RegexEncoder()
+
+
+def get_encoder(model: str):
+    """
+    Get the (cached) encoder for a model.
+
+    Args:
+        model: The model name.
+
+    Returns:
+        An encoder with encode, encode_batch and decode methods.
+    """
+    encoder = _encoders.get(model)
+    if encoder is None:
+        with _encoders_lock:
+            encoder = _encoders.get(model)
+            if encoder is None:
+                encoder = _load_encoder(model)
+                _encoders[model] = encoder
+    return encoder
+
+
+@lru_cache(maxsize=COUNT_CACHE_SIZE)
+def _cached_count(model: str, text: str) -> int:
+    return len(get_encoder(model).encode(text))
+
+
+def count_tokens(text: str, model: str) -> int:
+    """
+    Count the number of tokens in a text.
+
+    Args:
+        text: The text to count tokens for.
+        model: The model whose tokenizer to use.
+
+    Returns:
+        The number of tokens.
+    """
+    if not text:
+        return 0
+    if len(text) <= MAX_CACHED_TEXT_LENGTH:
+        return _cached_count(model, text)
+    return len(get_encoder(model).encode(text))
+
+
+def count_tokens_batch(texts: Sequence[str], model: str) -> List[int]:
+    """
+    Count the tokens of several texts in one call.
+
+    Args:
+        texts: The texts to count tokens for.
+        model: The model whose tokenizer to use.
+
+    Returns:
+        Token counts in the same order as the texts.
+    """
+    return [len(tokens) for tokens in get_encoder(model).encode_batch(texts)]
+
+
+def character_boundary(encoder, tokens: Sequence, index: int, step: int = -1) -> int:
+    """
+    Move a split point between tokens to the nearest point between characters.
+
+    Byte-level BPE tokens can end inside a multi-byte UTF-8 character, and
+    decoding the tokens on either side of such a split separately turns the
+    character into U+FFFD.
+
+    Args:
+        encoder: The encoder of the tokens (get_encoder).
+        tokens: The tokens.
+        index: The split point, the index of the first token after it.
+        step: -1 to move towards the start of the tokens, 1 towards the end.
+
+    Returns:
+        The nearest index in the step direction whose token starts a
+        character, or 0 or len(tokens).
+    """
+    while 0 < index < len(tokens) and not encoder.starts_character(tokens[index]):
+        index += step
+    return index
+
+
+def chunk_text(text: str, max_chunk_tokens: int, model: str) -> List[str]:
+    """
+    Split text into chunks of at most max_chunk_tokens tokens.
+
+    The text is tokenized once and split at token offsets, moved back so no
+    multi-byte character is split between two chunks.
+
+    Args:
+        text: The text to split.
+        max_chunk_tokens: Maximum tokens per chunk.
+        model: The model whose tokenizer to use.
+
+    Returns:
+        List of text chunks.
+    """
+    if max_chunk_tokens <= 0:
+        raise ValueError("max_chunk_tokens must be positive")
+
+    encoder = get_encoder(model)
+    tokens = encoder.encode(text)
+    chunks = []
+    start = 0
+    while start < len(tokens):
+        end = min(start + max_chunk_tokens, len(tokens))
+        aligned = character_boundary(encoder, tokens, end)
+        # A chunk too small to hold one whole character is split anyway
+        if aligned > start:
+            end = aligned
+        chunk = encoder.decode(tokens[start:end])
+        if chunk.strip():
+            chunks.append(chunk)
+        start = end
+    return chunks
+
+
+def clear_caches():
+    """Drop cached encoders and token counts"""
+    with _encoders_lock:
+        _encoders.clear()
+    _cached_count.cache_clear()
@@ -0,0 +1,436 @@
+"""
+LLM Usage Ledger Module
+
+This module keeps a persistent, append-only record of every LLM call: the
+provider, model, endpoint, repository being analyzed, token counts, latency,
+estimated cost and whether the response came from the cache. Records are
+buffered in memory and appended to a local SQLite file in small batches, so
+recording adds no measurable latency to a call.
+
+Aggregation queries summarize usage per repository, day, model, provider or
+endpoint (with p50/p95 latency), and rank the prompts that dominate cost and
+latency. The repository a call belongs to is taken from a context variable
+set by the analyzers with repo_context, so it follows async tasks.
+"""
+
+import os
+import time
+import atexit
+import sqlite3
+import hashlib
+import logging
+import threading
+import contextvars
+from contextlib import contextmanager
+from dataclasses import dataclass, astuple
+from typing import Dict, Any, List, Optional, Tuple
+
+from dotenv import load_dotenv
+
+from prompt_builder import cached_prompt_tokens
+
+# Configure logging
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger(__name__)
+
+# Load environment variables
+load_dotenv()
+
+LEDGER_ENABLED = os.getenv("LLM_USAGE_LEDGER_ENABLED", "1").lower() in ("1", "true", "yes")
+# One ledger per user, wherever the analyzers are started
+LEDGER_PATH = os.getenv(
+    "LLM_USAGE_LEDGER_PATH", os.path.join(os.path.expanduser("~"), ".cache", "llm-analysis", "usage.sqlite3")
+)
+
+# Buffered records are appended once this many are pending, or this old
+FLUSH_RECORDS = 64
+FLUSH_SECONDS = 2.0
+
+# USD per million (input, output) tokens, used to estimate call cost
+MODEL_PRICES: Dict[str, Tuple[float, float]] = {
+    "gpt-4o": (2.50, 10.00),
+    "gpt-4o-mini": (0.15, 0.60),
+    "gpt-4-turbo": (10.00, 30.00),
+    "gpt-4": (30.00, 60.00),
+    "gpt-3.5-turbo": (0.50, 1.50),
+    "text-embedding-3-small": (0.02, 0.0),
+    "text-embedding-3-large": (0.13, 0.0),
+    "mistral-large-latest": (2.00, 6.00),
+    "mistral-medium-latest": (0.40, 2.00),
+    "mistral-small-latest": (0.20, 0.60),
+    "mistral-embed": (0.10, 0.0),
+}
+
+# Share of the input price charged for prompt tokens served from the
+# provider's prompt cache
+CACHED_INPUT_PRICE_RATIO = 0.5
+
+# Share of the regular price charged for requests run through a batch API
+BATCH_PRICE_RATIO = 0.5
+
+# Columns usage can be grouped by
+GROUP_COLUMNS = {
+    "repo": "repo",
+    "day": "date(ts, 'unixepoch')",
+    "model": "model",
+    "provider": "provider",
+    "endpoint": "endpoint",
+}
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS calls (
+    id INTEGER PRIMARY KEY,
+    ts REAL NOT NULL,
+    provider TEXT NOT NULL,
+    model TEXT NOT NULL,
+    endpoint TEXT NOT NULL,
+    repo TEXT,
+    prompt_hash TEXT,
+    prompt_preview TEXT,
+    prompt_tokens INTEGER NOT NULL,
+    completion_tokens INTEGER NOT NULL,
+    latency_ms REAL NOT NULL,
+    cached INTEGER NOT NULL,
+    cost_usd REAL NOT NULL,
+    cached_tokens INTEGER NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS calls_ts ON calls (ts);
+"""
+
+_current_repo: contextvars.ContextVar = contextvars.ContextVar("llm_usage_repo", default=None)
+
+
+@contextmanager
+def repo_context(repo: Any):
+    """
+    Attribute the LLM calls made inside the block to a repository.
+
+    Args:
+        repo: Repository path or name.
+    """
+    token = _current_repo.set(str(repo))
+    try:
+        yield
+    finally:
+        _current_repo.reset(token)
+
+
+def current_repo() -> Optional[str]:
+    """Get the repository LLM calls are currently attributed to"""
+    return _current_repo.get()
+
+
+def estimate_cost(
+    model: str,
+    prompt_tokens: int,
+    completion_tokens: int,
+    cached_tokens: int = 0,
+    batch: bool = False
+) -> float:
+    """
+    Estimate the cost of a call in USD.
+
+    Args:
+        model: Model name; dated variants use the price of their base model.
+        prompt_tokens: Input tokens, including cached ones.
+        completion_tokens: Output tokens.
+        cached_tokens: Input tokens served from the provider's prompt cache.
+        batch: Whether the call ran through a batch API, at batch pricing.
+
+    Returns:
+        Estimated cost, or 0.0 for models without a known price.
+    """
+    prices = MODEL_PRICES.get(model)
+    if prices is None:
+        base = max((name for name in MODEL_PRICES if model.startswith(name + "-")), key=len, default=None)
+        prices = MODEL_PRICES.get(base, (0.0, 0.0))
+    input_tokens = prompt_tokens - cached_tokens + cached_tokens * CACHED_INPUT_PRICE_RATIO
+    cost = (input_tokens * prices[0] + completion_tokens * prices[1]) / 1_000_000
+    return cost * BATCH_PRICE_RATIO if batch else cost
+
+
+def prompt_fingerprint(messages: List[Dict[str, Any]]) -> Tuple[str, str]:
+    """
+    Identify the prompt of a chat call for ranking.
+
+    Args:
+        messages: Chat messages.
+
+    Returns:
+        Tuple of (hash of the message texts, preview of the last message).
+    """
+    texts = [str(message.get("content") or "") for message in messages]
+    digest = hashlib.sha256("\x00".join(texts).encode("utf-8")).hexdigest()[:16]
+    preview = " ".join(texts[-1].split())[:120] if texts else ""
+    return digest, preview
+
+
+@dataclass
+class UsageRecord:
+    """One LLM call, as stored in the ledger"""
+    ts: float
+    provider: str
+    model: str
+    endpoint: str
+    repo: Optional[str]
+    prompt_hash: Optional[str]
+    prompt_preview: Optional[str]
+    prompt_tokens: int
+    completion_tokens: int
+    latency_ms: float
+    cached: bool
+    cost_usd: float
+    cached_tokens: int = 0
+
+
+class UsageLedger:
+    """
+    Append-only SQLite ledger of LLM calls.
+    """
+
+    def __init__(self, path: str = LEDGER_PATH):
+        """
+        Initialize the ledger.
+
+        Args:
+            path: SQLite database file.
+        """
+        self.path = path
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._lock = threading.Lock()
+        self._pending: List[UsageRecord] = []
+        self._last_flush = time.time()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None, timeout=30)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(_SCHEMA)
+        self._migrate()
+
+    def _migrate(self):
+        """Add columns introduced after a ledger file was created"""
+        columns = {row[1] for row in self._conn.execute("PRAGMA table_info(calls)")}
+        if "cached_tokens" not in columns:
+            self._conn.execute("ALTER TABLE calls ADD COLUMN cached_tokens INTEGER NOT NULL DEFAULT 0")
+
+    def record(
+        self,
+        provider: str,
+        model: str,
+        endpoint: str,
+        usage: Dict[str, Any],
+        latency_seconds: float,
+        cached: bool = False,
+        messages: Optional[List[Dict[str, Any]]] = None,
+        repo: Optional[str] = None,
+        batch: bool = False
+    ):
+        """
+        Record one call.
+
+        Args:
+            provider: Provider name.
+            model: Model that served the call.
+            endpoint: API endpoint, e.g. "chat/completions".
+            usage: Token usage reported by the provider.
+            latency_seconds: Call latency.
+            cached: True if the response came from the response cache, was
+                shared with a coalesced call or was replayed from a cassette;
+                cached calls cost nothing.
+            messages: Chat messages, used to identify the prompt.
+            repo: Repository of the call. If None, uses the current repo_context.
+            batch: Whether the call ran through a batch API, at batch pricing.
+        """
+        prompt_tokens = int(usage.get("prompt_tokens") or 0)
+        completion_tokens = int(usage.get("completion_tokens") or 0)
+        cached_tokens = cached_prompt_tokens(usage)
+        prompt_hash, preview = prompt_fingerprint(messages) if messages else (None, None)
+        record = UsageRecord(
+            ts=time.time(),
+            provider=provider,
+            model=model,
+            endpoint=endpoint,
+            repo=repo or current_repo(),
+            prompt_hash=prompt_hash,
+            prompt_preview=preview,
+            prompt_tokens=prompt_tokens,
+            completion_tokens=completion_tokens,
+            latency_ms=latency_seconds * 1000.0,
+            cached=cached,
+            cost_usd=0.0 if cached else estimate_cost(model, prompt_tokens, completion_tokens, cached_tokens, batch),
+            cached_tokens=cached_tokens
+        )
+        with self._lock:
+            self._pending.append(record)
+            if len(self._pending) >= FLUSH_RECORDS or record.ts - self._last_flush >= FLUSH_SECONDS:
+                self._flush_locked()
+
+    def flush(self):
+        """Append the buffered records"""
+        with self._lock:
+            self._flush_locked()
+
+    def _flush_locked(self):
+        if self._pending:
+            try:
+                self._conn.execute("BEGIN")
+                self._conn.executemany(
+                    "INSERT INTO calls (ts, provider, model, endpoint, repo, prompt_hash, prompt_preview, "
+                    "prompt_tokens, completion_tokens, latency_ms, cached, cost_usd, cached_tokens) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                    [astuple(record) for record in self._pending]
+                )
+                self._conn.execute("COMMIT")
+                self._pending = []
+            except sqlite3.Error as e:
+                if self._conn.in_transaction:
+                    self._conn.execute("ROLLBACK")
+                logger.warning(f"Could not write usage ledger: {str(e)}")
+        self._last_flush = time.time()
+
+    def _where(self, since: Optional[float], repo: Optional[str]) -> Tuple[str, List[Any]]:
+        clauses, params = [], []
+        if since is not None:
+            clauses.append("ts >= ?")
+            params.append(since)
+        if repo is not None:
+            clauses.append("repo = ?")
+            params.append(repo)
+        return (" WHERE " + " AND ".join(clauses)) if clauses else "", params
+
+    def summary(
+        self,
+        group_by: str = "repo",
+        since: Optional[float] = None,
+        repo: Optional[str] = None
+    ) -> List[Dict[str, Any]]:
+        """
+        Aggregate usage.
+
+        Args:
+            group_by: One of "repo", "day", "model", "provider" or "endpoint".
+            since: Only include calls at or after this Unix time.
+            repo: Only include calls for this repository.
+
+        Returns:
+            One row per group with call, token, cache hit and cost totals and
+            p50/p95 latency, most expensive group first.
+        """
+        if group_by not in GROUP_COLUMNS:
+            raise ValueError(f"Cannot group usage by {group_by!r}; use one of {', '.join(GROUP_COLUMNS)}")
+        self.flush()
+        where, params = self._where(since, repo)
+        column = GROUP_COLUMNS[group_by]
+        # Latency percentiles are nearest-rank: the row ranked ceil(p * n) in its group
+        with self._lock:
+            rows = self._conn.execute(
+                f"WITH ranked AS ("
+                f"SELECT {column} AS grp, *, "
+                f"ROW_NUMBER() OVER (PARTITION BY {column} ORDER BY latency_ms) AS latency_rank, "
+                f"COUNT(*) OVER (PARTITION BY {column}) AS group_calls "
+                f"FROM calls{where}) "
+                "SELECT grp, COUNT(*), SUM(cached), SUM(prompt_tokens), SUM(cached_tokens), SUM(completion_tokens), "
+                "SUM(cost_usd) AS cost, "
+                "MAX(CASE WHEN latency_rank = MAX(1, (group_calls * 50 + 99) / 100) THEN latency_ms END), "
+                "MAX(CASE WHEN latency_rank = MAX(1, (group_calls * 95 + 99) / 100) THEN latency_ms END) "
+                "FROM ranked GROUP BY grp ORDER BY cost DESC",
+                params
+            ).fetchall()
+        return [
+            {
+                group_by: grp,
+                "calls": calls,
+                "cache_hits": cache_hits,
+                "prompt_tokens": prompt_tokens,
+                "cached_tokens": cached_tokens,
+                "completion_tokens": completion_tokens,
+                "total_tokens": prompt_tokens + completion_tokens,
+                "cost_usd": round(cost_usd, 6),
+                "p50_latency_ms": round(p50, 2),
+                "p95_latency_ms": round(p95, 2)
+            }
+            for grp, calls, cache_hits, prompt_tokens, cached_tokens, completion_tokens, cost_usd, p50, p95 in rows
+        ]
+
+    def top_prompts(
+        self,
+        order_by: str = "cost",
+        limit: int = 10,
+        since: Optional[float] = None,
+        repo: Optional[str] = None
+    ) -> List[Dict[str, Any]]:
+        """
+        Rank the prompts that dominate cost or latency.
+
+        Args:
+            order_by: "cost", "tokens" or "latency" (total time spent).
+            limit: Number of prompts to return.
+            since: Only include calls at or after this Unix time.
+            repo: Only include calls for this repository.
+
+        Returns:
+            One row per prompt with its preview, call count and totals.
+        """
+        orders = {"cost": "cost", "tokens": "tokens", "latency": "latency"}
+        if order_by not in orders:
+            raise ValueError(f"Cannot rank prompts by {order_by!r}; use one of {', '.join(orders)}")
+        self.flush()
+        where, params = self._where(since, repo)
+        where = (where + " AND" if where else " WHERE") + " prompt_hash IS NOT NULL"
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT prompt_hash, MAX(prompt_preview), COUNT(*), SUM(prompt_tokens + completion_tokens) AS tokens, "
+                f"SUM(latency_ms) AS latency, SUM(cost_usd) AS cost, MAX(model) FROM calls{where} "
+                f"GROUP BY prompt_hash ORDER BY {orders[order_by]} DESC LIMIT ?",
+                params + [limit]
+            ).fetchall()
+        return [
+            {
+                "prompt_hash": prompt_hash,
+                "prompt_preview": preview,
+                "calls": calls,
+                "total_tokens": total_tokens,
+                "latency_ms": round(latency_ms, 2),
+                "cost_usd": round(cost_usd, 6),
+                "model": model
+            }
+            for prompt_hash, preview, calls, total_tokens, latency_ms, cost_usd, model in rows
+        ]
+
+    def recent(self, limit: int = 50) -> List[Dict[str, Any]]:
+        """Get the most recent calls, newest first"""
+        self.flush()
+        with self._lock:
+            cursor = self._conn.execute("SELECT * FROM calls ORDER BY id DESC LIMIT ?", (limit,))
+            columns = [description[0] for description in cursor.description]
+            return [dict(zip(columns, row)) for row in cursor.fetchall()]
+
+    def close(self):
+        """Flush pending records and close the database"""
+        self.flush()
+        with self._lock:
+            self._conn.close()
+
+
+_default_ledger = None
+_default_lock = threading.Lock()
+
+
+def get_usage_ledger() -> Optional[UsageLedger]:
+    """
+    Get the process-wide usage ledger.
+
+    Returns:
+        The shared ledger, or None if LLM_USAGE_LEDGER_ENABLED is off.
+    """
+    global _default_ledger
+    if not LEDGER_ENABLED:
+        return None
+    if _default_ledger is None:
+        with _default_lock:
+            if _default_ledger is None:
+                _default_ledger = UsageLedger()
+                atexit.register(_default_ledger.flush)
+    return _default_ledger